@@ -0,0 +1,9 @@
+"""Local JSON API over the ticket store (tickets, history, chat, stats).
+
+Runs as its own process next to the Streamlit app, sharing the database and
+the login sessions:
+
+    python -m api --port 8502
+    curl -X POST localhost:8502/api/v1/auth/token -d '{"username": "admin", "password": "..."}'
+    curl -H 'Authorization: Bearer <token>' 'localhost:8502/api/v1/chamados?status=Pendente&limite=20'
+"""
@@ -0,0 +1,31 @@
+"""python -m api: serve the JSON API with uvicorn"""
+import argparse
+import os
+import sys
+
+# Bind address of the JSON API (local only by default)
+API_HOST = os.environ.get('API_HOST', '127.0.0.1')
+API_PORT = int(os.environ.get('API_PORT', 8502))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the JSON API')
+    parser.add_argument('--host', default=API_HOST)
+    parser.add_argument('--port', type=int, default=API_PORT)
+    parser.add_argument('--log-level', default='warning')
+    args = parser.parse_args(argv)
+
+    try:
+        import uvicorn
+    except ImportError:
+        print("uvicorn is required to serve the API: pip install 'uvicorn[standard]'", file=sys.stderr)
+        return 1
+
+    # One event loop is enough: handlers only wait on the read pool and the writer thread
+    uvicorn.run('api.app:app', host=args.host, port=args.port, log_level=args.log_level,
+                access_log=False, lifespan='on')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
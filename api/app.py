@@ -0,0 +1,431 @@
+"""ASGI application of the JSON API.
+
+Plain ASGI (no framework): a regex route table, async handlers, reads on
+api.pool.ReadPool and writes through the components.database functions on a
+single writer thread. Every read response carries an ETag derived from the
+'chamados' data version (bumped by triggers on tickets, history and chat), the
+request and the caller; a matching If-None-Match is answered with 304 before
+the query runs.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+import traceback
+from urllib.parse import parse_qsl, urlencode
+
+try:
+    import orjson
+except ImportError:  # Optional; the stdlib encoder is a few times slower
+    orjson = None
+
+from api import queries
+from api.pool import ReadPool, WriteQueue
+from components import alert_ingest, database
+from components.notifications import start_notification_dispatcher
+from components.auth import authenticate_user, resolve_session
+from components.metrics import inc, observe, render_prometheus
+from components.password_hashing import HashingBusyError, LoginThrottledError
+from components.session_tokens import (
+    SESSION_TTL_HOURS, cache_principal, get_cached_principal, new_session_token, verify_session_token
+)
+
+# Read connections (threads) serving the GET handlers
+API_READ_POOL_SIZE = int(os.environ.get('API_READ_POOL_SIZE', 4))
+# Page size of the lists (?limite=) when not given, and its upper bound
+API_DEFAULT_PAGE_SIZE = int(os.environ.get('API_DEFAULT_PAGE_SIZE', 50))
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 200))
+# Shared secret of the monitoring systems posting to /alertas (empty disables the route)
+ALERT_INGEST_TOKEN = os.environ.get('ALERT_INGEST_TOKEN', '')
+MAX_BODY_BYTES = 64 * 1024
+# Bulk alert posts may carry thousands of events
+ALERT_MAX_BODY_BYTES = 16 * 1024 * 1024
+
+PREFIX = '/api/v1'
+PRIORIDADES = ('Alta', 'Média', 'Baixa')
+STAFF_ROLES = ('Técnico', 'Administrador', 'Diretoria')
+
+JSON_TYPE = b'application/json'
+TEXT_TYPE = b'text/plain; version=0.0.4; charset=utf-8'
+
+
+class ApiError(Exception):
+    """Ends a request with an error status and {"erro": message}"""
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or []
+
+
+def dumps(value):
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+class Request:
+    __slots__ = ('method', 'path', 'query_string', 'query', 'headers', 'body', 'params', 'principal')
+
+    def __init__(self, scope):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.query_string = scope.get('query_string', b'').decode('latin-1')
+        self.query = dict(parse_qsl(self.query_string))
+        self.headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+        self.body = b''
+        self.params = {}
+        self.principal = None
+
+    def json(self):
+        try:
+            value = json.loads(self.body or b'{}')
+        except ValueError:
+            raise ApiError(400, 'Corpo da requisição não é um JSON válido')
+        if not isinstance(value, dict):
+            raise ApiError(400, 'O corpo da requisição deve ser um objeto JSON')
+        return value
+
+    def int_param(self, name, default=None):
+        value = self.query.get(name)
+        if value is None or value == '':
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            raise ApiError(400, f"Parâmetro '{name}' deve ser um número inteiro")
+
+
+def _text_field(body, name, required=True):
+    value = body.get(name)
+    if not required and (value is None or value == ''):
+        return None
+    if not isinstance(value, str) or not value.strip():
+        raise ApiError(400, f"Campo '{name}' é obrigatório")
+    return value.strip()
+
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    return header.strip() == '*' or etag in (tag.strip() for tag in header.split(','))
+
+
+# (method, path pattern, handler, requires a session)
+ROUTES = [
+    ('GET', r'/health', 'health', False),
+    ('POST', r'/auth/token', 'login', False),
+    ('GET', r'/chamados', 'list_chamados', True),
+    ('POST', r'/chamados', 'create_chamado', True),
+    ('GET', r'/chamados/(?P<chamado_id>\d+)', 'get_chamado', True),
+    ('GET', r'/chamados/(?P<chamado_id>\d+)/historico', 'list_historico', True),
+    ('GET', r'/chamados/(?P<chamado_id>\d+)/mensagens', 'list_mensagens', True),
+    ('POST', r'/chamados/(?P<chamado_id>\d+)/mensagens', 'add_mensagem', True),
+    ('GET', r'/stats', 'stats', True),
+    ('GET', r'/metrics', 'metrics', False),
+    ('POST', r'/alertas', 'ingest_alertas', False),
+]
+
+
+class JsonApi:
+    """The ASGI callable; the pools are created on lifespan startup"""
+
+    def __init__(self):
+        self.routes = [(method, re.compile(re.escape(PREFIX) + pattern + '$'), getattr(self, handler), handler, auth)
+                       for method, pattern, handler, auth in ROUTES]
+        self.pool = None
+        self.writes = None
+
+    async def startup(self):
+        self.writes = WriteQueue()
+        # Schema, indexes and the SLA policies used by create_chamado
+        await self.writes.run(database.init_database)
+        self.pool = ReadPool(API_READ_POOL_SIZE)
+        alert_ingest.start_alert_ingestor()
+        start_notification_dispatcher()
+
+    def shutdown(self):
+        alert_ingest.flush()
+        if self.pool:
+            self.pool.close()
+        if self.writes:
+            self.writes.close()
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await self.startup()
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        start = time.perf_counter()
+        route = 'nao_encontrado'
+        try:
+            request = Request(scope)
+            handler, route, auth = self._match(request)
+            request.body = await self._read_body(
+                scope, receive, ALERT_MAX_BODY_BYTES if route == 'ingest_alertas' else MAX_BODY_BYTES)
+            if auth:
+                request.principal = await self._authenticate(request)
+            status, payload, headers = await handler(request)
+        except ApiError as e:
+            status, payload, headers = e.status, {'erro': e.message}, e.headers
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e) and 'busy' not in str(e):
+                traceback.print_exc(file=sys.stderr)
+            status, payload, headers = 503, {'erro': 'Banco de dados ocupado, tente novamente'}, [('retry-after', '1')]
+        except Exception:
+            traceback.print_exc(file=sys.stderr)
+            status, payload, headers = 500, {'erro': 'Erro interno do servidor'}, []
+
+        await self._send(send, status, payload, headers)
+        observe('chamados_api_request_seconds', 'route', route, time.perf_counter() - start)
+        inc('chamados_api_responses_total', 'status', str(status))
+
+    async def _read_body(self, scope, receive, limit):
+        if scope['method'] not in ('POST', 'PUT', 'PATCH'):
+            return b''
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > limit:
+                raise ApiError(413, 'Corpo da requisição muito grande')
+            chunks.append(chunk)
+            if not message.get('more_body'):
+                return b''.join(chunks)
+
+    def _match(self, request):
+        allowed = []
+        for method, pattern, handler, name, auth in self.routes:
+            match = pattern.match(request.path)
+            if match:
+                if method != request.method:
+                    allowed.append(method)
+                    continue
+                request.params = {key: int(value) for key, value in match.groupdict().items()}
+                return handler, name, auth
+        if allowed:
+            raise ApiError(405, 'Método não permitido', [('allow', ', '.join(allowed))])
+        raise ApiError(404, 'Recurso não encontrado')
+
+    async def _send(self, send, status, payload, headers):
+        if payload is None:
+            body, content_type = b'', None
+        elif isinstance(payload, str):
+            body, content_type = payload.encode(), TEXT_TYPE
+        else:
+            body, content_type = dumps(payload), JSON_TYPE
+        raw_headers = [(b'content-length', str(len(body)).encode())]
+        if content_type:
+            raw_headers.append((b'content-type', content_type))
+        raw_headers.extend((name.encode('latin-1'), value.encode('latin-1')) for name, value in headers)
+        await send({'type': 'http.response.start', 'status': status, 'headers': raw_headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _authenticate(self, request):
+        """Principal of the Bearer session token (same tokens and cache as the Streamlit app)"""
+        scheme, _, token = request.headers.get('authorization', '').partition(' ')
+        token = token.strip()
+        if scheme.lower() != 'bearer' or not token:
+            raise ApiError(401, 'Token de acesso ausente', [('www-authenticate', 'Bearer')])
+        key = verify_session_token(token)
+        # Cache hits are answered on the event loop; misses read the sessions table on the pool
+        principal = get_cached_principal(key) if key else None
+        if principal is None and key:
+            principal = await self.pool.call(resolve_session, token)
+        if not principal:
+            raise ApiError(401, 'Sessão inválida ou expirada', [('www-authenticate', 'Bearer')])
+        return principal
+
+    def _etag(self, version, request):
+        principal = request.principal or {}
+        key = f"{version}|{request.path}?{request.query_string}|{principal.get('id')}|{principal.get('role')}"
+        return '"' + hashlib.blake2b(key.encode(), digest_size=12).hexdigest() + '"'
+
+    async def _conditional(self, request, fn, *args, guard=None):
+        """Read fn(conn, *args) with an ETag; 304 (without running fn) if the client's copy is current.
+
+        guard(conn) runs first (access checks), so a 304 never skips them.
+        """
+        if_none_match = request.headers.get('if-none-match')
+
+        def read(conn):
+            if guard:
+                guard(conn)
+            etag = self._etag(queries.data_version(conn), request)
+            if _etag_matches(if_none_match, etag):
+                return etag, None
+            return etag, fn(conn, *args)
+
+        etag, result = await self.pool.run(read)
+        headers = [('etag', etag), ('cache-control', 'private, no-cache')]
+        if result is None:
+            return 304, None, headers
+        return 200, result, headers
+
+    def _page_size(self, request):
+        limit = request.int_param('limite', API_DEFAULT_PAGE_SIZE)
+        if not 1 <= limit <= API_MAX_PAGE_SIZE:
+            raise ApiError(400, f"Parâmetro 'limite' deve estar entre 1 e {API_MAX_PAGE_SIZE}")
+        return limit
+
+    @staticmethod
+    def _paged(request, cursor_name, status, result, headers):
+        """{"itens", "proximo"} body plus a Link header to the next page"""
+        if status != 200:
+            return status, result, headers
+        items, cursor = result
+        if cursor is not None:
+            query = urlencode({**request.query, cursor_name: cursor})
+            headers.append(('link', f'<{request.path}?{query}>; rel="next"'))
+        return status, {'itens': items, 'proximo': cursor}, headers
+
+    def _ticket_guard(self, request):
+        """Access check of a ticket's resources: staff see all, requesters only their own"""
+        chamado_id = request.params['chamado_id']
+        principal = request.principal
+
+        def guard(conn):
+            owner = queries.get_chamado_owner(conn, chamado_id)
+            if owner is None:
+                raise ApiError(404, 'Chamado não encontrado')
+            if principal['role'] not in STAFF_ROLES and owner != principal['id']:
+                raise ApiError(403, 'Acesso negado a este chamado')
+        return guard
+
+    # Handlers: async (request) -> (status, payload, [(header, value)])
+
+    async def health(self, request):
+        return 200, {'status': 'ok'}, []
+
+    async def metrics(self, request):
+        return 200, render_prometheus(), []
+
+    async def login(self, request):
+        body = request.json()
+        username, password = body.get('username'), body.get('password')
+        if not isinstance(username, str) or not isinstance(password, str) or not username or not password:
+            raise ApiError(400, 'Informe usuário e senha')
+        try:
+            # Hashing has its own worker pool; keep its wait off the read and write threads
+            user = await asyncio.to_thread(authenticate_user, username, password)
+        except LoginThrottledError as e:
+            raise ApiError(429, 'Muitas tentativas sem sucesso, tente novamente mais tarde',
+                           [('retry-after', str(int(e.retry_after) + 1))])
+        except HashingBusyError:
+            raise ApiError(503, 'Sistema ocupado no momento, tente novamente', [('retry-after', '1')])
+        if not user:
+            raise ApiError(401, 'Usuário ou senha inválidos')
+
+        token, key = new_session_token()
+        await self.writes.run(database.create_session, key, user['id'])
+        cache_principal(key, user)
+        return 200, {'token': token, 'tipo': 'Bearer', 'expira_em_horas': SESSION_TTL_HOURS, 'usuario': user}, []
+
+    async def list_chamados(self, request):
+        filters = {name: request.query.get(name) for name in ('status', 'prioridade', 'setor')}
+        filters['solicitante_id'] = request.int_param('solicitante_id')
+        filters['tecnico_id'] = request.int_param('tecnico_id')
+        if request.principal['role'] not in STAFF_ROLES:
+            filters['solicitante_id'] = request.principal['id']
+        before, limit = request.int_param('antes'), self._page_size(request)
+        return self._paged(request, 'antes',
+                           *await self._conditional(request, queries.list_chamados, filters, before, limit))
+
+    async def get_chamado(self, request):
+        return await self._conditional(request, queries.get_chamado, request.params['chamado_id'],
+                                       guard=self._ticket_guard(request))
+
+    async def list_historico(self, request):
+        after, limit = request.int_param('depois'), self._page_size(request)
+        return self._paged(request, 'depois', *await self._conditional(
+            request, queries.list_historico, request.params['chamado_id'], after, limit,
+            guard=self._ticket_guard(request)))
+
+    async def list_mensagens(self, request):
+        after, limit = request.int_param('depois'), self._page_size(request)
+        return self._paged(request, 'depois', *await self._conditional(
+            request, queries.list_mensagens, request.params['chamado_id'], after, limit,
+            guard=self._ticket_guard(request)))
+
+    async def stats(self, request):
+        if request.principal['role'] not in STAFF_ROLES:
+            raise ApiError(403, 'Acesso negado')
+        return await self._conditional(request, queries.quick_stats)
+
+    async def create_chamado(self, request):
+        body = request.json()
+        titulo, descricao = _text_field(body, 'titulo'), _text_field(body, 'descricao')
+        prioridade = body.get('prioridade', 'Média')
+        if prioridade not in PRIORIDADES:
+            raise ApiError(400, f"Campo 'prioridade' deve ser um de: {', '.join(PRIORIDADES)}")
+        setor = _text_field(body, 'setor', required=False) or request.principal['setor']
+        observacoes = _text_field(body, 'observacoes', required=False)
+
+        principal = request.principal
+        chamado_id = await self.writes.run(database.create_chamado, titulo, descricao, setor, prioridade,
+                                           principal['id'], principal['username'], observacoes)
+        return 201, {'id': chamado_id}, [('location', f"{PREFIX}/chamados/{chamado_id}")]
+
+    async def add_mensagem(self, request):
+        mensagem = _text_field(request.json(), 'mensagem')
+        chamado_id = request.params['chamado_id']
+        await self.pool.run(self._ticket_guard(request))
+
+        principal = request.principal
+        await self.writes.run(database.add_message, chamado_id, principal['id'], principal['username'], mensagem)
+        return 201, {'chamado_id': chamado_id}, [('location', f"{PREFIX}/chamados/{chamado_id}/mensagens")]
+
+    async def ingest_alertas(self, request):
+        """Bulk alert events (JSON array, {"eventos": [...]}, one event, or JSON lines); queued, 202"""
+        scheme, _, token = request.headers.get('authorization', '').partition(' ')
+        if not ALERT_INGEST_TOKEN:
+            raise ApiError(404, 'Recurso não encontrado')
+        if scheme.lower() != 'bearer' or not hmac.compare_digest(token.strip(), ALERT_INGEST_TOKEN):
+            raise ApiError(401, 'Token de ingestão inválido', [('www-authenticate', 'Bearer')])
+
+        try:
+            if 'ndjson' in request.headers.get('content-type', ''):
+                events = [json.loads(line) for line in request.body.splitlines() if line.strip()]
+            else:
+                events = json.loads(request.body or b'[]')
+        except ValueError:
+            raise ApiError(400, 'Corpo da requisição não é um JSON válido')
+        if isinstance(events, dict):
+            events = events.get('eventos', [events])
+        if not isinstance(events, list):
+            raise ApiError(400, 'Envie uma lista de eventos')
+
+        try:
+            # Validation of a large batch would stall the event loop
+            accepted, rejected = await asyncio.to_thread(alert_ingest.submit, events)
+        except alert_ingest.AlertQueueFull:
+            raise ApiError(503, 'Fila de alertas cheia, tente novamente', [('retry-after', '2')])
+        return 202, {'aceitos': accepted, 'rejeitados': [{'indice': index, 'erro': error}
+                                                         for index, error in rejected]}, []
+
+
+app = JsonApi()
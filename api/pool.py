@@ -0,0 +1,92 @@
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from components import database
+
+# Tables the read queries use that live in the units' files in site-partitioned mode
+SITE_TABLES = ('chamados', 'historico_chamados', 'chat_messages', 'config_versoes')
+
+
+def _attach_sites(conn):
+    """Attach every unit's file and shadow the ticket tables with TEMP views over all of them.
+
+    TEMP objects are resolved first, so api.queries runs unchanged; the central
+    file's own (empty) ticket tables are never read.
+    """
+    schemas = []
+    for site, path in database.get_database_files()[1:]:
+        schema = f'"site_{site}"'
+        conn.execute(f"ATTACH DATABASE ? AS {schema}", (f"file:{path}?mode=ro",))
+        schemas.append(schema)
+    for table in SITE_TABLES:
+        union = ' UNION ALL '.join(f"SELECT * FROM {schema}.{table}" for schema in schemas)
+        if table == 'config_versoes':
+            # One counter per unit: their sum changes whenever any unit changes
+            union = f"SELECT nome, SUM(versao) AS versao FROM ({union}) GROUP BY nome"
+        conn.execute(f"CREATE TEMP VIEW {table} AS {union}")
+
+
+class ReadPool:
+    """Read-only SQLite connections, one per pool thread, for the async handlers.
+
+    Each call runs in its own read transaction, so the data version read by the
+    handler and the rows it returns come from the same snapshot (WAL).
+    """
+
+    def __init__(self, size=4):
+        self.size = size
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix='api-read')
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{database.DB_PATH}?mode=ro", uri=True,
+                                   timeout=database.DB_BUSY_TIMEOUT, check_same_thread=False)
+            if database.SITES:
+                _attach_sites(conn)
+            conn.execute("PRAGMA query_only = 1")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _call(self, fn, args):
+        conn = self._connection()
+        conn.execute("BEGIN")
+        try:
+            return fn(conn, *args)
+        finally:
+            conn.rollback()
+
+    async def run(self, fn, *args):
+        """Run fn(conn, *args) on a pooled connection inside one read transaction"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._call, fn, args)
+
+    async def call(self, fn, *args):
+        """Run a blocking function that opens its own connection (e.g. session lookups) on the pool threads"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+
+class WriteQueue:
+    """A single thread for the components.database write functions (SQLite has one writer)"""
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='api-write')
+
+    async def run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,100 @@
+"""Read queries of the JSON API; each takes a read-only connection from api.pool.ReadPool.
+
+Lists are paginated by keyset (`antes` = last id of the previous page), so a
+page costs the same wherever it is in the table.
+"""
+
+CHAMADO_FIELDS = ('id', 'titulo', 'descricao', 'setor_origem', 'prioridade', 'status',
+                  'solicitante_id', 'solicitante_nome', 'tecnico_id', 'tecnico_nome',
+                  'data_abertura', 'data_atribuicao', 'data_resolucao', 'sla_prazo')
+CHAMADO_DETAIL_FIELDS = CHAMADO_FIELDS + ('observacoes', 'resolucao', 'versao')
+HISTORICO_FIELDS = ('id', 'usuario_id', 'usuario_nome', 'acao', 'detalhes', 'data_acao')
+MENSAGEM_FIELDS = ('id', 'usuario_id', 'username', 'mensagem', 'data_criacao')
+
+# Query parameter -> column of the ticket filters
+CHAMADO_FILTERS = {
+    'status': 'status',
+    'prioridade': 'prioridade',
+    'setor': 'setor_origem',
+    'solicitante_id': 'solicitante_id',
+    'tecnico_id': 'tecnico_id',
+}
+
+
+def data_version(conn):
+    """Version counter of tickets, history and chat (bumped by triggers on every write)"""
+    row = conn.execute("SELECT versao FROM config_versoes WHERE nome = 'chamados'").fetchone()
+    return row[0] if row else 0
+
+
+def _rows(cursor, fields):
+    return [dict(zip(fields, row)) for row in cursor]
+
+
+def list_chamados(conn, filters, before, limit):
+    """One page of tickets, newest first; returns (items, next cursor or None)"""
+    query = f"SELECT {', '.join(CHAMADO_FIELDS)} FROM chamados WHERE 1=1"
+    params = []
+    for name, column in CHAMADO_FILTERS.items():
+        if filters.get(name) is not None:
+            query += f" AND {column} = ?"
+            params.append(filters[name])
+    if before:
+        query += " AND id < ?"
+        params.append(before)
+    query += " ORDER BY id DESC LIMIT ?"
+    params.append(limit + 1)
+
+    items = _rows(conn.execute(query, params), CHAMADO_FIELDS)
+    if len(items) > limit:
+        return items[:limit], items[limit - 1]['id']
+    return items, None
+
+
+def get_chamado(conn, chamado_id):
+    row = conn.execute(f"SELECT {', '.join(CHAMADO_DETAIL_FIELDS)} FROM chamados WHERE id = ?",
+                       (chamado_id,)).fetchone()
+    return dict(zip(CHAMADO_DETAIL_FIELDS, row)) if row else None
+
+
+def get_chamado_owner(conn, chamado_id):
+    """Requester id of a ticket (None if it does not exist)"""
+    row = conn.execute("SELECT solicitante_id FROM chamados WHERE id = ?", (chamado_id,)).fetchone()
+    return row[0] if row else None
+
+
+def _list_children(conn, table, fields, chamado_id, after, limit):
+    """Rows of a ticket's history/chat in chronological order, after the `depois` cursor"""
+    query = f"SELECT {', '.join(fields)} FROM {table} WHERE chamado_id = ?"
+    params = [chamado_id]
+    if after:
+        query += " AND id > ?"
+        params.append(after)
+    query += " ORDER BY id LIMIT ?"
+    params.append(limit + 1)
+
+    items = _rows(conn.execute(query, params), fields)
+    if len(items) > limit:
+        return items[:limit], items[limit - 1]['id']
+    return items, None
+
+
+def list_historico(conn, chamado_id, after, limit):
+    return _list_children(conn, 'historico_chamados', HISTORICO_FIELDS, chamado_id, after, limit)
+
+
+def list_mensagens(conn, chamado_id, after, limit):
+    return _list_children(conn, 'chat_messages', MENSAGEM_FIELDS, chamado_id, after, limit)
+
+
+def quick_stats(conn):
+    """Same numbers as database.get_quick_stats, in one pass"""
+    row = conn.execute("""
+        SELECT COUNT(*),
+               SUM(status = 'Pendente'),
+               SUM(status = 'Em Andamento'),
+               SUM(status = 'Resolvido')
+        FROM chamados
+    """).fetchone()
+    total, pendentes, em_andamento, resolvidos = (value or 0 for value in row)
+    return {'total': total, 'pendentes': pendentes, 'em_andamento': em_andamento, 'resolvidos': resolvidos}
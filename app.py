@@ -16,9 +16,17 @@ except:
 sys.path.append(os.path.join(os.path.dirname(__file__), 'components'))
 sys.path.append(os.path.join(os.path.dirname(__file__), 'utils'))
 
-from components.auth import check_authentication, login_page
+from components.auth import check_authentication, login_page, logout
+from components.auto_assign import start_auto_assign
+from components.backup import start_backups
 from components.database import init_database
 from components.header import display_header
+from components.job_queue import start_job_queue
+from components.maintenance import start_maintenance
+from components.metrics import page_timer, start_metrics_exporters
+from components.notifications import start_notification_dispatcher
+from components.report_scheduler import start_report_scheduler
+from components.sla_monitor import start_sla_monitor
 
 # Configure page
 st.set_page_config(
@@ -31,6 +39,14 @@ st.set_page_config(
 # Initialize database and ensure data directory exists
 os.makedirs('data', exist_ok=True)
 init_database()
+start_sla_monitor()
+start_job_queue()
+start_notification_dispatcher()
+start_report_scheduler()
+start_auto_assign()
+start_maintenance()
+start_backups()
+start_metrics_exporters()
 
 def main():
     # Check if user is authenticated
@@ -73,7 +89,7 @@ def main():
     
     elif user_role == 'Administrador':
         st.info("⚙️ Acesso completo ao sistema: gerencie usuários e todos os chamados.")
-        col1, col2, col3 = st.columns(3)
+        col1, col2, col3, col4 = st.columns(4)
         with col1:
             if st.button("👥 Gerenciar Usuários", use_container_width=True):
                 st.switch_page("pages/5_admin_usuarios.py")
@@ -83,6 +99,9 @@ def main():
         with col3:
             if st.button("📊 Dashboard", use_container_width=True):
                 st.switch_page("pages/4_dashboard_diretoria.py")
+        with col4:
+            if st.button("📈 Métricas", use_container_width=True):
+                st.switch_page("pages/6_metricas.py")
     
     elif user_role == 'Diretoria':
         st.info("📊 Acesse relatórios gerenciais e dashboards analíticos.")
@@ -114,9 +133,7 @@ def main():
     with st.sidebar:
         st.markdown("---")
         if st.button("🚪 Logout", use_container_width=True):
-            for key in list(st.session_state.keys()):
-                del st.session_state[key]
-            st.rerun()
+            logout()
         
         # Informações básicas no final do sidebar
         st.markdown("---")
@@ -128,4 +145,5 @@ def main():
         """, unsafe_allow_html=True)
 
 if __name__ == "__main__":
-    main()
+    with page_timer('app'):
+        main()
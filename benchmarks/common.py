@@ -0,0 +1,84 @@
+"""Helpers shared by the benchmark scripts: percentiles, JSON reports, baselines."""
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import time
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def latency_summary(latencies):
+    """Mean/p50/p95/p99/max of a list of durations in seconds, in milliseconds"""
+    return {
+        'mean': round(statistics.fmean(latencies) * 1000, 3) if latencies else 0,
+        'p50': round(percentile(latencies, 50) * 1000, 3),
+        'p95': round(percentile(latencies, 95) * 1000, 3),
+        'p99': round(percentile(latencies, 99) * 1000, 3),
+        'max': round(max(latencies, default=0) * 1000, 3),
+    }
+
+
+def environment():
+    """Where a report was produced, so baselines from other machines stand out"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def write_report(report, output=None):
+    """Print a report as JSON and optionally save it"""
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare_to_baseline(current, baseline, metric, threshold, min_delta=0.0, lower_is_better=True):
+    """Compare {name: {metric: value}} entries against a baseline.
+
+    Returns (comparisons, regressions): one entry per name present in both, and the
+    subset whose metric got worse by more than `threshold` (0.2 = 20%) and by more
+    than `min_delta` in absolute terms (so microsecond noise is not a regression).
+    """
+    comparisons, regressions = [], []
+    for name, entry in current.items():
+        base = baseline.get(name)
+        if not base or metric not in base or metric not in entry:
+            continue
+        before, after = base[metric], entry[metric]
+        if not before:
+            continue
+        change = (after - before) / before
+        worsening = change if lower_is_better else -change
+        worse = worsening > threshold and abs(after - before) > min_delta
+        comparison = {'name': name, 'metric': metric, 'baseline': before, 'current': after,
+                      'change': round(change, 4), 'regression': worse}
+        comparisons.append(comparison)
+        if worse:
+            regressions.append(comparison)
+    return comparisons, regressions
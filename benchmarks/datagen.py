@@ -0,0 +1,306 @@
+"""Synthetic helpdesk dataset generator for the benchmarks.
+
+Builds a database with the application schema and fills it with users,
+tickets, ticket history and chat messages. Volume is skewed the way the
+production data is: a few sectors open most tickets, most tickets are
+'Média', tickets arrive in business hours on weekdays, and resolution times
+are log-normal per priority (recent tickets are still open). Run from the
+repository root:
+
+    python -m benchmarks.datagen --tickets 100000 --output data/bench_100k.db
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+SECTORS = [
+    "Atendimento Terréo", "Faturamento", "Administrativo", "Financeiro", "Atendimento 1Piso",
+    "Recursos Humanos", "Médico", "Comercial", "Tomografia", "Ressonância", "Atendimento 2Piso",
+    "Suprimentos", "Vacinas", "Marketing", "Qualidade", "Telefonia", "AlphaclinMais",
+    "Aréa Técnica", "Lumina Imagem", "Diretoria", "Outro",
+]
+# Zipf-like: the first sectors open most of the tickets
+SECTOR_WEIGHTS = 1 / np.arange(1, len(SECTORS) + 1) ** 0.9
+
+PRIORITIES = ['Alta', 'Média', 'Baixa']
+PRIORITY_WEIGHTS = [0.15, 0.55, 0.30]
+# Median resolution / assignment delay in hours, per priority
+RESOLUTION_MEDIAN_HOURS = {'Alta': 3, 'Média': 16, 'Baixa': 48}
+ASSIGNMENT_MEAN_HOURS = {'Alta': 0.3, 'Média': 2, 'Baixa': 8}
+CANCEL_RATE = 0.03
+# Tickets nobody ever closed (forgotten backlog), on top of the ones still within their resolution time
+STALE_RATE = 0.02
+# Chat messages per ticket are Poisson(chat_rate * factor)
+CHAT_FACTOR = {'Alta': 2.0, 'Média': 1.0, 'Baixa': 0.6}
+
+# Monday is the busiest day, weekends see on-call tickets only
+WEEKDAY_WEIGHTS = [1.25, 1.05, 1.0, 1.0, 0.9, 0.15, 0.08]
+
+PROBLEMS = [
+    ("Impressora não imprime", "A impressora do setor não responde e os documentos ficam na fila."),
+    ("Sistema lento", "O sistema de gestão está demorando vários minutos para abrir as telas."),
+    ("Sem acesso à internet", "O computador não conecta à rede desde o início do expediente."),
+    ("Erro ao emitir nota fiscal", "Ao emitir a nota o sistema retorna erro de comunicação com a SEFAZ."),
+    ("Senha expirada", "Não consigo entrar no sistema, a senha expirou e o reset não chega por e-mail."),
+    ("Telefone sem linha", "O ramal do setor está mudo desde ontem."),
+    ("Instalação de software", "Preciso do leitor de PDF e do pacote de escritório instalados."),
+    ("Monitor piscando", "O monitor pisca e desliga sozinho algumas vezes por hora."),
+    ("E-mail não sincroniza", "As mensagens novas não aparecem no celular nem no computador."),
+    ("Laudo não abre", "Os laudos de imagem não abrem no visualizador do consultório."),
+    ("Scanner não digitaliza", "O scanner da recepção não envia os documentos para a pasta da rede."),
+    ("Computador não liga", "O computador não liga mesmo com o cabo de energia conectado."),
+    ("Acesso a pasta compartilhada", "Preciso de acesso de leitura à pasta do financeiro."),
+    ("Agenda não carrega", "A agenda de exames não carrega os horários do dia."),
+    ("Backup falhou", "O aviso de falha de backup apareceu na estação do setor."),
+]
+CHAT_LINES = [
+    "Bom dia, já estou verificando.", "Pode reiniciar o equipamento e testar novamente?",
+    "Reiniciei e o problema continua.", "Consegue me enviar um print do erro?",
+    "Segue o print em anexo.", "Estou a caminho do setor.", "Resolvido por aqui, obrigado!",
+    "Vou precisar trocar a peça, aguardando o fornecedor.", "Ainda está acontecendo?",
+    "Funcionou, pode encerrar.",
+]
+FIRST_NAMES = ["Ana", "Bruno", "Carla", "Diego", "Eduarda", "Felipe", "Gabriela", "Hugo", "Isabela",
+               "João", "Karina", "Lucas", "Mariana", "Nicolas", "Olívia", "Paulo", "Rafaela", "Sérgio",
+               "Tatiane", "Vinícius"]
+LAST_NAMES = ["Silva", "Souza", "Oliveira", "Santos", "Lima", "Pereira", "Costa", "Rodrigues",
+              "Almeida", "Nascimento", "Araújo", "Ferreira", "Carvalho", "Gomes", "Martins"]
+
+INSERT_CHUNK = 20000
+PASSWORD = 'senha-benchmark'
+
+
+def _weights(values):
+    values = np.asarray(values, dtype=np.float64)
+    return values / values.sum()
+
+
+def _format(timestamps):
+    """datetime64[s] array -> 'YYYY-MM-DD HH:MM:SS' strings (None for NaT)"""
+    text = np.char.replace(np.datetime_as_string(timestamps, unit='s'), 'T', ' ').astype(object)
+    text[np.isnat(timestamps)] = None
+    return text
+
+
+def _insert(conn, sql, rows):
+    for start in range(0, len(rows), INSERT_CHUNK):
+        conn.executemany(sql, rows[start:start + INSERT_CHUNK])
+
+
+def _user_counts(tickets, users=None):
+    """Requesters, technicians, directors and admins for a dataset size"""
+    requesters = users or max(20, tickets // 40)
+    return {'Colaborador': requesters, 'Técnico': max(4, tickets // 2500), 'Diretoria': 3, 'Administrador': 2}
+
+
+def _create_users(conn, rng, counts):
+    """Insert the synthetic accounts; returns {role: (ids, names, sectors)}"""
+    from components.password_hashing import hash_password
+
+    shared_hash = hash_password(PASSWORD)  # one KDF call, reused by every account
+    sector_p = _weights(SECTOR_WEIGHTS)
+    next_id = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM usuarios").fetchone()[0]
+    accounts = {}
+    rows = []
+    for role, count in counts.items():
+        ids = np.arange(next_id, next_id + count)
+        next_id += count
+        names = [f"{FIRST_NAMES[i % len(FIRST_NAMES)]} {LAST_NAMES[(i * 7 + j) % len(LAST_NAMES)]}"
+                 for j, i in enumerate(rng.integers(0, len(FIRST_NAMES), count))]
+        if role == 'Colaborador':
+            sectors = np.array(SECTORS, dtype=object)[rng.choice(len(SECTORS), count, p=sector_p)]
+        else:
+            sectors = np.array(['TI' if role != 'Diretoria' else 'Diretoria'] * count, dtype=object)
+        prefix = {'Colaborador': 'colab', 'Técnico': 'tec', 'Diretoria': 'dir', 'Administrador': 'adm'}[role]
+        usernames = [f"{prefix}{int(user_id)}" for user_id in ids]
+        accounts[role] = (ids, np.array(usernames, dtype=object), sectors)
+        rows.extend((int(user_id), username, shared_hash, name, f"{username}@empresa.com", role, sector)
+                    for user_id, username, name, sector in zip(ids, usernames, names, sectors))
+    _insert(conn, """
+        INSERT INTO usuarios (id, username, password_hash, nome_completo, email, role, setor)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    return accounts
+
+
+def _opening_times(rng, n, days, now):
+    """Ticket opening times over the last `days` days: weekdays, business hours"""
+    first_day = (now - np.timedelta64(days - 1, 'D')).astype('datetime64[D]')
+    day_list = first_day + np.arange(days)
+    weekday = (day_list.astype('datetime64[D]').view('int64') - 4) % 7  # 1970-01-01 was a Thursday
+    day_p = _weights(np.array(WEEKDAY_WEIGHTS)[weekday])
+    picked = day_list[rng.choice(days, n, p=day_p)]
+
+    # 90% around mid-morning/afternoon, 10% spread over the whole day (on-call)
+    hours = np.where(rng.random(n) < 0.9, np.clip(rng.normal(11.5, 2.8, n), 7, 19), rng.uniform(0, 24, n))
+    seconds = (hours * 3600).astype('int64')
+    opened = picked.astype('datetime64[s]') + seconds.astype('timedelta64[s]')
+
+    # Today's tickets cannot be in the future
+    future = opened > now
+    opened[future] = now - rng.integers(60, 6 * 3600, future.sum()).astype('timedelta64[s]')
+    return np.sort(opened)
+
+
+def _hours(values):
+    return (np.asarray(values) * 3600).astype('int64').astype('timedelta64[s]')
+
+
+def generate(db_path, tickets=10000, users=None, days=365, chat_rate=1.5, seed=42):
+    """Create (or extend) a benchmark database at db_path; returns the row counts.
+
+    Points components.database at db_path, so later calls in this process use it.
+    """
+    from components import database
+    from components.sla_policy import calculate_deadlines
+
+    database.DB_PATH = db_path
+    database.init_database()
+
+    rng = np.random.default_rng(seed)
+    started = time.perf_counter()
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA synchronous=OFF")  # bulk load: a crash just means regenerating
+
+    accounts = _create_users(conn, rng, _user_counts(tickets, users))
+    colab_ids, colab_names, colab_sectors = accounts['Colaborador']
+    tec_ids, tec_names, _ = accounts['Técnico']
+    admin_id, admin_name = int(accounts['Administrador'][0][0]), accounts['Administrador'][1][0]
+
+    now = np.datetime64(database.get_current_time().strftime('%Y-%m-%dT%H:%M:%S'), 's')
+    n = tickets
+    first_id = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM chamados").fetchone()[0]
+    ids = np.arange(first_id, first_id + n)
+
+    # Requesters: a few heavy users open most tickets; mostly from their own sector
+    requester_p = _weights(1 / np.arange(1, len(colab_ids) + 1) ** 0.6)
+    requester = rng.choice(len(colab_ids), n, p=requester_p)
+    sectors = colab_sectors[requester].copy()
+    elsewhere = rng.random(n) < 0.2
+    sectors[elsewhere] = np.array(SECTORS, dtype=object)[
+        rng.choice(len(SECTORS), elsewhere.sum(), p=_weights(SECTOR_WEIGHTS))]
+    priorities = np.array(PRIORITIES, dtype=object)[rng.choice(3, n, p=PRIORITY_WEIGHTS)]
+    problem = rng.integers(0, len(PROBLEMS), n)
+
+    opened = _opening_times(rng, n, days, now)
+    median = np.array([RESOLUTION_MEDIAN_HOURS[p] for p in priorities], dtype=np.float64)
+    resolution = opened + _hours(median * rng.lognormal(0, 1.0, n))
+    assign_mean = np.array([ASSIGNMENT_MEAN_HOURS[p] for p in priorities], dtype=np.float64)
+    assigned = opened + _hours(np.minimum(rng.exponential(assign_mean), median))
+
+    closed = (resolution <= now) & (rng.random(n) >= STALE_RATE)
+    cancelled = closed & (rng.random(n) < CANCEL_RATE)
+    is_assigned = (assigned <= now) & ~(cancelled & (rng.random(n) < 0.5))
+    status = np.where(closed, 'Resolvido', np.where(is_assigned, 'Em Andamento', 'Pendente')).astype(object)
+    status[cancelled] = 'Cancelado'
+
+    # Technicians are skewed too (senior staff take more tickets)
+    technician = rng.choice(len(tec_ids), n, p=_weights(1 / np.arange(1, len(tec_ids) + 1) ** 0.5))
+
+    opened_text = _format(opened)
+    assigned_text = _format(np.where(is_assigned, assigned, np.datetime64('NaT')))
+    resolved_text = _format(np.where(status == 'Resolvido', resolution, np.datetime64('NaT')))
+    deadlines = calculate_deadlines(pd.Series(opened_text), priorities, sectors).dt.strftime('%Y-%m-%d %H:%M:%S')
+
+    chamados, historico = [], []
+    for i in range(n):
+        chamado_id = int(ids[i])
+        title, description = PROBLEMS[problem[i]]
+        requester_id, requester_name = int(colab_ids[requester[i]]), colab_names[requester[i]]
+        tec_id = int(tec_ids[technician[i]]) if is_assigned[i] else None
+        tec_name = tec_names[technician[i]] if is_assigned[i] else None
+        chamados.append((
+            chamado_id, title, description, sectors[i], priorities[i], status[i], requester_id, requester_name,
+            tec_id, tec_name, opened_text[i], assigned_text[i], resolved_text[i], deadlines[i],
+            'Chamado resolvido' if status[i] == 'Resolvido' else None,
+        ))
+        historico.append((chamado_id, requester_id, requester_name, 'Criação',
+                          f'Chamado criado com prioridade {priorities[i]}', opened_text[i]))
+        if tec_id is not None:
+            historico.append((chamado_id, admin_id, admin_name, 'Atribuição',
+                              f'Chamado atribuído para {tec_name}', assigned_text[i]))
+        if closed[i]:
+            actor_id, actor_name = (tec_id, tec_name) if tec_id is not None else (requester_id, requester_name)
+            historico.append((chamado_id, actor_id, actor_name, f'Status alterado para {status[i]}', None,
+                              _format(resolution[i:i + 1])[0]))
+
+    _insert(conn, """
+        INSERT INTO chamados (id, titulo, descricao, setor_origem, prioridade, status, solicitante_id,
+                              solicitante_nome, tecnico_id, tecnico_nome, data_abertura, data_atribuicao,
+                              data_resolucao, sla_prazo, resolucao)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, chamados)
+    del chamados
+    _insert(conn, """
+        INSERT INTO historico_chamados (chamado_id, usuario_id, usuario_nome, acao, detalhes, data_acao)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, historico)
+    history_rows = len(historico)
+    del historico
+
+    # Chat: more messages on urgent tickets, spread between opening and closing
+    factor = np.array([CHAT_FACTOR[p] for p in priorities])
+    counts = rng.poisson(chat_rate * factor) * is_assigned
+    owner = np.repeat(np.arange(n), counts)
+    end = np.where(closed, resolution, now)
+    span_seconds = np.maximum((end - opened).astype('int64'), 1)
+    sent = opened[owner] + (rng.random(len(owner)) * span_seconds[owner]).astype('int64').astype('timedelta64[s]')
+    sent_text = _format(sent)
+    from_technician = rng.random(len(owner)) < 0.5
+    line = rng.integers(0, len(CHAT_LINES), len(owner))
+    chat = []
+    for k, i in enumerate(owner):
+        if from_technician[k]:
+            author_id, author = int(tec_ids[technician[i]]), tec_names[technician[i]]
+        else:
+            author_id, author = int(colab_ids[requester[i]]), colab_names[requester[i]]
+        chat.append((int(ids[i]), author_id, author, CHAT_LINES[line[k]], sent_text[k]))
+    _insert(conn, """
+        INSERT INTO chat_messages (chamado_id, usuario_id, username, mensagem, data_criacao)
+        VALUES (?, ?, ?, ?, ?)
+    """, chat)
+
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+    return {
+        'database': db_path,
+        'usuarios': int(sum(len(ids_) for ids_, _, _ in accounts.values())),
+        'chamados': n,
+        'historico': history_rows,
+        'mensagens': len(chat),
+        'abertos': int((status == 'Pendente').sum() + (status == 'Em Andamento').sum()),
+        'seconds': round(time.perf_counter() - started, 2),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tickets', type=int, default=10000, help='tickets to generate (10k to 1M)')
+    parser.add_argument('--users', type=int, help='requester accounts (default: tickets / 40)')
+    parser.add_argument('--days', type=int, default=365, help='days of history')
+    parser.add_argument('--chat-rate', type=float, default=1.5, help='mean chat messages per assigned ticket')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', required=True, help='database file to create')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if os.path.exists(args.output):
+        print(f"{args.output} already exists; remove it first", file=sys.stderr)
+        return None
+    summary = generate(args.output, args.tickets, args.users, args.days, args.chat_rate, args.seed)
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    return summary
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,381 @@
+"""Microbenchmarks for every function in components.database and components.chat.
+
+Generates synthetic databases (benchmarks.datagen) at one or more sizes, calls
+each function with representative arguments and reports latency percentiles
+and rows/second as JSON. With --baseline the run is compared against a stored
+report and the script exits non-zero when a function regressed by more than
+--threshold. Run from the repository root:
+
+    python -m benchmarks.db_bench --tickets 10000 100000 --output bench.json
+    python -m benchmarks.db_bench --baseline bench.json --threshold 0.25
+"""
+import argparse
+import inspect
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+from benchmarks.common import compare_to_baseline, environment, latency_summary, load_baseline, write_report
+
+# setup(rng) runs untimed and returns the call's arguments; iterations overrides --iterations
+Case = namedtuple('Case', ['name', 'call', 'setup', 'iterations'], defaults=(None, None))
+
+# Functions deliberately not measured here
+SKIPPED = {
+    'display_chat': 'Streamlit UI; measured by benchmarks.render_bench',
+    'queue_notifications': "runs inside the caller's transaction; measured through assign_technician and others",
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tickets', type=int, nargs='+', default=[10000], help='dataset sizes (10k to 1M)')
+    parser.add_argument('--database', help='benchmark a copy of this database instead of generating one')
+    parser.add_argument('--iterations', type=int, default=50, help='timed calls per function')
+    parser.add_argument('--warmup', type=int, default=3, help='untimed calls before measuring')
+    parser.add_argument('--max-seconds', type=float, default=5.0, help='time budget per function')
+    parser.add_argument('--only', nargs='+', help='benchmark only these functions')
+    parser.add_argument('--profile', action='store_true', help='keep slow-query profiling on (off by default)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    parser.add_argument('--baseline', help='report to compare against')
+    parser.add_argument('--metric', default='p50', choices=['mean', 'p50', 'p95', 'p99'])
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed slowdown (0.25 = 25%%)')
+    parser.add_argument('--min-delta-ms', type=float, default=0.05, help='ignore slowdowns smaller than this')
+    parser.add_argument('--keep', action='store_true', help='keep the generated databases')
+    return parser.parse_args(argv)
+
+
+def _public_functions(module):
+    """Public functions defined in (not imported into) a module"""
+    return sorted(name for name, value in vars(module).items()
+                  if inspect.isfunction(value) and not name.startswith('_')
+                  and value.__module__ == module.__name__)
+
+
+def _context(db_path, rng):
+    """Ids and names the cases draw their arguments from"""
+    conn = sqlite3.connect(db_path)
+
+    def users(role):
+        return conn.execute("SELECT id, username FROM usuarios WHERE role = ? AND ativo = 1", (role,)).fetchall()
+
+    context = {
+        'chamados': [row[0] for row in conn.execute("SELECT id FROM chamados")],
+        'abertos': [row[0] for row in conn.execute(
+            "SELECT id FROM chamados WHERE status IN ('Pendente', 'Em Andamento')")],
+        'colaboradores': users('Colaborador'),
+        'tecnicos': users('Técnico'),
+        'admin': users('Administrador')[0],
+        'setores': [row[0] for row in conn.execute("SELECT DISTINCT setor_origem FROM chamados")],
+        'hashes': dict(conn.execute("SELECT id, password_hash FROM usuarios")),
+    }
+    conn.close()
+    rng.shuffle(context['abertos'])
+    return context
+
+
+def build_cases(database, chat, context):
+    """Benchmark cases: one or more per function of components.database and components.chat"""
+    ctx = context
+    admin_id, admin_name = ctx['admin']
+    counter = iter(range(10 ** 9))
+
+    def ticket(rng):
+        return rng.choice(ctx['chamados'])
+
+    def open_ticket(rng):
+        return rng.choice(ctx['abertos'] or ctx['chamados'])
+
+    def requester(rng):
+        return rng.choice(ctx['colaboradores'])
+
+    def technician(rng):
+        return rng.choice(ctx['tecnicos'])
+
+    def unpaused_ticket(rng):
+        chamado_id = open_ticket(rng)
+        database.resume_sla(chamado_id, admin_id, admin_name)
+        return (chamado_id, admin_id, admin_name, 'Aguardando retorno')
+
+    def paused_ticket(rng):
+        chamado_id = open_ticket(rng)
+        database.pause_sla(chamado_id, admin_id, admin_name)
+        return (chamado_id, admin_id, admin_name)
+
+    def new_session(rng):
+        key = f"bench-{next(counter)}"
+        database.create_session(key, requester(rng)[0])
+        return (key,)
+
+    def pending_job(rng):
+        return (database.create_job('exportacao_chamados', {'formato': 'csv.gz'}, admin_id),)
+
+    def running_job(rng):
+        job_id = database.create_job('exportacao_chamados', {'formato': 'csv.gz'}, admin_id)
+        database.claim_job(job_id)
+        return (job_id,)
+
+    def scratch_policy(rng):
+        setor = f"Bench {next(counter)}"
+        database.save_sla_policy(setor, 'Alta', 2)
+        conn = database.get_connection()
+        policy_id = conn.execute("SELECT id FROM sla_policies WHERE setor = ?", (setor,)).fetchone()[0]
+        conn.close()
+        return (policy_id,)
+
+    def same_hash(rng):
+        user_id = requester(rng)[0]
+        return (user_id, ctx['hashes'][user_id], ctx['hashes'][user_id])
+
+    def sla_transitions(rng):
+        ids = [open_ticket(rng) for _ in range(20)]
+        now = database.get_current_time_str()
+        return ([(chamado_id, 'critico', now) for chamado_id in ids],
+                [(chamado_id, 'critico') for chamado_id in ids[:10]], now)
+
+    def claimed_notifications(rng):
+        database.assign_technician(open_ticket(rng), *technician(rng), admin_id, admin_name)  # queues two rows
+        rows = database.claim_notifications(f"bench-{next(counter)}", 50, 0)
+        return ([row[0] for row in rows],)
+
+    def claimed_report(rng):
+        return (database.claim_report('benchmark', f"bench-{next(counter)}", '2000-01-01 00:00:00'),)
+
+    def alert_groups(rng):
+        now = database.get_current_time_str()
+        return ([{'fingerprint': f"bench-{rng.randrange(50)}", 'origem': 'benchmark', 'titulo': 'Host inacessível',
+                  'descricao': 'Benchmark', 'prioridade': 'Alta', 'setor': 'TI', 'ocorrencias': 100,
+                  'primeira': now, 'ultima': now, 'mensagem': 'Benchmark'} for _ in range(10)], 3600)
+
+    db, ch = database, chat
+    return [
+        Case('database.get_connection', lambda: db.get_connection().close()),
+        Case('database.get_current_time', db.get_current_time),
+        Case('database.get_current_time_str', db.get_current_time_str),
+        Case('database.site_for_setor', db.site_for_setor, lambda rng: (rng.choice(ctx['setores']),)),
+        Case('database.site_for_chamado', db.site_for_chamado, lambda rng: (ticket(rng),)),
+        Case('database.query_sites', db.query_sites),
+        Case('database.get_database_files', db.get_database_files),
+        Case('database.init_database', db.init_database, iterations=10),
+        Case('database.register_chamado_listener', db.register_chamado_listener, lambda rng: (_noop_listener,)),
+        Case('database.calculate_sla_deadline', db.calculate_sla_deadline,
+             lambda rng: (rng.choice(['Alta', 'Média', 'Baixa']), rng.choice(ctx['setores']))),
+        Case('database.create_chamado', db.create_chamado, lambda rng: (
+            'Impressora não imprime', 'Benchmark', rng.choice(ctx['setores']), 'Média', *requester(rng))),
+        Case('database.get_chamados[all]', db.get_chamados),
+        Case('database.get_chamados[status]', db.get_chamados, lambda rng: ({'status': 'Pendente'},)),
+        Case('database.get_chamados[solicitante]', db.get_chamados,
+             lambda rng: ({'solicitante_id': requester(rng)[0]},)),
+        Case('database.get_chamados[tecnico]', db.get_chamados,
+             lambda rng: ({'tecnico_id': technician(rng)[0], 'status': 'Em Andamento'},)),
+        Case('database.get_chamados[setor_prioridade]', db.get_chamados,
+             lambda rng: ({'setor': rng.choice(ctx['setores']), 'prioridade': 'Alta'},)),
+        Case('database.get_chamado_versions[all]', db.get_chamado_versions),
+        Case('database.get_chamado_versions[tecnico]', db.get_chamado_versions,
+             lambda rng: ({'tecnico_id': technician(rng)[0]},)),
+        Case('database.get_chamado_by_id', db.get_chamado_by_id, lambda rng: (ticket(rng),)),
+        Case('database.update_chamado_status', db.update_chamado_status,
+             lambda rng: (open_ticket(rng), 'Em Andamento', admin_id, admin_name)),
+        Case('database.assign_technician', db.assign_technician,
+             lambda rng: (open_ticket(rng), *technician(rng), admin_id, admin_name)),
+        Case('database.get_quick_stats', db.get_quick_stats),
+        Case('database.get_analytics_data', db.get_analytics_data),
+        Case('database.get_usuarios', db.get_usuarios),
+        Case('database.get_user_credentials', db.get_user_credentials, lambda rng: (requester(rng)[1],)),
+        Case('database.update_password_hash', db.update_password_hash, same_hash),
+        Case('database.check_username_exists', db.check_username_exists, lambda rng: (requester(rng)[1],)),
+        Case('database.create_user', db.create_user, lambda rng: (
+            f"bench_user_{next(counter)}", 'senha-benchmark', 'Usuário Benchmark', 'bench@empresa.com',
+            'Colaborador', 'Administrativo'), iterations=10),
+        Case('database.update_user', db.update_user, lambda rng: (
+            requester(rng)[0], 'Usuário Benchmark', 'bench@empresa.com', 'Colaborador', 'Administrativo')),
+        Case('database.update_user_status', db.update_user_status, lambda rng: (requester(rng)[0], True)),
+        Case('database.create_session', db.create_session,
+             lambda rng: (f"bench-{next(counter)}", requester(rng)[0])),
+        Case('database.get_session_principal', db.get_session_principal, new_session),
+        Case('database.revoke_session', db.revoke_session, new_session),
+        Case('database.purge_expired_sessions', db.purge_expired_sessions),
+        Case('database.get_tecnicos', db.get_tecnicos),
+        Case('database.save_feedback', db.save_feedback, lambda rng: (requester(rng)[0], 'Benchmark')),
+        Case('database.add_message', db.add_message,
+             lambda rng: (ticket(rng), *requester(rng), 'Mensagem de benchmark')),
+        Case('database.get_sla_tracking_rows[open]', db.get_sla_tracking_rows),
+        Case('database.get_sla_tracking_rows[ids]', db.get_sla_tracking_rows,
+             lambda rng: ([ticket(rng) for _ in range(50)],)),
+        Case('database.get_open_ticket_rows[open]', db.get_open_ticket_rows),
+        Case('database.get_open_ticket_rows[ids]', db.get_open_ticket_rows,
+             lambda rng: ([ticket(rng) for _ in range(50)],)),
+        Case('database.get_assignment_rows[open]', db.get_assignment_rows),
+        Case('database.get_assignment_rows[ids]', db.get_assignment_rows,
+             lambda rng: ([ticket(rng) for _ in range(50)],)),
+        Case('database.get_assignable_technicians', db.get_assignable_technicians),
+        Case('database.get_system_user', db.get_system_user, lambda rng: (db.AUTO_ASSIGN_USERNAME,)),
+        Case('database.apply_sla_alert_transitions', db.apply_sla_alert_transitions, sla_transitions),
+        Case('database.get_active_sla_alerts', db.get_active_sla_alerts),
+        Case('database.get_config_version', db.get_config_version, lambda rng: ('sla_policies',)),
+        Case('database.get_ticket_version', db.get_ticket_version),
+        Case('database.get_sla_policy_rows', db.get_sla_policy_rows),
+        Case('database.save_sla_policy', db.save_sla_policy, lambda rng: ('*', 'Alta', 4)),
+        Case('database.delete_sla_policy', db.delete_sla_policy, scratch_policy),
+        Case('database.pause_sla', db.pause_sla, unpaused_ticket),
+        Case('database.resume_sla', db.resume_sla, paused_ticket),
+        Case('database.get_paused_chamados', db.get_paused_chamados),
+        Case('database.create_job', db.create_job,
+             lambda rng: ('exportacao_chamados', {'formato': 'csv.gz'}, admin_id)),
+        Case('database.claim_job', db.claim_job, pending_job),
+        Case('database.update_job_progress', db.update_job_progress, lambda rng: (*running_job(rng), 500, 1000)),
+        Case('database.finish_job', db.finish_job, lambda rng: (*running_job(rng), 'Concluído')),
+        Case('database.cancel_job', db.cancel_job, lambda rng: (*pending_job(rng), admin_id)),
+        Case('database.get_user_jobs', db.get_user_jobs, lambda rng: (admin_id,)),
+        Case('database.recover_interrupted_jobs', db.recover_interrupted_jobs),
+        Case('database.get_storage_sizes', db.get_storage_sizes),
+        Case('database.ingest_alert_batch', db.ingest_alert_batch, alert_groups),
+        Case('database.claim_notifications', db.claim_notifications,
+             lambda rng: (f"bench-{next(counter)}", 100, 0)),
+        Case('database.mark_notifications_sent', db.mark_notifications_sent, claimed_notifications),
+        Case('database.mark_notifications_failed', db.mark_notifications_failed,
+             lambda rng: (*claimed_notifications(rng), 'Benchmark', None)),
+        Case('database.get_notification_backlog', db.get_notification_backlog),
+        Case('database.purge_notifications', db.purge_notifications, lambda rng: ('2000-01-01 00:00:00',)),
+        Case('database.claim_report', db.claim_report,
+             lambda rng: ('benchmark', f"bench-{next(counter)}", '2000-01-01 00:00:00')),
+        Case('database.finish_report', db.finish_report,
+             lambda rng: (*claimed_report(rng), 'Concluído', {'quick_stats': {'total': 1}}, [])),
+        Case('database.get_latest_report', db.get_latest_report, lambda rng: ('benchmark',)),
+        Case('database.get_reports', db.get_reports),
+        Case('database.purge_reports', db.purge_reports, lambda rng: ('2000-01-01 00:00:00',)),
+        Case('chat.init_chat_table', ch.init_chat_table),
+        Case('chat.send_message', ch.send_message,
+             lambda rng: (ticket(rng), *requester(rng), 'Mensagem de benchmark')),
+        Case('chat.get_chat_messages', ch.get_chat_messages, lambda rng: (ticket(rng),)),
+        Case('chat.get_unread_messages_count', ch.get_unread_messages_count,
+             lambda rng: (ticket(rng), requester(rng)[0])),
+        Case('chat.mark_messages_as_read', ch.mark_messages_as_read, lambda rng: (ticket(rng), requester(rng)[0])),
+    ]
+
+
+def _noop_listener(chamado_id):
+    pass
+
+
+def _rows(result):
+    """Rows a call returned (lists of rows, a single row, or nothing)"""
+    if isinstance(result, (list, set)):
+        return len(result)
+    if isinstance(result, (tuple, dict)):
+        return 1
+    return 0
+
+
+def run_case(case, rng, iterations, warmup, max_seconds):
+    """Time one case; returns its latency summary and rows/second"""
+    iterations = min(iterations, case.iterations or iterations)
+    for _ in range(warmup):
+        case.call(*(case.setup(rng) if case.setup else ()))
+
+    latencies, rows = [], 0
+    budget_end = time.perf_counter() + max_seconds
+    for i in range(iterations):
+        args = case.setup(rng) if case.setup else ()
+        start = time.perf_counter()
+        result = case.call(*args)
+        latencies.append(time.perf_counter() - start)
+        rows += _rows(result)
+        if i >= 4 and time.perf_counter() > budget_end:
+            break
+
+    total = sum(latencies)
+    summary = latency_summary(latencies)
+    summary['calls'] = len(latencies)
+    summary['rows_per_call'] = round(rows / len(latencies), 1)
+    summary['rows_per_second'] = round(rows / total, 1) if total and rows else 0
+    return summary
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='db_bench_')
+    # Read at import time: measure the functions themselves, keep logs out of data/
+    os.environ['CHAMADOS_DB_PATH'] = os.path.join(workdir, 'chamados.db')
+    os.environ.setdefault('SLOW_QUERY_MS', '100' if args.profile else '-1')
+    os.environ.setdefault('SLOW_QUERY_LOG', os.path.join(workdir, 'slow_queries.jsonl'))
+    os.environ.setdefault('TRACING_ENABLED', '0')
+
+    from benchmarks.datagen import generate
+    from components import chat, database
+
+    covered = set()
+    datasets, results = {}, {}
+    sizes = [None] if args.database else args.tickets
+    try:
+        for size in sizes:
+            db_path = os.path.join(workdir, f"bench_{size or 'copy'}.db")
+            if args.database:
+                source = sqlite3.connect(args.database)
+                target = sqlite3.connect(db_path)
+                source.backup(target)
+                source.close()
+                target.close()
+                database.DB_PATH = db_path
+                database.init_database()
+                label = os.path.basename(args.database)
+                datasets[label] = {'database': args.database}
+            else:
+                label = str(size)
+                datasets[label] = generate(db_path, size, seed=args.seed)
+            print(f"dataset {label}: {datasets[label]}", file=sys.stderr)
+
+            rng = random.Random(args.seed)
+            cases = build_cases(database, chat, _context(db_path, rng))
+            results[label] = {}
+            for case in cases:
+                function = case.name.split('[')[0].split('.')[1]
+                covered.add(function)
+                if args.only and function not in args.only and case.name not in args.only:
+                    continue
+                results[label][case.name] = run_case(case, rng, args.iterations, args.warmup, args.max_seconds)
+                print(f"  {case.name}: p50 {results[label][case.name]['p50']} ms", file=sys.stderr)
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    missing = [f"{module.__name__}.{name}" for module in (database, chat)
+               for name in _public_functions(module) if name not in covered and name not in SKIPPED]
+    report = {
+        'environment': environment(),
+        'settings': {'iterations': args.iterations, 'warmup': args.warmup, 'profiling': args.profile,
+                     'seed': args.seed},
+        'datasets': datasets,
+        'results': results,
+        'skipped': SKIPPED,
+        'not_covered': missing,
+    }
+
+    ok = True
+    if args.baseline:
+        baseline = load_baseline(args.baseline)
+        flatten = lambda runs: {f"{label}:{name}": entry for label, cases in runs.items()
+                                for name, entry in cases.items()}
+        comparisons, regressions = compare_to_baseline(
+            flatten(results), flatten(baseline.get('results', {})),
+            args.metric, args.threshold, args.min_delta_ms)
+        report['comparison'] = {'baseline': args.baseline, 'metric': args.metric, 'threshold': args.threshold,
+                                'compared': len(comparisons), 'regressions': regressions}
+        ok = not regressions
+
+    write_report(report, args.output)
+    if not ok:
+        print(f"{len(report['comparison']['regressions'])} function(s) regressed more than "
+              f"{args.threshold:.0%} on {args.metric}", file=sys.stderr)
+    return report if ok else None
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
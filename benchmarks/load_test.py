@@ -0,0 +1,310 @@
+"""Concurrent session load generator for SQLite contention testing.
+
+Simulates N users (threads, spread over P processes) running a weighted mix
+of the operations the pages perform: opening tickets, assigning technicians,
+changing status, chatting, listing tickets and loading the dashboard. Each
+'database is locked' error is retried with backoff and counted. The report
+has throughput, p50/p99 latency per operation, lock retries and error rates
+for every concurrency level. Run from the repository root:
+
+    python -m benchmarks.load_test --users 8 32 128 --processes 4 --duration 30
+    python -m benchmarks.load_test --users 64 --mix create_chamado=5,list_meus=5 --busy-timeout 1
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from benchmarks.common import environment, latency_summary, write_report
+
+# Operation -> weight; roughly what a working day looks like (reads dominate)
+DEFAULT_MIX = {
+    'list_meus': 25,
+    'list_tecnico': 20,
+    'get_chat': 15,
+    'send_message': 12,
+    'create_chamado': 10,
+    'assign_technician': 7,
+    'update_chamado_status': 6,
+    'dashboard': 5,
+}
+
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r} (choose from {', '.join(DEFAULT_MIX)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, nargs='+', default=[8, 32], help='concurrent users per level')
+    parser.add_argument('--processes', type=int, default=1, help='processes the users are spread over')
+    parser.add_argument('--duration', type=float, default=20, help='seconds per concurrency level')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX, help='e.g. create_chamado=10,list_meus=25')
+    parser.add_argument('--think-ms', type=float, default=0, help='mean pause between a user\'s operations')
+    parser.add_argument('--tickets', type=int, default=10000, help='size of the generated dataset')
+    parser.add_argument('--database', help='load-test a copy of this database instead of generating one')
+    parser.add_argument('--busy-timeout', type=float, help='CHAMADOS_DB_BUSY_TIMEOUT for the workers')
+    parser.add_argument('--max-retries', type=int, default=5, help='retries of a locked operation')
+    parser.add_argument('--max-error-rate', type=float, default=0.01, help='exit non-zero above this rate')
+    parser.add_argument('--profile', action='store_true', help='keep slow-query profiling on (off by default)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    return parser.parse_args(argv)
+
+
+def _is_lock_error(exc):
+    return isinstance(exc, sqlite3.OperationalError) and 'locked' in str(exc)
+
+
+class Session:
+    """One simulated user; picks operations from the mix and runs them against the database"""
+
+    def __init__(self, database, chat, context, rng):
+        self.db, self.chat = database, chat
+        self.ctx = context
+        self.rng = rng
+        self.requester = rng.choice(context['colaboradores'])
+        self.technician = rng.choice(context['tecnicos'])
+
+    def _open_ticket(self):
+        with self.ctx['lock']:
+            return self.rng.choice(self.ctx['abertos']) if self.ctx['abertos'] else None
+
+    def create_chamado(self):
+        chamado_id = self.db.create_chamado(
+            'Sistema lento', 'Teste de carga', self.rng.choice(self.ctx['setores']),
+            self.rng.choice(['Alta', 'Média', 'Média', 'Baixa']), *self.requester)
+        with self.ctx['lock']:
+            self.ctx['abertos'].append(chamado_id)
+
+    def assign_technician(self):
+        chamado_id = self._open_ticket()
+        if chamado_id:
+            self.db.assign_technician(chamado_id, *self.technician, *self.technician)
+
+    def update_chamado_status(self):
+        chamado_id = self._open_ticket()
+        if chamado_id:
+            self.db.update_chamado_status(chamado_id, 'Resolvido', *self.technician, 'Teste de carga')
+            with self.ctx['lock']:
+                if chamado_id in self.ctx['abertos']:
+                    self.ctx['abertos'].remove(chamado_id)
+
+    def send_message(self):
+        chamado_id = self._open_ticket()
+        if chamado_id:
+            self.chat.send_message(chamado_id, *self.requester, 'Mensagem do teste de carga')
+
+    def get_chat(self):
+        chamado_id = self._open_ticket()
+        if chamado_id:
+            self.chat.get_chat_messages(chamado_id)
+
+    def list_meus(self):
+        self.db.get_chamados({'solicitante_id': self.requester[0]})
+
+    def list_tecnico(self):
+        self.db.get_chamados({'status': 'Pendente'})
+        self.db.get_chamados({'tecnico_id': self.technician[0], 'status': 'Em Andamento'})
+
+    def dashboard(self):
+        self.db.get_quick_stats()
+        self.db.get_analytics_data()
+
+
+def _context(db_path):
+    conn = sqlite3.connect(db_path)
+    context = {
+        'colaboradores': conn.execute(
+            "SELECT id, username FROM usuarios WHERE role = 'Colaborador' AND ativo = 1").fetchall(),
+        'tecnicos': conn.execute(
+            "SELECT id, username FROM usuarios WHERE role = 'Técnico' AND ativo = 1").fetchall(),
+        'abertos': [row[0] for row in conn.execute(
+            "SELECT id FROM chamados WHERE status IN ('Pendente', 'Em Andamento')")],
+        'setores': [row[0] for row in conn.execute("SELECT DISTINCT setor_origem FROM chamados")],
+        'lock': threading.Lock(),
+    }
+    conn.close()
+    return context
+
+
+def run_process(db_path, users, duration, mix, think_ms, max_retries, seed):
+    """Run `users` concurrent sessions for `duration` seconds; returns per-operation raw results"""
+    from components import chat, database  # before the threads start (concurrent first imports race)
+
+    context = _context(db_path)
+    names, weights = list(mix), list(mix.values())
+    results = defaultdict(lambda: {'latencies': [], 'errors': defaultdict(int), 'lock_retries': 0})
+    results_lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def user(index):
+        rng = random.Random(seed * 100003 + index)
+        session = Session(database, chat, context, rng)
+        local = defaultdict(lambda: {'latencies': [], 'errors': defaultdict(int), 'lock_retries': 0})
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            entry = local[name]
+            start = time.perf_counter()
+            for attempt in range(max_retries + 1):
+                try:
+                    getattr(session, name)()
+                    entry['latencies'].append(time.perf_counter() - start)
+                    break
+                except Exception as exc:
+                    if _is_lock_error(exc) and attempt < max_retries:
+                        entry['lock_retries'] += 1
+                        time.sleep(min(0.05 * 2 ** attempt, 1) * rng.random())
+                        continue
+                    entry['errors'][f"{type(exc).__name__}: {exc}"[:120]] += 1
+                    break
+            if think_ms:
+                time.sleep(rng.expovariate(1000 / think_ms))
+        with results_lock:
+            for name, entry in local.items():
+                merged = results[name]
+                merged['latencies'].extend(entry['latencies'])
+                merged['lock_retries'] += entry['lock_retries']
+                for message, count in entry['errors'].items():
+                    merged['errors'][message] += count
+
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {name: {'latencies': entry['latencies'], 'errors': dict(entry['errors']),
+                   'lock_retries': entry['lock_retries']} for name, entry in results.items()}
+
+
+def _process_main(queue, *args):
+    queue.put(run_process(*args))
+
+
+def run_level(db_path, users, processes, args):
+    """One concurrency level; processes > 1 uses spawned workers sharing the database file"""
+    processes = max(1, min(processes, users))
+    shares = [users // processes + (1 if i < users % processes else 0) for i in range(processes)]
+    started = time.perf_counter()
+    if processes == 1:
+        parts = [run_process(db_path, users, args.duration, args.mix, args.think_ms, args.max_retries, args.seed)]
+    else:
+        ctx = multiprocessing.get_context('spawn')
+        queue = ctx.Queue()
+        workers = [ctx.Process(target=_process_main, args=(
+            queue, db_path, share, args.duration, args.mix, args.think_ms, args.max_retries, args.seed + i))
+            for i, share in enumerate(shares)]
+        for worker in workers:
+            worker.start()
+        parts = [queue.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+    wall = time.perf_counter() - started
+
+    operations, total_ok, total_errors, total_retries, all_latencies = {}, 0, 0, 0, []
+    for name in args.mix:
+        latencies = [value for part in parts for value in part.get(name, {}).get('latencies', [])]
+        errors = defaultdict(int)
+        retries = 0
+        for part in parts:
+            retries += part.get(name, {}).get('lock_retries', 0)
+            for message, count in part.get(name, {}).get('errors', {}).items():
+                errors[message] += count
+        failed = sum(errors.values())
+        summary = latency_summary(latencies)
+        operations[name] = {
+            'ok': len(latencies),
+            'errors': failed,
+            'error_rate': round(failed / (len(latencies) + failed), 4) if latencies or failed else 0,
+            'lock_retries': retries,
+            'p50_ms': summary['p50'],
+            'p99_ms': summary['p99'],
+            'mean_ms': summary['mean'],
+            'error_messages': dict(errors),
+        }
+        total_ok += len(latencies)
+        total_errors += failed
+        total_retries += retries
+        all_latencies.extend(latencies)
+
+    summary = latency_summary(all_latencies)
+    return {
+        'users': users,
+        'processes': processes,
+        'wall_seconds': round(wall, 2),
+        'operations_ok': total_ok,
+        'throughput_per_second': round(total_ok / args.duration, 1) if args.duration else 0,
+        'p50_ms': summary['p50'],
+        'p99_ms': summary['p99'],
+        'lock_retries': total_retries,
+        'errors': total_errors,
+        'error_rate': round(total_errors / (total_ok + total_errors), 4) if total_ok or total_errors else 0,
+        'by_operation': operations,
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='load_test_')
+    db_path = os.path.join(workdir, 'chamados.db')
+    # Read at import time, here and in the spawned workers (they inherit the environment)
+    os.environ['CHAMADOS_DB_PATH'] = db_path
+    os.environ.setdefault('SLOW_QUERY_MS', '100' if args.profile else '-1')
+    os.environ.setdefault('SLOW_QUERY_LOG', os.path.join(workdir, 'slow_queries.jsonl'))
+    os.environ.setdefault('TRACING_ENABLED', '0')
+    if args.busy_timeout is not None:
+        os.environ['CHAMADOS_DB_BUSY_TIMEOUT'] = str(args.busy_timeout)
+
+    from benchmarks.datagen import generate
+    from components import database
+
+    try:
+        if args.database:
+            source, target = sqlite3.connect(args.database), sqlite3.connect(db_path)
+            source.backup(target)
+            source.close()
+            target.close()
+            database.init_database()
+            dataset = {'database': args.database}
+        else:
+            dataset = generate(db_path, args.tickets, seed=args.seed)
+
+        levels = []
+        for users in args.users:
+            level = run_level(db_path, users, args.processes, args)
+            levels.append(level)
+            print(f"{users} users: {level['throughput_per_second']} ops/s, p99 {level['p99_ms']} ms, "
+                  f"{level['lock_retries']} lock retries, error rate {level['error_rate']:.2%}", file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'environment': environment(),
+        'settings': {'duration': args.duration, 'mix': args.mix, 'think_ms': args.think_ms,
+                     'busy_timeout': database.DB_BUSY_TIMEOUT, 'max_retries': args.max_retries,
+                     'profiling': args.profile},
+        'dataset': dataset,
+        'levels': levels,
+    }
+    write_report(report, args.output)
+    ok = all(level['error_rate'] <= args.max_error_rate for level in levels)
+    return report if ok else None
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
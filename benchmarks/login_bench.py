@@ -0,0 +1,132 @@
+"""Login throughput benchmark for the password hashing service.
+
+Simulates a morning login burst: N concurrent sessions log in against a
+temporary database and the script reports throughput and latency
+percentiles. Run from the repository root:
+
+    python -m benchmarks.login_bench --sessions 32 --logins 500
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.common import percentile
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=50, help='distinct user accounts')
+    parser.add_argument('--sessions', type=int, default=16, help='concurrent login sessions')
+    parser.add_argument('--logins', type=int, default=300, help='total login attempts')
+    parser.add_argument('--wrong-ratio', type=float, default=0.05, help='share of attempts with a wrong password')
+    parser.add_argument('--legacy', action='store_true', help='seed SHA-256 hashes to measure rehash-on-login')
+    parser.add_argument('--scheme', choices=['bcrypt', 'scrypt'], help='KDF for new hashes')
+    parser.add_argument('--rounds', type=int, help='bcrypt cost factor')
+    parser.add_argument('--workers', type=int, help='hashing pool size')
+    parser.add_argument('--queue-limit', type=int, help='maximum queued hashing jobs')
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Hashing settings are read at import time
+    overrides = {'PASSWORD_HASH_SCHEME': args.scheme, 'BCRYPT_ROUNDS': args.rounds,
+                 'PASSWORD_HASH_WORKERS': args.workers, 'PASSWORD_HASH_QUEUE_LIMIT': args.queue_limit,
+                 'LOGIN_THROTTLE_MAX_FAILURES': 10 ** 6}
+    for key, value in overrides.items():
+        if value is not None:
+            os.environ[key] = str(value)
+
+    workdir = tempfile.mkdtemp(prefix='login_bench_')
+    os.environ['CHAMADOS_DB_PATH'] = os.path.join(workdir, 'chamados.db')
+
+    import hashlib
+    from components import database, password_hashing
+    from components.auth import authenticate_user
+    from components.password_hashing import HashingBusyError, LoginThrottledError
+
+    database.init_database()
+
+    password = 'senha-benchmark'
+    shared_hash = (hashlib.sha256(password.encode()).hexdigest() if args.legacy
+                   else password_hashing.hash_password(password))
+    conn = database.get_connection()
+    conn.executemany("""
+        INSERT INTO usuarios (username, password_hash, nome_completo, email, role, setor)
+        VALUES (?, ?, ?, ?, 'Colaborador', 'Administrativo')
+    """, [(f'bench{i}', shared_hash, f'Usuário {i}', f'bench{i}@empresa.com') for i in range(args.users)])
+    conn.commit()
+    conn.close()
+
+    latencies = []
+    outcomes = {'ok': 0, 'rejected': 0, 'busy': 0, 'throttled': 0, 'error': 0}
+    lock = threading.Lock()
+    remaining = iter(range(args.logins))
+
+    def session(seed):
+        rng = random.Random(seed)
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            username = f'bench{rng.randrange(args.users)}'
+            attempt = password if rng.random() >= args.wrong_ratio else 'senha-errada'
+            start = time.perf_counter()
+            try:
+                outcome = 'ok' if authenticate_user(username, attempt) else 'rejected'
+            except HashingBusyError:
+                outcome = 'busy'
+            except LoginThrottledError:
+                outcome = 'throttled'
+            except Exception:
+                outcome = 'error'
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                outcomes[outcome] += 1
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(args.sessions)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    report = {
+        'scheme': password_hashing.HASH_SCHEME,
+        'bcrypt_rounds': password_hashing.BCRYPT_ROUNDS,
+        'workers': password_hashing.HASH_WORKERS,
+        'queue_limit': password_hashing.HASH_QUEUE_LIMIT,
+        'sessions': args.sessions,
+        'attempts': len(latencies),
+        'legacy_seed': args.legacy,
+        'wall_seconds': round(wall, 3),
+        'logins_per_second': round(len(latencies) / wall, 2) if wall else 0,
+        'latency_ms': {
+            'mean': round(statistics.fmean(latencies) * 1000, 2) if latencies else 0,
+            'p50': round(percentile(latencies, 50) * 1000, 2),
+            'p95': round(percentile(latencies, 95) * 1000, 2),
+            'p99': round(percentile(latencies, 99) * 1000, 2),
+            'max': round(max(latencies, default=0) * 1000, 2),
+        },
+        'outcomes': outcomes,
+    }
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return report
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,226 @@
+"""End-to-end render benchmarks for app.py and every page, per role and dataset size.
+
+Each page runs headlessly through streamlit.testing.v1.AppTest with a
+logged-in session for each role allowed to open it, against generated
+databases of increasing size (benchmarks.datagen). The report has rerun wall
+time (first run and warm median), number of elements emitted (with the most
+frequent element types, to spot per-ticket widget explosions) and the peak
+Python memory of a traced rerun. A rerun that shows the login form or the
+access-denied error stops the run instead of being timed. Run from the
+repository root:
+
+    python -m benchmarks.render_bench --tickets 1000 10000 100000 --output render.json
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+from benchmarks.common import compare_to_baseline, environment, load_baseline, write_report
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Script -> roles that can open it (the others only see the access-denied message)
+PAGES = {
+    'app.py': ['Colaborador', 'Técnico', 'Administrador', 'Diretoria'],
+    'pages/1_abrir_chamado.py': ['Colaborador', 'Técnico', 'Administrador', 'Diretoria'],
+    'pages/2_meus_chamados.py': ['Colaborador', 'Técnico', 'Administrador', 'Diretoria'],
+    'pages/3_chamados_tecnicos.py': ['Técnico', 'Administrador', 'Diretoria'],
+    'pages/4_dashboard_diretoria.py': ['Administrador', 'Diretoria'],
+    'pages/5_admin_usuarios.py': ['Administrador'],
+    'pages/6_metricas.py': ['Administrador'],
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tickets', type=int, nargs='+', default=[1000, 10000], help='dataset sizes')
+    parser.add_argument('--pages', nargs='+', choices=sorted(PAGES), help='scripts to run (default: all)')
+    parser.add_argument('--roles', nargs='+', choices=['Colaborador', 'Técnico', 'Administrador', 'Diretoria'])
+    parser.add_argument('--runs', type=int, default=3, help='timed reruns per page and role')
+    parser.add_argument('--timeout', type=float, default=300, help='seconds allowed for one rerun')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    parser.add_argument('--baseline', help='report to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed slowdown (0.25 = 25%%)')
+    parser.add_argument('--keep', action='store_true', help='keep the generated databases')
+    return parser.parse_args(argv)
+
+
+def _principals(db_path):
+    """One user per role: the busiest requester and technician, so the pages show the most data"""
+    conn = sqlite3.connect(db_path)
+    busiest = {
+        'Colaborador': "SELECT solicitante_id FROM chamados GROUP BY solicitante_id ORDER BY COUNT(*) DESC LIMIT 1",
+        'Técnico': """SELECT tecnico_id FROM chamados WHERE tecnico_id IS NOT NULL
+                      GROUP BY tecnico_id ORDER BY COUNT(*) DESC LIMIT 1""",
+    }
+    principals = {}
+    for role in ('Colaborador', 'Técnico', 'Administrador', 'Diretoria'):
+        row = conn.execute(busiest[role]).fetchone() if role in busiest else None
+        user = conn.execute(
+            "SELECT id, username, role, setor FROM usuarios WHERE " +
+            ("id = ?" if row else "role = ? AND ativo = 1 ORDER BY id LIMIT 1"),
+            (row[0] if row else role,)).fetchone()
+        principals[role] = {'id': user[0], 'username': user[1], 'role': user[2], 'setor': user[3]}
+    conn.close()
+    return principals
+
+
+def _login(principal):
+    """A session token for the principal, issued and stored as start_session does"""
+    from components.database import create_session
+    from components.session_tokens import new_session_token
+
+    token, key = new_session_token()
+    create_session(key, principal['id'])
+    return token
+
+
+def _check_rendered(at, script, principal):
+    """Refuse to time a page that showed the login form or the access-denied error instead"""
+    denied = [error.value for error in at.error if 'Acesso negado' in str(error.value)]
+    login = [form for form in at.get('form') if form.proto.form.form_id == 'login_form']
+    if denied or login:
+        raise RuntimeError(f"{script} did not render for {principal['username']} ({principal['role']}): "
+                           f"{denied[0] if denied else 'login form'}")
+
+
+def _walk(node, types):
+    types[getattr(node, 'type', type(node).__name__)] += 1
+    for child in (getattr(node, 'children', None) or {}).values():
+        _walk(child, types)
+
+
+def _element_types(at):
+    """Element count per type emitted by the last run (containers included)"""
+    types = Counter()
+    for child in at._tree.children.values():
+        _walk(child, types)
+    return types
+
+
+def render(script, principal, token, timeout, trace_memory=False):
+    """One rerun of a script in a fresh logged-in session; returns (seconds, AppTest, peak bytes)"""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(ROOT, script), default_timeout=timeout)
+    at.session_state['authenticated'] = True
+    at.session_state['user_info'] = dict(principal)
+    at.session_state['session_token'] = token
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        at.run()
+        elapsed = time.perf_counter() - start
+    finally:
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        if trace_memory:
+            tracemalloc.stop()
+    _check_rendered(at, script, principal)
+    return elapsed, at, peak
+
+
+def bench_page(script, principal, runs, timeout):
+    token = _login(principal)
+    first, at, _ = render(script, principal, token, timeout)
+    warm = [render(script, principal, token, timeout)[0] for _ in range(runs)]
+    _, _, peak = render(script, principal, token, timeout, trace_memory=True)
+
+    types = _element_types(at)
+    return {
+        'first_run_ms': round(first * 1000, 1),
+        'warm_median_ms': round(statistics.median(warm) * 1000, 1) if warm else None,
+        'warm_max_ms': round(max(warm) * 1000, 1) if warm else None,
+        'elements': sum(types.values()),
+        'top_elements': dict(types.most_common(8)),
+        'peak_memory_mb': round(peak / 1024 / 1024, 2),
+        'exceptions': [str(exc.value)[:200] for exc in at.exception],
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='render_bench_')
+    # Read at import time: keep profiling, logs and background work out of the measurement and of data/
+    os.environ['CHAMADOS_DB_PATH'] = os.path.join(workdir, 'chamados.db')
+    os.environ.setdefault('SLOW_QUERY_MS', '-1')
+    os.environ.setdefault('SLOW_QUERY_LOG', os.path.join(workdir, 'slow_queries.jsonl'))
+    os.environ.setdefault('AUDIT_DIR', os.path.join(workdir, 'audit'))
+    os.environ.setdefault('TRACING_ENABLED', '0')
+    os.environ['METRICS_PORT'] = '0'
+    os.environ['METRICS_FILE'] = ''
+
+    from benchmarks.datagen import generate
+
+    scripts = args.pages or list(PAGES)
+    datasets, results = {}, {}
+    try:
+        for size in args.tickets:
+            label = str(size)
+            db_path = os.path.join(workdir, f"bench_{size}.db")
+            datasets[label] = generate(db_path, size, seed=args.seed)
+            print(f"dataset {label}: {datasets[label]}", file=sys.stderr)
+            principals = _principals(db_path)
+
+            results[label] = {}
+            for script in scripts:
+                for role in PAGES[script]:
+                    if args.roles and role not in args.roles:
+                        continue
+                    name = f"{script}:{role}"
+                    results[label][name] = bench_page(script, principals[role], args.runs, args.timeout)
+                    entry = results[label][name]
+                    print(f"  {name}: {entry['warm_median_ms']} ms, {entry['elements']} elements, "
+                          f"{entry['peak_memory_mb']} MB", file=sys.stderr)
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    # How each page grows from the smallest to the largest dataset
+    scaling = {}
+    if len(args.tickets) > 1:
+        smallest, largest = results[str(args.tickets[0])], results[str(args.tickets[-1])]
+        for name, entry in largest.items():
+            base = smallest.get(name)
+            if base and base['warm_median_ms']:
+                scaling[name] = {
+                    'time_factor': round(entry['warm_median_ms'] / base['warm_median_ms'], 2),
+                    'elements_factor': round(entry['elements'] / max(base['elements'], 1), 2),
+                }
+
+    report = {
+        'environment': environment(),
+        'settings': {'runs': args.runs, 'seed': args.seed},
+        'datasets': datasets,
+        'results': results,
+        'scaling': scaling,
+    }
+
+    ok = not any(entry['exceptions'] for cases in results.values() for entry in cases.values())
+    if args.baseline:
+        baseline = load_baseline(args.baseline)
+        flatten = lambda runs: {f"{label}:{name}": entry for label, cases in runs.items()
+                                for name, entry in cases.items()}
+        _, slower = compare_to_baseline(flatten(results), flatten(baseline.get('results', {})),
+                                        'warm_median_ms', args.threshold, min_delta=5)
+        _, bigger = compare_to_baseline(flatten(results), flatten(baseline.get('results', {})),
+                                        'elements', args.threshold)
+        report['comparison'] = {'baseline': args.baseline, 'threshold': args.threshold,
+                                'regressions': slower + bigger}
+        ok = ok and not (slower or bigger)
+
+    write_report(report, args.output)
+    return report if ok else None
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,201 @@
+"""Replay a captured workload against a copy of the database.
+
+Reads a file written with WORKLOAD_CAPTURE (components.workload_capture),
+copies the database with the SQLite backup API and re-executes each call at
+its original pace divided by --speed (0 = as fast as possible). Calls from
+the same original thread keep their order; --concurrency sets how many
+replay threads they are spread over. --setup-sql applies statements (new
+indexes, PRAGMAs) to the copy first, so the report's per-function latency
+can be compared with the captured timings or with another replay. Run from
+the repository root:
+
+    WORKLOAD_CAPTURE=data/workload.jsonl.gz streamlit run app.py   # capture
+    python -m benchmarks.replay data/workload.jsonl.gz --speed 4 --concurrency 8
+    python -m benchmarks.replay data/workload*.jsonl.gz --speed 0 --setup-sql indexes.sql --baseline replay.json
+"""
+import argparse
+import os
+import queue
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from benchmarks.common import compare_to_baseline, environment, latency_summary, load_baseline, write_report
+
+# Functions that only read; --read-only replays just these
+READ_ONLY_PREFIXES = ('get_', 'check_', 'count_')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('capture', nargs='+', help='files written with WORKLOAD_CAPTURE (.jsonl or .jsonl.gz)')
+    parser.add_argument('--database', default=os.path.join('data', 'chamados.db'), help='database to copy')
+    parser.add_argument('--speed', type=float, default=1.0, help='pace multiplier (0 = no waiting)')
+    parser.add_argument('--concurrency', type=int, default=4, help='replay threads')
+    parser.add_argument('--setup-sql', help='SQL file applied to the copy before replaying')
+    parser.add_argument('--read-only', action='store_true', help='replay only the read functions')
+    parser.add_argument('--functions', nargs='+', help='replay only these functions')
+    parser.add_argument('--limit', type=int, help='replay at most this many calls')
+    parser.add_argument('--profile', action='store_true', help='keep slow-query profiling on (off by default)')
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    parser.add_argument('--baseline', help='replay report to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed slowdown (0.25 = 25%%)')
+    parser.add_argument('--keep', action='store_true', help='keep the database copy')
+    return parser.parse_args(argv)
+
+
+def copy_database(source, target, setup_sql=None):
+    """Online copy of the database (safe while the app is running), then the optional setup script"""
+    src, dst = sqlite3.connect(source), sqlite3.connect(target)
+    src.backup(dst)
+    src.close()
+    if setup_sql:
+        with open(setup_sql, encoding='utf-8') as f:
+            dst.executescript(f.read())
+    dst.commit()
+    dst.close()
+
+
+def load_calls(paths, args):
+    """Captured calls of every file (main process and job workers), merged in time order"""
+    from components.workload_capture import read_workload
+
+    calls = []
+    for path in paths:
+        for entry in read_workload(path):
+            if args.functions and entry['fn'] not in args.functions:
+                continue
+            if args.read_only and not entry['fn'].startswith(READ_ONLY_PREFIXES):
+                continue
+            calls.append(entry)
+    calls.sort(key=lambda entry: entry['ts'])
+    return calls[:args.limit] if args.limit else calls
+
+
+def replay(calls, modules, speed, concurrency):
+    """Re-execute calls on a schedule; returns per-function latencies, errors and schedule lag"""
+    from components.workload_capture import decode
+
+    lanes = [queue.Queue() for _ in range(concurrency)]
+    results = defaultdict(lambda: {'latencies': [], 'errors': defaultdict(int)})
+    lag = []
+    results_lock = threading.Lock()
+    first_ts = calls[0]['ts'] if calls else 0
+    started = time.perf_counter()
+
+    def worker(lane):
+        local = defaultdict(lambda: {'latencies': [], 'errors': defaultdict(int)})
+        local_lag = []
+        while True:
+            entry = lane.get()
+            if entry is None:
+                break
+            due = (entry['ts'] - first_ts) / speed if speed else 0
+            wait = due - (time.perf_counter() - started)
+            if wait > 0:
+                time.sleep(wait)
+            else:
+                local_lag.append(-wait)
+            function = getattr(modules[entry['mod']], entry['fn'])
+            start = time.perf_counter()
+            try:
+                function(**decode(entry['args']))
+                local[entry['fn']]['latencies'].append(time.perf_counter() - start)
+            except Exception as e:
+                local[entry['fn']]['errors'][f"{type(e).__name__}: {e}"[:120]] += 1
+        with results_lock:
+            lag.extend(local_lag)
+            for name, entry in local.items():
+                results[name]['latencies'].extend(entry['latencies'])
+                for message, count in entry['errors'].items():
+                    results[name]['errors'][message] += count
+
+    threads = [threading.Thread(target=worker, args=(lane,)) for lane in lanes]
+    for thread in threads:
+        thread.start()
+    # Calls of one original thread stay in order on the same lane
+    for entry in calls:
+        lanes[hash((entry.get('pid'), entry.get('tid'))) % concurrency].put(entry)
+    for lane in lanes:
+        lane.put(None)
+    for thread in threads:
+        thread.join()
+    return results, lag, time.perf_counter() - started
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='replay_')
+    db_path = os.path.join(workdir, 'chamados.db')
+    # Read at import time; the replay itself is never captured again
+    os.environ['CHAMADOS_DB_PATH'] = db_path
+    os.environ['WORKLOAD_CAPTURE'] = ''
+    os.environ.setdefault('SLOW_QUERY_MS', '100' if args.profile else '-1')
+    os.environ.setdefault('SLOW_QUERY_LOG', os.path.join(workdir, 'slow_queries.jsonl'))
+    os.environ.setdefault('TRACING_ENABLED', '0')
+
+    try:
+        copy_database(args.database, db_path, args.setup_sql)
+        from components import chat, database
+        database.init_database()
+
+        calls = load_calls(args.capture, args)
+        if not calls:
+            print(f"no calls to replay in {', '.join(args.capture)}", file=sys.stderr)
+            return None
+        captured = defaultdict(list)
+        for entry in calls:
+            captured[entry['fn']].append(entry['ms'] / 1000)
+
+        results, lag, wall = replay(calls, {'components.database': database, 'components.chat': chat},
+                                    args.speed, max(1, args.concurrency))
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    functions = {}
+    for name in sorted(results):
+        latencies = results[name]['latencies']
+        summary = latency_summary(latencies)
+        summary.update({
+            'calls': len(latencies),
+            'errors': sum(results[name]['errors'].values()),
+            'error_messages': dict(results[name]['errors']),
+            'captured_p50': latency_summary(captured[name])['p50'],
+            'captured_p95': latency_summary(captured[name])['p95'],
+        })
+        functions[name] = summary
+
+    span = calls[-1]['ts'] - calls[0]['ts']
+    lag_summary = latency_summary(lag)
+    report = {
+        'environment': environment(),
+        'settings': {'capture': args.capture, 'database': args.database, 'speed': args.speed,
+                     'concurrency': args.concurrency, 'setup_sql': args.setup_sql, 'read_only': args.read_only},
+        'calls': len(calls),
+        'captured_seconds': round(span, 2),
+        'replay_seconds': round(wall, 2),
+        'calls_per_second': round(len(calls) / wall, 1) if wall else 0,
+        'behind_schedule_ms': {'p50': lag_summary['p50'], 'p99': lag_summary['p99'], 'max': lag_summary['max']},
+        'functions': functions,
+    }
+
+    ok = True
+    if args.baseline:
+        comparisons, regressions = compare_to_baseline(
+            functions, load_baseline(args.baseline).get('functions', {}), 'p50', args.threshold, min_delta=0.05)
+        report['comparison'] = {'baseline': args.baseline, 'compared': len(comparisons),
+                                'regressions': regressions}
+        ok = not regressions
+
+    write_report(report, args.output)
+    return report if ok else None
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,450 @@
+"""Alert ingestion: monitoring events coalesced by fingerprint into tickets.
+
+Events arrive over HTTP (POST /api/v1/alertas, queued in memory and written
+by a background thread) or as files in a spool directory (written
+synchronously, the file is deleted only after its transaction commits).
+Queued events are never dropped: a batch that fails to write, and whatever is
+still queued at shutdown, is written to the spool directory and retried from
+there (ALERT_SPOOL_DIR, or data/alertas_retidos when no spool is configured):
+
+    python -m components.alert_ingest --spool data/alertas   # watch a spool directory
+    python -m components.alert_ingest eventos.jsonl          # ingest files once
+
+An event is a JSON object: titulo (required), descricao, origem, severidade
+(critical/warning/info) or prioridade (Alta/Média/Baixa), setor, ocorrido_em
+and fingerprint (default: origem + titulo); spool files may also carry
+recebido_em (kept by spilled events). Events sharing a fingerprint
+become one ticket while they keep arriving within ALERT_COALESCE_WINDOW_SECONDS
+of each other; repeats are appended to its history, one row per batch.
+"""
+import argparse
+import atexit
+import hashlib
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+
+from components.database import get_current_time_str, ingest_alert_batch
+from components.metrics import inc, register_gauges
+
+# A repeat further apart than this from the previous occurrence opens a new ticket
+ALERT_COALESCE_WINDOW = float(os.environ.get('ALERT_COALESCE_WINDOW_SECONDS', 3600))
+# Events per transaction, and how long queued events wait for a batch to fill
+ALERT_BATCH_SIZE = int(os.environ.get('ALERT_BATCH_SIZE', 5000))
+ALERT_FLUSH_SECONDS = float(os.environ.get('ALERT_FLUSH_SECONDS', 1))
+# Queued (not yet written) events beyond which HTTP submissions are refused
+ALERT_QUEUE_LIMIT = int(os.environ.get('ALERT_QUEUE_LIMIT', 100000))
+# Spool directory watched by the ingestor (empty disables); only *.json / *.jsonl files are read
+ALERT_SPOOL_DIR = os.environ.get('ALERT_SPOOL_DIR', '')
+ALERT_SPOOL_POLL_SECONDS = float(os.environ.get('ALERT_SPOOL_POLL_SECONDS', 2))
+# A file claimed (*.processando) longer than this belongs to a dead ingestor and is retried
+ALERT_SPOOL_LEASE_SECONDS = float(os.environ.get('ALERT_SPOOL_LEASE_SECONDS', 300))
+ALERT_DEFAULT_SETOR = os.environ.get('ALERT_DEFAULT_SETOR', 'TI')
+MAX_WRITE_ATTEMPTS = 5
+# Where events that could not be written go when no spool directory is configured
+SPILL_DIR = os.path.join('data', 'alertas_retidos')
+# Spilled files hold events already counted as received
+SPILL_PREFIX = 'retidos-'
+CLAIM_SUFFIX = '.processando'
+MAX_RETRY_SECONDS = 60
+
+SEVERIDADES = {
+    'critical': 'Alta', 'critica': 'Alta', 'crítica': 'Alta', 'high': 'Alta', 'alta': 'Alta',
+    'warning': 'Média', 'media': 'Média', 'média': 'Média', 'medium': 'Média',
+    'info': 'Baixa', 'low': 'Baixa', 'baixa': 'Baixa',
+}
+PRIORITY_RANK = {'Baixa': 0, 'Média': 1, 'Alta': 2}
+
+_condition = threading.Condition()
+_write_lock = threading.Lock()  # held while a batch is between the queue and the database
+_queue = deque()
+_stats = {'recebidos': 0, 'rejeitados': 0, 'gravados': 0, 'chamados_criados': 0, 'chamados_agrupados': 0}
+_thread = None
+_spool_thread = None
+_spool_dir = None
+_spill_sequence = itertools.count()
+
+
+class AlertQueueFull(Exception):
+    """Raised when ALERT_QUEUE_LIMIT events are already waiting to be written"""
+
+
+def _text(raw, name, limit, default=None):
+    value = raw.get(name, default)
+    if value is None:
+        return None
+    return str(value).strip()[:limit] or None
+
+
+def normalize_event(raw, keep_received=False):
+    """Validate one raw event; raises ValueError with a message for the sender.
+
+    keep_received keeps the event's recebido_em (local files only: senders must not move the window).
+    """
+    if not isinstance(raw, dict):
+        raise ValueError('evento deve ser um objeto JSON')
+    titulo = _text(raw, 'titulo', 200) or _text(raw, 'alertname', 200)
+    if not titulo:
+        raise ValueError("campo 'titulo' é obrigatório")
+
+    prioridade = raw.get('prioridade')
+    if prioridade not in PRIORITY_RANK:
+        prioridade = SEVERIDADES.get(str(raw.get('severidade', raw.get('severity', 'warning'))).lower())
+        if prioridade is None:
+            raise ValueError("severidade deve ser critical, warning ou info")
+
+    origem = _text(raw, 'origem', 100, 'monitoramento')
+    fingerprint = _text(raw, 'fingerprint', 200) or hashlib.sha1(f"{origem}|{titulo}".encode()).hexdigest()
+    return {
+        'fingerprint': fingerprint,
+        'origem': origem,
+        'titulo': titulo,
+        'descricao': _text(raw, 'descricao', 4000) or titulo,
+        'prioridade': prioridade,
+        'setor': _text(raw, 'setor', 100, ALERT_DEFAULT_SETOR),
+        'ocorrido_em': _text(raw, 'ocorrido_em', 40),
+        # The window is measured on our clock, not the sender's
+        'recebido_em': (keep_received and _text(raw, 'recebido_em', 19)) or get_current_time_str(),
+    }
+
+
+def _message(event):
+    prefix = f"[{event['ocorrido_em']}] " if event['ocorrido_em'] else ''
+    return (prefix + event['descricao'])[:200]
+
+
+def coalesce(events):
+    """Merge normalized events by fingerprint: one group per fingerprint, highest priority wins"""
+    groups = {}
+    for event in events:
+        group = groups.get(event['fingerprint'])
+        if group is None:
+            groups[event['fingerprint']] = {
+                'fingerprint': event['fingerprint'], 'origem': event['origem'], 'titulo': event['titulo'],
+                'descricao': event['descricao'], 'prioridade': event['prioridade'], 'setor': event['setor'],
+                'ocorrencias': 1, 'primeira': event['recebido_em'], 'ultima': event['recebido_em'],
+                'mensagem': _message(event),
+            }
+            continue
+        group['ocorrencias'] += 1
+        group['ultima'] = max(group['ultima'], event['recebido_em'])
+        group['mensagem'] = _message(event)
+        if PRIORITY_RANK[event['prioridade']] > PRIORITY_RANK[group['prioridade']]:
+            group['prioridade'] = event['prioridade']
+    return list(groups.values())
+
+
+def ingest(events):
+    """Write normalized events now (one transaction, retried while the database is locked)"""
+    if not events:
+        return [], []
+    groups = coalesce(events)
+    for attempt in range(MAX_WRITE_ATTEMPTS):
+        try:
+            created, appended = ingest_alert_batch(groups, ALERT_COALESCE_WINDOW)
+            break
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e) or attempt == MAX_WRITE_ATTEMPTS - 1:
+                raise
+            time.sleep(0.1 * 2 ** attempt)
+    with _condition:
+        _stats['gravados'] += len(events)
+        _stats['chamados_criados'] += len(created)
+        _stats['chamados_agrupados'] += len(appended)
+    return created, appended
+
+
+def submit(raw_events):
+    """Validate and queue events for the background writer; returns (accepted, [(index, error)])"""
+    accepted, rejected = [], []
+    for index, raw in enumerate(raw_events):
+        try:
+            accepted.append(normalize_event(raw))
+        except ValueError as e:
+            rejected.append((index, str(e)))
+
+    with _condition:
+        if len(_queue) + len(accepted) > ALERT_QUEUE_LIMIT:
+            raise AlertQueueFull(len(_queue))
+        _queue.extend(accepted)
+        _stats['recebidos'] += len(accepted)
+        _stats['rejeitados'] += len(rejected)
+        if len(_queue) >= ALERT_BATCH_SIZE:
+            _condition.notify()
+    return len(accepted), rejected
+
+
+def _take_batch(wait):
+    """Up to ALERT_BATCH_SIZE queued events, waiting at most `wait` seconds for a batch to fill"""
+    with _condition:
+        deadline = time.monotonic() + wait
+        while len(_queue) < ALERT_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            _condition.wait(remaining)
+        return [_queue.popleft() for _ in range(min(len(_queue), ALERT_BATCH_SIZE))]
+
+
+def spill(events):
+    """Write events that could not be ingested to the spool directory (retried from there); returns the path"""
+    directory = _spool_dir or ALERT_SPOOL_DIR or SPILL_DIR
+    os.makedirs(directory, exist_ok=True)
+    name = f"{SPILL_PREFIX}{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_spill_sequence)}.jsonl"
+    path = os.path.join(directory, name)
+    # Written under another name first: the watcher only sees complete files
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        for event in events:
+            f.write(json.dumps(event, ensure_ascii=False) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+    inc('chamados_alert_events_spilled_total', amount=len(events))
+    return path
+
+
+def _write_or_spill(batch):
+    """Ingest a batch; if that fails, spill it. If the spill fails too, requeue it and raise."""
+    try:
+        ingest(batch)
+    except Exception as e:
+        try:
+            path = spill(batch)
+        except OSError:
+            with _condition:
+                _queue.extendleft(reversed(batch))
+            raise
+        print(f"alert_ingest: {len(batch)} events spilled to {path}: {type(e).__name__}: {e}", file=sys.stderr)
+
+
+def flush():
+    """Write (or spill) everything queued so far, after any batch in flight (used on shutdown)"""
+    with _write_lock:
+        while True:
+            batch = _take_batch(0)
+            if not batch:
+                return
+            _write_or_spill(batch)
+
+
+def _run():
+    failures = 0
+    while True:
+        with _write_lock:
+            batch = _take_batch(ALERT_FLUSH_SECONDS)
+            if not batch:
+                continue
+            try:
+                _write_or_spill(batch)
+                failures = 0
+            except Exception as e:
+                failures += 1
+                print(f"alert_ingest: {len(batch)} events requeued: {type(e).__name__}: {e}", file=sys.stderr)
+        if failures:
+            time.sleep(min(ALERT_FLUSH_SECONDS * 2 ** failures, MAX_RETRY_SECONDS))
+
+
+def read_events_file(path, jsonl=None):
+    """Events of a file: a JSON array, an object with 'eventos', a single event, or JSON lines (.jsonl)"""
+    with open(path, encoding='utf-8') as f:
+        if path.endswith('.jsonl') if jsonl is None else jsonl:
+            return [json.loads(line) for line in f if line.strip()]
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('eventos', [data])
+    if not isinstance(data, list):
+        raise ValueError('o arquivo deve conter eventos JSON')
+    return data
+
+
+def _normalize_all(raw_events, source):
+    """Normalized events of a file and the number rejected (counted by the caller once written)"""
+    events, rejected = [], 0
+    for index, raw in enumerate(raw_events):
+        try:
+            events.append(normalize_event(raw, keep_received=True))
+        except ValueError as e:
+            rejected += 1
+            print(f"alert_ingest: {source} event {index} rejected: {e}", file=sys.stderr)
+    return events, rejected
+
+
+def _count_received(received, rejected):
+    with _condition:
+        _stats['recebidos'] += received
+        _stats['rejeitados'] += rejected
+
+
+def _reject(directory, path, name, error):
+    os.makedirs(os.path.join(directory, 'rejeitados'), exist_ok=True)
+    os.replace(path, os.path.join(directory, 'rejeitados', name))
+    print(f"alert_ingest: {name} rejected: {error}", file=sys.stderr)
+
+
+def _release(claimed):
+    """Give claimed files back to the spool (original name and modification time)"""
+    for path, mtime, *_ in claimed:
+        try:
+            os.rename(path, path[:-len(CLAIM_SUFFIX)])
+            os.utime(path[:-len(CLAIM_SUFFIX)], (mtime, mtime))
+        except OSError:
+            pass
+
+
+def _recover_stale_claims(directory):
+    """Release files claimed longer than ALERT_SPOOL_LEASE_SECONDS ago (their ingestor died)"""
+    cutoff = time.time() - ALERT_SPOOL_LEASE_SECONDS
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.endswith(CLAIM_SUFFIX) and entry.stat().st_mtime < cutoff:
+            _release([(entry.path, entry.stat().st_mtime)])
+
+
+def _is_database_failure(error):
+    """The database itself failed (locked, unavailable, corrupt), as opposed to the events being bad"""
+    return (isinstance(error, sqlite3.DatabaseError)
+            and not isinstance(error, (sqlite3.IntegrityError, sqlite3.DataError)))
+
+
+def _ingest_claimed(events, claimed):
+    """Write the events of claimed (path, mtime, received, rejected) files, then delete the files"""
+    try:
+        ingest(events)
+    except Exception:
+        _release(claimed)
+        raise
+    for path, _, received, rejected in claimed:
+        os.remove(path)
+        _count_received(received, rejected)
+
+
+def process_spool(directory, isolate=False):
+    """Ingest the spool files present now, about ALERT_BATCH_SIZE events per transaction.
+
+    A file is removed only after the transaction holding its events commits; if
+    the transaction fails its files are released for a later pass. isolate
+    writes one file per transaction and moves a file whose events fail (any
+    error but a failure of the database itself) to rejeitados/, as it does
+    with unreadable files. Returns the number of events written.
+    """
+    _recover_stale_claims(directory)
+    entries = sorted((entry for entry in os.scandir(directory)
+                      if entry.is_file() and entry.name.endswith(('.json', '.jsonl'))),
+                     key=lambda entry: entry.stat().st_mtime)
+    pending, claimed, written = [], [], 0
+    for entry in entries:
+        # Claim by rename so several ingestors can share a directory; the new mtime starts the lease
+        claimed_path = entry.path + CLAIM_SUFFIX
+        try:
+            mtime = entry.stat().st_mtime
+            os.rename(entry.path, claimed_path)
+            os.utime(claimed_path)
+        except OSError:
+            continue
+        try:
+            raw_events = read_events_file(claimed_path, jsonl=entry.name.endswith('.jsonl'))
+        except (OSError, ValueError) as e:
+            _reject(directory, claimed_path, entry.name, e)
+            continue
+        events, rejected = _normalize_all(raw_events, entry.name)
+        item = (claimed_path, mtime, 0 if entry.name.startswith(SPILL_PREFIX) else len(events), rejected)
+        if isolate:
+            try:
+                ingest(events)
+            except Exception as e:
+                if _is_database_failure(e):
+                    _release([item])
+                    raise
+                _reject(directory, claimed_path, entry.name, e)
+                continue
+            os.remove(claimed_path)
+            _count_received(*item[2:])
+            written += len(events)
+            continue
+        pending.extend(events)
+        claimed.append(item)
+        if len(pending) >= ALERT_BATCH_SIZE:
+            _ingest_claimed(pending, claimed)
+            written += len(pending)
+            pending, claimed = [], []
+    _ingest_claimed(pending, claimed)
+    written += len(pending)
+    return written
+
+
+def _spool_loop(directory):
+    os.makedirs(directory, exist_ok=True)
+    failures = 0
+    while True:
+        try:
+            # After a failure, one file per transaction until a pass succeeds: a bad file cannot block the rest
+            written = process_spool(directory, isolate=failures > 0)
+            failures = 0
+            if not written:
+                time.sleep(ALERT_SPOOL_POLL_SECONDS)
+        except Exception as e:
+            failures += 1
+            print(f"alert_ingest: spool error: {type(e).__name__}: {e}", file=sys.stderr)
+            time.sleep(min(ALERT_SPOOL_POLL_SECONDS * 2 ** failures, MAX_RETRY_SECONDS))
+
+
+def start_alert_ingestor(spool_dir=None):
+    """Start the queue writer and the spool watcher (spilled events at least) once per process"""
+    global _thread, _spool_thread, _spool_dir
+    with _condition:
+        if _thread is None:
+            _thread = threading.Thread(target=_run, name='alert-ingest', daemon=True)
+            _thread.start()
+            # Queued events are written (or spilled) on any normal interpreter exit
+            atexit.register(flush)
+        if _spool_thread is None:
+            _spool_dir = spool_dir or ALERT_SPOOL_DIR or SPILL_DIR
+            _spool_thread = threading.Thread(target=_spool_loop, args=(_spool_dir,), name='alert-spool', daemon=True)
+            _spool_thread.start()
+
+
+def get_alert_stats():
+    with _condition:
+        return dict(_stats, fila=len(_queue))
+
+
+def _alert_gauges():
+    stats = get_alert_stats()
+    return [('chamados_alert_queue_size', {}, stats['fila']),
+            ('chamados_alert_events_total', {'resultado': 'recebido'}, stats['recebidos']),
+            ('chamados_alert_events_total', {'resultado': 'rejeitado'}, stats['rejeitados']),
+            ('chamados_alert_events_total', {'resultado': 'gravado'}, stats['gravados']),
+            ('chamados_alert_tickets_total', {'acao': 'criado'}, stats['chamados_criados']),
+            ('chamados_alert_tickets_total', {'acao': 'agrupado'}, stats['chamados_agrupados'])]
+
+
+register_gauges(_alert_gauges)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Ingest monitoring alerts into tickets')
+    parser.add_argument('files', nargs='*', help='event files to ingest once (.json or .jsonl)')
+    parser.add_argument('--spool', default=ALERT_SPOOL_DIR or None, help='spool directory to watch')
+    args = parser.parse_args(argv)
+
+    from components.database import init_database
+    init_database()
+
+    if args.files:
+        for path in args.files:
+            events, rejected = _normalize_all(read_events_file(path), path)
+            created, appended = ingest(events)
+            _count_received(len(events), rejected)
+            print(f"{path}: {len(created)} ticket(s) opened, {len(appended)} updated")
+        return 0
+    if not args.spool:
+        parser.error('give event files or --spool (or set ALERT_SPOOL_DIR)')
+    _spool_loop(args.spool)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
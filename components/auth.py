@@ -1,42 +1,146 @@
 import streamlit as st
-import sqlite3
-import hashlib
+import streamlit.components.v1 as components
+from components.database import (
+    get_user_credentials, update_password_hash, create_session, get_session_principal, revoke_session
+)
+from components.password_hashing import (
+    hash_password, verify_password, needs_rehash, burn_verification,
+    check_throttle, register_failure, reset_failures,
+    HashingBusyError, LoginThrottledError
+)
+from components.session_tokens import (
+    new_session_token, verify_session_token, get_cached_principal, cache_principal, invalidate_session,
+    SESSION_TTL_HOURS
+)
+from utils.audit import log_event
 from datetime import datetime
+from http.cookies import SimpleCookie
 
-def hash_password(password):
-    """Hash a password using SHA-256"""
-    return hashlib.sha256(password.encode()).hexdigest()
-
-def verify_password(password, hashed):
-    """Verify a password against its hash"""
-    return hash_password(password) == hashed
+SESSION_COOKIE = 'chamados_sid'
 
 def authenticate_user(username, password):
-    """Authenticate user credentials"""
-    conn = sqlite3.connect('data/chamados.db')
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT id, username, password_hash, role, setor, ativo
-        FROM usuarios 
-        WHERE username = ? AND ativo = 1
-    """, (username,))
-    
-    user = cursor.fetchone()
-    conn.close()
-    
-    if user and verify_password(password, user[2]):
-        return {
-            'id': user[0],
-            'username': user[1],
-            'role': user[3],
-            'setor': user[4]
-        }
-    return None
+    """Authenticate user credentials (raises LoginThrottledError / HashingBusyError)"""
+    check_throttle(username)
+
+    user = get_user_credentials(username)
+
+    if not user:
+        burn_verification(password)
+        register_failure(username)
+        log_event(None, 'login_falhou', username)
+        return None
+
+    user_id, username, password_hash, role, setor = user
+    if not verify_password(password, password_hash):
+        register_failure(username)
+        log_event(user_id, 'login_falhou', username)
+        return None
+
+    reset_failures(username)
+    log_event(user_id, 'login', username)
+
+    # Transparently upgrade legacy SHA-256 (or weaker) hashes
+    if needs_rehash(password_hash):
+        try:
+            update_password_hash(user_id, password_hash, hash_password(password))
+        except HashingBusyError:
+            pass  # Upgrade on a later login
+
+    return {
+        'id': user_id,
+        'username': username,
+        'role': role,
+        'setor': setor
+    }
+
+def start_session(user_info):
+    """Persist a signed session token; a cookie (never the URL) keeps reloads logged in"""
+    token, key = new_session_token()
+    create_session(key, user_info['id'])
+    cache_principal(key, user_info)
+
+    st.session_state.authenticated = True
+    st.session_state.user_info = user_info
+    st.session_state.session_token = token
+    # Written on the next run: login_page reruns right after this
+    st.session_state.session_cookie_pending = token
+
+def _write_session_cookie(token):
+    """Set (or, with no token, delete) the session cookie of the app page.
+
+    Streamlit cannot send Set-Cookie headers, so a zero-height iframe does it: it shares the page's
+    origin. The browser sends the cookie back when the page is reloaded (see _request_cookie).
+    """
+    max_age = int(SESSION_TTL_HOURS * 3600) if token else 0
+    script = ("<script>window.parent.document.cookie = "
+              f"'{SESSION_COOKIE}={token or ''}; Max-Age={max_age}; Path=/; SameSite=Strict'"
+              " + (window.parent.location.protocol === 'https:' ? '; Secure' : '');</script>")
+    if hasattr(st, 'iframe'):
+        st.iframe(script, height='content')
+    else:
+        components.html(script, height=0)
+
+def _request_cookie(name):
+    """Value of a cookie sent with the page load, None unless a non-empty string.
+
+    Streamlit versions without st.context: read from the websocket headers.
+    """
+    if hasattr(st, 'context'):
+        value = st.context.cookies.get(name)
+    else:
+        from streamlit.web.server.websocket_headers import _get_websocket_headers
+        cookies = SimpleCookie((_get_websocket_headers() or {}).get('Cookie', ''))
+        value = cookies[name].value if name in cookies else None
+    return value if isinstance(value, str) and value else None
+
+def resolve_session(token):
+    """Validate a session token: signature, then principal cache, then the sessions table"""
+    key = verify_session_token(token)
+    if not key:
+        return None
+
+    principal = get_cached_principal(key)
+    if principal is None:
+        principal = get_session_principal(key)
+        if principal:
+            cache_principal(key, principal)
+    return principal
+
+def _clear_session_state():
+    """Drop the authentication keys from the session state"""
+    for key in ('authenticated', 'user_info', 'session_token'):
+        st.session_state.pop(key, None)
 
 def check_authentication():
-    """Check if user is authenticated"""
-    return 'authenticated' in st.session_state and st.session_state.authenticated
+    """Check if user is authenticated, restoring or refreshing the principal from the session token"""
+    if 'session_cookie_pending' in st.session_state:
+        _write_session_cookie(st.session_state.pop('session_cookie_pending'))
+    # Tokens used to travel in the URL; old links must not keep them around
+    if 'sid' in st.query_params:
+        del st.query_params['sid']
+
+    # The cookie only restores a session: it never replaces the token of this one
+    token = st.session_state.get('session_token')
+    if not token:
+        cookie = _request_cookie(SESSION_COOKIE)
+        # The cookie sent with the page load stays visible after it is deleted: check it once
+        if cookie and cookie != st.session_state.get('rejected_session_cookie'):
+            token = cookie
+    if not token:
+        return 'authenticated' in st.session_state and st.session_state.authenticated
+
+    # One cache lookup per rerun; also picks up deactivations and role changes
+    principal = resolve_session(token)
+    if not principal:
+        _clear_session_state()
+        st.session_state.rejected_session_cookie = token
+        _write_session_cookie(None)
+        return False
+
+    st.session_state.authenticated = True
+    st.session_state.user_info = principal
+    st.session_state.session_token = token
+    return True
 
 def login_page():
     """Display login page"""
@@ -54,14 +158,21 @@ def login_page():
             
             if submit_button:
                 if username and password:
-                    user_info = authenticate_user(username, password)
+                    login_error = "❌ Usuário ou senha incorretos!"
+                    try:
+                        user_info = authenticate_user(username, password)
+                    except LoginThrottledError as e:
+                        user_info = None
+                        login_error = f"🔒 Muitas tentativas sem sucesso. Tente novamente em {int(e.retry_after // 60) + 1} minuto(s)."
+                    except HashingBusyError:
+                        user_info = None
+                        login_error = "⏳ Sistema ocupado no momento. Tente novamente em alguns segundos."
                     if user_info:
-                        st.session_state.authenticated = True
-                        st.session_state.user_info = user_info
+                        start_session(user_info)
                         st.success("Login realizado com sucesso!")
                         st.rerun()
                     else:
-                        st.error("❌ Usuário ou senha incorretos!")
+                        st.error(login_error)
                 else:
                     st.error("❌ Preencha todos os campos!")
     
@@ -80,8 +191,19 @@ def login_page():
 
 def logout():
     """Logout user"""
+    user = st.session_state.get('user_info')
+    if user:
+        log_event(user['id'], 'logout', user['username'])
+    token = st.session_state.get('session_token')
+    key = verify_session_token(token)
+    if key:
+        revoke_session(key)
+        invalidate_session(key)
+    st.query_params.clear()
     for key in list(st.session_state.keys()):
         del st.session_state[key]
+    st.session_state.rejected_session_cookie = token
+    st.session_state.session_cookie_pending = None
     st.rerun()
 
 def require_role(required_roles):
@@ -0,0 +1,287 @@
+"""Load-aware automatic assignment of pending tickets.
+
+A background loop keeps the open workload of every active technician and a
+priority queue of the unassigned pending tickets, ordered by priority, SLA
+deadline (least slack first) and age. Every AUTO_ASSIGN_INTERVAL_SECONDS it
+takes up to AUTO_ASSIGN_BATCH_SIZE tickets off the queue and gives each one to
+the least-loaded technician, preferring one of the ticket's sector when
+AUTO_ASSIGN_SECTOR_AFFINITY is on. Both choices are heap operations
+(O(log n)). Assignments go through assign_technician with the row version the
+engine read, so a ticket claimed by hand in the meantime is skipped, never
+reassigned.
+
+Workloads follow the ticket listener of components.database; changes made by
+other processes are picked up through the ticket version (get_ticket_version).
+The engine thread is the only writer of its state and changes it under
+_condition, where get_workloads() and the gauges read it.
+"""
+import heapq
+import itertools
+import os
+import sys
+import threading
+import time
+
+from components.database import (
+    AUTO_ASSIGN_USERNAME, assign_technician, get_assignable_technicians, get_assignment_rows,
+    get_system_user, get_ticket_version, register_chamado_listener
+)
+from components.metrics import inc, register_gauges
+
+# Off by default: tickets wait for a technician to claim them
+AUTO_ASSIGN_ENABLED = os.environ.get('AUTO_ASSIGN_ENABLED', '0') == '1'
+AUTO_ASSIGN_INTERVAL_SECONDS = float(os.environ.get('AUTO_ASSIGN_INTERVAL_SECONDS', 15))
+AUTO_ASSIGN_BATCH_SIZE = int(os.environ.get('AUTO_ASSIGN_BATCH_SIZE', 50))
+# Technicians with this many open tickets get no more (0 = no limit)
+AUTO_ASSIGN_MAX_OPEN = int(os.environ.get('AUTO_ASSIGN_MAX_OPEN', 10))
+# Prefer a technician of the ticket's sector while one has capacity
+AUTO_ASSIGN_SECTOR_AFFINITY = os.environ.get('AUTO_ASSIGN_SECTOR_AFFINITY', '1') == '1'
+RESYNC_INTERVAL = float(os.environ.get('AUTO_ASSIGN_RESYNC_SECONDS', 300))
+
+OPEN_STATUSES = ('Pendente', 'Em Andamento')
+PRIORITY_RANK = {'Alta': 0, 'Média': 1, 'Baixa': 2}
+# Tickets without an SLA deadline go after every ticket that has one
+NO_DEADLINE = '9999-12-31 23:59:59'
+
+_condition = threading.Condition()
+_queue = []         # (rank, sla_prazo, data_abertura, chamado_id, versao) - unassigned pending tickets
+_queued = {}        # chamado_id -> versao of its live queue entry; other entries are stale
+_tickets = {}       # chamado_id -> (tecnico_id, setor) of every open ticket
+_technicians = {}   # tecnico_id -> (username, setor)
+_load = {}          # tecnico_id -> open tickets assigned to them
+_stamp = {}         # tecnico_id -> sequence of its live entry in the load heaps
+_least = {}         # setor (None = everyone) -> heap of (load, sequence, tecnico_id)
+_dirty = set()      # tickets changed since the last wake-up
+_sequence = itertools.count()
+_resync_requested = False
+_thread = None
+
+
+def assignment_key(prioridade, sla_prazo, data_abertura):
+    """Order in which pending tickets are assigned (the 'Pendentes' tab shows the same order)"""
+    return PRIORITY_RANK.get(prioridade, len(PRIORITY_RANK)), sla_prazo or NO_DEADLINE, data_abertura or ''
+
+
+def _push_entry(key, entry):
+    heap = _least.setdefault(key, [])
+    heapq.heappush(heap, entry)
+    # Stale entries only leave a heap when they reach its top: rebuild it if they pile up
+    if len(heap) > 4 * len(_technicians) + 64:
+        heap[:] = [item for item in heap if _stamp.get(item[2]) == item[1]]
+        heapq.heapify(heap)
+
+
+def _push_technician(tecnico_id):
+    """Publish a technician's current load; earlier heap entries for them become stale"""
+    sequence = next(_sequence)
+    _stamp[tecnico_id] = sequence
+    entry = (_load[tecnico_id], sequence, tecnico_id)
+    _push_entry(None, entry)
+    if AUTO_ASSIGN_SECTOR_AFFINITY:
+        _push_entry(_technicians[tecnico_id][1], entry)
+
+
+def _add_load(tecnico_id, amount):
+    # Tickets of administrators or deactivated technicians do not count
+    if tecnico_id in _technicians:
+        _load[tecnico_id] += amount
+        _push_technician(tecnico_id)
+
+
+def _pick_technician(setor):
+    """Least-loaded technician with capacity, from the ticket's sector first; None if all are full"""
+    for key in ((setor, None) if AUTO_ASSIGN_SECTOR_AFFINITY else (None,)):
+        heap = _least.get(key, [])
+        while heap and _stamp.get(heap[0][2]) != heap[0][1]:
+            heapq.heappop(heap)
+        if heap and (not AUTO_ASSIGN_MAX_OPEN or heap[0][0] < AUTO_ASSIGN_MAX_OPEN):
+            return heap[0][2]
+    return None
+
+
+def _track(chamado_id, row):
+    """Apply the current state of a ticket (row None = gone) to the workloads and the queue (caller holds _condition)"""
+    previous = _tickets.pop(chamado_id, None)
+    if previous and previous[0] is not None:
+        _add_load(previous[0], -1)
+    queued_version = _queued.pop(chamado_id, None)
+
+    if row is None:
+        return
+    _, status, tecnico_id, prioridade, setor, sla_prazo, data_abertura, versao = row
+    if status not in OPEN_STATUSES:
+        return
+
+    _tickets[chamado_id] = (tecnico_id, setor)
+    if tecnico_id is not None:
+        _add_load(tecnico_id, 1)
+    elif status == 'Pendente':
+        # Unchanged row (e.g. a chat message): its queue entry is still valid
+        if queued_version != versao:
+            heapq.heappush(_queue, (*assignment_key(prioridade, sla_prazo, data_abertura), chamado_id, versao))
+        _queued[chamado_id] = versao
+
+
+def _full_resync():
+    """Reload technicians and every open ticket from the database, then swap the new state in"""
+    global _queue, _queued, _tickets, _technicians, _load, _stamp, _least
+    technicians = {tecnico_id: (username, setor) for tecnico_id, username, _, setor in get_assignable_technicians()}
+    load = dict.fromkeys(technicians, 0)
+    queue, queued, tickets = [], {}, {}
+    for chamado_id, status, tecnico_id, prioridade, setor, sla_prazo, data_abertura, versao in get_assignment_rows():
+        if status not in OPEN_STATUSES:
+            continue
+        tickets[chamado_id] = (tecnico_id, setor)
+        if tecnico_id is not None:
+            if tecnico_id in load:
+                load[tecnico_id] += 1
+        elif status == 'Pendente':
+            queue.append((*assignment_key(prioridade, sla_prazo, data_abertura), chamado_id, versao))
+            queued[chamado_id] = versao
+    heapq.heapify(queue)
+
+    stamp, least = {}, {}
+    for tecnico_id, (_, setor) in technicians.items():
+        stamp[tecnico_id] = next(_sequence)
+        entry = (load[tecnico_id], stamp[tecnico_id], tecnico_id)
+        least.setdefault(None, []).append(entry)
+        if AUTO_ASSIGN_SECTOR_AFFINITY:
+            least.setdefault(setor, []).append(entry)
+    for heap in least.values():
+        heapq.heapify(heap)
+
+    with _condition:
+        _queue, _queued, _tickets, _technicians, _load, _stamp, _least = (
+            queue, queued, tickets, technicians, load, stamp, least)
+
+
+def _assign_batch(actor):
+    """Assign up to AUTO_ASSIGN_BATCH_SIZE queued tickets; returns the ids that lost a race"""
+    actor_id, actor_name = actor
+    attempts, conflicts = 0, []
+    while attempts < AUTO_ASSIGN_BATCH_SIZE:
+        # The lock is not held across the database write (its listener takes it too)
+        with _condition:
+            if not _queue:
+                break
+            chamado_id, versao = _queue[0][3:]
+            if _queued.get(chamado_id) != versao:
+                heapq.heappop(_queue)
+                continue
+
+            setor = _tickets[chamado_id][1]
+            tecnico_id = _pick_technician(setor)
+            if tecnico_id is None:
+                break
+            heapq.heappop(_queue)
+            del _queued[chamado_id]
+            username = _technicians[tecnico_id][0]
+        attempts += 1
+
+        if assign_technician(chamado_id, tecnico_id, username, actor_id, actor_name, expected_version=versao):
+            with _condition:
+                _tickets[chamado_id] = (tecnico_id, setor)
+                _add_load(tecnico_id, 1)
+            inc('chamados_auto_assignments_total', 'resultado', 'atribuido')
+        else:
+            conflicts.append(chamado_id)
+            inc('chamados_auto_assignments_total', 'resultado', 'conflito')
+    return conflicts
+
+
+def _run():
+    """Engine loop: apply ticket changes as they happen, assign a batch every interval"""
+    global _resync_requested
+    next_resync = 0.0
+    next_batch = 0.0
+    seen_version = None
+    actor = None
+
+    while True:
+        with _condition:
+            while True:
+                monotonic = time.monotonic()
+                if _dirty or _resync_requested or monotonic >= min(next_resync, next_batch):
+                    break
+                _condition.wait(timeout=max(min(next_resync, next_batch) - monotonic, 0.01))
+
+            dirty = set(_dirty)
+            _dirty.clear()
+            resync = _resync_requested or monotonic >= next_resync
+            batch = monotonic >= next_batch
+            _resync_requested = False
+
+        try:
+            if batch:
+                # Writes of other processes never reach our listener
+                version = get_ticket_version()
+                resync = resync or version != seen_version
+                seen_version = version
+
+            if resync:
+                actor = get_system_user(AUTO_ASSIGN_USERNAME)
+                _full_resync()
+                next_resync = time.monotonic() + RESYNC_INTERVAL
+            elif dirty:
+                rows = {row[0]: row for row in get_assignment_rows(dirty)}
+                with _condition:
+                    for chamado_id in dirty:
+                        _track(chamado_id, rows.get(chamado_id))
+
+            if batch:
+                next_batch = time.monotonic() + AUTO_ASSIGN_INTERVAL_SECONDS
+                conflicts = _assign_batch(actor)
+                if conflicts:
+                    with _condition:
+                        _dirty.update(conflicts)
+        except Exception as e:
+            print(f"auto_assign: {type(e).__name__}: {e}", file=sys.stderr)
+            # Database busy or unavailable: rebuild state from scratch shortly
+            next_resync = time.monotonic() + 5
+
+
+def _on_chamado_changed(chamado_id):
+    """Listener registered in components.database: refresh this ticket on the next wake-up"""
+    with _condition:
+        _dirty.add(chamado_id)
+        _condition.notify()
+
+
+def request_resync():
+    """Ask the engine to reload technicians and open tickets (e.g. after user changes)"""
+    global _resync_requested
+    with _condition:
+        _resync_requested = True
+        _condition.notify()
+
+
+def start_auto_assign():
+    """Start the assignment engine once per process, if AUTO_ASSIGN_ENABLED"""
+    global _thread
+    if not AUTO_ASSIGN_ENABLED:
+        return
+    with _condition:
+        if _thread is not None and _thread.is_alive():
+            return
+        register_chamado_listener(_on_chamado_changed)
+        _thread = threading.Thread(target=_run, name='auto-assign', daemon=True)
+        _thread.start()
+
+
+def get_workloads():
+    """Open tickets per technician username, as the engine sees them"""
+    with _condition:
+        return {_technicians[tecnico_id][0]: load for tecnico_id, load in list(_load.items())}
+
+
+def _engine_gauges():
+    if _thread is None:
+        return []
+    with _condition:
+        gauges = [('chamados_auto_assign_queue', None, len(_queued))]
+        gauges += [('chamados_technician_open_tickets', {'tecnico': _technicians[tecnico_id][0]}, load)
+                   for tecnico_id, load in list(_load.items())]
+    return gauges
+
+
+register_gauges(_engine_gauges)
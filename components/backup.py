@@ -0,0 +1,420 @@
+"""Online backups of the SQLite files, with retention and restore verification.
+
+On BACKUP_SCHEDULE (cron, as the directors' reports) every database file (the
+central one and, in site-partitioned mode, every unit's file) is copied into a
+new snapshot directory of BACKUP_DIR with the SQLite online backup API:
+
+- Each copy runs inside one read transaction on its source, started for all
+  files before the first copy. The snapshot is one consistent state, and
+  application writes never restart the copy. In WAL mode writers are not
+  blocked; the WAL only grows until the copy ends.
+- Pages are copied BACKUP_PAGES_PER_STEP at a time with BACKUP_STEP_PAUSE_MS
+  between steps, so the copy does not crowd the application's disk reads.
+- The copy is checked (PRAGMA integrity_check, row counts) and gzipped, then
+  described in manifest.json. The snapshot directory gets its final name only
+  once every file is written, so a half-written snapshot is never listed.
+- Retention keeps the newest snapshot of each of the last BACKUP_KEEP_DAILY
+  days, BACKUP_KEEP_WEEKLY weeks and BACKUP_KEEP_MONTHLY months.
+
+    python -m components.backup --run                      # back up now
+    python -m components.backup --list
+    python -m components.backup --verify [SNAPSHOT]        # newest if omitted
+    python -m components.backup --restore SNAPSHOT --target DIR
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from components.database import get_current_time, get_database_files
+from components.metrics import inc, observe, register_gauges
+from components.report_scheduler import last_slot, parse_cron
+
+BACKUP_ENABLED = os.environ.get('BACKUP_ENABLED', '1') == '1'
+# Preferably on another disk than the database
+BACKUP_DIR = os.environ.get('BACKUP_DIR', os.path.join('data', 'backups'))
+BACKUP_SCHEDULE = os.environ.get('BACKUP_SCHEDULE', '30 2 * * *')
+BACKUP_POLL_SECONDS = float(os.environ.get('BACKUP_POLL_SECONDS', 60))
+BACKUP_PAGES_PER_STEP = int(os.environ.get('BACKUP_PAGES_PER_STEP', 256))
+BACKUP_STEP_PAUSE_MS = float(os.environ.get('BACKUP_STEP_PAUSE_MS', 5))
+BACKUP_COMPRESS_LEVEL = int(os.environ.get('BACKUP_COMPRESS_LEVEL', 6))
+BACKUP_KEEP_DAILY = int(os.environ.get('BACKUP_KEEP_DAILY', 7))
+BACKUP_KEEP_WEEKLY = int(os.environ.get('BACKUP_KEEP_WEEKLY', 4))
+BACKUP_KEEP_MONTHLY = int(os.environ.get('BACKUP_KEEP_MONTHLY', 12))
+
+SNAPSHOT_FORMAT = '%Y%m%d-%H%M%S'
+SNAPSHOT_NAME = re.compile(r'^\d{8}-\d{6}$')
+MANIFEST = 'manifest.json'
+LOCK_NAME = '.lock'
+# A lock older than this belongs to a dead process and is taken over
+LOCK_STALE_SECONDS = 6 * 3600
+CHUNK_SIZE = 1024 * 1024
+
+_lock = threading.Lock()
+_thread = None
+_last_backup = {}   # 'horario' (unix time) and 'bytes' of the newest snapshot this process wrote
+
+
+class BackupInProgress(Exception):
+    pass
+
+
+def list_snapshots(backup_dir=None):
+    """Complete snapshots as (name, moment), newest first"""
+    backup_dir = backup_dir or BACKUP_DIR
+    if not os.path.isdir(backup_dir):
+        return []
+    snapshots = [(name, datetime.strptime(name, SNAPSHOT_FORMAT)) for name in os.listdir(backup_dir)
+                 if SNAPSHOT_NAME.match(name) and os.path.exists(os.path.join(backup_dir, name, MANIFEST))]
+    return sorted(snapshots, key=lambda item: item[1], reverse=True)
+
+
+def read_manifest(snapshot, backup_dir=None):
+    with open(os.path.join(backup_dir or BACKUP_DIR, snapshot, MANIFEST), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def select_retained(snapshots):
+    """Names to keep: the newest overall plus the newest of each recent day, ISO week and month"""
+    keep = {snapshots[0][0]} if snapshots else set()
+    periods = (
+        (lambda moment: moment.date(), BACKUP_KEEP_DAILY),
+        (lambda moment: moment.isocalendar()[:2], BACKUP_KEEP_WEEKLY),
+        (lambda moment: (moment.year, moment.month), BACKUP_KEEP_MONTHLY),
+    )
+    for period_of, count in periods:
+        seen = set()
+        for name, moment in snapshots:
+            period = period_of(moment)
+            if period in seen:
+                continue
+            if len(seen) >= count:
+                break
+            seen.add(period)
+            keep.add(name)
+    return keep
+
+
+def apply_retention(backup_dir=None):
+    """Delete the snapshots the retention policy no longer keeps; returns their names"""
+    backup_dir = backup_dir or BACKUP_DIR
+    snapshots = list_snapshots(backup_dir)
+    keep = select_retained(snapshots)
+    removed = []
+    for name, _ in snapshots:
+        if name not in keep:
+            shutil.rmtree(os.path.join(backup_dir, name), ignore_errors=True)
+            removed.append(name)
+    return removed
+
+
+def _acquire(backup_dir):
+    """One backup at a time across processes: the lock is a directory (mkdir is atomic)"""
+    os.makedirs(backup_dir, exist_ok=True)
+    lock_path = os.path.join(backup_dir, LOCK_NAME)
+    try:
+        os.mkdir(lock_path)
+    except FileExistsError:
+        if time.time() - os.path.getmtime(lock_path) < LOCK_STALE_SECONDS:
+            raise BackupInProgress(f"backup em andamento em outro processo ({lock_path})")
+        shutil.rmtree(lock_path, ignore_errors=True)
+        os.mkdir(lock_path)
+    # Leftovers of a backup that died half-way
+    for name in os.listdir(backup_dir):
+        if name.endswith('.partial'):
+            shutil.rmtree(os.path.join(backup_dir, name), ignore_errors=True)
+    return lock_path
+
+
+def _table_counts(conn):
+    tables = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+    return {table: conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0] for table in tables}
+
+
+def _copy(source, target_path, name):
+    """Stepwise online backup of an open source connection; returns (pages, longest step in seconds)"""
+    target = sqlite3.connect(target_path)
+    longest = 0.0
+    last = time.perf_counter()
+    pages = 0
+
+    def progress(status, remaining, total):
+        nonlocal last, longest, pages
+        seconds = time.perf_counter() - last
+        observe('chamados_backup_step_seconds', 'arquivo', name, seconds)
+        longest, pages = max(longest, seconds), total
+        time.sleep(BACKUP_STEP_PAUSE_MS / 1000)
+        last = time.perf_counter()
+
+    try:
+        source.backup(target, pages=BACKUP_PAGES_PER_STEP, progress=progress)
+    finally:
+        target.close()
+    return pages, longest
+
+
+def _compress(path, gz_path):
+    """gzip a file in chunks; returns the SHA-256 of the compressed file"""
+    with open(path, 'rb') as src, gzip.open(gz_path, 'wb', compresslevel=BACKUP_COMPRESS_LEVEL) as dst:
+        shutil.copyfileobj(src, dst, CHUNK_SIZE)
+    return _sha256(gz_path)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _backup_file(source, site, path, work_dir):
+    start = time.perf_counter()
+    name = os.path.basename(path)
+    copy_path = os.path.join(work_dir, name)
+    pages, longest = _copy(source, copy_path, name)
+
+    # Checks run on the copy, not on the live file
+    copy = sqlite3.connect(copy_path)
+    try:
+        integrity = copy.execute("PRAGMA integrity_check").fetchone()[0]
+        tables = _table_counts(copy)
+    finally:
+        copy.close()
+    if integrity != 'ok':
+        raise sqlite3.DatabaseError(f"{name}: cópia com integridade comprometida ({integrity})")
+
+    gz_name = name + '.gz'
+    checksum = _compress(copy_path, os.path.join(work_dir, gz_name))
+    size = os.path.getsize(copy_path)
+    os.remove(copy_path)
+    observe('chamados_backup_seconds', 'arquivo', name, time.perf_counter() - start)
+    return {
+        'site': site,
+        'nome': name,
+        'arquivo': gz_name,
+        'paginas': pages,
+        'bytes': size,
+        'bytes_gz': os.path.getsize(os.path.join(work_dir, gz_name)),
+        'sha256': checksum,
+        'tabelas': tables,
+        'maior_passo_ms': round(longest * 1000, 2),
+        'duracao_s': round(time.perf_counter() - start, 2),
+    }
+
+
+def run_backup(backup_dir=None):
+    """Write a new snapshot of every database file, then apply retention; returns its manifest"""
+    backup_dir = backup_dir or BACKUP_DIR
+    lock_path = _acquire(backup_dir)
+    sources = []
+    try:
+        created = get_current_time()
+        snapshot = created.strftime(SNAPSHOT_FORMAT)
+        work_dir = os.path.join(backup_dir, f".{snapshot}.partial")
+        os.mkdir(work_dir)
+        start = time.perf_counter()
+
+        # Pin every file's state before copying any of them, so the snapshot is (nearly) one moment
+        for site, path in get_database_files():
+            if not os.path.exists(path):
+                continue
+            source = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True, isolation_level=None)
+            sources.append((site, path, source))
+            source.execute("BEGIN")
+            source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+
+        files = []
+        for site, path, source in sources:
+            files.append(_backup_file(source, site, path, work_dir))
+            # Done with this file: release its snapshot so the WAL can be checkpointed again
+            source.close()
+
+        manifest = {
+            'criado_em': created.strftime('%Y-%m-%d %H:%M:%S'),
+            'duracao_s': round(time.perf_counter() - start, 2),
+            'arquivos': files,
+        }
+        with open(os.path.join(work_dir, MANIFEST), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.rename(work_dir, os.path.join(backup_dir, snapshot))
+    except Exception:
+        inc('chamados_backups_total', 'resultado', 'falhou')
+        raise
+    finally:
+        for _, _, source in sources:
+            source.close()
+        shutil.rmtree(lock_path, ignore_errors=True)
+
+    inc('chamados_backups_total', 'resultado', 'ok')
+    _last_backup.update(horario=time.time(), bytes=sum(item['bytes_gz'] for item in files))
+    manifest['snapshot'] = snapshot
+    manifest['removidos'] = apply_retention(backup_dir)
+    return manifest
+
+
+def verify_snapshot(snapshot, backup_dir=None, quick=False):
+    """Decompress every file of a snapshot and check it: checksum, integrity_check and row counts.
+
+    Returns one {'nome', 'ok', 'detalhes'} per file.
+    """
+    backup_dir = backup_dir or BACKUP_DIR
+    snapshot_dir = os.path.join(backup_dir, snapshot)
+    manifest = read_manifest(snapshot, backup_dir)
+    results = []
+    with tempfile.TemporaryDirectory(dir=backup_dir, prefix='.verify-') as work_dir:
+        for item in manifest['arquivos']:
+            results.append(_verify_file(item, snapshot_dir, work_dir, quick))
+    return results
+
+
+def _verify_file(item, snapshot_dir, work_dir, quick):
+    gz_path = os.path.join(snapshot_dir, item['arquivo'])
+    if not os.path.exists(gz_path):
+        return {'nome': item['nome'], 'ok': False, 'detalhes': 'arquivo ausente'}
+    if _sha256(gz_path) != item['sha256']:
+        return {'nome': item['nome'], 'ok': False, 'detalhes': 'SHA-256 não confere'}
+
+    path = os.path.join(work_dir, item['nome'])
+    with gzip.open(gz_path, 'rb') as src, open(path, 'wb') as dst:
+        shutil.copyfileobj(src, dst, CHUNK_SIZE)
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        check = conn.execute("PRAGMA quick_check" if quick else "PRAGMA integrity_check").fetchall()
+        tables = _table_counts(conn)
+    finally:
+        conn.close()
+    os.remove(path)
+
+    if check != [('ok',)]:
+        return {'nome': item['nome'], 'ok': False, 'detalhes': '; '.join(row[0] for row in check[:5])}
+    different = sorted(table for table in set(tables) | set(item['tabelas'])
+                       if tables.get(table) != item['tabelas'].get(table))
+    if different:
+        return {'nome': item['nome'], 'ok': False, 'detalhes': f"contagem diferente em: {', '.join(different)}"}
+    return {'nome': item['nome'], 'ok': True,
+            'detalhes': f"{len(tables)} tabela(s), {sum(tables.values())} linha(s)"}
+
+
+def restore_snapshot(snapshot, target_dir, backup_dir=None):
+    """Verify a snapshot and decompress its files into target_dir (never over the live files)"""
+    backup_dir = backup_dir or BACKUP_DIR
+    failed = [result for result in verify_snapshot(snapshot, backup_dir) if not result['ok']]
+    if failed:
+        raise ValueError("backup inválido: " + '; '.join(f"{r['nome']}: {r['detalhes']}" for r in failed))
+
+    manifest = read_manifest(snapshot, backup_dir)
+    live = {os.path.abspath(path) for _, path in get_database_files()}
+    targets = [os.path.join(target_dir, item['nome']) for item in manifest['arquivos']]
+    for path in targets:
+        if os.path.abspath(path) in live:
+            raise ValueError(f"{path} é um banco em uso: restaure em outro diretório")
+        if os.path.exists(path):
+            raise ValueError(f"{path} já existe")
+
+    os.makedirs(target_dir, exist_ok=True)
+    for item, path in zip(manifest['arquivos'], targets):
+        with gzip.open(os.path.join(backup_dir, snapshot, item['arquivo']), 'rb') as src, open(path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+    return targets
+
+
+def _run(schedule):
+    while True:
+        try:
+            slot = last_slot(schedule, get_current_time().replace(tzinfo=None))
+            snapshots = list_snapshots()
+            if slot is not None and (not snapshots or snapshots[0][1] < slot):
+                run_backup()
+        except BackupInProgress:
+            pass
+        except Exception as e:
+            print(f"backup: {type(e).__name__}: {e}", file=sys.stderr)
+        time.sleep(BACKUP_POLL_SECONDS)
+
+
+def start_backups():
+    """Start the backup thread once per process, if BACKUP_ENABLED (processes take turns via the lock)"""
+    global _thread
+    if not BACKUP_ENABLED:
+        return
+    with _lock:
+        if _thread is not None:
+            return
+        _thread = threading.Thread(target=_run, args=(parse_cron(BACKUP_SCHEDULE),), name='db-backup', daemon=True)
+        _thread.start()
+
+
+def _backup_gauges():
+    if not _last_backup:
+        return []
+    return [
+        ('chamados_backup_last_success_timestamp', None, _last_backup['horario']),
+        ('chamados_backup_bytes', None, _last_backup['bytes']),
+    ]
+
+
+register_gauges(_backup_gauges)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Online backups of the SQLite database files')
+    parser.add_argument('--run', action='store_true', help='write a snapshot now')
+    parser.add_argument('--list', action='store_true', help='list the snapshots')
+    parser.add_argument('--verify', nargs='?', const='', metavar='SNAPSHOT',
+                        help='decompress and check a snapshot (the newest if omitted)')
+    parser.add_argument('--quick', action='store_true', help='with --verify: PRAGMA quick_check')
+    parser.add_argument('--restore', metavar='SNAPSHOT', help='verify and decompress a snapshot into --target')
+    parser.add_argument('--target', help='directory for --restore')
+    args = parser.parse_args(argv)
+
+    if args.run:
+        manifest = run_backup()
+        for item in manifest['arquivos']:
+            print(f"{item['nome']}: {item['bytes']} -> {item['bytes_gz']} bytes em {item['duracao_s']} s "
+                  f"(maior passo {item['maior_passo_ms']} ms)")
+        print(f"snapshot {manifest['snapshot']}" + (f", removidos: {', '.join(manifest['removidos'])}"
+                                                   if manifest['removidos'] else ''))
+
+    if args.list:
+        for name, _ in list_snapshots():
+            manifest = read_manifest(name)
+            print(f"{name}: {len(manifest['arquivos'])} arquivo(s), "
+                  f"{sum(item['bytes_gz'] for item in manifest['arquivos'])} bytes")
+
+    status = 0
+    if args.verify is not None:
+        snapshot = args.verify or next(iter(name for name, _ in list_snapshots()), None)
+        if snapshot is None:
+            print("nenhum backup encontrado", file=sys.stderr)
+            return 1
+        for result in verify_snapshot(snapshot, quick=args.quick):
+            print(f"{snapshot}/{result['nome']}: {'ok' if result['ok'] else 'FALHOU'} ({result['detalhes']})")
+            status = status if result['ok'] else 1
+
+    if args.restore:
+        if not args.target:
+            parser.error('--restore requer --target')
+        try:
+            targets = restore_snapshot(args.restore, args.target)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 1
+        for path in targets:
+            print(f"restaurado: {path}")
+        print("Pare a aplicação, substitua os arquivos do banco pelos restaurados e apague os -wal/-shm antigos.")
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,10 +1,12 @@
 import streamlit as st
-import sqlite3
+from components.database import get_connection, queue_notifications, site_for_chamado
+from components.tracing import begin_span, end_span, span
+from components.workload_capture import capture_enabled, capture_module
 from datetime import datetime
 
 def init_chat_table():
     """Initialize chat messages table"""
-    conn = sqlite3.connect('data/chamados.db')
+    conn = get_connection()
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -28,13 +30,14 @@ def send_message(chamado_id, user_id, username, message):
     if not message.strip():
         return False
     
-    conn = sqlite3.connect('data/chamados.db')
+    conn = get_connection(site_for_chamado(chamado_id))
     cursor = conn.cursor()
     
     cursor.execute("""
         INSERT INTO chat_messages (chamado_id, usuario_id, username, mensagem)
         VALUES (?, ?, ?, ?)
     """, (chamado_id, user_id, username, message.strip()))
+    queue_notifications(cursor, chamado_id, 'mensagem', f'Nova mensagem de {username}: {message.strip()[:300]}', user_id)
     
     conn.commit()
     conn.close()
@@ -42,7 +45,7 @@ def send_message(chamado_id, user_id, username, message):
 
 def get_chat_messages(chamado_id):
     """Get all chat messages for a ticket"""
-    conn = sqlite3.connect('data/chamados.db')
+    conn = get_connection(site_for_chamado(chamado_id))
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -61,10 +64,13 @@ def display_chat(chamado_id, current_user):
     st.markdown("### 💬 Chat Interno")
     
     # Initialize chat table if needed
-    init_chat_table()
+    with span('chat.init_chat_table', 'db'):
+        init_chat_table()
     
     # Display messages
-    messages = get_chat_messages(chamado_id)
+    with span('chat.get_chat_messages', 'db', chamado_id=chamado_id):
+        messages = get_chat_messages(chamado_id)
+    render_span = begin_span('chat.render', 'render', mensagens=len(messages))
     
     if messages:
         chat_container = st.container()
@@ -117,6 +123,7 @@ def display_chat(chamado_id, current_user):
                 st.rerun()
             else:
                 st.error("Erro ao enviar mensagem.")
+    end_span(render_span)
 
 def get_unread_messages_count(chamado_id, user_id):
     """Get count of unread messages for a user in a ticket"""
@@ -127,3 +134,7 @@ def mark_messages_as_read(chamado_id, user_id):
     """Mark messages as read for a user"""
     # Implementation for marking messages as read
     pass
+
+# Opt-in workload capture (WORKLOAD_CAPTURE), as in components.database
+if capture_enabled():
+    capture_module(globals(), exclude=('display_chat',))
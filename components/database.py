@@ -1,9 +1,202 @@
 import sqlite3
 import os
+import json
+import re
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-import hashlib
 import pytz
 
+from components.metrics import count_connections, instrument_module, register_gauges
+from components.password_hashing import hash_password
+from components.query_log import ProfilingConnection, profiling_enabled
+from components.session_tokens import SESSION_TTL_HOURS, invalidate_user
+from components.sla_policy import calculate_deadline, extend_deadline, get_sla_policy, load_sla_policies
+from components.workload_capture import capture_enabled, capture_module
+
+# Path of the SQLite database (override with CHAMADOS_DB_PATH, e.g. for benchmarks)
+DB_PATH = os.environ.get('CHAMADOS_DB_PATH', os.path.join('data', 'chamados.db'))
+# Seconds a connection waits on a locked database before raising 'database is locked'
+DB_BUSY_TIMEOUT = float(os.environ.get('CHAMADOS_DB_BUSY_TIMEOUT', 10))
+# Requester of the tickets opened from monitoring alerts (created inactive, cannot log in)
+ALERT_USERNAME = os.environ.get('ALERT_USERNAME', 'monitoramento')
+# Author of the history entries of automatic assignments (created inactive, cannot log in)
+AUTO_ASSIGN_USERNAME = os.environ.get('AUTO_ASSIGN_USERNAME', 'atribuicao.automatica')
+
+# Site-partitioned storage: 'unit=sector,sector;unit=sector' gives each clinic unit its own tickets
+# file next to DB_PATH (empty = everything in DB_PATH). Append new units at the end: a unit's
+# position is part of its ticket ids
+CHAMADOS_SITES = os.environ.get('CHAMADOS_SITES', '')
+# Ticket ids end in their unit's position (1-9), so an id routes to its file without a lookup
+SITE_ID_STRIDE = 10
+
+# Callbacks notified with a ticket id after a write to that ticket commits
+_chamado_listeners = []
+# Unit -> increments of its 'chamados_linhas' counter made by this process's own writes
+_own_ticket_changes = {}
+_own_ticket_lock = threading.Lock()
+
+def _parse_sites(spec):
+    """Unit name -> tuple of its sectors, in configuration order"""
+    sites = {}
+    for item in spec.split(';'):
+        name, _, setores = item.partition('=')
+        name = name.strip()
+        if not name:
+            continue
+        if not re.fullmatch(r'[\w-]+', name):
+            raise ValueError(f"nome de unidade inválido em CHAMADOS_SITES: {name!r}")
+        sites[name] = tuple(setor.strip() for setor in setores.split(',') if setor.strip())
+    if len(sites) >= SITE_ID_STRIDE:
+        raise ValueError(f"CHAMADOS_SITES aceita no máximo {SITE_ID_STRIDE - 1} unidades")
+    return sites
+
+SITES = _parse_sites(CHAMADOS_SITES)
+_SITE_OF_SETOR = {setor: site for site, setores in SITES.items() for setor in setores}
+_SITE_NAMES = list(SITES)
+_fan_out_executor = None
+_fan_out_lock = threading.Lock()
+
+def _site_path(site):
+    """data/chamados.db -> data/chamados_<unit>.db"""
+    root, ext = os.path.splitext(DB_PATH)
+    return f"{root}_{site}{ext}"
+
+def get_connection(site=None):
+    """Open a connection to the tickets database (statements profiled unless SLOW_QUERY_MS < 0).
+
+    With a unit, the connection opens that unit's tickets file and attaches the
+    central one: ticket tables resolve to the unit, users, outbox and jobs to
+    the central file, so the same SQL works in both storage modes.
+    """
+    factory = ProfilingConnection if profiling_enabled() else sqlite3.Connection
+    if site is None:
+        return sqlite3.connect(DB_PATH, timeout=DB_BUSY_TIMEOUT, factory=factory)
+    conn = sqlite3.connect(_site_path(site), timeout=DB_BUSY_TIMEOUT, factory=factory)
+    conn.execute("ATTACH DATABASE ? AS central", (DB_PATH,))
+    return conn
+
+def site_for_setor(setor):
+    """Unit holding the tickets of a sector (unlisted sectors go to the first unit; None = single file)"""
+    if not SITES:
+        return None
+    return _SITE_OF_SETOR.get(setor, _SITE_NAMES[0])
+
+def site_for_chamado(chamado_id):
+    """Unit holding a ticket, from the last digit of its id (None = single file)"""
+    if not SITES:
+        return None
+    position = int(chamado_id) % SITE_ID_STRIDE
+    return _SITE_NAMES[position - 1] if 0 < position <= len(_SITE_NAMES) else _SITE_NAMES[0]
+
+def query_sites(setor=None, site=None):
+    """Units a ticket query has to read: the given unit, the sector's unit, or all of them"""
+    if not SITES:
+        return [None]
+    if site:
+        return [site]
+    if setor:
+        return [site_for_setor(setor)]
+    return list(_SITE_NAMES)
+
+def get_database_files():
+    """(unit, path) of every database file, the central one (unit None) first"""
+    return [(None, DB_PATH)] + [(site, _site_path(site)) for site in _SITE_NAMES]
+
+def _fan_out(fn, sites):
+    """fn(site) for every unit, in parallel when there are several; results in the order of sites"""
+    if len(sites) <= 1:
+        return [fn(site) for site in sites]
+    global _fan_out_executor
+    with _fan_out_lock:
+        if _fan_out_executor is None:
+            _fan_out_executor = ThreadPoolExecutor(max_workers=len(_SITE_NAMES), thread_name_prefix='site-query')
+    return list(_fan_out_executor.map(fn, sites))
+
+def _ids_by_site(chamado_ids):
+    """Ticket ids grouped by the unit holding them (None = every open ticket of every unit)"""
+    if chamado_ids is None:
+        return {site: None for site in query_sites()}
+    groups = {}
+    for chamado_id in chamado_ids:
+        groups.setdefault(site_for_chamado(chamado_id), []).append(chamado_id)
+    return groups
+
+def _new_chamado_ids(site, count=1):
+    """Ids for new tickets: None (autoincrement) in a single file, else the unit's next ids.
+
+    Units draw from a sequence in the central file, in a short transaction of its own
+    taken before the ticket write; an id is never reused, even when its ticket is
+    rolled back or deleted.
+    """
+    if site is None or not count:
+        return [None] * count
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("UPDATE chamado_sequencias SET ultimo = ultimo + ? WHERE site = ?", (count, site))
+    cursor.execute("SELECT ultimo FROM chamado_sequencias WHERE site = ?", (site,))
+    ultimo = cursor.fetchone()[0]
+    conn.commit()
+    conn.close()
+    position = _SITE_NAMES.index(site) + 1
+    return [bloco * SITE_ID_STRIDE + position for bloco in range(ultimo - count + 1, ultimo + 1)]
+
+def _ensure_column(cursor, table, column, definition):
+    """Add a column to an existing table if it is missing (lightweight migration)"""
+    cursor.execute(f"PRAGMA table_info({table})")
+    if column not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+def register_chamado_listener(callback):
+    """Register a callback invoked with the ticket id whenever a ticket changes"""
+    if callback not in _chamado_listeners:
+        _chamado_listeners.append(callback)
+
+def _notify_chamado_changed(chamado_id):
+    """Notify listeners that a ticket changed (listener errors never break the write)"""
+    for callback in list(_chamado_listeners):
+        try:
+            callback(chamado_id)
+        except Exception:
+            pass
+
+def _ticket_counter(cursor):
+    """Current 'chamados_linhas' counter of the connection's file"""
+    cursor.execute("SELECT versao FROM config_versoes WHERE nome = 'chamados_linhas'")
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+def _begin_ticket_write(cursor):
+    """Start a ticket write holding the ticket file's write lock; returns the 'chamados_linhas' counter before it.
+
+    BEGIN IMMEDIATE would write-lock the attached central file too, serializing every
+    unit: a first (no-op) write to main locks the unit's file only. Central tables
+    (the outbox) are written last, so their lock is held just until the commit.
+    """
+    cursor.execute("BEGIN")
+    cursor.execute("UPDATE main.config_versoes SET versao = versao WHERE nome = 'chamados_linhas'")
+    return _ticket_counter(cursor)
+
+def _commit_ticket_write(conn, site, before):
+    """Commit a write begun with _begin_ticket_write and record its counter increments as our own.
+
+    The write lock is held since the start, so every increment since `before` is this write's.
+    """
+    changes = _ticket_counter(conn.cursor()) - before
+    conn.commit()
+    with _own_ticket_lock:
+        _own_ticket_changes[site] = _own_ticket_changes.get(site, 0) + changes
+
+def _external_ticket_version(cursor, site):
+    """'chamados_linhas' counter of a file minus the increments this process made itself.
+
+    Our own tally is read first: a write committing in between can then only cause a spurious change.
+    """
+    with _own_ticket_lock:
+        own = _own_ticket_changes.get(site, 0)
+    return _ticket_counter(cursor) - own
+
 # Helper function to get current time in 'America/Porto_Velho' timezone
 def get_current_time():
     timezone = pytz.timezone('America/Porto_Velho')
@@ -13,33 +206,27 @@ def get_current_time():
 def get_current_time_str():
     return get_current_time().strftime('%Y-%m-%d %H:%M:%S')
 
-def hash_password(password):
-    """Hash a password using SHA-256"""
-    return hashlib.sha256(password.encode()).hexdigest()
-
-def init_database():
-    """Initialize the SQLite database with all required tables"""
-    # Create data directory if it doesn't exist
-    os.makedirs('data', exist_ok=True)
-
-    conn = sqlite3.connect('data/chamados.db')
-    cursor = conn.cursor()
-
-    # Create usuarios table
+def _track_versions(cursor, nome, tables, trigger_prefix='trg'):
+    """Version counter `nome` in config_versoes, bumped by triggers on every write to the tables"""
     cursor.execute("""
-        CREATE TABLE IF NOT EXISTS usuarios (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            nome_completo TEXT NOT NULL,
-            email TEXT,
-            role TEXT NOT NULL CHECK (role IN ('Colaborador', 'Técnico', 'Administrador', 'Diretoria')),
-            setor TEXT NOT NULL,
-            ativo BOOLEAN DEFAULT 1,
-            data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        CREATE TABLE IF NOT EXISTS config_versoes (
+            nome TEXT PRIMARY KEY,
+            versao INTEGER NOT NULL DEFAULT 0
         )
     """)
-
+    cursor.execute("INSERT OR IGNORE INTO config_versoes (nome, versao) VALUES (?, 0)", (nome,))
+    for table in tables:
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {trigger_prefix}_{table}_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE config_versoes SET versao = versao + 1 WHERE nome = '{nome}';
+                END
+            """)
+
+def _create_ticket_tables(cursor):
+    """Tables owned by tickets: the whole schema of a unit's file, and part of the central one"""
     # Create chamados table
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS chamados (
@@ -94,6 +281,211 @@ def init_database():
         )
     """)
 
+    # Create sla_alerts table (state transitions written by the SLA monitor)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sla_alerts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chamado_id INTEGER NOT NULL,
+            tipo TEXT NOT NULL CHECK (tipo IN ('critico', 'vencido', 'nao_atribuido')),
+            ativo BOOLEAN NOT NULL DEFAULT 1,
+            prazo TIMESTAMP,
+            data_disparo TIMESTAMP NOT NULL,
+            data_encerramento TIMESTAMP,
+            FOREIGN KEY (chamado_id) REFERENCES chamados (id)
+        )
+    """)
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_sla_alerts_ativos
+        ON sla_alerts (tipo, chamado_id) WHERE ativo = 1
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chamados_status ON chamados (status)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chamados_abertura ON chamados (data_abertura)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chamados_solicitante ON chamados (solicitante_id, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chamados_tecnico ON chamados (tecnico_id, status)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_historico_chamado ON historico_chamados (chamado_id, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_chamado ON chat_messages (chamado_id, data_criacao)")
+
+    # Create alertas_agrupados table (alert fingerprint -> ticket it is coalesced into)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS alertas_agrupados (
+            fingerprint TEXT PRIMARY KEY,
+            chamado_id INTEGER NOT NULL,
+            origem TEXT,
+            ocorrencias INTEGER NOT NULL DEFAULT 0,
+            primeira_ocorrencia TIMESTAMP NOT NULL,
+            ultima_ocorrencia TIMESTAMP NOT NULL,
+            FOREIGN KEY (chamado_id) REFERENCES chamados (id)
+        )
+    """)
+
+    # Create sla_pausas table (periods a ticket spent waiting on the requester)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sla_pausas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chamado_id INTEGER NOT NULL,
+            usuario_id INTEGER NOT NULL,
+            motivo TEXT,
+            inicio TIMESTAMP NOT NULL,
+            fim TIMESTAMP,
+            FOREIGN KEY (chamado_id) REFERENCES chamados (id),
+            FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sla_pausas_chamado ON sla_pausas (chamado_id, fim)")
+
+    # Set while the ticket waits on the requester (SLA clock paused)
+    _ensure_column(cursor, 'chamados', 'sla_pausado_em', 'TIMESTAMP')
+    # Row version for optimistic concurrency: every UPDATE of a ticket increments it
+    _ensure_column(cursor, 'chamados', 'versao', 'INTEGER NOT NULL DEFAULT 1')
+
+    # 'chamados' covers tickets, their history and chat (ETags of the JSON API)
+    _track_versions(cursor, 'chamados', ['chamados', 'historico_chamados', 'chat_messages'])
+    # Ticket rows only: history and chat writes leave it alone (see get_ticket_version)
+    _track_versions(cursor, 'chamados_linhas', ['chamados'], trigger_prefix='trg_linhas')
+
+def init_database():
+    """Initialize the SQLite database with all required tables"""
+    # Create data directory if it doesn't exist
+    os.makedirs(os.path.dirname(DB_PATH) or '.', exist_ok=True)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    # Free pages are released online in small steps by components.maintenance (new files only)
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    # WAL lets the background workers write while pages keep reading
+    cursor.execute("PRAGMA journal_mode=WAL")
+
+    # Create usuarios table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS usuarios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            nome_completo TEXT NOT NULL,
+            email TEXT,
+            role TEXT NOT NULL CHECK (role IN ('Colaborador', 'Técnico', 'Administrador', 'Diretoria')),
+            setor TEXT NOT NULL,
+            ativo BOOLEAN DEFAULT 1,
+            data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Tickets and everything attached to them (in partitioned mode these stay empty here)
+    _create_ticket_tables(cursor)
+
+    # Create notificacoes table (outbox written with the change; sent by components.notifications)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS notificacoes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            destinatario_id INTEGER NOT NULL,
+            chamado_id INTEGER,
+            tipo TEXT NOT NULL,
+            mensagem TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'Pendente' CHECK (status IN ('Pendente', 'Enviada', 'Falhou')),
+            tentativas INTEGER NOT NULL DEFAULT 0,
+            proxima_tentativa TIMESTAMP NOT NULL,
+            lote TEXT,
+            erro TEXT,
+            data_criacao TIMESTAMP NOT NULL,
+            data_envio TIMESTAMP,
+            FOREIGN KEY (destinatario_id) REFERENCES usuarios (id),
+            FOREIGN KEY (chamado_id) REFERENCES chamados (id)
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_notificacoes_pendentes
+        ON notificacoes (proxima_tentativa) WHERE status = 'Pendente'
+    """)
+
+    # Create chamado_sequencias table (last id block handed out per unit: id = ultimo * SITE_ID_STRIDE + position)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS chamado_sequencias (
+            site TEXT PRIMARY KEY,
+            ultimo INTEGER NOT NULL
+        )
+    """)
+
+    # Create sessions table (persistent logins; only a hash of the token id is stored)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_key TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            data_criacao TIMESTAMP NOT NULL,
+            data_expiracao TIMESTAMP NOT NULL,
+            revogada BOOLEAN NOT NULL DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES usuarios (id)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions (user_id)")
+
+    # Create sla_policies table (setor '*' applies to every sector)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sla_policies (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            setor TEXT NOT NULL DEFAULT '*',
+            prioridade TEXT NOT NULL CHECK (prioridade IN ('Alta', 'Média', 'Baixa')),
+            horas_resolucao REAL NOT NULL CHECK (horas_resolucao > 0),
+            horario_comercial BOOLEAN NOT NULL DEFAULT 0,
+            pausa_aguardando_solicitante BOOLEAN NOT NULL DEFAULT 1,
+            ativo BOOLEAN NOT NULL DEFAULT 1,
+            data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (setor, prioridade)
+        )
+    """)
+
+    # Create jobs table (background exports/reports run by the worker pool)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tipo TEXT NOT NULL,
+            parametros TEXT NOT NULL DEFAULT '{}',
+            status TEXT NOT NULL DEFAULT 'Pendente'
+                CHECK (status IN ('Pendente', 'Executando', 'Concluído', 'Falhou', 'Cancelado')),
+            progresso INTEGER NOT NULL DEFAULT 0,
+            total INTEGER,
+            mensagem TEXT,
+            cancelar BOOLEAN NOT NULL DEFAULT 0,
+            resultado_path TEXT,
+            resultado_nome TEXT,
+            resultado_mime TEXT,
+            solicitante_id INTEGER NOT NULL,
+            data_criacao TIMESTAMP NOT NULL,
+            data_inicio TIMESTAMP,
+            data_fim TIMESTAMP,
+            FOREIGN KEY (solicitante_id) REFERENCES usuarios (id)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_solicitante ON jobs (solicitante_id, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)")
+
+    # Create reports table (scheduled KPI snapshots and export files, see components.report_scheduler)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS reports (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL,
+            agendado_para TIMESTAMP NOT NULL,
+            status TEXT NOT NULL DEFAULT 'Gerando' CHECK (status IN ('Gerando', 'Concluído', 'Falhou')),
+            dados TEXT,
+            arquivos TEXT NOT NULL DEFAULT '[]',
+            mensagem TEXT,
+            data_inicio TIMESTAMP NOT NULL,
+            data_fim TIMESTAMP,
+            UNIQUE (nome, agendado_para)
+        )
+    """)
+
+    # Version counters bumped by triggers, so in-memory caches can detect changes cheaply
+    _track_versions(cursor, 'sla_policies', ['sla_policies'])
+
+    # Seed the historical targets: 4h / 24h / 72h around the clock
+    cursor.execute("SELECT COUNT(*) FROM sla_policies")
+    if cursor.fetchone()[0] == 0:
+        cursor.executemany("""
+            INSERT INTO sla_policies (setor, prioridade, horas_resolucao)
+            VALUES ('*', ?, ?)
+        """, [('Alta', 4), ('Média', 24), ('Baixa', 72)])
+
     # Create default users if they don't exist
     default_users = [
         ('admin', 'admin123', 'Administrador Sistema', 'admin@empresa.com', 'Administrador', 'TI'),
@@ -111,33 +503,71 @@ def init_database():
                 VALUES (?, ?, ?, ?, ?, ?)
             """, (username, password_hash, nome, email, role, setor))
 
+    # '!' never verifies, so the alert requester and the assignment engine cannot log in
+    cursor.executemany("""
+        INSERT OR IGNORE INTO usuarios (username, password_hash, nome_completo, email, role, setor, ativo)
+        VALUES (?, '!', ?, NULL, 'Colaborador', 'TI', 0)
+    """, [(ALERT_USERNAME, 'Monitoramento (alertas)'), (AUTO_ASSIGN_USERNAME, 'Atribuição automática')])
+
     conn.commit()
     conn.close()
 
-def calculate_sla_deadline(prioridade):
-    """Calculate SLA deadline based on priority"""
-    if prioridade == 'Alta':
-        sla_hours = 4
-    elif prioridade == 'Média':
-        sla_hours = 24
-    else:  # Baixa
-        sla_hours = 72
-    
-    sla_prazo = get_current_time() + timedelta(hours=sla_hours)
-    return sla_prazo
+    # Each unit's tickets file carries only the ticket tables
+    for site in SITES:
+        conn = get_connection(site)
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        cursor.execute("PRAGMA journal_mode=WAL")
+        _create_ticket_tables(cursor)
+        # Never behind the unit's tickets (e.g. central restored from an older backup)
+        cursor.execute(f"""
+            INSERT INTO central.chamado_sequencias (site, ultimo)
+            SELECT ?, COALESCE(MAX(id), 0) / {SITE_ID_STRIDE} FROM main.chamados WHERE 1
+            ON CONFLICT (site) DO UPDATE SET ultimo = MAX(ultimo, excluded.ultimo)
+        """, (site,))
+        conn.commit()
+        conn.close()
+
+    # Compile the SLA policies into the in-memory lookup
+    load_sla_policies()
+
+def calculate_sla_deadline(prioridade, setor=None, abertura=None):
+    """Calculate SLA deadline from the compiled SLA policies (no database access)"""
+    return calculate_deadline(abertura or get_current_time(), prioridade, setor)
+
+def queue_notifications(cursor, chamado_id, tipo, mensagem, actor_id=None):
+    """Outbox rows for the ticket's requester and technician (except the actor), in the caller's transaction.
+
+    Call it last: with units, the outbox is in the central file and its write lock is
+    held from here to the commit. WAL does not make a commit across attached files
+    atomic either, so a crash in between can lose these rows or keep them for a
+    ticket write that did not land (the dispatcher sends those without a title).
+    """
+    now = get_current_time_str()
+    cursor.execute("""
+        INSERT INTO notificacoes (destinatario_id, chamado_id, tipo, mensagem, proxima_tentativa, data_criacao)
+        SELECT u.id, c.id, ?, ?, ?, ?
+        FROM chamados c
+        JOIN usuarios u ON u.id IN (c.solicitante_id, c.tecnico_id)
+        WHERE c.id = ? AND u.id != ? AND u.ativo = 1
+    """, (tipo, mensagem, now, now, chamado_id, actor_id if actor_id is not None else -1))
 
 def create_chamado(titulo, descricao, setor_origem, prioridade, solicitante_id, solicitante_nome, observacoes=None):
-    """Create a new ticket"""
-    conn = sqlite3.connect('data/chamados.db')
+    """Create a new ticket (in the file of the sector's unit)"""
+    site = site_for_setor(setor_origem)
+    new_id, = _new_chamado_ids(site)
+    conn = get_connection(site)
     cursor = conn.cursor()
+    before = _begin_ticket_write(cursor)
 
-    sla_prazo = calculate_sla_deadline(prioridade)
-    data_abertura = get_current_time_str()
+    abertura = get_current_time()
+    data_abertura = abertura.strftime('%Y-%m-%d %H:%M:%S')
+    sla_prazo = calculate_sla_deadline(prioridade, setor_origem, abertura).strftime('%Y-%m-%d %H:%M:%S')
 
     cursor.execute("""
-        INSERT INTO chamados (titulo, descricao, setor_origem, prioridade, solicitante_id, solicitante_nome, observacoes, sla_prazo, data_abertura)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (titulo, descricao, setor_origem, prioridade, solicitante_id, solicitante_nome, observacoes, sla_prazo, data_abertura))
+        INSERT INTO chamados (id, titulo, descricao, setor_origem, prioridade, solicitante_id, solicitante_nome, observacoes, sla_prazo, data_abertura)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (new_id, titulo, descricao, setor_origem, prioridade, solicitante_id, solicitante_nome, observacoes, sla_prazo, data_abertura))
 
     chamado_id = cursor.lastrowid
 
@@ -147,16 +577,14 @@ def create_chamado(titulo, descricao, setor_origem, prioridade, solicitante_id,
         VALUES (?, ?, ?, ?, ?)
     """, (chamado_id, solicitante_id, solicitante_nome, 'Criação', f'Chamado criado com prioridade {prioridade}'))
 
-    conn.commit()
+    _commit_ticket_write(conn, site, before)
     conn.close()
 
+    _notify_chamado_changed(chamado_id)
     return chamado_id
 
 def get_chamados(filters=None):
-    """Get tickets with optional filters"""
-    conn = sqlite3.connect('data/chamados.db')
-    cursor = conn.cursor()
-
+    """Get tickets with optional filters (a 'site' or 'setor' filter reads only that unit's file)"""
     query = """
         SELECT id, titulo, descricao, setor_origem, prioridade, status, 
                solicitante_nome, tecnico_nome, data_abertura, data_resolucao, sla_prazo
@@ -184,15 +612,23 @@ def get_chamados(filters=None):
 
     query += " ORDER BY data_abertura DESC"
 
-    cursor.execute(query, params)
-    chamados = cursor.fetchall()
-    conn.close()
+    def read(site):
+        conn = get_connection(site)
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        chamados = cursor.fetchall()
+        conn.close()
+        return chamados
 
-    return chamados
+    filters = filters or {}
+    partitions = _fan_out(read, query_sites(filters.get('setor'), filters.get('site')))
+    if len(partitions) == 1:
+        return partitions[0]
+    return list(heapq.merge(*partitions, key=lambda row: row[8] or '', reverse=True))
 
 def get_chamado_by_id(chamado_id):
     """Get a specific ticket by ID"""
-    conn = sqlite3.connect('data/chamados.db')
+    conn = get_connection(site_for_chamado(chamado_id))
     cursor = conn.cursor()
 
     cursor.execute("""
@@ -204,78 +640,142 @@ def get_chamado_by_id(chamado_id):
 
     return chamado
 
-def update_chamado_status(chamado_id, new_status, user_id, user_name, detalhes=None):
-    """Update ticket status"""
-    conn = sqlite3.connect('data/chamados.db')
+def get_chamado_versions(filters=None):
+    """Current row version of each ticket matching the get_chamados filters: {id: versao}.
+
+    Read it before the tickets themselves, so a change in between surfaces as a
+    conflict instead of being overwritten.
+    """
+    query = "SELECT id, versao FROM chamados WHERE 1=1"
+    params = []
+    for key, column in (('status', 'status'), ('prioridade', 'prioridade'), ('setor', 'setor_origem'),
+                        ('solicitante_id', 'solicitante_id'), ('tecnico_id', 'tecnico_id')):
+        if filters and filters.get(key):
+            query += f" AND {column} = ?"
+            params.append(filters[key])
+
+    def read(site):
+        conn = get_connection(site)
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        versions = dict(cursor.fetchall())
+        conn.close()
+        return versions
+
+    filters = filters or {}
+    versions = {}
+    for partition in _fan_out(read, query_sites(filters.get('setor'), filters.get('site'))):
+        versions.update(partition)
+    return versions
+
+def update_chamado_status(chamado_id, new_status, user_id, user_name, detalhes=None, expected_version=None):
+    """Update ticket status; returns False if the ticket changed since expected_version was read"""
+    site = site_for_chamado(chamado_id)
+    conn = get_connection(site)
     cursor = conn.cursor()
+    before = _begin_ticket_write(cursor)
 
-    update_fields = ["status = ?"]
+    update_fields = ["status = ?", "versao = versao + 1"]
     params = [new_status]
 
     if new_status == 'Resolvido':
         update_fields.append("data_resolucao = ?")
         params.append(get_current_time_str())
 
+    query = f"UPDATE chamados SET {', '.join(update_fields)} WHERE id = ?"
     params.append(chamado_id)
+    if expected_version is not None:
+        query += " AND versao = ?"
+        params.append(expected_version)
 
-    cursor.execute(f"""
-        UPDATE chamados 
-        SET {', '.join(update_fields)}
-        WHERE id = ?
-    """, params)
+    cursor.execute(query, params)
+    if not cursor.rowcount:
+        conn.rollback()
+        conn.close()
+        return False
+
+    if new_status in ('Resolvido', 'Cancelado'):
+        # Close a pending SLA pause so the final deadline accounts for it
+        _resume_sla(cursor, chamado_id, user_id, user_name)
 
     # Add to history
     cursor.execute("""
         INSERT INTO historico_chamados (chamado_id, usuario_id, usuario_nome, acao, detalhes)
         VALUES (?, ?, ?, ?, ?)
     """, (chamado_id, user_id, user_name, f'Status alterado para {new_status}', detalhes))
+    queue_notifications(cursor, chamado_id, 'status',
+                        f'Status alterado para {new_status} por {user_name}' + (f': {detalhes}' if detalhes else ''),
+                        user_id)
 
-    conn.commit()
+    _commit_ticket_write(conn, site, before)
     conn.close()
 
-def assign_technician(chamado_id, tecnico_id, tecnico_nome, user_id, user_name):
-    """Assign a technician to a ticket"""
-    conn = sqlite3.connect('data/chamados.db')
+    _notify_chamado_changed(chamado_id)
+    return True
+
+def assign_technician(chamado_id, tecnico_id, tecnico_nome, user_id, user_name, expected_version=None):
+    """Assign a technician to a ticket; returns False if the ticket changed since expected_version was read"""
+    site = site_for_chamado(chamado_id)
+    conn = get_connection(site)
     cursor = conn.cursor()
+    before = _begin_ticket_write(cursor)
 
-    cursor.execute("""
-        UPDATE chamados 
-        SET tecnico_id = ?, tecnico_nome = ?, data_atribuicao = ?, status = 'Em Andamento'
+    query = """
+        UPDATE chamados
+        SET tecnico_id = ?, tecnico_nome = ?, data_atribuicao = ?, status = 'Em Andamento', versao = versao + 1
         WHERE id = ?
-    """, (tecnico_id, tecnico_nome, get_current_time_str(), chamado_id))
+    """
+    params = [tecnico_id, tecnico_nome, get_current_time_str(), chamado_id]
+    if expected_version is not None:
+        query += " AND versao = ?"
+        params.append(expected_version)
+
+    cursor.execute(query, params)
+    if not cursor.rowcount:
+        conn.rollback()
+        conn.close()
+        return False
 
     # Add to history
     cursor.execute("""
         INSERT INTO historico_chamados (chamado_id, usuario_id, usuario_nome, acao, detalhes)
         VALUES (?, ?, ?, ?, ?)
     """, (chamado_id, user_id, user_name, 'Atribuição', f'Chamado atribuído para {tecnico_nome}'))
+    queue_notifications(cursor, chamado_id, 'atribuicao', f'Chamado atribuído para {tecnico_nome}', user_id)
 
-    conn.commit()
+    _commit_ticket_write(conn, site, before)
     conn.close()
 
-def get_quick_stats():
-    """Get quick statistics for dashboard"""
-    conn = sqlite3.connect('data/chamados.db')
-    cursor = conn.cursor()
+    _notify_chamado_changed(chamado_id)
+    return True
 
-    # Total tickets
-    cursor.execute("SELECT COUNT(*) FROM chamados")
-    total = cursor.fetchone()[0]
+def get_quick_stats(site=None):
+    """Get quick statistics for dashboard (one unit, or every unit read in parallel)"""
+    def read(site):
+        conn = get_connection(site)
+        cursor = conn.cursor()
 
-    # Pending tickets
-    cursor.execute("SELECT COUNT(*) FROM chamados WHERE status = 'Pendente'")
-    pendentes = cursor.fetchone()[0]
+        # Total tickets
+        cursor.execute("SELECT COUNT(*) FROM chamados")
+        total = cursor.fetchone()[0]
 
-    # In progress tickets
-    cursor.execute("SELECT COUNT(*) FROM chamados WHERE status = 'Em Andamento'")
-    em_andamento = cursor.fetchone()[0]
+        # Pending tickets
+        cursor.execute("SELECT COUNT(*) FROM chamados WHERE status = 'Pendente'")
+        pendentes = cursor.fetchone()[0]
 
-    # Resolved tickets
-    cursor.execute("SELECT COUNT(*) FROM chamados WHERE status = 'Resolvido'")
-    resolvidos = cursor.fetchone()[0]
+        # In progress tickets
+        cursor.execute("SELECT COUNT(*) FROM chamados WHERE status = 'Em Andamento'")
+        em_andamento = cursor.fetchone()[0]
 
-    conn.close()
+        # Resolved tickets
+        cursor.execute("SELECT COUNT(*) FROM chamados WHERE status = 'Resolvido'")
+        resolvidos = cursor.fetchone()[0]
+
+        conn.close()
+        return total, pendentes, em_andamento, resolvidos
 
+    total, pendentes, em_andamento, resolvidos = (sum(column) for column in
+                                                  zip(*_fan_out(read, query_sites(site=site))))
     return {
         'total': total,
         'pendentes': pendentes,
@@ -283,85 +783,258 @@ def get_quick_stats():
         'resolvidos': resolvidos
     }
 
-def get_analytics_data():
-    """Get data for analytics dashboard"""
-    conn = sqlite3.connect('data/chamados.db')
+def _merge_counts(partitions):
+    """Add up (key, count) rows of several units"""
+    counts = {}
+    for rows in partitions:
+        for key, count in rows:
+            counts[key] = counts.get(key, 0) + count
+    return counts
+
+def get_analytics_data(site=None):
+    """Get data for analytics dashboard (one unit, or every unit read in parallel and merged)"""
+    def read(site):
+        conn = get_connection(site)
+        cursor = conn.cursor()
+
+        # Tickets by priority
+        cursor.execute("""
+            SELECT prioridade, COUNT(*) as count
+            FROM chamados
+            GROUP BY prioridade
+        """)
+        tickets_by_priority = cursor.fetchall()
+
+        # Tickets by status
+        cursor.execute("""
+            SELECT status, COUNT(*) as count
+            FROM chamados
+            GROUP BY status
+        """)
+        tickets_by_status = cursor.fetchall()
+
+        # Tickets by sector
+        cursor.execute("""
+            SELECT setor_origem, COUNT(*) as count
+            FROM chamados
+            GROUP BY setor_origem
+        """)
+        tickets_by_sector = cursor.fetchall()
+
+        # Technician performance (sums, so the averages of several units can be merged)
+        cursor.execute("""
+            SELECT tecnico_nome, COUNT(*) as total_chamados,
+                   SUM(julianday(data_resolucao) - julianday(data_abertura)),
+                   COUNT(julianday(data_resolucao) - julianday(data_abertura))
+            FROM chamados
+            WHERE tecnico_nome IS NOT NULL AND status = 'Resolvido'
+            GROUP BY tecnico_nome
+        """)
+        technician_performance = cursor.fetchall()
+
+        # Tickets over time (last 30 days)
+        cursor.execute("""
+            SELECT DATE(data_abertura) as date, COUNT(*) as count
+            FROM chamados
+            WHERE data_abertura >= date('now', '-30 days')
+            GROUP BY DATE(data_abertura)
+        """)
+        tickets_over_time = cursor.fetchall()
+
+        conn.close()
+        return tickets_by_priority, tickets_by_status, tickets_by_sector, technician_performance, tickets_over_time
+
+    by_priority, by_status, by_sector, performance, over_time = zip(*_fan_out(read, query_sites(site=site)))
+
+    technicians = {}
+    for rows in performance:
+        for tecnico_nome, total, days, resolved in rows:
+            merged = technicians.setdefault(tecnico_nome, [0, 0.0, 0])
+            merged[0] += total
+            merged[1] += days or 0.0
+            merged[2] += resolved
+    technician_performance = sorted(
+        ((tecnico_nome, total, days / resolved if resolved else None)
+         for tecnico_nome, (total, days, resolved) in technicians.items()),
+        key=lambda row: row[1], reverse=True)
+
+    return {
+        'by_priority': sorted(_merge_counts(by_priority).items()),
+        'by_status': sorted(_merge_counts(by_status).items()),
+        'by_sector': sorted(_merge_counts(by_sector).items(), key=lambda row: row[1], reverse=True),
+        'technician_performance': technician_performance,
+        'over_time': sorted(_merge_counts(over_time).items())
+    }
+
+def get_usuarios():
+    """Get all users"""
+    conn = get_connection()
     cursor = conn.cursor()
 
-    # Tickets by priority
     cursor.execute("""
-        SELECT prioridade, COUNT(*) as count
-        FROM chamados
-        GROUP BY prioridade
+        SELECT id, username, nome_completo, email, role, setor, ativo
+        FROM usuarios
+        ORDER BY nome_completo
     """)
-    tickets_by_priority = cursor.fetchall()
 
-    # Tickets by status
-    cursor.execute("""
-        SELECT status, COUNT(*) as count
-        FROM chamados
-        GROUP BY status
-    """)
-    tickets_by_status = cursor.fetchall()
+    users = cursor.fetchall()
+    conn.close()
+    return users
+
+def get_user_credentials(username):
+    """Get the login record of an active user (id, username, password_hash, role, setor)"""
+    conn = get_connection()
+    cursor = conn.cursor()
 
-    # Tickets by sector
     cursor.execute("""
-        SELECT setor_origem, COUNT(*) as count
-        FROM chamados
-        GROUP BY setor_origem
-        ORDER BY count DESC
-    """)
-    tickets_by_sector = cursor.fetchall()
+        SELECT id, username, password_hash, role, setor
+        FROM usuarios 
+        WHERE username = ? AND ativo = 1
+    """, (username,))
+
+    user = cursor.fetchone()
+    conn.close()
+    return user
+
+def update_password_hash(user_id, old_hash, new_hash):
+    """Replace a password hash (only if it is still the one that was verified)"""
+    conn = get_connection()
+    cursor = conn.cursor()
 
-    # Technician performance
     cursor.execute("""
-        SELECT tecnico_nome, COUNT(*) as total_chamados,
-               AVG(julianday(data_resolucao) - julianday(data_abertura)) as avg_resolution_days
-        FROM chamados
-        WHERE tecnico_nome IS NOT NULL AND status = 'Resolvido'
-        GROUP BY tecnico_nome
-        ORDER BY total_chamados DESC
-    """)
-    technician_performance = cursor.fetchall()
+        UPDATE usuarios SET password_hash = ? WHERE id = ? AND password_hash = ?
+    """, (new_hash, user_id, old_hash))
+
+    conn.commit()
+    conn.close()
+
+def check_username_exists(username):
+    """Check if username already exists"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT id FROM usuarios WHERE username = ?", (username,))
+    exists = cursor.fetchone() is not None
+
+    conn.close()
+    return exists
+
+def create_user(username, password, nome, email, perfil, setor):
+    """Create a new user"""
+    password_hash = hash_password(password)
+
+    conn = get_connection()
+    cursor = conn.cursor()
 
-    # Tickets over time (last 30 days)
     cursor.execute("""
-        SELECT DATE(data_abertura) as date, COUNT(*) as count
-        FROM chamados
-        WHERE data_abertura >= date('now', '-30 days')
-        GROUP BY DATE(data_abertura)
-        ORDER BY date
-    """)
-    tickets_over_time = cursor.fetchall()
+        INSERT INTO usuarios (username, password_hash, nome_completo, email, role, setor)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (username, password_hash, nome, email, perfil, setor))
 
+    conn.commit()
     conn.close()
 
-    return {
-        'by_priority': tickets_by_priority,
-        'by_status': tickets_by_status,
-        'by_sector': tickets_by_sector,
-        'technician_performance': technician_performance,
-        'over_time': tickets_over_time
-    }
+def update_user(user_id, nome, email, perfil, setor, password=None):
+    """Update an existing user"""
+    password_hash = hash_password(password) if password else None
 
-def get_usuarios():
-    """Get all users"""
-    conn = sqlite3.connect('data/chamados.db')
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    if password_hash:
+        cursor.execute("""
+            UPDATE usuarios 
+            SET nome_completo = ?, email = ?, role = ?, setor = ?, password_hash = ?
+            WHERE id = ?
+        """, (nome, email, perfil, setor, password_hash, user_id))
+    else:
+        cursor.execute("""
+            UPDATE usuarios 
+            SET nome_completo = ?, email = ?, role = ?, setor = ?
+            WHERE id = ?
+        """, (nome, email, perfil, setor, user_id))
+
+    conn.commit()
+    conn.close()
+
+    # Role/sector changes must reach open sessions on their next rerun
+    invalidate_user(user_id)
+
+def update_user_status(user_id, active):
+    """Update user active status"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("UPDATE usuarios SET ativo = ? WHERE id = ?", (active, user_id))
+
+    if not active:
+        # Deactivated users lose every open session immediately
+        cursor.execute("UPDATE sessions SET revogada = 1 WHERE user_id = ? AND revogada = 0", (user_id,))
+
+    conn.commit()
+    conn.close()
+
+    invalidate_user(user_id)
+
+def create_session(session_key, user_id):
+    """Persist a login session for SESSION_TTL_HOURS"""
+    now = get_current_time()
+    conn = get_connection()
     cursor = conn.cursor()
 
     cursor.execute("""
-        SELECT id, username, nome_completo, email, role, setor, ativo
-        FROM usuarios
-        ORDER BY nome_completo
-    """)
+        INSERT INTO sessions (session_key, user_id, data_criacao, data_expiracao)
+        VALUES (?, ?, ?, ?)
+    """, (session_key, user_id, now.strftime('%Y-%m-%d %H:%M:%S'),
+          (now + timedelta(hours=SESSION_TTL_HOURS)).strftime('%Y-%m-%d %H:%M:%S')))
 
-    users = cursor.fetchall()
+    conn.commit()
     conn.close()
-    return users
+
+def get_session_principal(session_key):
+    """Get the principal of a valid session (active user, not revoked, not expired)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        SELECT u.id, u.username, u.role, u.setor
+        FROM sessions s
+        JOIN usuarios u ON u.id = s.user_id
+        WHERE s.session_key = ? AND s.revogada = 0 AND s.data_expiracao > ? AND u.ativo = 1
+    """, (session_key, get_current_time_str()))
+
+    row = cursor.fetchone()
+    conn.close()
+
+    if not row:
+        return None
+    return {'id': row[0], 'username': row[1], 'role': row[2], 'setor': row[3]}
+
+def revoke_session(session_key):
+    """Revoke a session (logout)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("UPDATE sessions SET revogada = 1 WHERE session_key = ?", (session_key,))
+
+    conn.commit()
+    conn.close()
+
+def purge_expired_sessions():
+    """Delete expired or revoked sessions"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("DELETE FROM sessions WHERE revogada = 1 OR data_expiracao <= ?", (get_current_time_str(),))
+    deleted = cursor.rowcount
+
+    conn.commit()
+    conn.close()
+    return deleted
 
 def get_tecnicos():
     """Get all technicians"""
-    conn = sqlite3.connect('data/chamados.db')
+    conn = get_connection()
     cursor = conn.cursor()
 
     cursor.execute("""
@@ -377,7 +1050,7 @@ def get_tecnicos():
 
 def save_feedback(user_id, feedback_text):
     """Save user feedback to database"""
-    conn = sqlite3.connect('data/chamados.db')
+    conn = get_connection()
     cursor = conn.cursor()
 
     # Create feedback table if it doesn't exist
@@ -402,7 +1075,7 @@ def save_feedback(user_id, feedback_text):
 
 def add_message(chamado_id, user_id, username, mensagem):
     """Add a chat message to the database."""
-    conn = sqlite3.connect('data/chamados.db')
+    conn = get_connection(site_for_chamado(chamado_id))
     cursor = conn.cursor()
 
     timestamp = get_current_time_str()
@@ -411,6 +1084,781 @@ def add_message(chamado_id, user_id, username, mensagem):
         INSERT INTO chat_messages (chamado_id, usuario_id, username, mensagem, data_criacao)
         VALUES (?, ?, ?, ?, ?)
     """, (chamado_id, user_id, username, mensagem, timestamp))
+    queue_notifications(cursor, chamado_id, 'mensagem', f'Nova mensagem de {username}: {mensagem[:300]}', user_id)
+
+    conn.commit()
+    conn.close()
+
+def _ingest_site_alerts(site, groups, window_seconds):
+    """ingest_alert_batch for the groups of one unit, in one transaction"""
+    conn = get_connection(site)
+    cursor = conn.cursor()
+    before = _begin_ticket_write(cursor)
+
+    cursor.execute("SELECT id, username FROM usuarios WHERE username = ?", (ALERT_USERNAME,))
+    user_id, user_name = cursor.fetchone()
+
+    existing = {}
+    fingerprints = [group['fingerprint'] for group in groups]
+    for start in range(0, len(fingerprints), 500):
+        chunk = fingerprints[start:start + 500]
+        cursor.execute(f"""
+            SELECT a.fingerprint, a.chamado_id, a.ocorrencias, a.primeira_ocorrencia, a.ultima_ocorrencia, c.status
+            FROM alertas_agrupados a
+            JOIN chamados c ON c.id = a.chamado_id
+            WHERE a.fingerprint IN ({','.join('?' * len(chunk))})
+        """, chunk)
+        existing.update((row[0], row[1:]) for row in cursor.fetchall())
+
+    now = get_current_time()
+    data_abertura = now.strftime('%Y-%m-%d %H:%M:%S')
+    cutoff = (now - timedelta(seconds=window_seconds)).strftime('%Y-%m-%d %H:%M:%S')
+
+    def appends(row):
+        return row and row[4] in ('Pendente', 'Em Andamento') and row[3] >= cutoff
+
+    new_ids = iter(_new_chamado_ids(site, sum(not appends(existing.get(group['fingerprint'])) for group in groups)))
+    created, appended, history, upserts = [], [], [], []
+    for group in groups:
+        ocorrencias = group['ocorrencias']
+        row = existing.get(group['fingerprint'])
+        if appends(row):
+            chamado_id, total, primeira = row[0], row[1] + ocorrencias, row[2]
+            appended.append(chamado_id)
+            history.append((chamado_id, user_id, user_name, 'Alerta repetido',
+                            f"{ocorrencias} ocorrência(s) até {group['ultima']}: {group['mensagem']}"))
+        else:
+            sla_prazo = calculate_sla_deadline(group['prioridade'], group['setor'], now).strftime('%Y-%m-%d %H:%M:%S')
+            cursor.execute("""
+                INSERT INTO chamados (id, titulo, descricao, setor_origem, prioridade, solicitante_id, solicitante_nome, observacoes, sla_prazo, data_abertura)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (next(new_ids), group['titulo'], group['descricao'], group['setor'], group['prioridade'], user_id, user_name,
+                  f"Alerta {group['origem']} ({group['fingerprint']})", sla_prazo, data_abertura))
+            chamado_id, total, primeira = cursor.lastrowid, ocorrencias, group['primeira']
+            created.append(chamado_id)
+            history.append((chamado_id, user_id, user_name, 'Criação',
+                            f"Chamado aberto pelo monitoramento com prioridade {group['prioridade']} "
+                            f"({ocorrencias} ocorrência(s))"))
+        upserts.append((group['fingerprint'], chamado_id, group['origem'], total, primeira, group['ultima']))
+
+    cursor.executemany("""
+        INSERT INTO historico_chamados (chamado_id, usuario_id, usuario_nome, acao, detalhes)
+        VALUES (?, ?, ?, ?, ?)
+    """, history)
+    cursor.executemany("""
+        INSERT OR REPLACE INTO alertas_agrupados
+            (fingerprint, chamado_id, origem, ocorrencias, primeira_ocorrencia, ultima_ocorrencia)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, upserts)
+
+    _commit_ticket_write(conn, site, before)
+    conn.close()
+    return created, appended
+
+def ingest_alert_batch(groups, window_seconds):
+    """Coalesce alert groups into tickets, in one transaction per unit.
+
+    Each group (see components.alert_ingest.coalesce) is appended to the open
+    ticket of its fingerprint if the last occurrence is within window_seconds,
+    otherwise it opens a new ticket. Returns (created ids, appended ids).
+    """
+    by_site = {}
+    for group in groups:
+        by_site.setdefault(site_for_setor(group['setor']), []).append(group)
+
+    created, appended = [], []
+    for site_created, site_appended in _fan_out(
+            lambda site: _ingest_site_alerts(site, by_site[site], window_seconds), list(by_site)):
+        created += site_created
+        appended += site_appended
+
+    for chamado_id in dict.fromkeys(created + appended):
+        _notify_chamado_changed(chamado_id)
+    return created, appended
+
+def claim_notifications(lote, limit, lease_seconds):
+    """Lease up to `limit` due outbox rows to a dispatch batch and return them with their recipient.
+
+    A leased row becomes due again when the lease expires, so rows of a
+    dispatcher that died are picked up by the next one.
+    """
+    now = get_current_time()
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        UPDATE notificacoes SET lote = ?, proxima_tentativa = ?
+        WHERE id IN (
+            SELECT id FROM notificacoes
+            WHERE status = 'Pendente' AND proxima_tentativa <= ?
+            ORDER BY proxima_tentativa, id
+            LIMIT ?
+        )
+    """, (lote, (now + timedelta(seconds=lease_seconds)).strftime('%Y-%m-%d %H:%M:%S'),
+          now.strftime('%Y-%m-%d %H:%M:%S'), limit))
+    cursor.execute("""
+        SELECT n.id, n.destinatario_id, u.username, u.nome_completo, u.email,
+               n.chamado_id, c.titulo, n.tipo, n.mensagem, n.data_criacao, n.tentativas
+        FROM notificacoes n
+        JOIN usuarios u ON u.id = n.destinatario_id
+        LEFT JOIN chamados c ON c.id = n.chamado_id
+        WHERE n.lote = ? AND n.status = 'Pendente'
+        ORDER BY n.destinatario_id, n.id
+    """, (lote,))
+
+    rows = cursor.fetchall()
+    conn.commit()
+    conn.close()
+
+    if SITES:
+        # Ticket titles live in the units' files
+        titles = _get_chamado_titles({row[5] for row in rows if row[5] is not None})
+        rows = [row[:6] + (titles.get(row[5]),) + row[7:] for row in rows]
+    return rows
+
+def _get_chamado_titles(chamado_ids):
+    """{id: titulo} of tickets, read from their units in parallel"""
+    by_site = _ids_by_site(chamado_ids)
+
+    def read(site):
+        ids = by_site[site]
+        conn = get_connection(site)
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT id, titulo FROM chamados WHERE id IN ({', '.join('?' * len(ids))})", ids)
+        titles = cursor.fetchall()
+        conn.close()
+        return titles
+
+    return {chamado_id: titulo for titles in _fan_out(read, list(by_site)) for chamado_id, titulo in titles}
+
+def mark_notifications_sent(ids):
+    """Record delivered outbox rows"""
+    if not ids:
+        return
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(f"""
+        UPDATE notificacoes SET status = 'Enviada', data_envio = ?, lote = NULL, erro = NULL
+        WHERE id IN ({','.join('?' * len(ids))})
+    """, [get_current_time_str(), *ids])
+
+    conn.commit()
+    conn.close()
+
+def mark_notifications_failed(ids, erro, retry_at=None):
+    """Record a failed delivery: due again at retry_at, or given up for good when retry_at is None"""
+    if not ids:
+        return
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(f"""
+        UPDATE notificacoes
+        SET tentativas = tentativas + 1, erro = ?, lote = NULL,
+            status = CASE WHEN ? IS NULL THEN 'Falhou' ELSE 'Pendente' END,
+            proxima_tentativa = COALESCE(?, proxima_tentativa)
+        WHERE id IN ({','.join('?' * len(ids))})
+    """, [erro[:500], retry_at, retry_at, *ids])
 
     conn.commit()
-    conn.close()
\ No newline at end of file
+    conn.close()
+
+def get_notification_backlog():
+    """Pending outbox rows and the creation time of the oldest one"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT COUNT(*), MIN(data_criacao) FROM notificacoes WHERE status = 'Pendente'")
+    row = cursor.fetchone()
+    conn.close()
+    return row
+
+def purge_notifications(older_than):
+    """Delete delivered or abandoned outbox rows created before a timestamp"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("DELETE FROM notificacoes WHERE status != 'Pendente' AND data_criacao < ?", (older_than,))
+    deleted = cursor.rowcount
+
+    conn.commit()
+    conn.close()
+    return deleted
+
+def get_sla_tracking_rows(chamado_ids=None):
+    """Get the fields the SLA monitor tracks, for all open tickets or specific ids"""
+    by_site = _ids_by_site(chamado_ids)
+
+    def read(site):
+        conn = get_connection(site)
+        cursor = conn.cursor()
+
+        chamado_ids = by_site[site]
+        if chamado_ids is None:
+            cursor.execute("""
+                SELECT id, status, tecnico_id, data_abertura, sla_prazo, sla_pausado_em
+                FROM chamados
+                WHERE status IN ('Pendente', 'Em Andamento')
+            """)
+        else:
+            placeholders = ', '.join('?' * len(chamado_ids))
+            cursor.execute(f"""
+                SELECT id, status, tecnico_id, data_abertura, sla_prazo, sla_pausado_em
+                FROM chamados
+                WHERE id IN ({placeholders})
+            """, chamado_ids)
+
+        rows = cursor.fetchall()
+        conn.close()
+        return rows
+
+    return [row for rows in _fan_out(read, list(by_site)) for row in rows]
+
+def get_open_ticket_rows(chamado_ids=None):
+    """Open tickets (or specific ids, any status) and the get_ticket_version() value, read in one snapshot.
+
+    Returns (versao, rows); rows are the get_chamados() fields plus solicitante_id, tecnico_id, versao.
+    With several units each one is its own snapshot and versao is the sum of their versions.
+    """
+    query = """
+        SELECT id, titulo, descricao, setor_origem, prioridade, status,
+               solicitante_nome, tecnico_nome, data_abertura, data_resolucao, sla_prazo,
+               solicitante_id, tecnico_id, versao
+        FROM chamados
+    """
+    by_site = _ids_by_site(chamado_ids)
+
+    def read(site):
+        conn = get_connection(site)
+        cursor = conn.cursor()
+
+        cursor.execute("BEGIN")
+        version = _external_ticket_version(cursor, site)
+        chamado_ids = by_site[site]
+        if chamado_ids is None:
+            cursor.execute(query + " WHERE status IN ('Pendente', 'Em Andamento')")
+            rows = cursor.fetchall()
+        else:
+            rows = []
+            for start in range(0, len(chamado_ids), 500):
+                chunk = chamado_ids[start:start + 500]
+                cursor.execute(query + f" WHERE id IN ({', '.join('?' * len(chunk))})", chunk)
+                rows.extend(cursor.fetchall())
+
+        conn.rollback()
+        conn.close()
+        return version, rows
+
+    partitions = _fan_out(read, list(by_site))
+    return sum(version for version, _ in partitions), [row for _, rows in partitions for row in rows]
+
+def get_assignment_rows(chamado_ids=None):
+    """Fields the assignment engine tracks, for all open tickets or specific ids:
+    (id, status, tecnico_id, prioridade, setor_origem, sla_prazo, data_abertura, versao)
+    """
+    query = """
+        SELECT id, status, tecnico_id, prioridade, setor_origem, sla_prazo, data_abertura, versao
+        FROM chamados
+    """
+    by_site = _ids_by_site(chamado_ids)
+
+    def read(site):
+        conn = get_connection(site)
+        cursor = conn.cursor()
+
+        chamado_ids = by_site[site]
+        if chamado_ids is None:
+            cursor.execute(query + " WHERE status IN ('Pendente', 'Em Andamento')")
+            rows = cursor.fetchall()
+        else:
+            rows = []
+            for start in range(0, len(chamado_ids), 500):
+                chunk = chamado_ids[start:start + 500]
+                cursor.execute(query + f" WHERE id IN ({', '.join('?' * len(chunk))})", chunk)
+                rows.extend(cursor.fetchall())
+
+        conn.close()
+        return rows
+
+    return [row for rows in _fan_out(read, list(by_site)) for row in rows]
+
+def get_assignable_technicians():
+    """Active technicians that can receive automatic assignments (id, username, nome_completo, setor)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        SELECT id, username, nome_completo, setor
+        FROM usuarios
+        WHERE role = 'Técnico' AND ativo = 1
+    """)
+
+    technicians = cursor.fetchall()
+    conn.close()
+    return technicians
+
+def get_system_user(username):
+    """(id, nome_completo) of an internal account such as AUTO_ASSIGN_USERNAME, or None"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT id, nome_completo FROM usuarios WHERE username = ?", (username,))
+
+    user = cursor.fetchone()
+    conn.close()
+    return user
+
+def apply_sla_alert_transitions(opened, closed, timestamp):
+    """Open and close SLA alerts in a single transaction (per unit).
+
+    opened: list of (chamado_id, tipo, prazo); closed: list of (chamado_id, tipo)
+    """
+    if not opened and not closed:
+        return
+
+    by_site = {}
+    for transition in opened:
+        by_site.setdefault(site_for_chamado(transition[0]), ([], []))[0].append(transition)
+    for transition in closed:
+        by_site.setdefault(site_for_chamado(transition[0]), ([], []))[1].append(transition)
+
+    def write(site):
+        opened, closed = by_site[site]
+        conn = get_connection(site)
+        cursor = conn.cursor()
+
+        cursor.executemany("""
+            UPDATE sla_alerts
+            SET ativo = 0, data_encerramento = ?
+            WHERE ativo = 1 AND tipo = ? AND chamado_id = ?
+        """, [(timestamp, tipo, chamado_id) for chamado_id, tipo in closed])
+
+        cursor.executemany("""
+            INSERT OR IGNORE INTO sla_alerts (chamado_id, tipo, prazo, data_disparo)
+            VALUES (?, ?, ?, ?)
+        """, [(chamado_id, tipo, prazo, timestamp) for chamado_id, tipo, prazo in opened])
+
+        conn.commit()
+        conn.close()
+
+    _fan_out(write, list(by_site))
+
+def get_active_sla_alerts():
+    """Get the current SLA alert set (chamado_id, tipo, prazo, data_disparo)"""
+    def read(site):
+        conn = get_connection(site)
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT chamado_id, tipo, prazo, data_disparo
+            FROM sla_alerts
+            WHERE ativo = 1
+        """)
+
+        alerts = cursor.fetchall()
+        conn.close()
+        return alerts
+
+    return [alert for alerts in _fan_out(read, query_sites()) for alert in alerts]
+
+def get_config_version(nome):
+    """Get the version counter of a configuration table ('chamados' adds up the counters of every unit)"""
+    def read(site):
+        conn = get_connection(site)
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT versao FROM config_versoes WHERE nome = ?", (nome,))
+        row = cursor.fetchone()
+        conn.close()
+        return row[0] if row else 0
+
+    return sum(_fan_out(read, query_sites() if nome == 'chamados' else [None]))
+
+def get_ticket_version():
+    """Version of the ticket rows as changed by other processes (every unit added up).
+
+    Unlike get_config_version('chamados'), history and chat writes leave it alone,
+    and so do this process's own ticket writes: their listeners already saw them.
+    """
+    def read(site):
+        conn = get_connection(site)
+        version = _external_ticket_version(conn.cursor(), site)
+        conn.close()
+        return version
+
+    return sum(_fan_out(read, query_sites()))
+
+def get_sla_policy_rows(active_only=False):
+    """Get SLA policies (setor, prioridade, horas, horario_comercial, pausa[, id, ativo])"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    if active_only:
+        cursor.execute("""
+            SELECT setor, prioridade, horas_resolucao, horario_comercial, pausa_aguardando_solicitante
+            FROM sla_policies
+            WHERE ativo = 1
+        """)
+    else:
+        cursor.execute("""
+            SELECT setor, prioridade, horas_resolucao, horario_comercial, pausa_aguardando_solicitante, id, ativo
+            FROM sla_policies
+            ORDER BY setor, CASE prioridade WHEN 'Alta' THEN 0 WHEN 'Média' THEN 1 ELSE 2 END
+        """)
+
+    policies = cursor.fetchall()
+    conn.close()
+    return policies
+
+def save_sla_policy(setor, prioridade, horas_resolucao, horario_comercial=False, pausa_aguardando_solicitante=True, ativo=True):
+    """Create or update the SLA policy of a sector/priority and hot-reload the lookup"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        INSERT INTO sla_policies (setor, prioridade, horas_resolucao, horario_comercial, pausa_aguardando_solicitante, ativo)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (setor, prioridade) DO UPDATE SET
+            horas_resolucao = excluded.horas_resolucao,
+            horario_comercial = excluded.horario_comercial,
+            pausa_aguardando_solicitante = excluded.pausa_aguardando_solicitante,
+            ativo = excluded.ativo,
+            data_atualizacao = CURRENT_TIMESTAMP
+    """, (setor or '*', prioridade, horas_resolucao, horario_comercial, pausa_aguardando_solicitante, ativo))
+
+    conn.commit()
+    conn.close()
+
+    load_sla_policies()
+
+def delete_sla_policy(policy_id):
+    """Delete an SLA policy and hot-reload the lookup"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("DELETE FROM sla_policies WHERE id = ?", (policy_id,))
+
+    conn.commit()
+    conn.close()
+
+    load_sla_policies()
+
+def pause_sla(chamado_id, user_id, user_name, motivo=None):
+    """Pause the SLA clock while the ticket waits on the requester (if the policy allows it)"""
+    site = site_for_chamado(chamado_id)
+    conn = get_connection(site)
+    cursor = conn.cursor()
+    before = _begin_ticket_write(cursor)
+
+    cursor.execute("""
+        SELECT setor_origem, prioridade, status, sla_pausado_em FROM chamados WHERE id = ?
+    """, (chamado_id,))
+    row = cursor.fetchone()
+
+    if (not row or row[3] or row[2] not in ('Pendente', 'Em Andamento')
+            or not get_sla_policy(row[1], row[0]).pausa_aguardando_solicitante):
+        conn.close()
+        return False
+
+    inicio = get_current_time_str()
+    cursor.execute("UPDATE chamados SET sla_pausado_em = ?, versao = versao + 1 WHERE id = ?", (inicio, chamado_id))
+    cursor.execute("""
+        INSERT INTO sla_pausas (chamado_id, usuario_id, motivo, inicio)
+        VALUES (?, ?, ?, ?)
+    """, (chamado_id, user_id, motivo, inicio))
+    cursor.execute("""
+        INSERT INTO historico_chamados (chamado_id, usuario_id, usuario_nome, acao, detalhes)
+        VALUES (?, ?, ?, ?, ?)
+    """, (chamado_id, user_id, user_name, 'SLA pausado', motivo or 'Aguardando retorno do solicitante'))
+
+    _commit_ticket_write(conn, site, before)
+    conn.close()
+
+    _notify_chamado_changed(chamado_id)
+    return True
+
+def _resume_sla(cursor, chamado_id, user_id, user_name):
+    """Resume the SLA clock inside the caller's transaction; returns False if it was not paused"""
+    cursor.execute("""
+        SELECT setor_origem, prioridade, sla_prazo, sla_pausado_em FROM chamados WHERE id = ?
+    """, (chamado_id,))
+    row = cursor.fetchone()
+
+    if not row or not row[3]:
+        return False
+
+    setor, prioridade, sla_prazo, pausado_em = row
+    fim = get_current_time_str()
+    novo_prazo = extend_deadline(sla_prazo, pausado_em, fim, prioridade, setor) if sla_prazo else None
+
+    cursor.execute("""
+        UPDATE chamados SET sla_pausado_em = NULL, sla_prazo = ?, versao = versao + 1 WHERE id = ?
+    """, (novo_prazo.strftime('%Y-%m-%d %H:%M:%S') if novo_prazo else sla_prazo, chamado_id))
+    cursor.execute("""
+        UPDATE sla_pausas SET fim = ? WHERE chamado_id = ? AND fim IS NULL
+    """, (fim, chamado_id))
+    cursor.execute("""
+        INSERT INTO historico_chamados (chamado_id, usuario_id, usuario_nome, acao, detalhes)
+        VALUES (?, ?, ?, ?, ?)
+    """, (chamado_id, user_id, user_name, 'SLA retomado', f'Novo prazo de SLA: {novo_prazo or sla_prazo}'))
+    return True
+
+def resume_sla(chamado_id, user_id, user_name):
+    """Resume the SLA clock, pushing the deadline forward by the paused time"""
+    site = site_for_chamado(chamado_id)
+    conn = get_connection(site)
+    cursor = conn.cursor()
+    before = _begin_ticket_write(cursor)
+
+    resumed = _resume_sla(cursor, chamado_id, user_id, user_name)
+
+    _commit_ticket_write(conn, site, before)
+    conn.close()
+
+    if resumed:
+        _notify_chamado_changed(chamado_id)
+    return resumed
+
+def get_paused_chamados():
+    """Get the ids of tickets whose SLA clock is paused"""
+    def read(site):
+        conn = get_connection(site)
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT id FROM chamados WHERE sla_pausado_em IS NOT NULL")
+
+        paused = {row[0] for row in cursor.fetchall()}
+        conn.close()
+        return paused
+
+    return set().union(*_fan_out(read, query_sites()))
+
+def create_job(tipo, parametros, solicitante_id):
+    """Queue a background job; returns its id"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        INSERT INTO jobs (tipo, parametros, solicitante_id, data_criacao)
+        VALUES (?, ?, ?, ?)
+    """, (tipo, json.dumps(parametros, default=str), solicitante_id, get_current_time_str()))
+    job_id = cursor.lastrowid
+
+    conn.commit()
+    conn.close()
+    return job_id
+
+def claim_job(job_id):
+    """Mark a pending job as running; returns (tipo, parametros) or None if it was cancelled/taken"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        UPDATE jobs SET status = 'Executando', data_inicio = ?
+        WHERE id = ? AND status = 'Pendente' AND cancelar = 0
+    """, (get_current_time_str(), job_id))
+    claimed = cursor.rowcount == 1
+    row = None
+    if claimed:
+        cursor.execute("SELECT tipo, parametros FROM jobs WHERE id = ?", (job_id,))
+        row = cursor.fetchone()
+
+    conn.commit()
+    conn.close()
+    return (row[0], json.loads(row[1])) if row else None
+
+def update_job_progress(job_id, progresso, total=None, mensagem=None):
+    """Record job progress; returns True if cancellation was requested"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        UPDATE jobs SET progresso = ?, total = COALESCE(?, total), mensagem = COALESCE(?, mensagem)
+        WHERE id = ?
+    """, (progresso, total, mensagem, job_id))
+    cursor.execute("SELECT cancelar FROM jobs WHERE id = ?", (job_id,))
+    row = cursor.fetchone()
+
+    conn.commit()
+    conn.close()
+    return bool(row and row[0])
+
+def finish_job(job_id, status, mensagem=None, resultado_path=None, resultado_nome=None, resultado_mime=None):
+    """Store the final state of a job and its result file"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        UPDATE jobs
+        SET status = ?, mensagem = ?, resultado_path = ?, resultado_nome = ?, resultado_mime = ?, data_fim = ?
+        WHERE id = ?
+    """, (status, mensagem, resultado_path, resultado_nome, resultado_mime, get_current_time_str(), job_id))
+
+    conn.commit()
+    conn.close()
+
+def cancel_job(job_id, user_id):
+    """Request cancellation of a user's job (pending jobs are cancelled immediately)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        UPDATE jobs SET cancelar = 1
+        WHERE id = ? AND solicitante_id = ? AND status IN ('Pendente', 'Executando')
+    """, (job_id, user_id))
+    requested = cursor.rowcount == 1
+    cursor.execute("""
+        UPDATE jobs SET status = 'Cancelado', data_fim = ?
+        WHERE id = ? AND status = 'Pendente' AND cancelar = 1
+    """, (get_current_time_str(), job_id))
+
+    conn.commit()
+    conn.close()
+    return requested
+
+def get_user_jobs(user_id, limit=10):
+    """Get a user's most recent jobs"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        SELECT id, tipo, status, progresso, total, mensagem, resultado_path, resultado_nome,
+               resultado_mime, data_criacao, data_fim
+        FROM jobs
+        WHERE solicitante_id = ?
+        ORDER BY id DESC
+        LIMIT ?
+    """, (user_id, limit))
+
+    jobs = cursor.fetchall()
+    conn.close()
+    return jobs
+
+def claim_report(nome, agendado_para, stale_before):
+    """Claim a scheduled report run; returns its id, or None if another process has it or it is done.
+
+    A run still 'Gerando' since before stale_before (its process died) is taken over.
+    """
+    now = get_current_time_str()
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        INSERT OR IGNORE INTO reports (nome, agendado_para, data_inicio) VALUES (?, ?, ?)
+    """, (nome, agendado_para, now))
+    if not cursor.rowcount:
+        cursor.execute("""
+            UPDATE reports SET data_inicio = ?
+            WHERE nome = ? AND agendado_para = ? AND status = 'Gerando' AND data_inicio < ?
+        """, (now, nome, agendado_para, stale_before))
+    claimed = cursor.rowcount
+    cursor.execute("SELECT id FROM reports WHERE nome = ? AND agendado_para = ?", (nome, agendado_para))
+    report_id = cursor.fetchone()[0]
+
+    conn.commit()
+    conn.close()
+    return report_id if claimed else None
+
+def finish_report(report_id, status, dados=None, arquivos=None, mensagem=None):
+    """Record the outcome of a report run (dados and arquivos are stored as JSON)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        UPDATE reports SET status = ?, dados = ?, arquivos = ?, mensagem = ?, data_fim = ?
+        WHERE id = ?
+    """, (status, json.dumps(dados, default=str) if dados is not None else None,
+          json.dumps(arquivos or []), mensagem, get_current_time_str(), report_id))
+
+    conn.commit()
+    conn.close()
+
+def get_latest_report(nome):
+    """Most recent completed run of a report: (id, agendado_para, dados, arquivos, data_fim) or None"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        SELECT id, agendado_para, dados, arquivos, data_fim
+        FROM reports
+        WHERE nome = ? AND status = 'Concluído'
+        ORDER BY agendado_para DESC
+        LIMIT 1
+    """, (nome,))
+
+    row = cursor.fetchone()
+    conn.close()
+    if not row:
+        return None
+    return (row[0], row[1], json.loads(row[2]) if row[2] else None, json.loads(row[3]), row[4])
+
+def get_reports(limit=20):
+    """Most recent report runs with files: (id, nome, agendado_para, status, arquivos, mensagem, data_fim)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        SELECT id, nome, agendado_para, status, arquivos, mensagem, data_fim
+        FROM reports
+        WHERE arquivos != '[]' OR status = 'Falhou'
+        ORDER BY agendado_para DESC, id DESC
+        LIMIT ?
+    """, (limit,))
+
+    reports = [row[:4] + (json.loads(row[4]),) + row[5:] for row in cursor.fetchall()]
+    conn.close()
+    return reports
+
+def purge_reports(older_than):
+    """Delete report runs scheduled before a timestamp; returns the file paths they referenced"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT arquivos FROM reports WHERE agendado_para < ?", (older_than,))
+    paths = [item['path'] for (arquivos,) in cursor.fetchall() for item in json.loads(arquivos)]
+    cursor.execute("DELETE FROM reports WHERE agendado_para < ?", (older_than,))
+
+    conn.commit()
+    conn.close()
+    return paths
+
+def recover_interrupted_jobs():
+    """Fail jobs left running by a dead process; returns the ids still pending"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        UPDATE jobs SET status = 'Falhou', mensagem = 'Interrompido (servidor reiniciado)', data_fim = ?
+        WHERE status = 'Executando'
+    """, (get_current_time_str(),))
+    cursor.execute("SELECT id FROM jobs WHERE status = 'Pendente' ORDER BY id")
+    pending = [row[0] for row in cursor.fetchall()]
+
+    conn.commit()
+    conn.close()
+    return pending
+
+def get_storage_sizes():
+    """Size in bytes of the database files (central and units) and of their write-ahead logs"""
+    sizes = {}
+    for name, suffix in (('db', ''), ('wal', '-wal')):
+        paths = [path + suffix for _, path in get_database_files()]
+        sizes[name] = sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+    return sizes
+
+def _storage_gauges():
+    return [('chamados_db_file_bytes', {'file': name}, size) for name, size in get_storage_sizes().items()]
+
+# Instrumentation: latency histogram for every public function below, plus a connection counter
+register_gauges(_storage_gauges)
+instrument_module(globals(), exclude=('get_connection', 'get_current_time', 'get_current_time_str',
+                                      'register_chamado_listener', 'get_storage_sizes', 'queue_notifications',
+                                      'site_for_setor', 'site_for_chamado', 'query_sites', 'get_database_files'))
+# Opt-in workload capture (WORKLOAD_CAPTURE) of the calls benchmarks/replay.py can re-execute
+if capture_enabled():
+    capture_module(globals(), exclude=('get_connection', 'get_current_time', 'get_current_time_str',
+                                       'register_chamado_listener', 'get_storage_sizes', 'init_database',
+                                       'calculate_sla_deadline', 'queue_notifications', 'site_for_setor',
+                                       'site_for_chamado', 'query_sites', 'get_database_files'))
+get_connection = count_connections(get_connection)
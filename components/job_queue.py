@@ -0,0 +1,162 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from components.database import (
+    cancel_job, claim_job, create_job, finish_job, recover_interrupted_jobs, update_job_progress
+)
+from components.metrics import register_gauges
+
+# Worker processes for exports/reports (separate processes: the work is CPU bound)
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', os.cpu_count() or 2))
+# Minimum interval between progress writes (and cancellation checks) of a running job
+PROGRESS_INTERVAL = float(os.environ.get('JOB_PROGRESS_INTERVAL_SECONDS', 0.5))
+# How often pages refresh the status of running jobs
+JOB_POLL_SECONDS = float(os.environ.get('JOB_POLL_SECONDS', 2))
+
+JOB_LABELS = {
+    'exportacao_chamados': '📊 Exportação de chamados',
+    'desempenho_tecnicos': '👨‍💻 Desempenho dos técnicos',
+}
+
+ACTIVE_STATUSES = ('Pendente', 'Executando')
+
+_lock = threading.RLock()  # re-entrant: done callbacks may run inside _submit
+_executor = None
+_started = False
+_futures = {}  # job id -> Future, for jobs submitted by this process
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker when the user cancelled the running job"""
+
+
+class _ProgressReporter:
+    """Progress callback that writes to the jobs table and raises JobCancelled on request"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self._last = 0.0
+
+    def __call__(self, done, total=None, force=False):
+        now = time.monotonic()
+        if not force and now - self._last < PROGRESS_INTERVAL:
+            return
+        self._last = now
+        if update_job_progress(self.job_id, done, total):
+            raise JobCancelled()
+
+
+def _run_export(params, progress):
+    """Ticket export (general data or SLA analysis)"""
+    from utils.export_engine import count_chamados, export_chamados
+
+    start, end = params.get('start'), params.get('end')
+    progress(0, count_chamados(start, end, params.get('filters')), force=True)
+    return export_chamados(params.get('fmt', 'csv.gz'), params.get('columns'), start, end,
+                           params.get('filters'), params.get('filename_prefix', 'chamados'),
+                           progress=progress)
+
+
+def _run_technician_report(params, progress):
+    """Technician performance report"""
+    from components.database import get_analytics_data
+    from utils.export_engine import export_technician_report
+
+    rows = get_analytics_data()['technician_performance']
+    progress(0, len(rows), force=True)
+    return export_technician_report(params.get('fmt', 'csv.gz'), rows, progress=progress)
+
+
+JOB_TYPES = {
+    'exportacao_chamados': _run_export,
+    'desempenho_tecnicos': _run_technician_report,
+}
+
+
+def _execute(job_id):
+    """Worker entry point: run one job and record its outcome"""
+    claimed = claim_job(job_id)
+    if not claimed:
+        return  # cancelled before it started
+    tipo, params = claimed
+
+    progress = _ProgressReporter(job_id)
+    try:
+        path, filename, mime, rows = JOB_TYPES[tipo](params, progress)
+    except JobCancelled:
+        finish_job(job_id, 'Cancelado', 'Cancelado pelo usuário')
+    except Exception as e:
+        finish_job(job_id, 'Falhou', str(e))
+    else:
+        update_job_progress(job_id, rows, rows)
+        finish_job(job_id, 'Concluído', f'{rows} linha(s)', os.path.abspath(path), filename, mime)
+
+
+def _on_done(job_id, future):
+    """Record jobs whose worker process died (the worker records every other outcome)"""
+    global _executor
+    with _lock:
+        _futures.pop(job_id, None)
+    if future.cancelled():
+        return
+    error = future.exception()
+    if error is not None:
+        finish_job(job_id, 'Falhou', f'Erro no processo de execução: {error}')
+        with _lock:
+            if getattr(_executor, '_broken', False):
+                _executor = None
+
+
+def _submit(job_id):
+    """Hand a queued job to the worker pool (caller holds the lock)"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=JOB_WORKERS,
+                                        mp_context=multiprocessing.get_context('spawn'))
+    future = _executor.submit(_execute, job_id)
+    _futures[job_id] = future
+    future.add_done_callback(lambda f: _on_done(job_id, f))
+
+
+def start_job_queue():
+    """Resume jobs queued before a restart (once per process; the pool itself starts lazily)"""
+    global _started
+    with _lock:
+        if _started:
+            return
+        _started = True
+        # Assumes a single server process owns the queue
+        for job_id in recover_interrupted_jobs():
+            _submit(job_id)
+
+
+def submit_job(tipo, params, user_id):
+    """Queue a job for the worker pool; returns its id"""
+    if tipo not in JOB_TYPES:
+        raise ValueError(f"Tipo de job desconhecido: {tipo}")
+    start_job_queue()
+    job_id = create_job(tipo, params, user_id)
+    with _lock:
+        _submit(job_id)
+    return job_id
+
+
+def request_cancel(job_id, user_id):
+    """Cancel a user's job: pending jobs never start, running ones stop at the next progress check"""
+    requested = cancel_job(job_id, user_id)
+    with _lock:
+        future = _futures.get(job_id)
+    if requested and future:
+        future.cancel()
+    return requested
+
+
+def _queue_gauges():
+    with _lock:
+        return [('chamados_jobs_in_flight', None, len(_futures))]
+
+
+register_gauges(_queue_gauges)
@@ -0,0 +1,290 @@
+"""Online maintenance of the SQLite files: statistics, free pages and the WAL.
+
+Every MAINTENANCE_POLL_SECONDS the scheduler looks at each database file (the
+central one and, in site-partitioned mode, every unit's file):
+
+- WAL over MAINTENANCE_WAL_CHECKPOINT_BYTES: a PASSIVE checkpoint, at any
+  time (it never takes the write lock). In a quiet moment, once the WAL is
+  fully copied back, a TRUNCATE checkpoint shrinks the file; with nothing
+  left to copy it holds the lock only to reset the log.
+- In a quiet moment, once every MAINTENANCE_ANALYZE_HOURS: ANALYZE table by
+  table with PRAGMA analysis_limit, so each statement (and its write lock)
+  stays short, then PRAGMA optimize.
+- In a quiet moment, with more than MAINTENANCE_VACUUM_MIN_PAGES free pages:
+  incremental vacuum in steps sized to stay under MAINTENANCE_LOCK_BUDGET_MS,
+  pausing between steps so application writes get through.
+
+Quiet = inside MAINTENANCE_WINDOW (local time, e.g. '01:00-05:00') and at most
+MAINTENANCE_IDLE_WRITES ticket writes since the previous check.
+
+Incremental vacuum needs auto_vacuum=INCREMENTAL, which new files get from
+init_database. An existing file is converted once, offline (full VACUUM):
+
+    python -m components.maintenance --enable-incremental-vacuum
+    python -m components.maintenance --run     # every task now, ignoring the window
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+
+from components.database import get_config_version, get_current_time, get_database_files
+from components.metrics import inc, observe, register_gauges
+
+MAINTENANCE_ENABLED = os.environ.get('MAINTENANCE_ENABLED', '1') == '1'
+MAINTENANCE_POLL_SECONDS = float(os.environ.get('MAINTENANCE_POLL_SECONDS', 60))
+# Low-traffic window, local time; empty = any time (still subject to MAINTENANCE_IDLE_WRITES)
+MAINTENANCE_WINDOW = os.environ.get('MAINTENANCE_WINDOW', '01:00-05:00')
+MAINTENANCE_IDLE_WRITES = int(os.environ.get('MAINTENANCE_IDLE_WRITES', 20))
+MAINTENANCE_WAL_CHECKPOINT_BYTES = int(os.environ.get('MAINTENANCE_WAL_CHECKPOINT_BYTES', 16 * 1024 * 1024))
+MAINTENANCE_ANALYZE_HOURS = float(os.environ.get('MAINTENANCE_ANALYZE_HOURS', 24))
+# Rows ANALYZE samples per index (approximate statistics, bounded statement time)
+MAINTENANCE_ANALYSIS_LIMIT = int(os.environ.get('MAINTENANCE_ANALYSIS_LIMIT', 1000))
+MAINTENANCE_VACUUM_MIN_PAGES = int(os.environ.get('MAINTENANCE_VACUUM_MIN_PAGES', 256))
+# Target longest write-lock hold of a single maintenance statement
+MAINTENANCE_LOCK_BUDGET_MS = float(os.environ.get('MAINTENANCE_LOCK_BUDGET_MS', 5))
+
+# Time a maintenance statement waits for a busy database before giving up until the next check
+BUSY_TIMEOUT = 0.05
+# Pause between vacuum steps, and total vacuum time per file per check
+STEP_PAUSE = 0.02
+VACUUM_SECONDS_PER_CHECK = 2.0
+MAX_VACUUM_STEP = 4096
+
+_lock = threading.Lock()
+_thread = None
+_log = deque(maxlen=200)    # recent actions, newest last
+_files = {}                 # path -> {'free_pages', 'wal_bytes', 'auto_vacuum'} of the last check
+_last_analyze = {}          # path -> monotonic time of the last ANALYZE
+_vacuum_step = {}           # path -> pages per incremental_vacuum step (adapted to the lock budget)
+
+
+def parse_window(window):
+    """'HH:MM-HH:MM' -> (start, end) minutes of the day; None = always (the window may wrap midnight)"""
+    if not window.strip():
+        return None
+    try:
+        start, end = (int(hours) * 60 + int(minutes)
+                      for hours, minutes in (part.strip().split(':') for part in window.split('-')))
+    except ValueError:
+        raise ValueError(f"janela de manutenção inválida (use HH:MM-HH:MM): {window!r}")
+    return start, end
+
+
+def in_window(window, moment):
+    if window is None:
+        return True
+    start, end = window
+    minute = moment.hour * 60 + moment.minute
+    return start <= minute < end if start <= end else minute >= start or minute < end
+
+
+def _connect(path):
+    # Autocommit: every statement is its own (short) transaction
+    return sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+
+
+def _record(path, tarefa, seconds, paginas=0, detalhes=None):
+    _log.append({
+        'horario': get_current_time().strftime('%Y-%m-%d %H:%M:%S'),
+        'arquivo': os.path.basename(path),
+        'tarefa': tarefa,
+        'duracao_ms': round(seconds * 1000, 2),
+        'paginas': paginas,
+        'detalhes': detalhes,
+    })
+
+
+def _timed(conn, sql, tarefa, script=False):
+    """Run one maintenance statement; its duration bounds how long it held any lock.
+
+    script=True runs it through executescript (no rows), which steps it to completion.
+    """
+    start = time.perf_counter()
+    if script:
+        conn.executescript(sql)
+        rows = []
+    else:
+        rows = conn.execute(sql).fetchall()
+    seconds = time.perf_counter() - start
+    observe('chamados_maintenance_statement_seconds', 'tarefa', tarefa, seconds)
+    return rows, seconds
+
+
+def checkpoint(conn, path, quiet, force=False):
+    """PASSIVE checkpoint of a large WAL; TRUNCATE it too when quiet and fully copied back"""
+    wal_path = path + '-wal'
+    wal_bytes = os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+    if wal_bytes < MAINTENANCE_WAL_CHECKPOINT_BYTES and not force:
+        return
+    rows, seconds = _timed(conn, "PRAGMA wal_checkpoint(PASSIVE)", 'checkpoint_passive')
+    busy, frames, copied = rows[0]
+    _record(path, 'checkpoint_passive', seconds, detalhes=f"{copied}/{frames} quadros copiados")
+    # Readers still on old frames: truncating would have to wait for them while holding the lock
+    if quiet and not busy and frames == copied:
+        rows, seconds = _timed(conn, "PRAGMA wal_checkpoint(TRUNCATE)", 'checkpoint_truncate')
+        _record(path, 'checkpoint_truncate', seconds,
+                detalhes='ocupado' if rows[0][0] else f"WAL de {wal_bytes / 1024 / 1024:.1f} MB truncado")
+
+
+def analyze(conn, path):
+    """ANALYZE one table per statement with a sampling limit, then PRAGMA optimize"""
+    conn.execute(f"PRAGMA analysis_limit = {MAINTENANCE_ANALYSIS_LIMIT}")
+    tables = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+    longest = total = 0.0
+    for table in tables:
+        _, seconds = _timed(conn, f'ANALYZE "{table}"', 'analyze')
+        longest, total = max(longest, seconds), total + seconds
+        time.sleep(STEP_PAUSE)
+    _, seconds = _timed(conn, "PRAGMA optimize", 'analyze')
+    _record(path, 'analyze', total + seconds,
+            detalhes=f"{len(tables)} tabela(s), maior bloqueio {longest * 1000:.1f} ms")
+
+
+def incremental_vacuum(conn, path):
+    """Release free pages in steps that each stay within MAINTENANCE_LOCK_BUDGET_MS"""
+    free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if free_pages < MAINTENANCE_VACUUM_MIN_PAGES:
+        return
+    step = _vacuum_step.get(path, 64)
+    reclaimed, longest, total, steps = 0, 0.0, 0.0, 0
+    deadline = time.monotonic() + VACUUM_SECONDS_PER_CHECK
+    while free_pages and time.monotonic() < deadline:
+        # Stepped once through execute() the pragma frees a single page, whatever the step
+        _, seconds = _timed(conn, f"PRAGMA incremental_vacuum({step})", 'vacuum', script=True)
+        remaining = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        reclaimed += free_pages - remaining
+        free_pages = remaining
+        longest, total = max(longest, seconds), total + seconds
+        steps += 1
+        # Keep each step near the budget: halve when over it, grow when well under it
+        if seconds * 1000 > MAINTENANCE_LOCK_BUDGET_MS:
+            step = max(step // 2, 1)
+        elif seconds * 1000 < MAINTENANCE_LOCK_BUDGET_MS / 4:
+            step = min(step * 2, MAX_VACUUM_STEP)
+        time.sleep(STEP_PAUSE)
+    _vacuum_step[path] = step
+    inc('chamados_maintenance_pages_reclaimed_total', 'arquivo', os.path.basename(path), reclaimed)
+    _record(path, 'vacuum', total, reclaimed,
+            f"{steps} passo(s), maior bloqueio {longest * 1000:.1f} ms, {free_pages} página(s) livre(s) restante(s)")
+
+
+def maintain_file(path, quiet, force=False):
+    """Run the maintenance a file is due for (force = every task, regardless of thresholds)"""
+    if not os.path.exists(path):
+        return
+    conn = _connect(path)
+    try:
+        checkpoint(conn, path, quiet, force)
+        if quiet or force:
+            last = _last_analyze.get(path)
+            if force or last is None or time.monotonic() - last >= MAINTENANCE_ANALYZE_HOURS * 3600:
+                analyze(conn, path)
+                _last_analyze[path] = time.monotonic()
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                incremental_vacuum(conn, path)
+
+        wal_path = path + '-wal'
+        _files[path] = {
+            'free_pages': conn.execute("PRAGMA freelist_count").fetchone()[0],
+            'wal_bytes': os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+            'auto_vacuum': conn.execute("PRAGMA auto_vacuum").fetchone()[0],
+        }
+    finally:
+        conn.close()
+
+
+def run_maintenance(quiet, force=False):
+    """One maintenance pass over every database file"""
+    for _, path in get_database_files():
+        try:
+            maintain_file(path, quiet, force)
+        except sqlite3.OperationalError as e:
+            # Busy: application traffic wins, try again on the next check
+            _record(path, 'adiada', 0.0, detalhes=str(e))
+            inc('chamados_maintenance_postponed_total', 'arquivo', os.path.basename(path))
+
+
+def _run(window):
+    seen_version = get_config_version('chamados')
+    while True:
+        time.sleep(MAINTENANCE_POLL_SECONDS)
+        try:
+            version = get_config_version('chamados')
+            quiet = (in_window(window, get_current_time())
+                     and version - seen_version <= MAINTENANCE_IDLE_WRITES)
+            seen_version = version
+            run_maintenance(quiet)
+        except Exception as e:
+            print(f"maintenance: {type(e).__name__}: {e}", file=sys.stderr)
+
+
+def start_maintenance():
+    """Start the maintenance thread once per process, if MAINTENANCE_ENABLED"""
+    global _thread
+    if not MAINTENANCE_ENABLED:
+        return
+    with _lock:
+        if _thread is not None:
+            return
+        _thread = threading.Thread(target=_run, args=(parse_window(MAINTENANCE_WINDOW),),
+                                   name='db-maintenance', daemon=True)
+        _thread.start()
+
+
+def get_maintenance_log(limit=50):
+    """Most recent maintenance actions, newest first"""
+    return list(_log)[-limit:][::-1]
+
+
+def _maintenance_gauges():
+    gauges = []
+    for path, state in list(_files.items()):
+        labels = {'file': os.path.basename(path)}
+        gauges.append(('chamados_db_free_pages', labels, state['free_pages']))
+        gauges.append(('chamados_db_wal_bytes', labels, state['wal_bytes']))
+    return gauges
+
+
+register_gauges(_maintenance_gauges)
+
+
+def enable_incremental_vacuum():
+    """Switch every file to auto_vacuum=INCREMENTAL (a full VACUUM: run it with the application stopped)"""
+    for _, path in get_database_files():
+        if not os.path.exists(path):
+            continue
+        conn = sqlite3.connect(path, isolation_level=None)
+        try:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                conn.execute("VACUUM")
+            print(f"{path}: auto_vacuum={conn.execute('PRAGMA auto_vacuum').fetchone()[0]}")
+        finally:
+            conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Maintenance of the SQLite database files')
+    parser.add_argument('--run', action='store_true', help='run every task now, ignoring window and thresholds')
+    parser.add_argument('--enable-incremental-vacuum', action='store_true',
+                        help='convert the files to auto_vacuum=INCREMENTAL (full VACUUM, offline)')
+    args = parser.parse_args(argv)
+
+    if args.enable_incremental_vacuum:
+        enable_incremental_vacuum()
+    if args.run:
+        run_maintenance(quiet=True, force=True)
+        for entry in reversed(get_maintenance_log(200)):
+            print(f"{entry['arquivo']}: {entry['tarefa']} {entry['duracao_ms']} ms"
+                  + (f", {entry['paginas']} página(s)" if entry['paginas'] else '')
+                  + (f" ({entry['detalhes']})" if entry['detalhes'] else ''))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
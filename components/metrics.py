@@ -0,0 +1,302 @@
+import functools
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from components.tracing import begin_span, end_span
+
+# Latency buckets in seconds (upper bounds; +Inf is implicit)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Exporters: local HTTP endpoint (127.0.0.1:METRICS_PORT) and/or a text file rewritten periodically
+METRICS_PORT = int(os.environ.get('METRICS_PORT', 0))
+METRICS_FILE = os.environ.get('METRICS_FILE', '')
+METRICS_FILE_INTERVAL = float(os.environ.get('METRICS_FILE_SECONDS', 15))
+
+_lock = threading.Lock()
+_histograms = {}   # (name, label key, label value) -> Histogram
+_counters = {}     # (name, label key, label value) -> int
+_gauge_collectors = []  # callables returning [(name, labels dict, value)]
+_exporters_started = False
+
+HELP = {
+    'chamados_db_query_seconds': 'Latency of components.database functions',
+    'chamados_db_connections_total': 'SQLite connections opened',
+    'chamados_db_errors_total': 'Exceptions raised by components.database functions',
+    'chamados_db_lock_errors_total': 'Calls that failed because the database was locked/busy',
+    'chamados_page_render_seconds': 'Streamlit page script run duration',
+    'chamados_slow_queries_total': 'Statements over SLOW_QUERY_MS written to the slow-query log',
+    'chamados_api_request_seconds': 'Latency of JSON API requests, per route',
+    'chamados_api_responses_total': 'JSON API responses, per status code',
+    'chamados_notifications_total': 'Outbox rows processed by the notification dispatcher, per result',
+    'chamados_notification_messages_total': 'Notification digests delivered, per channel',
+    'chamados_notification_dispatch_seconds': 'Duration of a notification dispatch batch, per channel',
+    'chamados_report_build_seconds': 'Duration of a scheduled report build, per report',
+    'chamados_auto_assignments_total': 'Automatic assignment attempts, per result',
+    'chamados_open_tickets_reloads_total': 'Refreshes of the in-memory open-ticket set, per kind',
+    'chamados_alert_events_spilled_total': 'Queued alert events written to the spool directory after their batch failed',
+    'chamados_maintenance_statement_seconds': 'Duration of one maintenance statement (bounds its lock hold), per task',
+    'chamados_maintenance_pages_reclaimed_total': 'Free pages released by incremental vacuum, per database file',
+    'chamados_maintenance_postponed_total': 'Maintenance passes skipped because the database was busy, per file',
+    'chamados_backup_seconds': 'Duration of the backup of one database file (copy, checks and compression)',
+    'chamados_backup_step_seconds': 'Duration of one online backup step, per database file',
+    'chamados_backups_total': 'Backup runs, per result',
+}
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram (Prometheus semantics)"""
+
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                break
+        else:
+            index = len(LATENCY_BUCKETS)
+        self.counts[index] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate a quantile by linear interpolation inside its bucket"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for index, bucket_count in enumerate(self.counts):
+            upper = LATENCY_BUCKETS[index] if index < len(LATENCY_BUCKETS) else LATENCY_BUCKETS[-1]
+            if seen + bucket_count >= rank and bucket_count:
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+            lower = upper
+        return LATENCY_BUCKETS[-1]
+
+
+def observe(name, label, value, seconds):
+    """Record one observation in a labelled histogram"""
+    with _lock:
+        histogram = _histograms.get((name, label, value))
+        if histogram is None:
+            histogram = _histograms[(name, label, value)] = Histogram()
+        histogram.observe(seconds)
+
+
+def inc(name, label=None, value=None, amount=1):
+    """Increment a (optionally labelled) counter"""
+    with _lock:
+        _counters[(name, label, value)] = _counters.get((name, label, value), 0) + amount
+
+
+def register_gauges(collector):
+    """Register a callable returning [(name, labels dict, value)] evaluated at export time.
+
+    Names ending in _total are exported as counters.
+    """
+    if collector not in _gauge_collectors:
+        _gauge_collectors.append(collector)
+
+
+def _is_lock_error(error):
+    """SQLite contention: 'database is locked' / 'database table is locked' / busy"""
+    return isinstance(error, sqlite3.OperationalError) and (
+        'locked' in str(error) or 'busy' in str(error))
+
+
+def timed(func, name='chamados_db_query_seconds', label='function'):
+    """Wrap a function so each call's latency (and failures) are recorded, and traced as a span"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        handle = begin_span(func.__name__, 'db')
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            inc('chamados_db_errors_total', label, func.__name__)
+            if _is_lock_error(e):
+                inc('chamados_db_lock_errors_total', label, func.__name__)
+            raise
+        finally:
+            observe(name, label, func.__name__, time.perf_counter() - start)
+            end_span(handle)
+    wrapper.__wrapped_for_metrics__ = True
+    return wrapper
+
+
+def instrument_module(namespace, exclude=()):
+    """Wrap every public function defined in a module namespace (call at the module bottom)"""
+    module_name = namespace['__name__']
+    for attr, value in list(namespace.items()):
+        if (callable(value) and getattr(value, '__module__', None) == module_name
+                and not attr.startswith('_') and attr not in exclude
+                and not isinstance(value, type)
+                and not getattr(value, '__wrapped_for_metrics__', False)):
+            namespace[attr] = timed(value)
+
+
+def count_connections(connect):
+    """Wrap a connection factory so opened connections are counted"""
+    @functools.wraps(connect)
+    def wrapper(*args, **kwargs):
+        inc('chamados_db_connections_total')
+        return connect(*args, **kwargs)
+    wrapper.__wrapped_for_metrics__ = True
+    return wrapper
+
+
+@contextmanager
+def page_timer(page):
+    """Measure one Streamlit script run of a page"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe('chamados_page_render_seconds', 'page', page, time.perf_counter() - start)
+
+
+def observe_page_render(page, start):
+    """Record a page run that started at time.perf_counter() value `start`"""
+    observe('chamados_page_render_seconds', 'page', page, time.perf_counter() - start)
+
+
+def get_histogram_summary(name):
+    """Per-label calls, total/avg/p50/p95/p99 seconds of a histogram, slowest total first"""
+    with _lock:
+        items = [(value, h.count, h.total, h.quantile(0.5), h.quantile(0.95), h.quantile(0.99))
+                 for (n, _, value), h in _histograms.items() if n == name]
+    rows = [{'nome': value, 'chamadas': count, 'total_s': total,
+             'media_ms': total / count * 1000 if count else 0.0,
+             'p50_ms': p50 * 1000, 'p95_ms': p95 * 1000, 'p99_ms': p99 * 1000}
+            for value, count, total, p50, p95, p99 in items]
+    return sorted(rows, key=lambda row: row['total_s'], reverse=True)
+
+
+def collect_counters():
+    """Snapshot of the counters as (name, labels dict, value)"""
+    with _lock:
+        return [(name, {label: value} if label else None, amount)
+                for (name, label, value), amount in _counters.items()]
+
+
+def collect_gauges():
+    """Evaluate every registered gauge collector (a failing collector is skipped)"""
+    gauges = []
+    for collector in list(_gauge_collectors):
+        try:
+            gauges.extend(collector())
+        except Exception:
+            pass
+    return gauges
+
+
+def _escape(value):
+    """Escape a label value for the text format"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def render_prometheus():
+    """All metrics in the Prometheus text exposition format"""
+    with _lock:
+        histograms = {key: (list(h.counts), h.total, h.count) for key, h in _histograms.items()}
+        counters = dict(_counters)
+
+    lines = []
+    for name in sorted({key[0] for key in histograms}):
+        lines.append(f"# HELP {name} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} histogram")
+        for (n, label, value), (counts, total, count) in sorted(histograms.items()):
+            if n != name:
+                continue
+            cumulative = 0
+            for bound, bucket_count in zip(LATENCY_BUCKETS + ('+Inf',), counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels({label: value, 'le': bound})} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels({label: value})} {total:.6f}")
+            lines.append(f"{name}_count{_format_labels({label: value})} {count}")
+
+    for name in sorted({key[0] for key in counters}):
+        lines.append(f"# HELP {name} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} counter")
+        for (n, label, value), amount in sorted(counters.items(), key=lambda item: str(item[0])):
+            if n == name:
+                lines.append(f"{name}{_format_labels({label: value} if label else None)} {amount}")
+
+    gauges = collect_gauges()
+    for name in sorted({gauge[0] for gauge in gauges}):
+        # Collectors may expose monotonic counters kept elsewhere (e.g. cache hits)
+        lines.append(f"# TYPE {name} {'counter' if name.endswith('_total') else 'gauge'}")
+        for n, labels, value in gauges:
+            if n == name:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+
+    return '\n'.join(lines) + '\n'
+
+
+def write_metrics_file(path=None):
+    """Atomically write the current metrics to a text file (node_exporter textfile style)"""
+    path = path or METRICS_FILE
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(render_prometheus())
+    os.replace(tmp_path, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render_prometheus().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _write_file_loop():
+    while True:
+        try:
+            write_metrics_file()
+        except Exception:
+            pass
+        time.sleep(METRICS_FILE_INTERVAL)
+
+
+def start_metrics_exporters():
+    """Start the configured exporters once per process (METRICS_PORT / METRICS_FILE)"""
+    global _exporters_started
+    with _lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+
+    if METRICS_PORT:
+        try:
+            server = ThreadingHTTPServer(('127.0.0.1', METRICS_PORT), _MetricsHandler)
+        except OSError:
+            pass  # Port taken (e.g. another server process already exports)
+        else:
+            threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    if METRICS_FILE:
+        threading.Thread(target=_write_file_loop, name='metrics-file', daemon=True).start()
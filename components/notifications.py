@@ -0,0 +1,279 @@
+"""Background delivery of the notification outbox (table notificacoes).
+
+State changes write outbox rows in their own transaction
+(database.queue_notifications); this dispatcher wakes every
+NOTIFY_DIGEST_SECONDS, leases the due rows, sends one digest per recipient
+through the configured channel and retries failures with exponential backoff.
+Channels: 'smtp' (SMTP_* settings; for development point it at a local
+stand-in such as `python -m aiosmtpd -n -l localhost:1025`), 'file' (one .eml
+per digest under NOTIFY_FILE_DIR) or any factory added with register_channel.
+
+    python -m components.notifications --once    # dispatch what is due now and exit
+"""
+import argparse
+import os
+import random
+import smtplib
+import sys
+import threading
+import time
+import uuid
+from datetime import timedelta
+from email.message import EmailMessage
+from itertools import groupby
+
+from components.database import (
+    claim_notifications, get_current_time, get_notification_backlog, mark_notifications_failed,
+    mark_notifications_sent, purge_notifications
+)
+from components.metrics import inc, observe, register_gauges
+from utils.business_calendar import parse_db_timestamp
+
+# Delivery channel: smtp, file, or empty to keep rows in the outbox without sending
+NOTIFY_CHANNEL = os.environ.get('NOTIFY_CHANNEL', 'file')
+# Notifications of a recipient within this interval go out as one digest
+NOTIFY_DIGEST_SECONDS = float(os.environ.get('NOTIFY_DIGEST_SECONDS', 60))
+NOTIFY_BATCH_SIZE = int(os.environ.get('NOTIFY_BATCH_SIZE', 1000))
+# Retries wait base * 2^attempt (with jitter, capped); after NOTIFY_MAX_ATTEMPTS a row is marked Falhou
+NOTIFY_MAX_ATTEMPTS = int(os.environ.get('NOTIFY_MAX_ATTEMPTS', 6))
+NOTIFY_RETRY_BASE_SECONDS = float(os.environ.get('NOTIFY_RETRY_BASE_SECONDS', 30))
+NOTIFY_RETRY_MAX_SECONDS = float(os.environ.get('NOTIFY_RETRY_MAX_SECONDS', 3600))
+NOTIFY_FILE_DIR = os.environ.get('NOTIFY_FILE_DIR', os.path.join('data', 'notificacoes'))
+NOTIFY_RETENTION_DAYS = float(os.environ.get('NOTIFY_RETENTION_DAYS', 30))
+SMTP_SERVER = os.environ.get('SMTP_SERVER', 'localhost')
+SMTP_PORT = int(os.environ.get('SMTP_PORT', 25))
+SMTP_USERNAME = os.environ.get('SMTP_USERNAME', '')
+SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD', '')
+EMAIL_FROM = os.environ.get('EMAIL_FROM', 'chamados@localhost')
+# Rows a dispatcher leases stay invisible to other dispatchers for this long
+LEASE_SECONDS = 600
+PURGE_INTERVAL = 3600
+
+TIPO_LABELS = {
+    'atribuicao': 'Atribuição',
+    'status': 'Status',
+    'mensagem': 'Mensagem',
+}
+
+_lock = threading.Lock()
+_thread = None
+
+
+class PermanentDeliveryError(Exception):
+    """The recipient cannot be reached on this channel; the rows are not retried"""
+
+
+class FileChannel:
+    """Writes each digest as an .eml file (development, or a pickup directory for another mailer)"""
+
+    name = 'file'
+
+    def __init__(self, directory=None):
+        self.directory = directory or NOTIFY_FILE_DIR
+
+    def open(self):
+        os.makedirs(self.directory, exist_ok=True)
+
+    def send(self, message):
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{message['X-Chamados-Destinatario']}-{uuid.uuid4().hex[:8]}.eml"
+        path = os.path.join(self.directory, name)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(message.as_bytes())
+        os.replace(path + '.tmp', path)
+
+    def close(self):
+        pass
+
+
+class SmtpChannel:
+    """One SMTP session per dispatch batch (STARTTLS when offered, login when SMTP_USERNAME is set)"""
+
+    name = 'smtp'
+
+    def __init__(self, host=None, port=None, username=None, password=None):
+        self.host, self.port = host or SMTP_SERVER, port or SMTP_PORT
+        self.username = SMTP_USERNAME if username is None else username
+        self.password = SMTP_PASSWORD if password is None else password
+        self._smtp = None
+
+    def open(self):
+        self._smtp = smtplib.SMTP(self.host, self.port, timeout=30)
+        self._smtp.ehlo()
+        if self._smtp.has_extn('starttls'):
+            self._smtp.starttls()
+            self._smtp.ehlo()
+        if self.username:
+            self._smtp.login(self.username, self.password)
+
+    def send(self, message):
+        if not message['To']:
+            raise PermanentDeliveryError('destinatário sem e-mail cadastrado')
+        try:
+            self._smtp.send_message(message)
+        except smtplib.SMTPRecipientsRefused as e:
+            raise PermanentDeliveryError(f"destinatário recusado: {e.recipients}")
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+
+CHANNELS = {'file': FileChannel, 'smtp': SmtpChannel}
+
+
+def register_channel(name, factory):
+    """Add a delivery channel: factory() returns an object with open(), send(EmailMessage) and close()"""
+    CHANNELS[name] = factory
+
+
+def build_digest(rows):
+    """One e-mail for all claimed rows of a recipient"""
+    _, _, username, nome, email = rows[0][:5]
+    if len(rows) == 1:
+        chamado_id, titulo, tipo = rows[0][5:8]
+        subject = f"[Chamado #{chamado_id}] {TIPO_LABELS.get(tipo, tipo)}: {titulo or ''}".strip()
+    else:
+        subject = f"{len(rows)} atualizações dos seus chamados"
+
+    lines = [f"Olá, {nome or username}.", ""]
+    for row in rows:
+        chamado_id, titulo, tipo, mensagem, data_criacao = row[5:10]
+        lines.append(f"• {data_criacao} · Chamado #{chamado_id} ({titulo or 'sem título'})")
+        lines.append(f"  {TIPO_LABELS.get(tipo, tipo)}: {mensagem}")
+    lines += ["", "Sistema de Chamados de TI"]
+
+    message = EmailMessage()
+    message['Subject'] = subject
+    message['From'] = EMAIL_FROM
+    message['To'] = email or ''
+    message['X-Chamados-Destinatario'] = username
+    message.set_content('\n'.join(lines))
+    return message
+
+
+def _retry_at(attempts):
+    """Next attempt after `attempts` failures, or None once NOTIFY_MAX_ATTEMPTS is reached"""
+    if attempts >= NOTIFY_MAX_ATTEMPTS:
+        return None
+    delay = min(NOTIFY_RETRY_BASE_SECONDS * 2 ** (attempts - 1), NOTIFY_RETRY_MAX_SECONDS)
+    moment = get_current_time() + timedelta(seconds=delay * random.uniform(0.5, 1.5))
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _fail(rows, error, permanent=False):
+    ids = [row[0] for row in rows]
+    retry_at = None if permanent else _retry_at(max(row[10] for row in rows) + 1)
+    mark_notifications_failed(ids, error, retry_at)
+    inc('chamados_notifications_total', 'resultado', 'retentativa' if retry_at else 'falhou', amount=len(ids))
+
+
+def dispatch_once(channel, limit=None):
+    """Send one batch of due notifications; returns how many outbox rows were claimed"""
+    rows = claim_notifications(uuid.uuid4().hex, limit or NOTIFY_BATCH_SIZE, LEASE_SECONDS)
+    if not rows:
+        return 0
+
+    start = time.perf_counter()
+    try:
+        channel.open()
+    except Exception as e:
+        for _, recipient_rows in groupby(rows, key=lambda row: row[1]):
+            _fail(list(recipient_rows), f"{type(e).__name__}: {e}")
+        return len(rows)
+
+    sent, digests = [], 0
+    try:
+        for _, recipient_rows in groupby(rows, key=lambda row: row[1]):
+            recipient_rows = list(recipient_rows)
+            try:
+                channel.send(build_digest(recipient_rows))
+            except PermanentDeliveryError as e:
+                _fail(recipient_rows, str(e), permanent=True)
+            except Exception as e:
+                _fail(recipient_rows, f"{type(e).__name__}: {e}")
+            else:
+                sent.extend(row[0] for row in recipient_rows)
+                digests += 1
+    finally:
+        channel.close()
+
+    mark_notifications_sent(sent)
+    inc('chamados_notifications_total', 'resultado', 'enviada', amount=len(sent))
+    inc('chamados_notification_messages_total', 'canal', channel.name, amount=digests)
+    observe('chamados_notification_dispatch_seconds', 'canal', channel.name, time.perf_counter() - start)
+    return len(rows)
+
+
+def _purge():
+    cutoff = get_current_time() - timedelta(days=NOTIFY_RETENTION_DAYS)
+    purge_notifications(cutoff.strftime('%Y-%m-%d %H:%M:%S'))
+
+
+def _run(channel):
+    last_purge = 0.0
+    while True:
+        try:
+            # A full batch means more is due: keep going until the backlog is drained
+            while dispatch_once(channel) >= NOTIFY_BATCH_SIZE:
+                pass
+            if time.monotonic() - last_purge > PURGE_INTERVAL:
+                _purge()
+                last_purge = time.monotonic()
+        except Exception as e:
+            print(f"notifications: {type(e).__name__}: {e}", file=sys.stderr)
+        time.sleep(NOTIFY_DIGEST_SECONDS)
+
+
+def start_notification_dispatcher():
+    """Start the dispatcher thread once per process (several processes may run one: rows are leased)"""
+    global _thread
+    if not NOTIFY_CHANNEL:
+        return
+    with _lock:
+        if _thread is not None:
+            return
+        channel = CHANNELS[NOTIFY_CHANNEL]()
+        _thread = threading.Thread(target=_run, args=(channel,), name='notifications', daemon=True)
+        _thread.start()
+
+
+def _backlog_gauges():
+    pending, oldest = get_notification_backlog()
+    age = 0.0
+    if oldest:
+        age = max(0.0, (get_current_time().replace(tzinfo=None) - parse_db_timestamp(oldest)).total_seconds())
+    return [('chamados_notifications_pending', {}, pending),
+            ('chamados_notifications_oldest_pending_seconds', {}, round(age, 1))]
+
+
+register_gauges(_backlog_gauges)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Dispatch the notification outbox')
+    parser.add_argument('--once', action='store_true', help='send what is due now and exit')
+    parser.add_argument('--channel', default=NOTIFY_CHANNEL or 'file', choices=sorted(CHANNELS))
+    args = parser.parse_args(argv)
+
+    from components.database import init_database
+    init_database()
+
+    channel = CHANNELS[args.channel]()
+    if not args.once:
+        _run(channel)
+    total = 0
+    while True:
+        claimed = dispatch_once(channel)
+        total += claimed
+        if claimed < NOTIFY_BATCH_SIZE:
+            break
+    print(f"{total} notification(s) processed")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
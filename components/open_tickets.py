@@ -0,0 +1,165 @@
+"""Process-wide in-memory working set of the open tickets (Pendente / Em Andamento).
+
+Loaded once, then kept current two ways:
+- Writes made through components.database in this process reach the ticket
+  listener and are applied on the next read.
+- Writes from other processes show up in the ticket version (see
+  components.database.get_ticket_version; chat, history and our own writes
+  leave it alone). It is checked at most every OPEN_TICKETS_CHECK_SECONDS,
+  and a change reloads the set.
+
+Records are compact slotted objects kept in the assignment engine's order
+(auto_assign.assignment_key: priority, SLA deadline, opening date), with
+secondary indexes by status, technician, requester and sector. Records are
+replaced, never modified, so a list returned to a page stays consistent while
+it is being rendered.
+"""
+import bisect
+import os
+import threading
+import time
+
+from components.auto_assign import assignment_key
+from components.database import get_open_ticket_rows, get_ticket_version, register_chamado_listener
+from components.metrics import inc, register_gauges
+
+OPEN_TICKETS_CHECK_SECONDS = float(os.environ.get('OPEN_TICKETS_CHECK_SECONDS', 1))
+
+OPEN_STATUSES = ('Pendente', 'Em Andamento')
+
+
+class OpenTicket:
+    """One open ticket; `key` is its position in the assignment order"""
+
+    __slots__ = ('id', 'titulo', 'descricao', 'setor', 'prioridade', 'status', 'solicitante', 'tecnico',
+                 'data_abertura', 'data_resolucao', 'sla_prazo', 'solicitante_id', 'tecnico_id', 'versao', 'key')
+
+    def __init__(self, row):
+        (self.id, self.titulo, self.descricao, self.setor, self.prioridade, self.status, self.solicitante,
+         self.tecnico, self.data_abertura, self.data_resolucao, self.sla_prazo, self.solicitante_id,
+         self.tecnico_id, self.versao) = row
+        self.key = (*assignment_key(self.prioridade, self.sla_prazo, self.data_abertura), self.id)
+
+    def as_row(self):
+        """The ticket in the get_chamados() tuple layout"""
+        return (self.id, self.titulo, self.descricao, self.setor, self.prioridade, self.status, self.solicitante,
+                self.tecnico, self.data_abertura, self.data_resolucao, self.sla_prazo)
+
+
+_lock = threading.Lock()
+_dirty_lock = threading.Lock()
+_records = {}        # chamado_id -> OpenTicket
+_order = []          # sorted OpenTicket.key of every record
+_indexes = {         # field -> value -> set of chamado_id
+    'status': {},
+    'tecnico_id': {},
+    'solicitante_id': {},
+    'setor': {},
+}
+_dirty = set()       # tickets written by this process since the last read
+_version = None      # get_ticket_version() the set reflects (None = not loaded)
+_next_check = 0.0
+
+
+def _remove(chamado_id):
+    record = _records.pop(chamado_id, None)
+    if record is None:
+        return
+    del _order[bisect.bisect_left(_order, record.key)]
+    for field, index in _indexes.items():
+        ids = index.get(getattr(record, field))
+        ids.discard(chamado_id)
+        if not ids:
+            del index[getattr(record, field)]
+
+
+def _index(record):
+    _records[record.id] = record
+    for field, index in _indexes.items():
+        index.setdefault(getattr(record, field), set()).add(record.id)
+
+
+def _add(row):
+    record = OpenTicket(row)
+    _index(record)
+    bisect.insort(_order, record.key)
+
+
+def _reload():
+    global _version
+    version, rows = get_open_ticket_rows()
+    _records.clear()
+    for index in _indexes.values():
+        index.clear()
+    for row in rows:
+        _index(OpenTicket(row))
+    _order[:] = sorted(record.key for record in _records.values())
+    _version = version
+    inc('chamados_open_tickets_reloads_total', 'tipo', 'completa')
+
+
+def _sync():
+    """Bring the set up to date (caller holds _lock)"""
+    global _next_check
+    if _version is None:
+        register_chamado_listener(_on_chamado_changed)
+        with _dirty_lock:
+            _dirty.clear()
+        _reload()
+        _next_check = time.monotonic() + OPEN_TICKETS_CHECK_SECONDS
+        return
+
+    with _dirty_lock:
+        dirty = set(_dirty)
+        _dirty.clear()
+    if dirty:
+        # Our own writes: apply them now (read-your-writes); they do not move the version
+        _, rows = get_open_ticket_rows(dirty)
+        for chamado_id in dirty:
+            _remove(chamado_id)
+        for row in rows:
+            if row[5] in OPEN_STATUSES:
+                _add(row)
+        inc('chamados_open_tickets_reloads_total', 'tipo', 'parcial')
+
+    if time.monotonic() >= _next_check:
+        if get_ticket_version() != _version:
+            _reload()
+        _next_check = time.monotonic() + OPEN_TICKETS_CHECK_SECONDS
+
+
+def _on_chamado_changed(chamado_id):
+    """Listener registered in components.database"""
+    with _dirty_lock:
+        _dirty.add(chamado_id)
+
+
+def get_open_tickets(status=None, tecnico_id=None, solicitante_id=None, setor=None):
+    """Open tickets matching every given filter, in assignment order (highest priority, then earliest SLA deadline)"""
+    filters = {'status': status, 'tecnico_id': tecnico_id, 'solicitante_id': solicitante_id, 'setor': setor}
+    with _lock:
+        _sync()
+        selected = None
+        for field, value in filters.items():
+            if value is not None:
+                ids = _indexes[field].get(value, set())
+                selected = ids if selected is None else selected & ids
+        if selected is None:
+            return [_records[key[-1]] for key in _order]
+        return sorted((_records[chamado_id] for chamado_id in selected), key=lambda record: record.key)
+
+
+def count_open_tickets(field, value):
+    """Number of open tickets with a field value (status, tecnico_id, solicitante_id or setor)"""
+    with _lock:
+        _sync()
+        return len(_indexes[field].get(value, ()))
+
+
+def _working_set_gauges():
+    if _version is None:
+        return []
+    return [('chamados_open_tickets_cached', None, len(_records))]
+
+
+register_gauges(_working_set_gauges)
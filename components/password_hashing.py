@@ -0,0 +1,157 @@
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+try:
+    import bcrypt
+except ImportError:  # bcrypt is optional, scrypt from hashlib is always available
+    bcrypt = None
+
+# KDF used for new hashes: 'bcrypt' (default when installed) or 'scrypt'
+HASH_SCHEME = os.environ.get('PASSWORD_HASH_SCHEME', 'bcrypt' if bcrypt else 'scrypt')
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+SCRYPT_N = int(os.environ.get('SCRYPT_N', 2 ** 14))
+SCRYPT_R = int(os.environ.get('SCRYPT_R', 8))
+SCRYPT_P = int(os.environ.get('SCRYPT_P', 1))
+
+# Bounded worker pool: both KDFs release the GIL, so threads hash in parallel
+HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 2))
+HASH_QUEUE_LIMIT = int(os.environ.get('PASSWORD_HASH_QUEUE_LIMIT', HASH_WORKERS * 4))
+HASH_QUEUE_TIMEOUT = float(os.environ.get('PASSWORD_HASH_QUEUE_TIMEOUT', 2))
+
+# Per-username throttling of failed attempts
+THROTTLE_MAX_FAILURES = int(os.environ.get('LOGIN_THROTTLE_MAX_FAILURES', 5))
+THROTTLE_WINDOW = float(os.environ.get('LOGIN_THROTTLE_WINDOW_SECONDS', 300))
+
+
+class HashingBusyError(Exception):
+    """Raised when the hashing queue is full; the caller should retry shortly"""
+
+
+class LoginThrottledError(Exception):
+    """Raised when a username exceeded its failed-attempt budget"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Too many failed attempts, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix='password-hash')
+_slots = threading.BoundedSemaphore(HASH_QUEUE_LIMIT)
+_failures = {}  # username -> deque of failure timestamps
+_failures_lock = threading.Lock()
+
+
+def _run_bounded(func, *args):
+    """Run a KDF call on the pool, refusing work when the queue is full"""
+    if not _slots.acquire(timeout=HASH_QUEUE_TIMEOUT):
+        raise HashingBusyError("Password hashing queue is full")
+    try:
+        return _executor.submit(func, *args).result()
+    finally:
+        _slots.release()
+
+
+def _is_legacy(stored):
+    """Unsalted SHA-256 hex digests written by earlier versions"""
+    return len(stored) == 64 and all(c in '0123456789abcdef' for c in stored)
+
+
+def _scrypt(password, salt, n, r, p):
+    """Derive a scrypt key with enough memory allowance for the given cost"""
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=128 * n * r * p * 2, dklen=32)
+
+
+def _hash(password):
+    """Hash a password with the configured scheme (runs on a pool thread)"""
+    if HASH_SCHEME == 'bcrypt' and bcrypt:
+        return bcrypt.hashpw(password.encode(), bcrypt.gensalt(BCRYPT_ROUNDS)).decode()
+
+    salt = secrets.token_bytes(16)
+    digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return '$'.join(['scrypt', str(SCRYPT_N), str(SCRYPT_R), str(SCRYPT_P),
+                     base64.b64encode(salt).decode(), base64.b64encode(digest).decode()])
+
+
+def _verify(password, stored):
+    """Check a password against a bcrypt, scrypt or legacy SHA-256 hash"""
+    if stored.startswith('$2'):
+        if not bcrypt:
+            return False
+        return bcrypt.checkpw(password.encode(), stored.encode())
+
+    if stored.startswith('scrypt$'):
+        _, n, r, p, salt, digest = stored.split('$')
+        candidate = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+        return hmac.compare_digest(candidate, base64.b64decode(digest))
+
+    if _is_legacy(stored):
+        return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored)
+
+    return False
+
+
+def needs_rehash(stored):
+    """Check whether a stored hash is legacy or weaker than the current settings"""
+    if stored.startswith('$2'):
+        return HASH_SCHEME != 'bcrypt' or int(stored.split('$')[2]) < BCRYPT_ROUNDS
+    if stored.startswith('scrypt$'):
+        if HASH_SCHEME == 'bcrypt' and bcrypt:
+            return True
+        n, r, p = (int(v) for v in stored.split('$')[1:4])
+        return n < SCRYPT_N or r < SCRYPT_R or p < SCRYPT_P
+    return True
+
+
+def hash_password(password):
+    """Hash a password with the configured KDF (salted, runs on the bounded pool)"""
+    return _run_bounded(_hash, password)
+
+
+def verify_password(password, stored):
+    """Verify a password against any supported hash format"""
+    return _run_bounded(_verify, password, stored or '')
+
+
+@lru_cache(maxsize=1)
+def _dummy_hash():
+    """Hash verified against unknown usernames so they cost the same as real ones"""
+    return _hash(secrets.token_urlsafe(16))
+
+
+def burn_verification(password):
+    """Spend one verification on a dummy hash (unknown user, same timing)"""
+    verify_password(password, _dummy_hash())
+
+
+def check_throttle(username):
+    """Raise LoginThrottledError if the username has too many recent failures"""
+    now = time.monotonic()
+    with _failures_lock:
+        attempts = _failures.get(username)
+        if not attempts:
+            return
+        while attempts and now - attempts[0] > THROTTLE_WINDOW:
+            attempts.popleft()
+        if len(attempts) >= THROTTLE_MAX_FAILURES:
+            raise LoginThrottledError(THROTTLE_WINDOW - (now - attempts[0]))
+
+
+def register_failure(username):
+    """Record a failed login attempt for throttling"""
+    with _failures_lock:
+        _failures.setdefault(username, deque(maxlen=THROTTLE_MAX_FAILURES)).append(time.monotonic())
+
+
+def reset_failures(username):
+    """Forget failed attempts after a successful login"""
+    with _failures_lock:
+        _failures.pop(username, None)
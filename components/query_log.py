@@ -0,0 +1,226 @@
+import json
+import logging
+import logging.handlers
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+from components.metrics import inc
+
+# Statements slower than this (execute + fetch time) are logged; negative disables profiling
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG', os.path.join('data', 'slow_queries.jsonl'))
+SLOW_QUERY_LOG_MAX_BYTES = int(os.environ.get('SLOW_QUERY_LOG_MAX_BYTES', 5 * 1024 * 1024))
+SLOW_QUERY_LOG_BACKUPS = int(os.environ.get('SLOW_QUERY_LOG_BACKUPS', 3))
+
+# Only these statements have a query plan worth capturing
+_EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT')
+_PLAN_CACHE_SIZE = 256
+
+_logger = logging.getLogger('chamados.slow_queries')
+_logger.propagate = False
+_logger_lock = threading.Lock()
+_plans = OrderedDict()  # sql -> plan lines (one EXPLAIN per distinct statement)
+_plans_lock = threading.Lock()
+
+# Frames skipped when looking for the caller: this module and the metrics wrappers
+_OWN_FILES = tuple(os.path.normcase(os.path.join(os.path.dirname(os.path.abspath(__file__)), name))
+                   for name in ('query_log.py', 'metrics.py'))
+_DATABASE_FILE = os.path.normcase(os.path.join('components', 'database.py'))
+
+
+def profiling_enabled():
+    """Whether get_connection should hand out profiled connections"""
+    return SLOW_QUERY_MS >= 0
+
+
+def _get_logger():
+    """Rotating JSONL handler, created on the first slow query"""
+    with _logger_lock:
+        if not _logger.handlers:
+            os.makedirs(os.path.dirname(SLOW_QUERY_LOG) or '.', exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                SLOW_QUERY_LOG, maxBytes=SLOW_QUERY_LOG_MAX_BYTES,
+                backupCount=SLOW_QUERY_LOG_BACKUPS, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            _logger.addHandler(handler)
+            _logger.setLevel(logging.INFO)
+    return _logger
+
+
+def _shape(value):
+    """Type (and length of text/blob) of a bound parameter, never its value"""
+    if value is None:
+        return 'null'
+    if isinstance(value, (str, bytes)):
+        return f"{type(value).__name__}({len(value)})"
+    return type(value).__name__
+
+
+def parameter_shape(params):
+    """Shape of the parameters bound to a statement"""
+    if params is None:
+        return []
+    if isinstance(params, dict):
+        return {key: _shape(value) for key, value in params.items()}
+    return [_shape(value) for value in params]
+
+
+def _caller():
+    """The components.database function and the page/module line that issued the statement"""
+    funcao = origem = None
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = os.path.normcase(os.path.abspath(frame.f_code.co_filename))
+        if filename not in _OWN_FILES and 'sqlite3' not in filename:
+            if funcao is None and filename.endswith(_DATABASE_FILE):
+                funcao = frame.f_code.co_name
+            elif not filename.endswith(_DATABASE_FILE):
+                origem = f"{os.path.relpath(frame.f_code.co_filename)}:{frame.f_lineno} ({frame.f_code.co_name})"
+                break
+        frame = frame.f_back
+    return funcao, origem
+
+
+def _query_plan(connection, sql, params):
+    """EXPLAIN QUERY PLAN lines of a statement (cached per statement text)"""
+    if not sql.lstrip().upper().startswith(_EXPLAINABLE):
+        return None
+    with _plans_lock:
+        if sql in _plans:
+            _plans.move_to_end(sql)
+            return _plans[sql]
+    try:
+        cursor = sqlite3.Cursor(connection)
+        rows = cursor.execute('EXPLAIN QUERY PLAN ' + sql, params if params is not None else ()).fetchall()
+        cursor.close()
+        plan = [row[-1] for row in rows]
+    except sqlite3.Error as e:
+        plan = [f"(plano indisponível: {e})"]
+    with _plans_lock:
+        _plans[sql] = plan
+        if len(_plans) > _PLAN_CACHE_SIZE:
+            _plans.popitem(last=False)
+    return plan
+
+
+def record_slow_query(connection, sql, params, duration, rows=None, many=False):
+    """Write one slow statement to the JSONL log"""
+    funcao, origem = _caller()
+    plan = _query_plan(connection, sql, (params[0] if params else None) if many else params)
+    entry = {
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'duracao_ms': round(duration * 1000, 3),
+        'sql': ' '.join(sql.split()),
+        'parametros': (
+            {'linhas': len(params), 'formato': parameter_shape(params[0]) if params else []}
+            if many else parameter_shape(params)),
+        'linhas': rows,  # None when the result was not fully fetched at logging time
+        'funcao': funcao,
+        'origem': origem,
+        'plano': plan,
+        'full_scan': any(line.startswith('SCAN ') and 'USING' not in line for line in plan or []),
+        'temp_btree': any('TEMP B-TREE' in line for line in plan or []),
+    }
+    inc('chamados_slow_queries_total', 'function', funcao or 'desconhecida')
+    _get_logger().info(json.dumps(entry, ensure_ascii=False, default=str))
+
+
+class ProfilingCursor(sqlite3.Cursor):
+    """Cursor that times each statement across execute and fetches"""
+
+    def _begin(self, sql, params, many=False):
+        self._sql, self._params, self._many = sql, params, many
+        self._elapsed = 0.0
+        self._rows = 0
+        self._logged = False
+
+    def _account(self, start, rows=0, done=False):
+        if not hasattr(self, '_sql'):
+            return
+        self._elapsed += time.perf_counter() - start
+        self._rows += rows
+        if not self._logged and self._elapsed * 1000 >= SLOW_QUERY_MS:
+            self._logged = True
+            try:
+                record_slow_query(self.connection, self._sql, self._params,
+                                  self._elapsed, self._rows if done else None, self._many)
+            except Exception:
+                pass  # Profiling never breaks a query
+
+    def execute(self, sql, params=()):
+        self._begin(sql, params)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            self._account(start)
+
+    def executemany(self, sql, seq_of_params):
+        seq_of_params = list(seq_of_params)
+        self._begin(sql, seq_of_params, many=True)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_params)
+        finally:
+            self._account(start, len(seq_of_params), done=True)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._account(start, 1 if row is not None else 0, done=row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(size if size is not None else self.arraysize)
+        self._account(start, len(rows), done=not rows)
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._account(start, done=True)
+            raise
+        self._account(start, 1)
+        return row
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._account(start, len(rows), done=True)
+        return rows
+
+
+class ProfilingConnection(sqlite3.Connection):
+    """Connection whose cursors (including conn.execute shortcuts) are profiled"""
+
+    def cursor(self, factory=ProfilingCursor):
+        return super().cursor(factory)
+
+    # The C shortcuts bypass Cursor.execute overrides, so route them through a cursor
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+
+def read_slow_queries(limit=100):
+    """Most recent slow-query entries (current log file), newest first"""
+    if not os.path.exists(SLOW_QUERY_LOG):
+        return []
+    with open(SLOW_QUERY_LOG, encoding='utf-8') as f:
+        lines = deque(f, maxlen=limit)
+    entries = []
+    for line in reversed(lines):
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            continue
+    return entries
@@ -0,0 +1,281 @@
+"""Scheduled pre-generation of the directors' reports.
+
+Each report has a cron-like schedule (minute hour day-of-month month
+day-of-week, 0 = Sunday; '*', '*/n', 'a-b' and lists). When a slot comes due
+the scheduler claims it in the reports table (so only one process builds it),
+computes a KPI snapshot and writes the export files into REPORTS_DIR. The
+dashboard shows the latest snapshot unless the user asks for live numbers.
+
+    python -m components.report_scheduler --run diario   # build a report now
+"""
+import argparse
+import os
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from components.database import (
+    claim_report, finish_report, get_analytics_data, get_chamados, get_current_time, get_quick_stats,
+    purge_reports
+)
+from components.metrics import observe
+from utils.business_calendar import compute_resolution_metrics, summarize_resolution_metrics
+
+# Pre-generated files live here (not in the short-lived data/exports)
+REPORTS_DIR = os.environ.get('REPORTS_DIR', os.path.join('data', 'reports'))
+REPORT_RETENTION_DAYS = float(os.environ.get('REPORT_RETENTION_DAYS', 35))
+REPORT_POLL_SECONDS = float(os.environ.get('REPORT_POLL_SECONDS', 30))
+# A run still generating after this long is considered dead and rebuilt
+REPORT_STALE_SECONDS = 3600
+# A slot missed by more than this (server down) is skipped
+MAX_LOOKBACK = timedelta(days=8)
+
+DEFAULT_SCHEDULES = {
+    'kpis': '*/15 * * * *',
+    'diario': '0 6 * * *',
+    'semanal': '0 6 * * 1',
+}
+REPORT_LABELS = {
+    'kpis': '📋 Indicadores',
+    'diario': '📅 Relatório diário',
+    'semanal': '🗓️ Relatório semanal',
+}
+SLA_COLUMNS = ['id', 'titulo', 'prioridade', 'status', 'data_abertura', 'data_resolucao', 'sla_prazo',
+               'horas_uteis', 'sla_status']
+
+_lock = threading.Lock()
+_thread = None
+
+
+def _parse_field(field, low, high):
+    values = set()
+    for part in field.split(','):
+        part, _, step = part.partition('/')
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start, end = (int(value) for value in part.split('-'))
+        else:
+            start = end = int(part)
+            if step:
+                end = high
+        if start < low or end > high or start > end:
+            raise ValueError(f"campo de agenda fora do intervalo: {field}")
+        values.update(range(start, end + 1, int(step or 1)))
+    return frozenset(values)
+
+
+def parse_cron(expression):
+    """Parse 'minute hour day month weekday' into sets of allowed values"""
+    fields = expression.split()
+    if len(fields) != 5:
+        raise ValueError(f"agenda inválida (use 5 campos): {expression!r}")
+    bounds = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+    minute, hour, day, month, weekday = (_parse_field(field, low, high)
+                                         for field, (low, high) in zip(fields, bounds))
+    if 7 in weekday:
+        weekday = weekday | {0}
+    return minute, hour, day, month, weekday
+
+
+def cron_matches(schedule, moment):
+    minute, hour, day, month, weekday = schedule
+    return (moment.minute in minute and moment.hour in hour and moment.day in day
+            and moment.month in month and moment.isoweekday() % 7 in weekday)
+
+
+def last_slot(schedule, now):
+    """Most recent scheduled minute at or before now (None if none within MAX_LOOKBACK)"""
+    moment = now.replace(second=0, microsecond=0)
+    limit = moment - MAX_LOOKBACK
+    while moment > limit:
+        # Skip whole hours/days that cannot match
+        if moment.month not in schedule[3] or moment.day not in schedule[2] \
+                or moment.isoweekday() % 7 not in schedule[4]:
+            moment = moment.replace(hour=0, minute=0) - timedelta(minutes=1)
+        elif moment.hour not in schedule[1]:
+            moment = moment.replace(minute=0) - timedelta(minutes=1)
+        elif moment.minute not in schedule[0]:
+            moment -= timedelta(minutes=1)
+        else:
+            return moment
+    return None
+
+
+def load_schedules():
+    """Report name -> parsed schedule; REPORT_SCHEDULES='diario=0 5 * * *;kpis=*/10 * * * *' overrides"""
+    expressions = dict(DEFAULT_SCHEDULES)
+    for item in os.environ.get('REPORT_SCHEDULES', '').split(';'):
+        name, _, expression = item.partition('=')
+        if name.strip():
+            expressions[name.strip()] = expression.strip()
+    return {name: parse_cron(expression) for name, expression in expressions.items()
+            if name in BUILDERS and expression}
+
+
+def compute_kpis(site=None):
+    """Everything the dashboard's KPI, chart, SLA and monitoring sections show (JSON-serializable).
+
+    With a unit only that unit's file is read; otherwise every unit is read in parallel.
+    """
+    analytics_data = get_analytics_data(site)
+    all_tickets = get_chamados({'site': site} if site else None)
+    resolution_summary = summarize_resolution_metrics(compute_resolution_metrics(all_tickets))
+
+    one_hour_ago = datetime.now() - timedelta(hours=1)
+    recent_tickets, recent_resolutions = [], 0
+    for ticket in all_tickets:
+        try:
+            if datetime.strptime(ticket[8], '%Y-%m-%d %H:%M:%S') >= one_hour_ago:
+                recent_tickets.append(ticket)
+            if ticket[9] and datetime.strptime(ticket[9], '%Y-%m-%d %H:%M:%S') >= one_hour_ago:
+                recent_resolutions += 1
+        except (TypeError, ValueError):
+            continue
+    assigned = len([t for t in recent_tickets if t[7]])
+
+    return {
+        'quick_stats': get_quick_stats(site),
+        'by_status': [list(row) for row in analytics_data['by_status']],
+        'by_priority': [list(row) for row in analytics_data['by_priority']],
+        'by_sector': [list(row) for row in analytics_data['by_sector']],
+        'technician_performance': [list(row) for row in analytics_data['technician_performance']],
+        'resolution_summary': resolution_summary,
+        'high_priority_pending': len([t for t in all_tickets if t[4] == 'Alta' and t[5] == 'Pendente']),
+        'last_hour': {
+            'novos': len(recent_tickets),
+            'resolvidos': recent_resolutions,
+            'taxa_resposta': round(assigned / len(recent_tickets) * 100, 1) if recent_tickets else None,
+        },
+    }
+
+
+def _keep(result, label):
+    """Move an export (path, filename, mime, rows) from data/exports into REPORTS_DIR"""
+    path, filename, mime, rows = result
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    target = os.path.join(REPORTS_DIR, filename)
+    shutil.move(path, target)
+    return {'rotulo': label, 'nome': filename, 'path': os.path.abspath(target), 'mime': mime, 'linhas': rows}
+
+
+def _period_files(prefix, start, end, label):
+    from utils.export_engine import export_chamados, export_technician_report
+
+    suffix = start.strftime('%Y%m%d')
+    files = [
+        _keep(export_chamados('csv.gz', None, start, end, filename_prefix=f"{prefix}_chamados_{suffix}"),
+              f"Chamados ({label})"),
+        _keep(export_chamados('csv.gz', SLA_COLUMNS, start, end, filename_prefix=f"{prefix}_sla_{suffix}"),
+              f"Análise SLA ({label})"),
+    ]
+    if prefix == 'semanal':
+        files.append(_keep(export_technician_report('csv.gz'), 'Desempenho dos técnicos'))
+    return files
+
+
+def _build_kpis(slot):
+    return compute_kpis(), []
+
+
+def _build_daily(slot):
+    day = (slot - timedelta(days=1)).date()
+    return compute_kpis(), _period_files('diario', day, day, day.strftime('%d/%m/%Y'))
+
+
+def _build_weekly(slot):
+    end = (slot - timedelta(days=1)).date()
+    start = end - timedelta(days=6)
+    return compute_kpis(), _period_files('semanal', start, end,
+                                         f"{start.strftime('%d/%m')} a {end.strftime('%d/%m/%Y')}")
+
+
+BUILDERS = {
+    'kpis': _build_kpis,
+    'diario': _build_daily,
+    'semanal': _build_weekly,
+}
+
+
+def run_report(nome, slot):
+    """Build one report run if no other process has; returns True if this call built it"""
+    agendado_para = slot.strftime('%Y-%m-%d %H:%M:%S')
+    stale = (get_current_time() - timedelta(seconds=REPORT_STALE_SECONDS)).strftime('%Y-%m-%d %H:%M:%S')
+    report_id = claim_report(nome, agendado_para, stale)
+    if report_id is None:
+        return False
+
+    start = time.perf_counter()
+    try:
+        dados, arquivos = BUILDERS[nome](slot)
+    except Exception as e:
+        finish_report(report_id, 'Falhou', mensagem=f"{type(e).__name__}: {e}")
+        return True
+    finish_report(report_id, 'Concluído', dados, arquivos,
+                  f"{sum(item['linhas'] for item in arquivos)} linha(s) exportada(s)" if arquivos else None)
+    observe('chamados_report_build_seconds', 'report', nome, time.perf_counter() - start)
+    return True
+
+
+def _purge():
+    cutoff = get_current_time() - timedelta(days=REPORT_RETENTION_DAYS)
+    for path in purge_reports(cutoff.strftime('%Y-%m-%d %H:%M:%S')):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def run_due_reports(schedules, now=None):
+    """Build every report whose latest slot has not been built yet"""
+    now = now or get_current_time().replace(tzinfo=None)
+    for nome, schedule in schedules.items():
+        slot = last_slot(schedule, now)
+        if slot is not None:
+            run_report(nome, slot)
+
+
+def _run(schedules):
+    last_purge = 0.0
+    while True:
+        try:
+            run_due_reports(schedules)
+            if time.monotonic() - last_purge > 3600:
+                _purge()
+                last_purge = time.monotonic()
+        except Exception as e:
+            print(f"report_scheduler: {type(e).__name__}: {e}", file=sys.stderr)
+        time.sleep(REPORT_POLL_SECONDS)
+
+
+def start_report_scheduler():
+    """Start the scheduler thread once per process (several processes are fine: runs are claimed)"""
+    global _thread
+    with _lock:
+        if _thread is not None:
+            return
+        _thread = threading.Thread(target=_run, args=(load_schedules(),), name='report-scheduler', daemon=True)
+        _thread.start()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the directors' scheduled reports")
+    parser.add_argument('--run', nargs='+', choices=sorted(BUILDERS), help='build these reports now')
+    args = parser.parse_args(argv)
+
+    from components.database import init_database
+    init_database()
+
+    if not args.run:
+        _run(load_schedules())
+    now = get_current_time().replace(tzinfo=None, microsecond=0)
+    for nome in args.run:
+        run_report(nome, now)
+        print(f"{nome}: {now}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
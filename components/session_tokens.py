@@ -0,0 +1,135 @@
+import hashlib
+import hmac
+import os
+import secrets
+import tempfile
+import threading
+import time
+
+from components.metrics import register_gauges
+
+# Lifetime of a persisted session and of a cached principal
+SESSION_TTL_HOURS = float(os.environ.get('SESSION_TTL_HOURS', 12))
+PRINCIPAL_CACHE_TTL = float(os.environ.get('PRINCIPAL_CACHE_TTL_SECONDS', 60))
+SECRET_FILE = os.path.join('data', '.session_secret')
+
+_cache = {}          # session key -> (principal, expires_at)
+_keys_by_user = {}   # user id -> set of session keys, for invalidation
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+_secret = None
+
+
+def _create_secret_file():
+    """Create the key file atomically (temp file + link); if another process got there first, keep its key"""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(SECRET_FILE), prefix='.session_secret.')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(secrets.token_hex(32))
+        os.link(temp_path, SECRET_FILE)
+    except FileExistsError:
+        pass
+    finally:
+        os.remove(temp_path)
+
+
+def _get_secret():
+    """Signing key: SECRET_KEY from the environment, else a key persisted under data/"""
+    global _secret
+    if _secret is None:
+        secret = os.environ.get('SECRET_KEY')
+        if not secret:
+            os.makedirs(os.path.dirname(SECRET_FILE), exist_ok=True)
+            if not os.path.exists(SECRET_FILE):
+                _create_secret_file()
+            with open(SECRET_FILE) as f:
+                secret = f.read().strip()
+        _secret = secret.encode()
+    return _secret
+
+
+def _signature(session_id):
+    """HMAC-SHA256 of a session id with the signing key"""
+    return hmac.new(_get_secret(), session_id.encode(), hashlib.sha256).hexdigest()
+
+
+def new_session_token():
+    """Create a signed token; returns (token, session_key) where the key is what gets stored"""
+    session_id = secrets.token_urlsafe(24)
+    return f"{session_id}.{_signature(session_id)}", session_key(session_id)
+
+
+def session_key(session_id):
+    """Database key of a session (the raw id never touches the database)"""
+    return hashlib.sha256(session_id.encode()).hexdigest()
+
+
+def verify_session_token(token):
+    """Check a token's signature; returns its session key or None"""
+    if not token or token.count('.') != 1:
+        return None
+    session_id, signature = token.split('.')
+    if not hmac.compare_digest(signature, _signature(session_id)):
+        return None
+    return session_key(session_id)
+
+
+def get_cached_principal(key):
+    """Return the cached principal for a session key, or None on a miss/expiry"""
+    with _lock:
+        entry = _cache.get(key)
+        if entry and entry[1] > time.monotonic():
+            _stats['hits'] += 1
+            return entry[0]
+        if entry:
+            _drop(key)
+        _stats['misses'] += 1
+        return None
+
+
+def cache_principal(key, principal):
+    """Store a validated principal for PRINCIPAL_CACHE_TTL seconds"""
+    with _lock:
+        _cache[key] = (principal, time.monotonic() + PRINCIPAL_CACHE_TTL)
+        _keys_by_user.setdefault(principal['id'], set()).add(key)
+
+
+def _drop(key):
+    """Remove a cache entry and its user index (caller holds the lock)"""
+    entry = _cache.pop(key, None)
+    if entry:
+        keys = _keys_by_user.get(entry[0]['id'])
+        if keys:
+            keys.discard(key)
+            if not keys:
+                del _keys_by_user[entry[0]['id']]
+
+
+def invalidate_session(key):
+    """Forget one cached session (logout)"""
+    with _lock:
+        _drop(key)
+
+
+def invalidate_user(user_id):
+    """Forget every cached session of a user (profile change, deactivation)"""
+    with _lock:
+        for key in _keys_by_user.pop(user_id, set()):
+            _cache.pop(key, None)
+        _stats['invalidations'] += 1
+
+
+def get_cache_stats():
+    """Hit/miss/invalidation counters and current size of the principal cache"""
+    with _lock:
+        return dict(_stats, size=len(_cache))
+
+
+def _cache_gauges():
+    stats = get_cache_stats()
+    return [(f'chamados_principal_cache_{name}_total', None, stats[name])
+            for name in ('hits', 'misses', 'invalidations')] + [
+        ('chamados_principal_cache_size', None, stats['size'])]
+
+
+register_gauges(_cache_gauges)
@@ -0,0 +1,225 @@
+import heapq
+import os
+import threading
+import time
+from datetime import timedelta
+
+from components.database import (
+    get_current_time, get_sla_tracking_rows, get_active_sla_alerts,
+    apply_sla_alert_transitions, register_chamado_listener
+)
+from components.metrics import register_gauges
+from utils.business_calendar import parse_db_timestamp
+
+# Thresholds that open an alert
+CRITICAL_WINDOW = timedelta(hours=1)
+UNASSIGNED_LIMIT = timedelta(hours=2)
+
+# Safety net for writes made by other processes, which never reach our listener
+RESYNC_INTERVAL = float(os.environ.get('SLA_MONITOR_RESYNC_SECONDS', 300))
+
+OPEN_STATUSES = ('Pendente', 'Em Andamento')
+
+_condition = threading.Condition()
+_heap = []          # (threshold, chamado_id, generation) - next threshold per open ticket
+_generation = {}    # chamado_id -> generation; older heap entries are stale
+_tickets = {}       # chamado_id -> (status, tecnico_id, data_abertura, sla_prazo)
+_active = {}        # chamado_id -> set of active alert types
+_dirty = set()      # tickets changed since the last wake-up
+_resync_requested = False
+_thread = None
+
+
+def _now():
+    """Current local time as a naive datetime (same convention as the stored timestamps)"""
+    return get_current_time().replace(tzinfo=None)
+
+
+def _desired_alerts(ticket, now):
+    """Alert types that should be active for a ticket at a given moment"""
+    status, tecnico_id, abertura, prazo = ticket
+    alerts = set()
+    if status not in OPEN_STATUSES:
+        return alerts
+
+    if prazo is not None:
+        if now >= prazo:
+            alerts.add('vencido')
+        elif now >= prazo - CRITICAL_WINDOW:
+            alerts.add('critico')
+
+    if status == 'Pendente' and tecnico_id is None and abertura is not None:
+        if now >= abertura + UNASSIGNED_LIMIT:
+            alerts.add('nao_atribuido')
+
+    return alerts
+
+
+def _next_threshold(ticket, now):
+    """Earliest future moment at which the ticket's alert set can change"""
+    status, tecnico_id, abertura, prazo = ticket
+    if status not in OPEN_STATUSES:
+        return None
+
+    candidates = []
+    if prazo is not None:
+        candidates += [prazo - CRITICAL_WINDOW, prazo]
+    if status == 'Pendente' and tecnico_id is None and abertura is not None:
+        candidates.append(abertura + UNASSIGNED_LIMIT)
+
+    future = [moment for moment in candidates if moment > now]
+    return min(future) if future else None
+
+
+def _evaluate(chamado_id, now, opened, closed):
+    """Diff a ticket's desired alerts against the active ones and reschedule it"""
+    ticket = _tickets.get(chamado_id)
+    desired = _desired_alerts(ticket, now) if ticket else set()
+    current = _active.get(chamado_id, set())
+
+    prazo = ticket[3] if ticket else None
+    for tipo in desired - current:
+        opened.append((chamado_id, tipo, prazo.strftime('%Y-%m-%d %H:%M:%S') if prazo else None))
+    for tipo in current - desired:
+        closed.append((chamado_id, tipo))
+
+    if desired:
+        _active[chamado_id] = desired
+    else:
+        _active.pop(chamado_id, None)
+
+    generation = _generation.get(chamado_id, 0) + 1
+    _generation[chamado_id] = generation
+
+    threshold = _next_threshold(ticket, now) if ticket else None
+    if threshold is None:
+        _tickets.pop(chamado_id, None)
+        _generation.pop(chamado_id, None)
+    else:
+        heapq.heappush(_heap, (threshold, chamado_id, generation))
+
+
+def _load(rows):
+    """Refresh tracked tickets from database rows"""
+    for chamado_id, status, tecnico_id, data_abertura, sla_prazo, sla_pausado_em in rows:
+        # A paused SLA clock has no deadline until it resumes
+        prazo = None if sla_pausado_em else parse_db_timestamp(sla_prazo)
+        _tickets[chamado_id] = (status, tecnico_id, parse_db_timestamp(data_abertura), prazo)
+
+
+def _full_resync(now, opened, closed):
+    """Reload every open ticket and the active alert set from the database"""
+    _heap.clear()
+    _tickets.clear()
+    _active.clear()
+    for chamado_id, tipo, _, _ in get_active_sla_alerts():
+        _active.setdefault(chamado_id, set()).add(tipo)
+
+    _load(get_sla_tracking_rows())
+    for chamado_id in set(_tickets) | set(_active):
+        _evaluate(chamado_id, now, opened, closed)
+
+
+def _run():
+    """Monitor loop: sleep until the next threshold, a ticket change or a resync"""
+    global _resync_requested
+    next_resync = 0.0
+
+    while True:
+        with _condition:
+            while True:
+                now = _now()
+                monotonic = time.monotonic()
+                if _dirty or _resync_requested or monotonic >= next_resync:
+                    break
+                # Discard heap entries superseded by a newer evaluation
+                while _heap and _generation.get(_heap[0][1]) != _heap[0][2]:
+                    heapq.heappop(_heap)
+                if _heap and _heap[0][0] <= now:
+                    break
+
+                timeout = next_resync - monotonic
+                if _heap:
+                    timeout = min(timeout, (_heap[0][0] - now).total_seconds())
+                _condition.wait(timeout=max(timeout, 0.01))
+
+            dirty = set(_dirty)
+            _dirty.clear()
+            resync = _resync_requested or monotonic >= next_resync
+            _resync_requested = False
+
+        opened, closed = [], []
+        try:
+            if resync:
+                _full_resync(now, opened, closed)
+                next_resync = time.monotonic() + RESYNC_INTERVAL
+            else:
+                if dirty:
+                    for chamado_id in dirty:
+                        _tickets.pop(chamado_id, None)
+                    _load(get_sla_tracking_rows(dirty))
+                    for chamado_id in dirty:
+                        _evaluate(chamado_id, now, opened, closed)
+
+                while _heap and _heap[0][0] <= now:
+                    _, chamado_id, generation = heapq.heappop(_heap)
+                    if _generation.get(chamado_id) == generation:
+                        _evaluate(chamado_id, now, opened, closed)
+
+            apply_sla_alert_transitions(opened, closed, now.strftime('%Y-%m-%d %H:%M:%S'))
+        except Exception:
+            # Database busy or unavailable: rebuild state from scratch shortly
+            next_resync = time.monotonic() + 5
+
+
+def _on_chamado_changed(chamado_id):
+    """Listener registered in components.database: wake the monitor for this ticket"""
+    with _condition:
+        _dirty.add(chamado_id)
+        _condition.notify()
+
+
+def request_resync():
+    """Ask the monitor to reload all open tickets (e.g. after bulk imports)"""
+    global _resync_requested
+    with _condition:
+        _resync_requested = True
+        _condition.notify()
+
+
+def start_sla_monitor():
+    """Start the background SLA monitor once per process"""
+    global _thread
+    with _condition:
+        if _thread is not None and _thread.is_alive():
+            return
+        register_chamado_listener(_on_chamado_changed)
+        _thread = threading.Thread(target=_run, name='sla-monitor', daemon=True)
+        _thread.start()
+
+
+def get_alerts_by_chamado():
+    """Map chamado_id -> set of active alert types (one indexed query)"""
+    alerts = {}
+    for chamado_id, tipo, _, _ in get_active_sla_alerts():
+        alerts.setdefault(chamado_id, set()).add(tipo)
+    return alerts
+
+
+def count_alerts_by_type():
+    """Count active alerts per type (one indexed query)"""
+    counts = {'critico': 0, 'vencido': 0, 'nao_atribuido': 0}
+    for _, tipo, _, _ in get_active_sla_alerts():
+        counts[tipo] = counts.get(tipo, 0) + 1
+    return counts
+
+
+def _monitor_gauges():
+    with _condition:
+        active = [tipo for alerts in _active.values() for tipo in alerts]
+        gauges = [('chamados_sla_monitor_tracked_tickets', None, len(_tickets))]
+    return gauges + [('chamados_sla_alerts_active', {'tipo': tipo}, active.count(tipo))
+                     for tipo in ('critico', 'vencido', 'nao_atribuido')]
+
+
+register_gauges(_monitor_gauges)
@@ -0,0 +1,140 @@
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import timedelta
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+from utils.business_calendar import get_default_calendar, parse_db_timestamp, parse_db_timestamps
+
+# Wildcard sector: the policy applies to every sector without a specific rule
+ANY_SECTOR = '*'
+
+SlaPolicy = namedtuple('SlaPolicy', [
+    'setor', 'prioridade', 'horas_resolucao', 'horario_comercial', 'pausa_aguardando_solicitante'
+])
+
+# Used when the table has no rule for a priority (and before the first load)
+DEFAULT_POLICIES = MappingProxyType({
+    (ANY_SECTOR, 'Alta'): SlaPolicy(ANY_SECTOR, 'Alta', 4.0, False, True),
+    (ANY_SECTOR, 'Média'): SlaPolicy(ANY_SECTOR, 'Média', 24.0, False, True),
+    (ANY_SECTOR, 'Baixa'): SlaPolicy(ANY_SECTOR, 'Baixa', 72.0, False, True),
+})
+FALLBACK_POLICY = DEFAULT_POLICIES[(ANY_SECTOR, 'Média')]
+
+# How often the watcher checks the policy version for edits made outside this process
+RELOAD_INTERVAL = float(os.environ.get('SLA_POLICY_RELOAD_SECONDS', 30))
+
+_lock = threading.Lock()
+_policies = DEFAULT_POLICIES
+_version = None
+_watcher = None
+
+
+def compile_policies(rows):
+    """Compile (setor, prioridade, horas, horario_comercial, pausa) rows into a frozen lookup"""
+    compiled = dict(DEFAULT_POLICIES)
+    for setor, prioridade, horas, horario_comercial, pausa in rows:
+        setor = setor or ANY_SECTOR
+        compiled[(setor, prioridade)] = SlaPolicy(
+            setor, prioridade, float(horas), bool(horario_comercial), bool(pausa))
+    return MappingProxyType(compiled)
+
+
+def load_sla_policies():
+    """(Re)compile the sla_policies table and swap it in atomically"""
+    global _policies, _version
+    from components.database import get_sla_policy_rows, get_config_version
+
+    with _lock:
+        version = get_config_version('sla_policies')
+        _policies = compile_policies(get_sla_policy_rows(active_only=True))
+        _version = version
+    _start_watcher()
+
+
+def refresh_sla_policies_if_changed():
+    """Reload the policies if the table version moved (one single-row query)"""
+    from components.database import get_config_version
+
+    if _version is None or get_config_version('sla_policies') != _version:
+        load_sla_policies()
+
+
+def _watch():
+    """Poll the policy version so edits made by other processes are picked up"""
+    while True:
+        time.sleep(RELOAD_INTERVAL)
+        try:
+            refresh_sla_policies_if_changed()
+        except Exception:
+            pass
+
+
+def _start_watcher():
+    """Start the hot-reload watcher once per process"""
+    global _watcher
+    if RELOAD_INTERVAL > 0 and (_watcher is None or not _watcher.is_alive()):
+        _watcher = threading.Thread(target=_watch, name='sla-policy-watcher', daemon=True)
+        _watcher.start()
+
+
+def get_policies():
+    """Return the current frozen policy lookup"""
+    return _policies
+
+
+def get_sla_policy(prioridade, setor=None):
+    """Resolve the policy for a sector/priority: specific rule, then wildcard, then default"""
+    if _version is None:
+        # Processes that never ran init_database compile the table on first use
+        try:
+            load_sla_policies()
+        except Exception:
+            pass
+    policies = _policies
+    policy = policies.get((setor, prioridade)) if setor else None
+    return policy or policies.get((ANY_SECTOR, prioridade)) or FALLBACK_POLICY
+
+
+def calculate_deadline(abertura, prioridade, setor=None):
+    """Deadline (naive local time) for a ticket opened at a given moment"""
+    policy = get_sla_policy(prioridade, setor)
+    abertura = parse_db_timestamp(abertura)
+    if policy.horario_comercial:
+        return get_default_calendar().add_working_minutes(abertura, policy.horas_resolucao * 60)
+    return abertura + timedelta(hours=policy.horas_resolucao)
+
+
+def extend_deadline(prazo, inicio_pausa, fim_pausa, prioridade, setor=None):
+    """Push a deadline forward by the time a ticket spent paused"""
+    policy = get_sla_policy(prioridade, setor)
+    prazo = parse_db_timestamp(prazo)
+    inicio_pausa, fim_pausa = parse_db_timestamp(inicio_pausa), parse_db_timestamp(fim_pausa)
+
+    if policy.horario_comercial:
+        calendar = get_default_calendar()
+        paused = calendar.working_minutes_between(inicio_pausa, fim_pausa)
+        return calendar.add_working_minutes(prazo, max(paused, 0))
+    return prazo + max(fim_pausa - inicio_pausa, timedelta(0))
+
+
+def calculate_deadlines(aberturas, prioridades, setores=None):
+    """Vectorized deadline computation for many tickets (returns a datetime64 Series)"""
+    aberturas = parse_db_timestamps(aberturas).reset_index(drop=True)
+    prioridades = list(prioridades)
+    setores = list(setores) if setores is not None else [None] * len(prioridades)
+
+    resolved = [get_sla_policy(prioridade, setor) for prioridade, setor in zip(prioridades, setores)]
+    hours = np.array([policy.horas_resolucao for policy in resolved], dtype=np.float64)
+    business = np.array([policy.horario_comercial for policy in resolved], dtype=bool)
+
+    deadlines = aberturas + pd.to_timedelta(hours, unit='h')
+    if business.any():
+        calendar_deadlines = get_default_calendar().add_working_minutes_many(
+            aberturas[business], hours[business] * 60)
+        deadlines[business] = calendar_deadlines.to_numpy()
+    return deadlines
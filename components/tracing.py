@@ -0,0 +1,118 @@
+import contextvars
+import glob
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Opt-in tracing of page reruns, written as Chrome trace-event JSON (chrome://tracing, Perfetto)
+TRACING_ENABLED = os.environ.get('TRACING_ENABLED', '').lower() in ('1', 'true', 'yes')
+# Fraction of reruns traced when enabled; ?trace=1 in the URL always traces that rerun
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', 0.01))
+TRACE_DIR = os.environ.get('TRACE_DIR', os.path.join('data', 'traces'))
+TRACE_MAX_FILES = int(os.environ.get('TRACE_MAX_FILES', 200))
+
+_current = contextvars.ContextVar('chamados_trace', default=None)
+
+
+class Trace:
+    """Events of one traced rerun"""
+
+    __slots__ = ('name', 'events', 'start_ns', 'pid')
+
+    def __init__(self, name):
+        self.name = name
+        self.events = []
+        self.start_ns = time.perf_counter_ns()
+        self.pid = os.getpid()
+
+    def add(self, name, category, start_ns, end_ns, args=None):
+        event = {
+            'name': name, 'cat': category, 'ph': 'X',
+            'ts': (start_ns - self.start_ns) / 1000, 'dur': (end_ns - start_ns) / 1000,
+            'pid': self.pid, 'tid': threading.get_ident(),
+        }
+        if args:
+            event['args'] = args
+        self.events.append(event)
+
+
+def start_trace(name, force=False):
+    """Begin tracing the current rerun if forced or sampled; returns the Trace or None"""
+    if not force and not (TRACING_ENABLED and random.random() < TRACE_SAMPLE_RATE):
+        _current.set(None)
+        return None
+    trace = Trace(name)
+    _current.set(trace)
+    return trace
+
+
+def start_page_trace(page):
+    """start_trace for a Streamlit page, forced by ?trace=1 in the URL"""
+    import streamlit as st
+    try:
+        force = st.query_params.get('trace') == '1'
+    except Exception:
+        force = False
+    return start_trace(page, force)
+
+
+def begin_span(name, category='app', **args):
+    """Open a span in the current trace (None when this rerun is not traced)"""
+    if _current.get() is None:
+        return None
+    return (name, category, args, time.perf_counter_ns())
+
+
+def end_span(handle):
+    """Close a span opened with begin_span"""
+    if handle is None:
+        return
+    trace = _current.get()
+    if trace is not None:
+        name, category, args, start_ns = handle
+        trace.add(name, category, start_ns, time.perf_counter_ns(), args)
+
+
+@contextmanager
+def span(name, category='app', **args):
+    """Time a block as a nested span of the current trace (no-op when not tracing)"""
+    handle = begin_span(name, category, **args)
+    try:
+        yield
+    finally:
+        end_span(handle)
+
+
+def _prune():
+    """Keep only the newest TRACE_MAX_FILES traces"""
+    files = sorted(glob.glob(os.path.join(TRACE_DIR, '*.json')), key=os.path.getmtime)
+    for path in files[:-TRACE_MAX_FILES]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def finish_trace(trace):
+    """Close the root span and write the trace file; returns its path"""
+    if trace is None:
+        return None
+    trace.add(trace.name, 'page', trace.start_ns, time.perf_counter_ns())
+    _current.set(None)
+
+    os.makedirs(TRACE_DIR, exist_ok=True)
+    path = os.path.join(TRACE_DIR, f"{trace.name}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{trace.pid}.json")
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': trace.events, 'displayTimeUnit': 'ms'}, f)
+    _prune()
+    return path
+
+
+def list_traces(limit=20):
+    """Most recent trace files, newest first"""
+    files = sorted(glob.glob(os.path.join(TRACE_DIR, '*.json')), key=os.path.getmtime, reverse=True)
+    return files[:limit]
@@ -0,0 +1,183 @@
+import atexit
+import functools
+import gzip
+import inspect
+import json
+import multiprocessing
+import os
+import threading
+import time
+from datetime import date, datetime
+
+# Opt-in recording of every database call (normalized arguments and timing) for benchmarks/replay.py.
+# Empty disables capture; a path ending in .gz is written gzip-compressed. Child processes (the job
+# pool) write next to it, with their pid inserted before the extension.
+WORKLOAD_CAPTURE = os.environ.get('WORKLOAD_CAPTURE', '')
+# Capture stops (with a marker line) once the file reaches this size
+WORKLOAD_CAPTURE_MAX_MB = float(os.environ.get('WORKLOAD_CAPTURE_MAX_MB', 200))
+FLUSH_INTERVAL = 1.0
+
+# Secrets are never written: password arguments are replaced, hashes dropped
+REDACTED_ARGUMENTS = {'password': 'senha-capturada', 'old_hash': None, 'new_hash': None}
+
+_lock = threading.Lock()
+_file = None
+_bytes = 0
+_last_flush = 0.0
+_stopped = False
+_local = threading.local()
+
+
+def capture_enabled():
+    return bool(WORKLOAD_CAPTURE)
+
+
+def normalize(value):
+    """JSON-safe form of an argument; decode() turns it back into the original type"""
+    if isinstance(value, datetime):
+        return {'$dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'$date': value.isoformat()}
+    if isinstance(value, (set, frozenset)):
+        return {'$set': [normalize(item) for item in value]}
+    if isinstance(value, (list, tuple)):
+        return [normalize(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): normalize(item) for key, item in value.items()}
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def decode(value):
+    """Inverse of normalize (tuples come back as lists)"""
+    if isinstance(value, list):
+        return [decode(item) for item in value]
+    if isinstance(value, dict):
+        if len(value) == 1:
+            key, item = next(iter(value.items()))
+            if key == '$dt':
+                return datetime.fromisoformat(item)
+            if key == '$date':
+                return date.fromisoformat(item)
+            if key == '$set':
+                return {decode(element) for element in item}
+        return {key: decode(item) for key, item in value.items()}
+    return value
+
+
+def capture_path():
+    """File this process writes to (one per process: appends from several processes would interleave)"""
+    if multiprocessing.parent_process() is None:
+        return WORKLOAD_CAPTURE
+    base, ext = WORKLOAD_CAPTURE, ''
+    for suffix in ('.jsonl.gz', '.jsonl', '.gz'):
+        if base.endswith(suffix):
+            base, ext = base[:-len(suffix)], suffix
+            break
+    return f"{base}.{os.getpid()}{ext}"
+
+
+def _open():
+    global _file
+    path = capture_path()
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    opener = gzip.open if path.endswith('.gz') else open
+    _file = opener(path, 'at', encoding='utf-8')
+    atexit.register(close)
+
+
+def _write(entry):
+    global _bytes, _last_flush, _stopped
+    line = json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n'
+    with _lock:
+        if _stopped:
+            return
+        if _file is None:
+            _open()
+        _bytes += len(line)
+        if _bytes > WORKLOAD_CAPTURE_MAX_MB * 1024 * 1024:
+            _stopped = True
+            line = json.dumps({'ts': entry['ts'], 'fim': 'limite de tamanho atingido'}) + '\n'
+        _file.write(line)
+        now = time.monotonic()
+        if _stopped or now - _last_flush >= FLUSH_INTERVAL:
+            _file.flush()
+            _last_flush = now
+
+
+def flush():
+    with _lock:
+        if _file is not None:
+            _file.flush()
+
+
+def close():
+    """Flush and close the capture file (writes the gzip trailer)"""
+    global _file
+    with _lock:
+        if _file is not None:
+            _file.close()
+            _file = None
+
+
+def captured(func, module):
+    """Wrap a function so its top-level calls are recorded (nested calls replay through their caller)"""
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if getattr(_local, 'depth', 0):
+            return func(*args, **kwargs)
+        _local.depth = 1
+        ts = time.time()
+        start = time.perf_counter()
+        error = None
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            _local.depth = 0
+            try:
+                bound = signature.bind(*args, **kwargs).arguments
+                arguments = {name: (REDACTED_ARGUMENTS[name] if name in REDACTED_ARGUMENTS else normalize(value))
+                             for name, value in bound.items()}
+                entry = {'ts': round(ts, 6), 'mod': module, 'fn': func.__name__, 'args': arguments,
+                         'ms': round(duration * 1000, 3), 'pid': os.getpid(), 'tid': threading.get_ident()}
+                if error:
+                    entry['err'] = error
+                _write(entry)
+            except Exception:
+                pass  # Capture never breaks a call
+    wrapper.__wrapped_for_capture__ = True
+    return wrapper
+
+
+def capture_module(namespace, exclude=()):
+    """Record every public function defined in a module namespace (call at the module bottom)"""
+    module_name = namespace['__name__']
+    for attr, value in list(namespace.items()):
+        if (callable(value) and getattr(value, '__module__', None) == module_name
+                and not attr.startswith('_') and attr not in exclude
+                and not isinstance(value, type)
+                and not getattr(value, '__wrapped_for_capture__', False)):
+            namespace[attr] = captured(value, module_name)
+
+
+def read_workload(path):
+    """Captured calls of a file, in the order they were written"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        try:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Truncated last line of a live capture
+                if 'fn' in entry:
+                    yield entry
+        except EOFError:
+            return  # gzip stream still being written (no trailer yet)
@@ -1,12 +1,17 @@
 import streamlit as st
 import sys
 import os
+import time
 
 # Add components directory to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'components'))
 
 from components.auth import check_authentication, get_current_user
 from components.database import create_chamado
+from components.sla_policy import get_sla_policy
+from components.metrics import observe_page_render
+
+_render_start = time.perf_counter()
 
 # Check authentication
 if not check_authentication():
@@ -25,6 +30,12 @@ if current_user['role'] not in allowed_roles:
     st.error("❌ Você não tem permissão para abrir chamados.")
     st.stop()
 
+def format_sla(prioridade, setor=None):
+    """Describe the SLA target of a priority/sector from the compiled policies"""
+    policy = get_sla_policy(prioridade, setor)
+    horas = f"{policy.horas_resolucao:g} horas"
+    return f"{horas} úteis" if policy.horario_comercial else horas
+
 # Form to create new ticket
 with st.form("novo_chamado"):
     st.markdown("### Informações do Chamado")
@@ -59,18 +70,18 @@ with st.form("novo_chamado"):
     
     # Priority information
     with st.expander("ℹ️ Informações sobre Prioridades"):
-        st.markdown("""
-        **🔴 Alta:** Problemas críticos que impedem o trabalho (SLA: 4 horas)
+        st.markdown(f"""
+        **🔴 Alta:** Problemas críticos que impedem o trabalho (SLA: {format_sla('Alta')})
         - Sistema fora do ar
         - Falha de segurança
         - Perda de dados
         
-        **🟡 Média:** Problemas que impactam a produtividade (SLA: 24 horas)
+        **🟡 Média:** Problemas que impactam a produtividade (SLA: {format_sla('Média')})
         - Lentidão no sistema
         - Problemas de impressão
         - Erro em funcionalidade específica
         
-        **🟢 Baixa:** Melhorias ou problemas menores (SLA: 72 horas)
+        **🟢 Baixa:** Melhorias ou problemas menores (SLA: {format_sla('Baixa')})
         - Solicitação de novo software
         - Dúvidas sobre uso
         - Pequenos ajustes
@@ -103,7 +114,7 @@ with st.form("novo_chamado"):
                     st.info(f"📎 {len(uploaded_files)} arquivo(s) anexado(s) ao chamado.")
                 
                 st.success(f"✅ Chamado #{chamado_id} criado com sucesso!")
-                st.info(f"📊 Prioridade: {prioridade} | SLA: {'4 horas' if prioridade == 'Alta' else '24 horas' if prioridade == 'Média' else '72 horas'}")
+                st.info(f"📊 Prioridade: {prioridade} | SLA: {format_sla(prioridade, setor_origem)}")
                 
                 # Store success state to show navigation after form
                 st.session_state['chamado_criado'] = True
@@ -189,3 +200,6 @@ with st.sidebar:
     st.markdown("**📞 Contato de Emergência:**")
     st.markdown("📱 (69) 99388-2222")
     st.markdown("📧 pageupsistemas@gmail.com")
+
+# Record how long this page run took
+observe_page_render('abrir_chamado', _render_start)
@@ -1,6 +1,7 @@
 import streamlit as st
 import sys
 import os
+import time
 import pandas as pd
 from datetime import datetime
 
@@ -8,31 +9,52 @@ from datetime import datetime
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'components'))
 
 from components.auth import check_authentication, get_current_user
-from components.database import get_chamados, get_chamado_by_id, update_chamado_status
+from components.database import get_chamados, get_chamado_by_id, get_chamado_versions, assign_technician, update_chamado_status, pause_sla, resume_sla, get_paused_chamados
 from components.chat import display_chat
+from components.sla_monitor import start_sla_monitor, get_alerts_by_chamado
 from components.header import display_header
+from components.metrics import observe_page_render
+from components.tracing import begin_span, end_span, finish_trace, start_page_trace
+
+_render_start = time.perf_counter()
+_trace = start_page_trace('meus_chamados')
 
 # Check authentication
+auth_span = begin_span('autenticação', 'auth')
 if not check_authentication():
     st.error("❌ Acesso negado. Faça login primeiro.")
     st.stop()
 
 current_user = get_current_user()
+end_span(auth_span)
 
 st.set_page_config(page_title="Meus Chamados", page_icon="📋", layout="wide")
 
 # Display header
+header_span = begin_span('cabeçalho', 'render')
 display_header()
+end_span(header_span)
 
 st.title("📋 Meus Chamados")
 
+load_span = begin_span('carregar dados', 'data')
+
+# Active SLA alerts, maintained by the background SLA monitor
+start_sla_monitor()
+sla_alerts = get_alerts_by_chamado()
+paused_tickets = get_paused_chamados()
+
 # Get user's tickets
+versions = {}
 if current_user['role'] in ['Técnico', 'Administrador']:
-    # Technicians can see tickets assigned to them or all tickets (for admin)
+    # Technicians can see tickets assigned to them or all tickets (for admin). Row versions are
+    # read first, so an action on a ticket changed meanwhile fails instead of overwriting it
     if current_user['role'] == 'Administrador':
+        versions = get_chamado_versions()
         user_tickets = get_chamados()  # Admin sees all tickets
         st.info("👨‍💼 Como administrador, você pode ver todos os chamados do sistema.")
     else:
+        versions = get_chamado_versions({'tecnico_id': current_user['id']})
         user_tickets = get_chamados({'tecnico_id': current_user['id']})
         st.info("🔧 Visualizando chamados atribuídos a você.")
 else:
@@ -40,6 +62,23 @@ else:
     user_tickets = get_chamados({'solicitante_id': current_user['id']})
     st.info("👤 Visualizando seus chamados abertos.")
 
+end_span(load_span)
+
+
+def claim_ticket(ticket_id, version):
+    """Button callback: runs before the rerun, with the version the user was looking at.
+
+    No version (a ticket listed after the versions were read) counts as a change: assign_technician
+    would otherwise overwrite unconditionally.
+    """
+    if version is not None and assign_technician(ticket_id, current_user['id'], current_user['username'],
+                                                 current_user['id'], current_user['username'],
+                                                 expected_version=version):
+        st.toast(f"✅ Chamado #{ticket_id} assumido com sucesso!")
+    else:
+        st.toast(f"⚠️ O chamado #{ticket_id} já foi assumido ou alterado por outra pessoa.")
+
+
 # Filters
 col1, col2, col3 = st.columns(3)
 
@@ -56,6 +95,7 @@ with col3:
                                 ["Todos", "Administrativo", "Financeiro", "RH", "Vendas", "Marketing", "Produção", "TI", "Diretoria"])
 
 # Apply filters
+filter_span = begin_span('filtros', 'python')
 filtered_tickets = user_tickets
 if status_filter != "Todos":
     filtered_tickets = [t for t in filtered_tickets if t[5] == status_filter]  # status is index 5
@@ -63,6 +103,7 @@ if priority_filter != "Todas":
     filtered_tickets = [t for t in filtered_tickets if t[4] == priority_filter]  # priority is index 4
 if sector_filter != "Todos":
     filtered_tickets = [t for t in filtered_tickets if t[3] == sector_filter]  # sector is index 3
+end_span(filter_span)
 
 # Statistics
 if filtered_tickets:
@@ -85,9 +126,11 @@ if filtered_tickets:
 st.markdown("---")
 
 # Display tickets
+render_span = begin_span('renderizar chamados', 'render', chamados=len(filtered_tickets))
 if filtered_tickets:
     for ticket in filtered_tickets:
         ticket_id, titulo, descricao, setor, prioridade, status, solicitante, tecnico, data_abertura, data_resolucao, sla_prazo = ticket
+        ticket_span = begin_span(f'chamado #{ticket_id}', 'render')
 
         # Status and priority colors
         status_colors = {
@@ -103,18 +146,15 @@ if filtered_tickets:
             'Baixa': '🟢'
         }
 
-        # Calculate SLA status
+        # SLA status from the active alert set
+        ticket_alerts = sla_alerts.get(ticket_id, set())
         sla_status = "⏰ Dentro do Prazo"
-        if sla_prazo:
-            try:
-                sla_deadline = datetime.strptime(sla_prazo, '%Y-%m-%d %H:%M:%S')
-                now = datetime.now()
-                if now > sla_deadline and status != 'Resolvido':
-                    sla_status = "⚠️ SLA Vencido"
-                elif (sla_deadline - now).total_seconds() < 3600 and status != 'Resolvido':  # Less than 1 hour
-                    sla_status = "🚨 SLA Próximo do Vencimento"
-            except:
-                pass
+        if ticket_id in paused_tickets:
+            sla_status = "⏸️ SLA Pausado (aguardando solicitante)"
+        elif 'vencido' in ticket_alerts:
+            sla_status = "⚠️ SLA Vencido"
+        elif 'critico' in ticket_alerts:
+            sla_status = "🚨 SLA Próximo do Vencimento"
 
         # Ticket card
         with st.expander(f"🎫 #{ticket_id} - {titulo} | {status_colors.get(status, '⚪')} {status} | {priority_colors.get(prioridade, '⚪')} {prioridade}"):
@@ -142,21 +182,21 @@ if filtered_tickets:
                 col1, col2, col3 = st.columns(3)
 
                 with col1:
-                    if status == 'Pendente' and st.button(f"👋 Assumir Chamado #{ticket_id}", key=f"assume_{ticket_id}"):
-                        from components.database import assign_technician
-                        assign_technician(ticket_id, current_user['id'], current_user['username'], 
-                                        current_user['id'], current_user['username'])
-                        st.success("Chamado assumido com sucesso!")
-                        st.rerun()
+                    if status == 'Pendente':
+                        st.button(f"👋 Assumir Chamado #{ticket_id}", key=f"assume_{ticket_id}",
+                                  on_click=claim_ticket, args=(ticket_id, versions.get(ticket_id)))
 
                 with col2:
                     if status == 'Em Andamento' and st.button(f"✅ Resolver #{ticket_id}", key=f"resolve_{ticket_id}"):
                         st.session_state[f'resolving_{ticket_id}'] = True
+                        # Remember the version the form was opened on
+                        st.session_state[f'versao_{ticket_id}'] = versions.get(ticket_id)
                         st.rerun()
 
                 with col3:
                     if st.button(f"📝 Atualizar #{ticket_id}", key=f"update_{ticket_id}"):
                         st.session_state[f'updating_{ticket_id}'] = True
+                        st.session_state[f'versao_{ticket_id}'] = versions.get(ticket_id)
                         st.rerun()
 
                 # Resolution form
@@ -168,14 +208,20 @@ if filtered_tickets:
                         col1, col2 = st.columns(2)
                         with col1:
                             if st.form_submit_button("✅ Confirmar Resolução"):
-                                update_chamado_status(ticket_id, 'Resolvido', current_user['id'], 
-                                                    current_user['username'], resolution)
-                                st.success("Chamado resolvido com sucesso!")
+                                opened_version = st.session_state.pop(f'versao_{ticket_id}', versions.get(ticket_id))
+                                if opened_version is not None and update_chamado_status(
+                                        ticket_id, 'Resolvido', current_user['id'], current_user['username'],
+                                        resolution, expected_version=opened_version):
+                                    st.success("Chamado resolvido com sucesso!")
+                                else:
+                                    st.toast(f"⚠️ O chamado #{ticket_id} foi alterado por outra pessoa "
+                                             "enquanto você editava. Revise e tente novamente.")
                                 del st.session_state[f'resolving_{ticket_id}']
                                 st.rerun()
                         with col2:
                             if st.form_submit_button("❌ Cancelar"):
                                 del st.session_state[f'resolving_{ticket_id}']
+                                st.session_state.pop(f'versao_{ticket_id}', None)
                                 st.rerun()
 
                 # Update form
@@ -184,24 +230,39 @@ if filtered_tickets:
                         st.markdown("### 📝 Atualizar Status")
                         new_status = st.selectbox("Novo Status:", ['Em Andamento', 'Pendente'])
                         update_notes = st.text_area("Observações:", height=80)
+                        waiting_requester = st.checkbox("⏸️ Aguardando retorno do solicitante (pausa o SLA)",
+                                                        value=ticket_id in paused_tickets)
 
                         col1, col2 = st.columns(2)
                         with col1:
                             if st.form_submit_button("💾 Salvar Atualização"):
-                                update_chamado_status(ticket_id, new_status, current_user['id'], 
-                                                    current_user['username'], update_notes)
-                                st.success("Status atualizado com sucesso!")
+                                opened_version = st.session_state.pop(f'versao_{ticket_id}', versions.get(ticket_id))
+                                if opened_version is not None and update_chamado_status(
+                                        ticket_id, new_status, current_user['id'], current_user['username'],
+                                        update_notes, expected_version=opened_version):
+                                    if waiting_requester and ticket_id not in paused_tickets:
+                                        if not pause_sla(ticket_id, current_user['id'], current_user['username'], update_notes or None):
+                                            st.toast("⚠️ A política de SLA deste chamado não permite pausa.")
+                                    elif not waiting_requester and ticket_id in paused_tickets:
+                                        resume_sla(ticket_id, current_user['id'], current_user['username'])
+                                    st.success("Status atualizado com sucesso!")
+                                else:
+                                    st.toast(f"⚠️ O chamado #{ticket_id} foi alterado por outra pessoa "
+                                             "enquanto você editava. Revise e tente novamente.")
                                 del st.session_state[f'updating_{ticket_id}']
                                 st.rerun()
                         with col2:
                             if st.form_submit_button("❌ Cancelar"):
                                 del st.session_state[f'updating_{ticket_id}']
+                                st.session_state.pop(f'versao_{ticket_id}', None)
                                 st.rerun()
 
             # Chat section
             st.markdown("---")
             display_chat(ticket_id, current_user)
 
+        end_span(ticket_span)
+
 else:
     st.info("📭 Nenhum chamado encontrado com os filtros aplicados.")
 
@@ -211,7 +272,10 @@ else:
             if st.button("📝 Abrir Primeiro Chamado", use_container_width=True):
                 st.switch_page("pages/1_abrir_chamado.py")
 
+end_span(render_span)
+
 # Quick navigation
+sidebar_span = begin_span('sidebar', 'render')
 with st.sidebar:
     st.markdown("### 🧭 Navegação Rápida")
 
@@ -250,4 +314,10 @@ with st.sidebar:
     <p>v1.0.3</p>
     <p><a href="https://github.com/pgup-sistemas" target="_blank" style="color: #888;">PgUp Sistemas</a></p>
     </div>
-    """, unsafe_allow_html=True)
\ No newline at end of file
+    """, unsafe_allow_html=True)
+
+end_span(sidebar_span)
+
+# Record how long this page run took
+observe_page_render('meus_chamados', _render_start)
+finish_trace(_trace)
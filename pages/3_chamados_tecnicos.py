@@ -1,6 +1,7 @@
 import streamlit as st
 import sys
 import os
+import time
 import pandas as pd
 from datetime import datetime
 
@@ -9,8 +10,13 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'components'))
 
 from components.auth import check_authentication, get_current_user, require_role
 from components.database import get_chamados, assign_technician, get_tecnicos, update_chamado_status
+from components.auto_assign import AUTO_ASSIGN_ENABLED, AUTO_ASSIGN_INTERVAL_SECONDS
 from components.chat import display_chat
 from components.header import display_header
+from components.metrics import observe_page_render
+from components.open_tickets import get_open_tickets
+
+_render_start = time.perf_counter()
 
 # Check authentication
 if not check_authentication():
@@ -34,6 +40,27 @@ st.title("🎯 Gestão de Chamados - Área Técnica")
 # Get all tickets
 all_tickets = get_chamados()
 
+# Open tickets come from the in-memory working set, with the row versions that make
+# actions fail instead of overwriting a newer change
+pending_records = get_open_tickets(status='Pendente')
+in_progress_records = get_open_tickets(status='Em Andamento')
+versions = {record.id: record.versao for record in pending_records + in_progress_records}
+
+
+def claim_ticket(ticket_id, version):
+    """Button callback: runs before the rerun, with the version the user was looking at.
+
+    No version (a ticket listed after the versions were read) counts as a change: assign_technician
+    would otherwise overwrite unconditionally.
+    """
+    if version is not None and assign_technician(ticket_id, current_user['id'], current_user['username'],
+                                                 current_user['id'], current_user['username'],
+                                                 expected_version=version):
+        st.toast(f"✅ Chamado #{ticket_id} assumido!")
+    else:
+        st.toast(f"⚠️ O chamado #{ticket_id} já foi assumido ou alterado por outra pessoa.")
+
+
 # Dashboard tabs
 tab1, tab2, tab3 = st.tabs(["🎫 Todos os Chamados", "⏳ Pendentes", "🔧 Em Andamento"])
 
@@ -136,16 +163,15 @@ with tab1:
 with tab2:
     st.markdown("### ⏳ Chamados Pendentes de Atribuição")
 
-    pending_tickets = [t for t in all_tickets if t[5] == 'Pendente']
+    pending_tickets = [record.as_row() for record in pending_records]
 
     if pending_tickets:
         st.info(f"📋 {len(pending_tickets)} chamado(s) aguardando atribuição de técnico.")
+        if AUTO_ASSIGN_ENABLED:
+            st.caption(f"🤖 Atribuição automática ativa: a cada {AUTO_ASSIGN_INTERVAL_SECONDS:g}s os chamados "
+                       "abaixo são distribuídos, nesta ordem, ao técnico com menos chamados abertos.")
 
-        # Sort by priority and date
-        pending_tickets.sort(key=lambda x: (
-            {'Alta': 0, 'Média': 1, 'Baixa': 2}.get(x[4], 3),  # Priority
-            x[8]  # Date
-        ))
+        # The working set is already in the assignment engine's order: priority, SLA deadline, opening date
 
         # Display pending tickets
         for ticket in pending_tickets:
@@ -162,11 +188,8 @@ with tab2:
                     st.markdown(f"**{titulo}** - {priority_colors.get(prioridade, '⚪')} {prioridade}")
                 with col3:
                     if current_user and current_user['role'] in ['Técnico', 'Administrador']:
-                        if st.button(f"👋 Assumir", key=f"assume_pending_{ticket_id}"):
-                            assign_technician(ticket_id, current_user['id'], current_user['username'],
-                                           current_user['id'], current_user['username'])
-                            st.success("Chamado assumido!")
-                            st.rerun()
+                        st.button(f"👋 Assumir", key=f"assume_pending_{ticket_id}", on_click=claim_ticket,
+                                  args=(ticket_id, versions.get(ticket_id)))
 
                 with st.expander(f"Detalhes #{ticket_id}"):
                     st.markdown(f"**📄 Descrição:** {descricao}")
@@ -181,7 +204,7 @@ with tab2:
 with tab3:
     st.markdown("### 🔧 Chamados Em Andamento")
 
-    in_progress_tickets = [t for t in all_tickets if t[5] == 'Em Andamento']
+    in_progress_tickets = [record.as_row() for record in in_progress_records]
 
     if in_progress_tickets:
         st.info(f"⚙️ {len(in_progress_tickets)} chamado(s) em atendimento.")
@@ -203,6 +226,8 @@ with tab3:
                     if tecnico and current_user and current_user['username'] in tecnico:
                         if st.button(f"✅ Resolver", key=f"resolve_progress_{ticket_id}"):
                             st.session_state[f'resolving_{ticket_id}'] = True
+                            # Remember the version the form was opened on
+                            st.session_state[f'versao_{ticket_id}'] = versions.get(ticket_id)
                             st.rerun()
 
                 with st.expander(f"Detalhes #{ticket_id}"):
@@ -222,14 +247,20 @@ with tab3:
                             with col1:
                                 if st.form_submit_button("✅ Confirmar Resolução"):
                                     if current_user:
-                                        update_chamado_status(ticket_id, 'Resolvido', current_user['id'],
-                                                            current_user['username'], resolution)
-                                        st.success("Chamado resolvido com sucesso!")
+                                        opened_version = st.session_state.pop(f'versao_{ticket_id}', versions.get(ticket_id))
+                                        if opened_version is not None and update_chamado_status(
+                                                ticket_id, 'Resolvido', current_user['id'], current_user['username'],
+                                                resolution, expected_version=opened_version):
+                                            st.success("Chamado resolvido com sucesso!")
+                                        else:
+                                            st.toast(f"⚠️ O chamado #{ticket_id} foi alterado por outra pessoa "
+                                                     "enquanto você editava. Revise e tente novamente.")
                                         del st.session_state[f'resolving_{ticket_id}']
                                         st.rerun()
                             with col2:
                                 if st.form_submit_button("❌ Cancelar"):
                                     del st.session_state[f'resolving_{ticket_id}']
+                                    st.session_state.pop(f'versao_{ticket_id}', None)
                                     st.rerun()
 
                 st.markdown("---")
@@ -267,4 +298,7 @@ with st.sidebar:
     <p>v1.0.3</p>
     <p><a href="https://github.com/pgup-sistemas" target="_blank" style="color: #888;">PgUp Sistemas</a></p>
     </div>
-    """, unsafe_allow_html=True)
\ No newline at end of file
+    """, unsafe_allow_html=True)
+
+# Record how long this page run took
+observe_page_render('chamados_tecnicos', _render_start)
@@ -1,13 +1,21 @@
 import streamlit as st
 import sys
 import os
-from datetime import datetime, timedelta
+from datetime import datetime
+import time
 
 # Add components directory to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'components'))
 
 from components.auth import check_authentication, get_current_user
-from components.database import get_analytics_data, get_quick_stats, get_chamados
+from components.database import SITES, get_latest_report, get_reports, get_user_jobs
+from components.sla_monitor import start_sla_monitor, count_alerts_by_type
+from components.job_queue import ACTIVE_STATUSES, JOB_LABELS, JOB_POLL_SECONDS, request_cancel, submit_job
+from utils.export_engine import DEFAULT_COLUMNS, DERIVED_COLUMNS, EXPORT_COLUMNS, EXPORT_FORMATS, available_formats
+from components.metrics import observe_page_render
+from components.report_scheduler import REPORT_LABELS, compute_kpis, start_report_scheduler
+
+_render_start = time.perf_counter()
 
 # Check authentication
 if not check_authentication():
@@ -26,9 +34,29 @@ st.set_page_config(page_title="Dashboard Diretoria", page_icon="📊", layout="w
 st.title("📊 Dashboard Gerencial - Diretoria")
 st.markdown("Análise completa do desempenho do sistema de chamados de TI")
 
-# Get analytics data
-analytics_data = get_analytics_data()
-quick_stats = get_quick_stats()
+# Make sure the SLA monitor and the report scheduler are running in this process
+start_sla_monitor()
+start_report_scheduler()
+
+# Serve the latest pre-generated snapshot; recomputing everything from the whole
+# ticket table only happens when someone asks for live numbers
+live = st.toggle("⚡ Dados ao vivo", value=False,
+                 help="Recalcula os indicadores agora em vez de usar o último instantâneo agendado")
+# One unit reads only its own file; the snapshots cover every unit
+site = None
+if SITES:
+    site = st.selectbox("🏥 Unidade", [None, *SITES],
+                        format_func=lambda name: "Todas as unidades" if name is None else name)
+snapshot = None if live or site else get_latest_report('kpis')
+if snapshot and snapshot[2]:
+    analytics_data = snapshot[2]
+    updated_at = datetime.strptime(snapshot[4], '%Y-%m-%d %H:%M:%S')
+    st.caption(f"📸 Instantâneo gerado em {updated_at.strftime('%d/%m/%Y às %H:%M:%S')}")
+else:
+    analytics_data = compute_kpis(site)
+    updated_at = datetime.now()
+quick_stats = analytics_data['quick_stats']
+resolution_summary = analytics_data['resolution_summary']
 
 # === KPI SECTION ===
 st.markdown("## 📋 Indicadores Principais (KPIs)")
@@ -57,27 +85,11 @@ with col5:
     st.metric("📈 Taxa de Resolução", f"{resolution_rate}%")
 
 with col6:
-    # Calculate average resolution time
-    all_tickets = get_chamados()
-    resolved_tickets = [t for t in all_tickets if t[5] == 'Resolvido' and t[9]]
-    
-    if resolved_tickets:
-        total_hours = 0
-        count = 0
-        for ticket in resolved_tickets:
-            try:
-                open_date = datetime.strptime(ticket[8], '%Y-%m-%d %H:%M:%S')
-                resolve_date = datetime.strptime(ticket[9], '%Y-%m-%d %H:%M:%S')
-                hours = (resolve_date - open_date).total_seconds() / 3600
-                total_hours += hours
-                count += 1
-            except:
-                continue
-        avg_hours = round(total_hours / count, 1) if count > 0 else 0
-    else:
-        avg_hours = 0
+    # Average resolution time
+    avg_hours = resolution_summary['avg_resolution_hours']
     
-    st.metric("⏱️ Tempo Médio (horas)", avg_hours)
+    st.metric("⏱️ Tempo Médio (horas)", avg_hours,
+              delta=f"{resolution_summary['avg_business_hours']}h úteis", delta_color="off")
 
 st.markdown("---")
 
@@ -161,38 +173,11 @@ st.markdown("## ⏰ Análise de SLA")
 
 col1, col2, col3 = st.columns(3)
 
-# Calculate SLA compliance
-all_tickets = get_chamados()
-sla_compliant = 0
-sla_violated = 0
-sla_critical = 0
-
-for ticket in all_tickets:
-    if ticket[5] == 'Resolvido' and ticket[9] and ticket[10]:  # Has resolution and SLA deadline
-        try:
-            resolve_date = datetime.strptime(ticket[9], '%Y-%m-%d %H:%M:%S')
-            sla_deadline = datetime.strptime(ticket[10], '%Y-%m-%d %H:%M:%S')
-            
-            if resolve_date <= sla_deadline:
-                sla_compliant += 1
-            else:
-                sla_violated += 1
-        except:
-            continue
-    elif ticket[5] != 'Resolvido' and ticket[10]:  # Open ticket with SLA
-        try:
-            sla_deadline = datetime.strptime(ticket[10], '%Y-%m-%d %H:%M:%S')
-            now = datetime.now()
-            
-            if now > sla_deadline:
-                sla_violated += 1
-            elif (sla_deadline - now).total_seconds() < 3600:  # Less than 1 hour
-                sla_critical += 1
-        except:
-            continue
-
-total_sla_tickets = sla_compliant + sla_violated
-sla_compliance_rate = round((sla_compliant / total_sla_tickets) * 100, 1) if total_sla_tickets > 0 else 0
+# Calculate SLA compliance (vectorized over the whole ticket table)
+sla_compliant = resolution_summary['sla_compliant']
+sla_violated = resolution_summary['sla_violated']
+sla_critical = resolution_summary['sla_critical']
+sla_compliance_rate = resolution_summary['sla_compliance']
 
 with col1:
     st.metric("✅ SLA Cumprido", f"{sla_compliance_rate}%", 
@@ -209,80 +194,111 @@ st.markdown("---")
 # === EXPORT SECTION ===
 st.markdown("## 📁 Exportação de Relatórios")
 
+# Exports run as background jobs on a worker process pool and stream from the
+# database in chunks into a file, so the page stays responsive while they run
+with st.expander("⚙️ Opções de exportação"):
+    opt_col1, opt_col2 = st.columns(2)
+    with opt_col1:
+        export_format = st.selectbox(
+            "Formato", available_formats(),
+            format_func=lambda fmt: EXPORT_FORMATS[fmt]['label'])
+        export_columns = st.multiselect(
+            "Colunas (Dados Gerais)", list(EXPORT_COLUMNS) + list(DERIVED_COLUMNS),
+            default=DEFAULT_COLUMNS)
+    with opt_col2:
+        export_start = st.date_input("Abertura a partir de", value=None)
+        export_end = st.date_input("Abertura até", value=None)
+
+
+def submit_export(tipo, columns=None, filename_prefix='chamados'):
+    """Queue an export on the background worker pool"""
+    job_id = submit_job(tipo, {
+        'fmt': export_format,
+        'columns': columns,
+        'start': export_start,
+        'end': export_end,
+        'filename_prefix': filename_prefix,
+    }, current_user['id'])
+    st.toast(f"Exportação #{job_id} enviada para processamento")
+
+
 col1, col2, col3 = st.columns(3)
 
 with col1:
     if st.button("📊 Exportar Dados Gerais", use_container_width=True):
-        # Prepare general data for export
-        all_tickets = get_chamados()
-        if all_tickets:
-            import pandas as pd
-            df = pd.DataFrame(all_tickets, columns=[
-                'ID', 'Título', 'Descrição', 'Setor', 'Prioridade', 'Status',
-                'Solicitante', 'Técnico', 'Data_Abertura', 'Data_Resolução', 'SLA_Prazo'
-            ])
-            
-            csv = df.to_csv(index=False)
-            st.download_button(
-                label="⬇️ Baixar CSV",
-                data=csv,
-                file_name=f"chamados_geral_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv"
-            )
+        submit_export('exportacao_chamados', export_columns or DEFAULT_COLUMNS, "chamados_geral")
 
 with col2:
     if st.button("⏰ Exportar Análise SLA", use_container_width=True):
-        # Prepare SLA analysis for export
-        sla_analysis = []
-        for ticket in all_tickets:
-            if ticket[10]:  # Has SLA deadline
-                sla_status = "Indefinido"
-                try:
-                    sla_deadline = datetime.strptime(ticket[10], '%Y-%m-%d %H:%M:%S')
-                    if ticket[5] == 'Resolvido' and ticket[9]:
-                        resolve_date = datetime.strptime(ticket[9], '%Y-%m-%d %H:%M:%S')
-                        sla_status = "Cumprido" if resolve_date <= sla_deadline else "Violado"
-                    elif ticket[5] != 'Resolvido':
-                        now = datetime.now()
-                        sla_status = "Violado" if now > sla_deadline else "Em Andamento"
-                except:
-                    pass
-                
-                sla_analysis.append([
-                    ticket[0], ticket[1], ticket[4], ticket[5], 
-                    ticket[8], ticket[9], ticket[10], sla_status
-                ])
-        
-        if sla_analysis:
-            import pandas as pd
-            sla_df = pd.DataFrame(sla_analysis, columns=[
-                'ID', 'Título', 'Prioridade', 'Status', 
-                'Data_Abertura', 'Data_Resolução', 'SLA_Prazo', 'SLA_Status'
-            ])
-            
-            csv = sla_df.to_csv(index=False)
-            st.download_button(
-                label="⬇️ Baixar Análise SLA",
-                data=csv,
-                file_name=f"analise_sla_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv"
-            )
+        submit_export('exportacao_chamados', [
+            'id', 'titulo', 'prioridade', 'status', 'data_abertura',
+            'data_resolucao', 'sla_prazo', 'horas_uteis', 'sla_status'
+        ], "analise_sla")
 
 with col3:
     if st.button("👨‍💻 Exportar Desempenho Técnicos", use_container_width=True):
-        # Prepare technician performance for export
-        if analytics_data['technician_performance']:
-            import pandas as pd
-            tech_df = pd.DataFrame(analytics_data['technician_performance'], 
-                                  columns=['Técnico', 'Chamados_Resolvidos', 'Tempo_Médio_Dias'])
-            
-            csv = tech_df.to_csv(index=False)
-            st.download_button(
-                label="⬇️ Baixar Desempenho",
-                data=csv,
-                file_name=f"desempenho_tecnicos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv"
-            )
+        submit_export('desempenho_tecnicos')
+
+
+def show_export_jobs():
+    """Status, progress, cancellation and downloads of the user's recent exports"""
+    jobs = get_user_jobs(current_user['id'])
+    if not jobs:
+        return False
+
+    st.markdown("### 📦 Minhas Exportações")
+    for job_id, tipo, status, progresso, total, mensagem, path, filename, mime, criado, fim in jobs:
+        job_col1, job_col2 = st.columns([3, 1])
+        with job_col1:
+            st.markdown(f"**#{job_id} {JOB_LABELS.get(tipo, tipo)}** — {status} · {criado}")
+            if status in ACTIVE_STATUSES:
+                fraction = min(progresso / total, 1.0) if total else 0.0
+                st.progress(fraction, text=f"{progresso}/{total if total is not None else '?'} linha(s)")
+            elif status == 'Falhou':
+                st.error(f"❌ {mensagem}")
+            elif mensagem:
+                st.caption(mensagem)
+        with job_col2:
+            if status in ACTIVE_STATUSES:
+                if st.button("⛔ Cancelar", key=f"cancel_job_{job_id}"):
+                    request_cancel(job_id, current_user['id'])
+                    st.rerun()
+            elif status == 'Concluído':
+                if path and os.path.exists(path):
+                    with open(path, 'rb') as f:
+                        st.download_button("⬇️ Baixar", data=f, file_name=filename, mime=mime,
+                                           key=f"download_job_{job_id}")
+                else:
+                    st.caption("Arquivo expirado")
+
+    return any(job[2] in ACTIVE_STATUSES for job in jobs)
+
+
+# Poll job status: a self-refreshing fragment where supported, else rerun the page while jobs run
+if hasattr(st, 'fragment'):
+    st.fragment(run_every=JOB_POLL_SECONDS)(show_export_jobs)()
+    jobs_running = False
+else:
+    jobs_running = show_export_jobs()
+
+# === SCHEDULED REPORTS ===
+# Files pre-generated by components.report_scheduler (previous day / previous week)
+reports = get_reports()
+if reports:
+    st.markdown("### 🗂️ Relatórios Agendados")
+    for report_id, nome, agendado_para, status, arquivos, mensagem, fim in reports:
+        st.markdown(f"**{REPORT_LABELS.get(nome, nome)}** — {status} · {agendado_para}")
+        if status == 'Falhou':
+            st.error(f"❌ {mensagem}")
+        file_cols = st.columns(max(len(arquivos), 1))
+        for index, (file_col, arquivo) in enumerate(zip(file_cols, arquivos)):
+            with file_col:
+                if os.path.exists(arquivo['path']):
+                    with open(arquivo['path'], 'rb') as f:
+                        st.download_button(f"⬇️ {arquivo['rotulo']}", data=f, file_name=arquivo['nome'],
+                                           mime=arquivo['mime'], key=f"download_report_{report_id}_{index}")
+                else:
+                    st.caption(f"{arquivo['rotulo']}: arquivo expirado")
 
 # === REAL-TIME MONITORING ===
 st.markdown("## 🔄 Monitoramento em Tempo Real")
@@ -292,36 +308,20 @@ col1, col2 = st.columns(2)
 with col1:
     st.markdown("### 🚨 Alertas Ativos")
     
-    # Check for overdue tickets
-    overdue_count = 0
-    for ticket in all_tickets:
-        if ticket[5] != 'Resolvido' and ticket[10]:
-            try:
-                sla_deadline = datetime.strptime(ticket[10], '%Y-%m-%d %H:%M:%S')
-                if datetime.now() > sla_deadline:
-                    overdue_count += 1
-            except:
-                continue
+    # Current alert set maintained by the background SLA monitor
+    sla_alerts = count_alerts_by_type()
+    overdue_count = sla_alerts['vencido']
     
     if overdue_count > 0:
         st.error(f"🚨 {overdue_count} chamado(s) com SLA vencido")
     
     # Check for high priority pending tickets
-    high_priority_pending = len([t for t in all_tickets if t[4] == 'Alta' and t[5] == 'Pendente'])
+    high_priority_pending = analytics_data['high_priority_pending']
     if high_priority_pending > 0:
         st.warning(f"⚡ {high_priority_pending} chamado(s) de alta prioridade pendente(s)")
     
     # Check for unassigned tickets older than 2 hours
-    unassigned_old = 0
-    for ticket in all_tickets:
-        if ticket[5] == 'Pendente' and not ticket[7]:  # No technician assigned
-            try:
-                open_date = datetime.strptime(ticket[8], '%Y-%m-%d %H:%M:%S')
-                hours_open = (datetime.now() - open_date).total_seconds() / 3600
-                if hours_open > 2:
-                    unassigned_old += 1
-            except:
-                continue
+    unassigned_old = sla_alerts['nao_atribuido']
     
     if unassigned_old > 0:
         st.warning(f"⏰ {unassigned_old} chamado(s) não atribuído(s) há mais de 2 horas")
@@ -332,43 +332,26 @@ with col1:
 with col2:
     st.markdown("### 📊 Estatísticas da Última Hora")
     
-    # Calculate statistics for last hour
-    one_hour_ago = datetime.now() - timedelta(hours=1)
-    recent_tickets = []
-    
-    for ticket in all_tickets:
-        try:
-            open_date = datetime.strptime(ticket[8], '%Y-%m-%d %H:%M:%S')
-            if open_date >= one_hour_ago:
-                recent_tickets.append(ticket)
-        except:
-            continue
-    
-    st.metric("🆕 Novos Chamados", len(recent_tickets))
-    
-    # Recent resolutions
-    recent_resolutions = []
-    for ticket in all_tickets:
-        if ticket[9]:  # Has resolution date
-            try:
-                resolve_date = datetime.strptime(ticket[9], '%Y-%m-%d %H:%M:%S')
-                if resolve_date >= one_hour_ago:
-                    recent_resolutions.append(ticket)
-            except:
-                continue
-    
-    st.metric("✅ Resoluções", len(recent_resolutions))
-    
-    # Average response time for new tickets
-    if recent_tickets:
-        assigned_count = len([t for t in recent_tickets if t[7]])  # Has technician
-        response_rate = round((assigned_count / len(recent_tickets)) * 100, 1)
-        st.metric("⚡ Taxa de Resposta", f"{response_rate}%")
+    # Statistics for the hour before the data above was computed
+    last_hour = analytics_data['last_hour']
+    st.metric("🆕 Novos Chamados", last_hour['novos'])
+    st.metric("✅ Resoluções", last_hour['resolvidos'])
+    if last_hour['taxa_resposta'] is not None:
+        st.metric("⚡ Taxa de Resposta", f"{last_hour['taxa_resposta']}%")
 
 # Auto-refresh option
 st.markdown("---")
 if st.button("🔄 Atualizar Dashboard", use_container_width=False):
     st.rerun()
 
-# Footer with last update time
-st.markdown(f"*Última atualização: {datetime.now().strftime('%d/%m/%Y às %H:%M:%S')}*")
\ No newline at end of file
+# Footer with the time the numbers above were computed
+st.markdown(f"*Última atualização: {updated_at.strftime('%d/%m/%Y às %H:%M:%S')}*")
+
+
+# Record how long this page run took
+observe_page_render('dashboard_diretoria', _render_start)
+
+# Refresh while exports are running (Streamlit versions without st.fragment)
+if jobs_running:
+    time.sleep(JOB_POLL_SECONDS)
+    st.rerun()
@@ -1,16 +1,20 @@
 import streamlit as st
 import sys
 import os
-import sqlite3
-import hashlib
+import time
 import pandas as pd
 
 # Add components directory to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'components'))
 
 from components.auth import check_authentication, get_current_user
-from components.database import get_usuarios
+from components.database import (get_usuarios, check_username_exists, create_user, update_user, update_user_status,
+                                 get_sla_policy_rows, save_sla_policy, delete_sla_policy)
+from components.auto_assign import request_resync
 from components.header import display_header
+from components.metrics import observe_page_render
+
+_render_start = time.perf_counter()
 
 # Check authentication
 if not check_authentication():
@@ -33,7 +37,7 @@ st.title("👥 Gerenciamento de Usuários")
 st.markdown("Gerencie usuários, perfis e permissões do sistema")
 
 # Tabs for different functions
-tab1, tab2, tab3 = st.tabs(["👥 Listar Usuários", "➕ Adicionar Usuário", "📊 Estatísticas"])
+tab1, tab2, tab3, tab4 = st.tabs(["👥 Listar Usuários", "➕ Adicionar Usuário", "📊 Estatísticas", "⏱️ Políticas de SLA"])
 
 with tab1:
     st.markdown("### 📋 Lista de Usuários")
@@ -129,11 +133,13 @@ with tab1:
                         if ativo:
                             if st.button(f"🚫 Desativar", key=f"deactivate_{user_id}"):
                                 update_user_status(user_id, False)
+                                request_resync()  # technicians available for automatic assignment changed
                                 st.success(f"Usuário {username} desativado!")
                                 st.rerun()
                         else:
                             if st.button(f"✅ Ativar", key=f"activate_{user_id}"):
                                 update_user_status(user_id, True)
+                                request_resync()
                                 st.success(f"Usuário {username} ativado!")
                                 st.rerun()
                     else:
@@ -171,11 +177,13 @@ with tab1:
                                         st.error("❌ Senha deve ter pelo menos 6 caracteres!")
                                     else:
                                         update_user(user_id, new_nome, new_email, new_perfil, new_setor, new_password)
+                                        request_resync()
                                         st.success("✅ Usuário atualizado com sucesso!")
                                         del st.session_state[f'editing_user_{user_id}']
                                         st.rerun()
                                 else:
                                     update_user(user_id, new_nome, new_email, new_perfil, new_setor)
+                                    request_resync()
                                     st.success("✅ Usuário atualizado com sucesso!")
                                     del st.session_state[f'editing_user_{user_id}']
                                     st.rerun()
@@ -237,6 +245,7 @@ with tab2:
                 else:
                     try:
                         create_user(username, password, nome, email, perfil, setor)
+                        request_resync()
                         st.success(f"✅ Usuário '{username}' criado com sucesso!")
                         st.info(f"📋 Perfil: {perfil} | Setor: {setor}")
 
@@ -291,64 +300,54 @@ with tab3:
             activity_rate = round((active_count / len(df)) * 100, 1) if len(df) > 0 else 0
             st.metric("📈 Taxa de Atividade", f"{activity_rate}%")
 
-# Helper functions
-def check_username_exists(username):
-    """Check if username already exists"""
-    conn = sqlite3.connect('data/chamados.db')
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT id FROM usuarios WHERE username = ?", (username,))
-    exists = cursor.fetchone() is not None
-
-    conn.close()
-    return exists
-
-def create_user(username, password, nome, email, perfil, setor):
-    """Create a new user"""
-    conn = sqlite3.connect('data/chamados.db')
-    cursor = conn.cursor()
-
-    password_hash = hash_password(password)
-
-    cursor.execute("""
-        INSERT INTO usuarios (username, password_hash, nome_completo, email, role, setor)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (username, password_hash, nome, email, perfil, setor))
-
-    conn.commit()
-    conn.close()
-
-def update_user(user_id, nome, email, perfil, setor, password=None):
-    """Update an existing user"""
-    conn = sqlite3.connect('data/chamados.db')
-    cursor = conn.cursor()
-
-    if password:
-        password_hash = hash_password(password)
-        cursor.execute("""
-            UPDATE usuarios 
-            SET nome_completo = ?, email = ?, role = ?, setor = ?, password_hash = ?
-            WHERE id = ?
-        """, (nome, email, perfil, setor, password_hash, user_id))
-    else:
-        cursor.execute("""
-            UPDATE usuarios 
-            SET nome_completo = ?, email = ?, role = ?, setor = ?
-            WHERE id = ?
-        """, (nome, email, perfil, setor, user_id))
-
-    conn.commit()
-    conn.close()
-
-def update_user_status(user_id, active):
-    """Update user active status"""
-    conn = sqlite3.connect('data/chamados.db')
-    cursor = conn.cursor()
+with tab4:
+    st.markdown("### ⏱️ Políticas de SLA")
+    st.markdown("Metas de atendimento por setor e prioridade. O setor `*` vale para todos os setores sem regra própria.")
+
+    policies = get_sla_policy_rows()
+    if policies:
+        policies_df = pd.DataFrame(policies, columns=['Setor', 'Prioridade', 'Horas', 'Horário Comercial',
+                                                      'Pausa Aguardando Solicitante', 'ID', 'Ativo'])
+        for column in ['Horário Comercial', 'Pausa Aguardando Solicitante', 'Ativo']:
+            policies_df[column] = policies_df[column].astype(bool)
+        st.dataframe(policies_df[['ID', 'Setor', 'Prioridade', 'Horas', 'Horário Comercial',
+                                  'Pausa Aguardando Solicitante', 'Ativo']],
+                     use_container_width=True, hide_index=True)
+
+    with st.form("sla_policy_form"):
+        st.markdown("#### ✏️ Criar ou Atualizar Política")
+        col1, col2 = st.columns(2)
 
-    cursor.execute("UPDATE usuarios SET ativo = ? WHERE id = ?", (active, user_id))
+        with col1:
+            policy_sector = st.selectbox("🏢 Setor:", [
+                "*", "Administrativo", "Financeiro", "Recursos Humanos", "Médico", "Faturamento", "Comercial", "AlphaclinMais", "Aréa Técnica", "Atendimento Terréo", "Atendimento 1Piso", "Atendimento 2Piso", "Vacinas",
+                "Marketing", "Suprimentos", "Tomografia", "Ressonância", "Diretoria", "Qualidade", "Telefonia", "Lumina Imagem", "Outro"
+            ])
+            policy_priority = st.selectbox("⚡ Prioridade:", ["Alta", "Média", "Baixa"])
+            policy_hours = st.number_input("⏱️ Prazo (horas):", min_value=0.5, max_value=720.0, value=24.0, step=0.5)
 
-    conn.commit()
-    conn.close()
+        with col2:
+            policy_business = st.checkbox("🕗 Contar apenas horário comercial (dias úteis e feriados)")
+            policy_pause = st.checkbox("⏸️ Pausar SLA enquanto aguarda o solicitante", value=True)
+            policy_active = st.checkbox("✅ Ativa", value=True)
+
+        if st.form_submit_button("💾 Salvar Política", use_container_width=True):
+            save_sla_policy(policy_sector, policy_priority, policy_hours,
+                            policy_business, policy_pause, policy_active)
+            st.success(f"✅ Política {policy_sector} / {policy_priority} salva e aplicada!")
+            st.rerun()
+
+    if policies:
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            policy_to_delete = st.selectbox("🗑️ Remover política:", [p[5] for p in policies],
+                                            format_func=lambda pid: next(f"#{p[5]} - {p[0]} / {p[1]}" for p in policies if p[5] == pid))
+        with col2:
+            st.markdown("<br>", unsafe_allow_html=True)
+            if st.button("🗑️ Remover", use_container_width=True):
+                delete_sla_policy(policy_to_delete)
+                st.success("Política removida!")
+                st.rerun()
 
 # Sidebar with quick actions
 with st.sidebar:
@@ -399,4 +398,7 @@ with st.sidebar:
     - 👥 Atribua perfis adequados
     - 🚫 Desative usuários inativos
     - 📧 Mantenha emails atualizados
-    """)
\ No newline at end of file
+    """)
+
+# Record how long this page run took
+observe_page_render('admin_usuarios', _render_start)
@@ -0,0 +1,176 @@
+import streamlit as st
+import sys
+import os
+import time
+import pandas as pd
+from datetime import datetime
+
+# Add components directory to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'components'))
+
+from components.auth import check_authentication, get_current_user
+from components.backup import BACKUP_DIR, list_snapshots, read_manifest
+from components.header import display_header
+from components.maintenance import get_maintenance_log
+from components.metrics import collect_gauges, get_histogram_summary, observe_page_render, render_prometheus
+from components.query_log import SLOW_QUERY_MS, read_slow_queries
+from components.tracing import list_traces
+from utils.helpers import check_system_health
+
+_render_start = time.perf_counter()
+
+# Check authentication
+if not check_authentication():
+    st.error("❌ Acesso negado. Faça login primeiro.")
+    st.stop()
+
+current_user = get_current_user()
+
+# Only allow administrators
+if current_user['role'] != 'Administrador':
+    st.error("❌ Acesso negado. Esta página é apenas para administradores.")
+    st.stop()
+
+st.set_page_config(page_title="Métricas do Sistema", page_icon="📈", layout="wide")
+
+# Display header
+display_header()
+
+st.title("📈 Métricas do Sistema")
+st.markdown("Latência das consultas, contadores e tamanho do banco (desde o início deste processo)")
+
+# === HEALTH ===
+health = check_system_health()
+col1, col2, col3, col4 = st.columns(4)
+with col1:
+    st.metric("Status", "✅ Saudável" if health['status'] == 'healthy' else "❌ Erro")
+with col2:
+    st.metric("Banco de dados", f"{health.get('db_bytes', 0) / 1024 / 1024:.1f} MB")
+with col3:
+    st.metric("WAL", f"{health.get('wal_bytes', 0) / 1024 / 1024:.1f} MB")
+with col4:
+    st.metric("Conexões abertas (total)", health.get('connections', 0),
+              help="Conexões SQLite abertas desde o início do processo (contador acumulado)")
+
+if health['status'] != 'healthy':
+    st.error(f"❌ {health.get('error')}")
+
+# === QUERY LATENCY ===
+st.markdown("## 🗄️ Latência por Função do Banco")
+queries = get_histogram_summary('chamados_db_query_seconds')
+if queries:
+    df = pd.DataFrame(queries).rename(columns={
+        'nome': 'Função', 'chamadas': 'Chamadas', 'total_s': 'Total (s)', 'media_ms': 'Média (ms)',
+        'p50_ms': 'p50 (ms)', 'p95_ms': 'p95 (ms)', 'p99_ms': 'p99 (ms)'
+    })
+    st.dataframe(df.round(2), use_container_width=True, hide_index=True)
+else:
+    st.info("Nenhuma consulta registrada ainda.")
+
+# === PAGE RENDER ===
+st.markdown("## 🖥️ Tempo de Renderização das Páginas")
+pages = get_histogram_summary('chamados_page_render_seconds')
+if pages:
+    df = pd.DataFrame(pages).rename(columns={
+        'nome': 'Página', 'chamadas': 'Execuções', 'total_s': 'Total (s)', 'media_ms': 'Média (ms)',
+        'p50_ms': 'p50 (ms)', 'p95_ms': 'p95 (ms)', 'p99_ms': 'p99 (ms)'
+    })
+    st.dataframe(df.round(1), use_container_width=True, hide_index=True)
+else:
+    st.info("Nenhuma página medida ainda.")
+
+# === SLOW QUERIES ===
+st.markdown("## 🐢 Consultas Lentas")
+st.caption(f"Instruções acima de {SLOW_QUERY_MS:g} ms, com plano de execução (EXPLAIN QUERY PLAN)")
+slow_queries = read_slow_queries(50)
+if slow_queries:
+    st.dataframe(pd.DataFrame([{
+        'Horário': entry['timestamp'],
+        'Duração (ms)': entry['duracao_ms'],
+        'Função': entry.get('funcao'),
+        'Origem': entry.get('origem'),
+        'Varredura completa': '⚠️' if entry.get('full_scan') else '',
+        'Ordenação temporária': '⚠️' if entry.get('temp_btree') else '',
+        'SQL': entry['sql'],
+        'Plano': ' | '.join(entry.get('plano') or []),
+    } for entry in slow_queries]), use_container_width=True, hide_index=True)
+else:
+    st.info("Nenhuma consulta lenta registrada.")
+
+# === GAUGES ===
+st.markdown("## 📟 Caches, Filas e Contadores")
+gauges = collect_gauges()
+if gauges:
+    st.dataframe(pd.DataFrame([
+        {'Métrica': name, 'Rótulos': ', '.join(f"{k}={v}" for k, v in (labels or {}).items()), 'Valor': value}
+        for name, labels, value in gauges
+    ]), use_container_width=True, hide_index=True)
+
+# === MAINTENANCE ===
+st.markdown("## 🧹 Manutenção do Banco")
+st.caption("Checkpoints do WAL, estatísticas (ANALYZE) e vacuum incremental feitos por este processo")
+maintenance_log = get_maintenance_log(50)
+if maintenance_log:
+    st.dataframe(pd.DataFrame([{
+        'Horário': entry['horario'],
+        'Arquivo': entry['arquivo'],
+        'Tarefa': entry['tarefa'],
+        'Duração (ms)': entry['duracao_ms'],
+        'Páginas liberadas': entry['paginas'],
+        'Detalhes': entry['detalhes'],
+    } for entry in maintenance_log]), use_container_width=True, hide_index=True)
+else:
+    st.info("Nenhuma manutenção executada ainda.")
+
+# === BACKUPS ===
+st.markdown("## 💾 Backups")
+st.caption(f"Cópias online em {BACKUP_DIR}. Verifique uma cópia com: python -m components.backup --verify")
+snapshots = list_snapshots()
+if snapshots:
+    backup_rows = []
+    for name, _ in snapshots:
+        manifest = read_manifest(name)
+        backup_rows.append({
+            'Backup': name,
+            'Criado em': manifest['criado_em'],
+            'Arquivos': len(manifest['arquivos']),
+            'Tamanho (MB)': round(sum(item['bytes'] for item in manifest['arquivos']) / 1024 / 1024, 1),
+            'Compactado (MB)': round(sum(item['bytes_gz'] for item in manifest['arquivos']) / 1024 / 1024, 1),
+            'Duração (s)': manifest['duracao_s'],
+        })
+    st.dataframe(pd.DataFrame(backup_rows), use_container_width=True, hide_index=True)
+else:
+    st.info("Nenhum backup encontrado.")
+
+# === TRACES ===
+st.markdown("## 🧵 Traces de Páginas")
+st.caption("Abra no chrome://tracing ou em ui.perfetto.dev. Adicione ?trace=1 à URL de uma página para gerar um trace.")
+traces = list_traces(10)
+if traces:
+    for index, path in enumerate(traces):
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            st.text(os.path.basename(path))
+        with col2:
+            with open(path, 'rb') as f:
+                st.download_button("⬇️ Baixar", data=f, file_name=os.path.basename(path),
+                                   mime="application/json", key=f"trace_{index}")
+else:
+    st.info("Nenhum trace registrado.")
+
+# === RAW EXPORT ===
+st.markdown("## 📄 Formato Prometheus")
+metrics_text = render_prometheus()
+col1, col2 = st.columns([1, 4])
+with col1:
+    st.download_button("⬇️ Baixar métricas", data=metrics_text,
+                       file_name=f"metricas_{datetime.now().strftime('%Y%m%d_%H%M%S')}.prom",
+                       mime="text/plain")
+with col2:
+    if st.button("🔄 Atualizar"):
+        st.rerun()
+with st.expander("Ver texto"):
+    st.code(metrics_text, language="text")
+
+# Record how long this page run took
+observe_page_render('metricas', _render_start)
@@ -0,0 +1,209 @@
+import atexit
+import glob
+import os
+import sqlite3
+import threading
+import time
+
+from components.database import get_current_time_str
+from components.metrics import register_gauges
+
+# One SQLite file per month (audit_YYYY_MM.db): cheap appends, old months can be archived/removed
+AUDIT_DIR = os.environ.get('AUDIT_DIR', os.path.join('data', 'audit'))
+
+# Durability: 'buffered' batches events in memory (lost on a crash since the last flush),
+# 'immediate' writes each event before log_event returns
+AUDIT_MODE = os.environ.get('AUDIT_MODE', 'buffered')
+# PRAGMA synchronous of the partitions: OFF, NORMAL or FULL
+AUDIT_SYNCHRONOUS = os.environ.get('AUDIT_SYNCHRONOUS', 'NORMAL').upper()
+FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_SECONDS', 2))
+BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', 200))
+# Past this many pending events the caller flushes inline (backpressure, never drops)
+MAX_BUFFER = int(os.environ.get('AUDIT_MAX_BUFFER', 10000))
+
+_condition = threading.Condition()
+_buffer = []        # (timestamp, user_id, action, details)
+_write_lock = threading.Lock()
+_initialized = set()  # partition paths whose schema exists
+_thread = None
+
+
+def _partition_path(month):
+    """File of a month partition ('YYYY_MM')"""
+    return os.path.join(AUDIT_DIR, f"audit_{month}.db")
+
+
+def _month_of(timestamp):
+    """Partition key of a 'YYYY-MM-DD HH:MM:SS' timestamp"""
+    return f"{timestamp[:4]}_{timestamp[5:7]}"
+
+
+def _connect(path):
+    """Open a partition, creating its schema on first use"""
+    conn = sqlite3.connect(path, timeout=10)
+    conn.execute(f"PRAGMA synchronous = {AUDIT_SYNCHRONOUS}")
+    if path not in _initialized:
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS audit_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                action TEXT NOT NULL,
+                details TEXT,
+                timestamp TIMESTAMP NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_timestamp ON audit_log (timestamp)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_user ON audit_log (user_id, timestamp)")
+        _initialized.add(path)
+    return conn
+
+
+def _write(events):
+    """Write a batch of events, one transaction per month partition"""
+    by_month = {}
+    for event in events:
+        by_month.setdefault(_month_of(event[0]), []).append(event)
+
+    os.makedirs(AUDIT_DIR, exist_ok=True)
+    with _write_lock:
+        for month, rows in by_month.items():
+            conn = _connect(_partition_path(month))
+            try:
+                with conn:
+                    conn.executemany("""
+                        INSERT INTO audit_log (timestamp, user_id, action, details)
+                        VALUES (?, ?, ?, ?)
+                    """, rows)
+            finally:
+                conn.close()
+
+
+def flush():
+    """Write every buffered event now"""
+    with _condition:
+        events = _buffer[:]
+        _buffer.clear()
+    if events:
+        try:
+            _write(events)
+        except Exception:
+            # Keep the events for the next attempt instead of losing them
+            with _condition:
+                _buffer[:0] = events
+            raise
+
+
+def _run():
+    """Flush on the timer or as soon as a full batch is waiting"""
+    while True:
+        with _condition:
+            _condition.wait_for(lambda: len(_buffer) >= BATCH_SIZE, timeout=FLUSH_INTERVAL)
+        try:
+            flush()
+        except Exception:
+            time.sleep(FLUSH_INTERVAL)
+
+
+def start_audit_writer():
+    """Start the background flusher once per process"""
+    global _thread
+    with _condition:
+        if _thread is not None and _thread.is_alive():
+            return
+        _thread = threading.Thread(target=_run, name='audit-writer', daemon=True)
+        _thread.start()
+
+
+def log_event(user_id, action, details=None, timestamp=None):
+    """Record an audit event (buffered unless AUDIT_MODE is 'immediate')"""
+    event = (timestamp or get_current_time_str(), user_id, action, details)
+    if AUDIT_MODE == 'immediate':
+        _write([event])
+        return
+
+    start_audit_writer()
+    with _condition:
+        _buffer.append(event)
+        pending = len(_buffer)
+        if pending >= BATCH_SIZE:
+            _condition.notify()
+    if pending >= MAX_BUFFER:
+        flush()
+
+
+def list_partitions():
+    """Existing month partitions ('YYYY_MM'), oldest first"""
+    paths = glob.glob(os.path.join(AUDIT_DIR, 'audit_????_??.db'))
+    return sorted(os.path.basename(path)[6:13] for path in paths)
+
+
+def _months_between(start, end):
+    """Partitions overlapping a timestamp range (None means unbounded)"""
+    months = list_partitions()
+    if start:
+        months = [m for m in months if m >= _month_of(str(start))]
+    if end:
+        months = [m for m in months if m <= _month_of(str(end))]
+    return months
+
+
+def query_audit(start=None, end=None, user_id=None, action=None, limit=500):
+    """Audit events newest first, reading only the partitions that overlap [start, end].
+
+    Buffered events are flushed first so the result includes everything logged so far.
+    Returns (timestamp, user_id, action, details) tuples.
+    """
+    flush()
+
+    query = "SELECT timestamp, user_id, action, details FROM audit_log WHERE 1=1"
+    params = []
+    if start:
+        query += " AND timestamp >= ?"
+        params.append(str(start))
+    if end:
+        query += " AND timestamp <= ?"
+        params.append(str(end))
+    if user_id is not None:
+        query += " AND user_id = ?"
+        params.append(user_id)
+    if action:
+        query += " AND action = ?"
+        params.append(action)
+    query += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+
+    # Months are disjoint, so newest-partition-first concatenation is already sorted
+    events = []
+    for month in reversed(_months_between(start, end)):
+        conn = sqlite3.connect(f"file:{_partition_path(month)}?mode=ro", uri=True, timeout=10)
+        try:
+            events.extend(conn.execute(query, params + [limit - len(events)]).fetchall())
+        finally:
+            conn.close()
+        if len(events) >= limit:
+            break
+    return events
+
+
+def drop_partitions_before(month):
+    """Delete partitions older than a 'YYYY_MM' month (retention); returns the months removed"""
+    removed = [m for m in list_partitions() if m < month]
+    with _write_lock:
+        for m in removed:
+            for suffix in ('', '-wal', '-shm'):
+                path = _partition_path(m) + suffix
+                if os.path.exists(path):
+                    os.remove(path)
+            _initialized.discard(_partition_path(m))
+    return removed
+
+
+# Flush whatever is still buffered when the process exits normally
+atexit.register(lambda: flush() if _buffer else None)
+
+
+def _buffer_gauges():
+    return [('chamados_audit_buffered_events', None, len(_buffer))]
+
+
+register_gauges(_buffer_gauges)
@@ -0,0 +1,357 @@
+import bisect
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import pytz
+
+# Timezone of Porto Velho, RO - timestamps in the database are stored as local wall time
+BRAZIL_TZ = pytz.timezone('America/Porto_Velho')
+
+DB_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Working hours per weekday (0 = Monday ... 6 = Sunday) as (start, end) intervals in local time.
+# Several intervals per day are allowed, e.g. [('08:00', '12:00'), ('14:00', '18:00')].
+WORKING_HOURS = {
+    0: [('08:00', '18:00')],
+    1: [('08:00', '18:00')],
+    2: [('08:00', '18:00')],
+    3: [('08:00', '18:00')],
+    4: [('08:00', '18:00')],
+    5: [],
+    6: [],
+}
+
+# Fixed-date national holidays: (month, day) -> (name, first year in force)
+NATIONAL_HOLIDAYS = {
+    (1, 1): ('Confraternização Universal', None),
+    (4, 21): ('Tiradentes', None),
+    (5, 1): ('Dia do Trabalho', None),
+    (9, 7): ('Independência do Brasil', None),
+    (10, 12): ('Nossa Senhora Aparecida', None),
+    (11, 2): ('Finados', None),
+    (11, 15): ('Proclamação da República', None),
+    (11, 20): ('Dia Nacional de Zumbi e da Consciência Negra', 2024),
+    (12, 25): ('Natal', None),
+}
+
+# Fixed-date state holidays of Rondônia
+RONDONIA_HOLIDAYS = {
+    (1, 4): ('Criação do Estado de Rondônia', None),
+    (6, 18): ('Dia do Evangélico', None),
+}
+
+# Holidays relative to Easter Sunday: offset in days -> (name, optional)
+# Optional entries are "pontos facultativos" and only count when include_optional is set.
+EASTER_HOLIDAYS = {
+    -48: ('Carnaval (segunda-feira)', True),
+    -47: ('Carnaval (terça-feira)', True),
+    -2: ('Sexta-feira Santa', False),
+    60: ('Corpus Christi', True),
+}
+
+
+def easter_sunday(year):
+    """Return Easter Sunday for a year (anonymous Gregorian algorithm)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def get_holidays(year, include_optional=True, extra_holidays=None):
+    """Return a {date: name} dict with national and Rondônia holidays for a year"""
+    holidays = {}
+
+    for fixed in (NATIONAL_HOLIDAYS, RONDONIA_HOLIDAYS):
+        for (month, day), (name, since) in fixed.items():
+            if since is None or year >= since:
+                holidays[date(year, month, day)] = name
+
+    easter = easter_sunday(year)
+    for offset, (name, optional) in EASTER_HOLIDAYS.items():
+        if include_optional or not optional:
+            holidays[easter + timedelta(days=offset)] = name
+
+    for holiday, name in (extra_holidays or {}).items():
+        if holiday.year == year:
+            holidays[holiday] = name
+
+    return holidays
+
+
+def _to_minutes(value):
+    """Convert 'HH:MM' or a time object into minutes since midnight"""
+    if isinstance(value, time):
+        return value.hour * 60 + value.minute
+    hours, minutes = str(value).split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def parse_db_timestamp(value):
+    """Parse a database timestamp into a naive local datetime (None if invalid)"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(BRAZIL_TZ).replace(tzinfo=None)
+        return value
+    try:
+        # Values may carry microseconds or a UTC offset ('2025-06-02 04:10:12.757703-04:00')
+        return datetime.strptime(str(value)[:19], DB_TIMESTAMP_FORMAT)
+    except ValueError:
+        return None
+
+
+def parse_db_timestamps(values):
+    """Vectorized parse of database timestamps into a datetime64 Series (NaT if invalid)"""
+    if isinstance(values, pd.Series) and pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    series = pd.Series(values, dtype='object')
+    return pd.to_datetime(series.astype('string').str.slice(0, 19),
+                          format=DB_TIMESTAMP_FORMAT, errors='coerce')
+
+
+class BusinessCalendar:
+    """Working-time calendar backed by precomputed cumulative working-minute tables.
+
+    Every day in the covered range stores its working intervals and the cumulative
+    number of working minutes before it, so the working time between two instants
+    is the difference of two table lookups - O(1) per pair, vectorized for batches.
+    """
+
+    def __init__(self, working_hours=None, include_optional=True, extra_holidays=None,
+                 first_year=None, last_year=None):
+        self.working_hours = {
+            weekday: [(_to_minutes(start), _to_minutes(end)) for start, end in intervals]
+            for weekday, intervals in (working_hours or WORKING_HOURS).items()
+        }
+        self.include_optional = include_optional
+        self.extra_holidays = dict(extra_holidays or {})
+
+        current_year = datetime.now(BRAZIL_TZ).year
+        self._build(first_year or current_year - 5, last_year or current_year + 5)
+
+    def _build(self, first_year, last_year):
+        """Precompute per-day intervals and cumulative working minutes"""
+        self.first_day = date(first_year, 1, 1)
+        self.last_day = date(last_year, 12, 31)
+        n_days = (self.last_day - self.first_day).days + 1
+
+        holidays = {}
+        for year in range(first_year, last_year + 1):
+            holidays.update(get_holidays(year, self.include_optional, self.extra_holidays))
+        self.holidays = holidays
+
+        max_intervals = max([len(v) for v in self.working_hours.values()] + [1])
+        starts = np.zeros((n_days, max_intervals), dtype=np.float64)
+        lengths = np.zeros((n_days, max_intervals), dtype=np.float64)
+        day_intervals = []
+
+        for index in range(n_days):
+            day = self.first_day + timedelta(days=index)
+            intervals = [] if day in holidays else self.working_hours.get(day.weekday(), [])
+            day_intervals.append(tuple(intervals))
+            for k, (start, end) in enumerate(intervals):
+                starts[index, k] = start
+                lengths[index, k] = max(end - start, 0)
+
+        cumulative = np.zeros(n_days + 1, dtype=np.float64)
+        np.cumsum(lengths.sum(axis=1), out=cumulative[1:])
+
+        self._day_intervals = day_intervals
+        self._cumulative = cumulative.tolist()
+        self._starts = starts
+        self._lengths = lengths
+        self._cumulative_array = cumulative
+        self._base = np.datetime64(self.first_day, 'D')
+
+    def _ensure_covers(self, first, last):
+        """Rebuild the tables if a date falls outside the covered range"""
+        if first < self.first_day or last > self.last_day:
+            self._build(min(first.year, self.first_day.year), max(last.year, self.last_day.year))
+
+    def is_business_day(self, day):
+        """Check whether a date has any working hours"""
+        if isinstance(day, datetime):
+            day = day.date()
+        self._ensure_covers(day, day)
+        return bool(self._day_intervals[(day - self.first_day).days])
+
+    def cumulative_minutes(self, moment):
+        """Working minutes elapsed from the start of the table up to a moment"""
+        moment = parse_db_timestamp(moment)
+        self._ensure_covers(moment.date(), moment.date())
+
+        index = (moment.date() - self.first_day).days
+        minute = moment.hour * 60 + moment.minute + moment.second / 60 + moment.microsecond / 60e6
+
+        elapsed = 0.0
+        for start, end in self._day_intervals[index]:
+            if minute <= start:
+                break
+            elapsed += min(minute, end) - start
+        return self._cumulative[index] + elapsed
+
+    def working_minutes_between(self, start, end):
+        """Working minutes between two moments (negative if end precedes start)"""
+        return self.cumulative_minutes(end) - self.cumulative_minutes(start)
+
+    def add_working_minutes(self, start, minutes):
+        """Return the moment after a number of working minutes have elapsed from start"""
+        start = parse_db_timestamp(start)
+        if minutes <= 0:
+            return start
+
+        target = self.cumulative_minutes(start) + minutes
+        while target > self._cumulative[-1]:
+            self._build(self.first_day.year, self.last_day.year + 5)
+
+        # Last day whose cumulative total is strictly below the target
+        index = bisect.bisect_left(self._cumulative, target) - 1
+        remaining = target - self._cumulative[index]
+        day_start = datetime.combine(self.first_day + timedelta(days=index), time())
+
+        for interval_start, interval_end in self._day_intervals[index]:
+            length = interval_end - interval_start
+            if remaining <= length:
+                return day_start + timedelta(minutes=interval_start + remaining)
+            remaining -= length
+        return day_start + timedelta(days=1)
+
+    def cumulative_minutes_many(self, moments):
+        """Vectorized cumulative_minutes over array-like timestamps (NaN for missing values)"""
+        values = parse_db_timestamps(moments).to_numpy(dtype='datetime64[s]')
+        valid = ~np.isnat(values)
+        result = np.full(len(values), np.nan)
+        if not valid.any():
+            return result
+
+        values = values[valid]
+        days = values.astype('datetime64[D]')
+        self._ensure_covers(days.min().astype(date), days.max().astype(date))
+
+        index = (days - self._base).astype(np.int64)
+        minute = (values - days).astype(np.int64) / 60.0
+
+        starts = self._starts[index]
+        lengths = self._lengths[index]
+        within = np.clip(minute[:, None] - starts, 0, lengths).sum(axis=1)
+
+        result[valid] = self._cumulative_array[index] + within
+        return result
+
+    def working_minutes_between_many(self, starts, ends):
+        """Vectorized working_minutes_between over paired array-likes"""
+        return self.cumulative_minutes_many(ends) - self.cumulative_minutes_many(starts)
+
+    def add_working_minutes_many(self, starts, minutes):
+        """Vectorized add_working_minutes (NaT for missing starts)"""
+        target = self.cumulative_minutes_many(starts) + np.asarray(minutes, dtype=np.float64)
+        result = np.full(len(target), np.datetime64('NaT'), dtype='datetime64[s]')
+        valid = ~np.isnan(target)
+        if not valid.any():
+            return pd.Series(result)
+
+        while np.nanmax(target) > self._cumulative_array[-1]:
+            self._build(self.first_day.year, self.last_day.year + 5)
+
+        target = target[valid]
+        index = np.searchsorted(self._cumulative_array, target, side='left') - 1
+        remaining = target - self._cumulative_array[index]
+
+        minute_of_day = np.full(len(target), 24 * 60.0)
+        pending = np.ones(len(target), dtype=bool)
+        for k in range(self._starts.shape[1]):
+            lengths = self._lengths[index, k]
+            fits = pending & (lengths > 0) & (remaining <= lengths)
+            minute_of_day[fits] = self._starts[index[fits], k] + remaining[fits]
+            pending &= ~fits
+            remaining = np.where(pending, remaining - lengths, remaining)
+
+        seconds = np.round(minute_of_day * 60).astype(np.int64).astype('timedelta64[s]')
+        result[valid] = (self._base + index).astype('datetime64[s]') + seconds
+        return pd.Series(result)
+
+
+@lru_cache(maxsize=1)
+def get_default_calendar():
+    """Return the process-wide calendar built from WORKING_HOURS and the holiday tables"""
+    return BusinessCalendar()
+
+
+def business_hours_between(start, end, calendar=None):
+    """Working hours between two moments"""
+    calendar = calendar or get_default_calendar()
+    return calendar.working_minutes_between(start, end) / 60
+
+
+def compute_resolution_metrics(tickets, now=None, calendar=None):
+    """Compute resolution times and SLA compliance for a whole ticket table at once.
+
+    Accepts rows in the get_chamados() layout (or a DataFrame with the same columns) and
+    returns a DataFrame with calendar hours, business hours and SLA outcome per ticket.
+    """
+    calendar = calendar or get_default_calendar()
+    columns = ['id', 'titulo', 'descricao', 'setor', 'prioridade', 'status', 'solicitante',
+               'tecnico', 'data_abertura', 'data_resolucao', 'sla_prazo']
+    df = tickets.copy() if isinstance(tickets, pd.DataFrame) else pd.DataFrame(tickets, columns=columns)
+    if df.empty:
+        return df.assign(horas_corridas=[], horas_uteis=[], sla_status=[])
+
+    now = parse_db_timestamp(now) if now is not None else datetime.now(BRAZIL_TZ).replace(tzinfo=None)
+    opened = parse_db_timestamps(df['data_abertura'])
+    resolved = parse_db_timestamps(df['data_resolucao'])
+    deadline = parse_db_timestamps(df['sla_prazo'])
+
+    is_resolved = (df['status'] == 'Resolvido').to_numpy() & resolved.notna().to_numpy()
+    df['horas_corridas'] = np.where(is_resolved, (resolved - opened).dt.total_seconds() / 3600, np.nan)
+    df['horas_uteis'] = np.where(
+        is_resolved, calendar.working_minutes_between_many(opened, resolved) / 60, np.nan)
+
+    has_deadline = deadline.notna().to_numpy()
+    is_open = ~df['status'].isin(['Resolvido', 'Cancelado']).to_numpy()
+    remaining = (deadline - pd.Timestamp(now)).dt.total_seconds().to_numpy()
+
+    df['sla_status'] = np.select(
+        [is_resolved & has_deadline & (resolved <= deadline).to_numpy(),
+         is_resolved & has_deadline,
+         is_open & has_deadline & (remaining < 0),
+         is_open & has_deadline & (remaining < 3600),
+         is_open & has_deadline],
+        ['Cumprido', 'Violado', 'Vencido', 'Crítico', 'No Prazo'],
+        default='Indefinido')
+    return df
+
+
+def summarize_resolution_metrics(metrics):
+    """Aggregate the output of compute_resolution_metrics into dashboard numbers"""
+    if metrics.empty:
+        return {'avg_resolution_hours': 0, 'avg_business_hours': 0, 'sla_compliance': 0,
+                'sla_compliant': 0, 'sla_violated': 0, 'sla_critical': 0}
+
+    counts = metrics['sla_status'].value_counts()
+    compliant = int(counts.get('Cumprido', 0))
+    # Open tickets past their deadline already count as violations
+    violated = int(counts.get('Violado', 0)) + int(counts.get('Vencido', 0))
+
+    def _mean(column):
+        value = metrics[column].mean()
+        return round(float(value), 1) if pd.notna(value) else 0
+
+    return {
+        'avg_resolution_hours': _mean('horas_corridas'),
+        'avg_business_hours': _mean('horas_uteis'),
+        'sla_compliance': round(compliant / (compliant + violated) * 100, 1) if compliant + violated else 0,
+        'sla_compliant': compliant,
+        'sla_violated': violated,
+        'sla_critical': int(counts.get('Crítico', 0)),
+    }
@@ -0,0 +1,263 @@
+import csv
+import gzip
+import os
+import tempfile
+import time
+from datetime import datetime
+from itertools import islice
+
+import pandas as pd
+
+from components.database import get_analytics_data, get_connection, query_sites
+from utils.business_calendar import compute_resolution_metrics
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet/Arrow exports need pyarrow; CSV.gz always works
+    pa = None
+
+# Exported files live here until they are older than EXPORT_MAX_AGE
+EXPORT_DIR = os.path.join('data', 'exports')
+EXPORT_MAX_AGE = int(os.environ.get('EXPORT_MAX_AGE_SECONDS', 3600))
+CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 5000))
+
+# Exportable columns: key -> (SQL expression, header)
+EXPORT_COLUMNS = {
+    'id': ('id', 'ID'),
+    'titulo': ('titulo', 'Título'),
+    'descricao': ('descricao', 'Descrição'),
+    'setor': ('setor_origem', 'Setor'),
+    'prioridade': ('prioridade', 'Prioridade'),
+    'status': ('status', 'Status'),
+    'solicitante': ('solicitante_nome', 'Solicitante'),
+    'tecnico': ('tecnico_nome', 'Técnico'),
+    'data_abertura': ('data_abertura', 'Data_Abertura'),
+    'data_atribuicao': ('data_atribuicao', 'Data_Atribuição'),
+    'data_resolucao': ('data_resolucao', 'Data_Resolução'),
+    'sla_prazo': ('sla_prazo', 'SLA_Prazo'),
+}
+
+# Columns computed per chunk from the ticket fields they depend on
+DERIVED_COLUMNS = {
+    'horas_uteis': 'Horas_Úteis',
+    'sla_status': 'SLA_Status',
+}
+DERIVED_DEPENDENCIES = ['status', 'data_abertura', 'data_resolucao', 'sla_prazo']
+
+DEFAULT_COLUMNS = ['id', 'titulo', 'descricao', 'setor', 'prioridade', 'status',
+                   'solicitante', 'tecnico', 'data_abertura', 'data_resolucao', 'sla_prazo']
+
+TECHNICIAN_REPORT_HEADERS = ['Técnico', 'Chamados_Resolvidos', 'Tempo_Médio_Dias']
+
+EXPORT_FORMATS = {
+    'csv.gz': {'label': 'CSV compactado (.csv.gz)', 'mime': 'application/gzip'},
+    'parquet': {'label': 'Parquet (.parquet)', 'mime': 'application/vnd.apache.parquet'},
+    'arrow': {'label': 'Arrow IPC (.arrow)', 'mime': 'application/vnd.apache.arrow.file'},
+}
+
+
+def available_formats():
+    """Export formats usable in this installation"""
+    return [fmt for fmt in EXPORT_FORMATS if fmt == 'csv.gz' or pa is not None]
+
+
+def _where_clause(start=None, end=None, filters=None):
+    """WHERE clause and parameters for the export date range and equality filters"""
+    clause = " WHERE 1=1"
+    params = []
+
+    if start:
+        clause += " AND data_abertura >= ?"
+        params.append(str(start))
+    if end:
+        # Inclusive end date: everything before the next day
+        clause += " AND data_abertura < date(?, '+1 day')"
+        params.append(str(end))
+    for column, value in (filters or {}).items():
+        if value:
+            clause += f" AND {EXPORT_COLUMNS[column][0]} = ?"
+            params.append(value)
+    return clause, params
+
+
+def count_chamados(start=None, end=None, filters=None):
+    """Number of tickets an export with these filters will write"""
+    clause, params = _where_clause(start, end, filters)
+    total = 0
+    for site in query_sites((filters or {}).get('setor')):
+        conn = get_connection(site)
+        try:
+            total += conn.execute("SELECT COUNT(*) FROM chamados" + clause, params).fetchone()[0]
+        finally:
+            conn.close()
+    return total
+
+
+def iter_chamados_chunks(columns, start=None, end=None, filters=None, chunk_size=CHUNK_SIZE):
+    """Yield lists of ticket rows (projected columns) in chunks via fetchmany (by unit, then id)"""
+    clause, params = _where_clause(start, end, filters)
+    query = f"SELECT {', '.join(EXPORT_COLUMNS[c][0] for c in columns)} FROM chamados{clause} ORDER BY id"
+
+    for site in query_sites((filters or {}).get('setor')):
+        conn = get_connection(site)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            conn.close()
+
+
+def chunked(rows, chunk_size=CHUNK_SIZE):
+    """Split any row iterable (lists, generators, cursors) into lists of chunk_size"""
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            break
+        yield chunk
+
+
+def _with_derived(chunks, columns, derived):
+    """Append derived columns to each chunk, computed vectorized per chunk"""
+    for rows in chunks:
+        frame = pd.DataFrame(rows, columns=columns)
+        metrics = compute_resolution_metrics(frame[DERIVED_DEPENDENCIES])
+        extra = [metrics[column].round(2) if column == 'horas_uteis' else metrics[column]
+                 for column in derived]
+        extra_rows = zip(*[series.astype(object).where(series.notna(), None).tolist()
+                           for series in extra])
+        yield [row + tuple(values) for row, values in zip(rows, extra_rows)]
+
+
+class _CsvGzWriter:
+    def __init__(self, path, headers):
+        self._file = gzip.open(path, 'wt', encoding='utf-8', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(headers)
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class _ArrowWriter:
+    def __init__(self, path, headers, fmt):
+        fields = [pa.field(header, pa.int64() if header == 'ID' else
+                           pa.float64() if header == DERIVED_COLUMNS['horas_uteis'] else pa.string())
+                  for header in headers]
+        self._schema = pa.schema(fields)
+        if fmt == 'parquet':
+            self._writer = pq.ParquetWriter(path, self._schema, compression='zstd')
+        else:
+            self._sink = pa.OSFile(path, 'wb')
+            self._writer = pa_ipc.new_file(self._sink, self._schema)
+        self._fmt = fmt
+
+    def write(self, rows):
+        arrays = [pa.array([None if value is None else
+                            value if field.type != pa.string() else str(value)
+                            for value in column], type=field.type)
+                  for column, field in zip(zip(*rows), self._schema)]
+        self._writer.write_batch(pa.record_batch(arrays, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+        if self._fmt != 'parquet':
+            self._sink.close()
+
+
+def _open_writer(fmt, path, headers):
+    """Chunk writer for an export format"""
+    if fmt == 'csv.gz':
+        return _CsvGzWriter(path, headers)
+    if pa is None:
+        raise RuntimeError("pyarrow não está instalado: exportação Parquet/Arrow indisponível")
+    return _ArrowWriter(path, headers, fmt)
+
+
+def cleanup_exports(max_age=EXPORT_MAX_AGE):
+    """Remove exported files older than max_age seconds"""
+    if not os.path.isdir(EXPORT_DIR):
+        return
+    limit = time.time() - max_age
+    for name in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, name)
+        try:
+            if os.path.getmtime(path) < limit:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def write_rows(chunks, headers, fmt='csv.gz', filename_prefix='export', progress=None):
+    """Stream row chunks into a temporary export file; returns (path, filename, rows)"""
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    cleanup_exports()
+
+    filename = f"{filename_prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    fd, path = tempfile.mkstemp(prefix=f"{filename_prefix}_", suffix=f".{fmt}", dir=EXPORT_DIR)
+    os.close(fd)
+
+    total = 0
+    writer = _open_writer(fmt, path, headers)
+    try:
+        for rows in chunks:
+            if not rows:
+                continue
+            writer.write(rows)
+            total += len(rows)
+            if progress:
+                progress(total)
+    except BaseException:
+        writer.close()
+        os.remove(path)
+        raise
+    writer.close()
+    return path, filename, total
+
+
+def export_chamados(fmt='csv.gz', columns=None, start=None, end=None, filters=None,
+                    filename_prefix='chamados', chunk_size=CHUNK_SIZE, progress=None):
+    """Export tickets with column projection and date range, in bounded-size chunks.
+
+    Memory stays proportional to chunk_size regardless of how many rows are exported.
+    Returns (path, filename, mime, rows).
+    """
+    columns = list(columns or DEFAULT_COLUMNS)
+    derived = [c for c in columns if c in DERIVED_COLUMNS]
+    base = [c for c in columns if c in EXPORT_COLUMNS]
+
+    # Derived columns need their source fields in the query, even if not exported
+    query_columns = base + [c for c in DERIVED_DEPENDENCIES if derived and c not in base]
+    chunks = iter_chamados_chunks(query_columns, start, end, filters, chunk_size)
+    if derived:
+        chunks = _with_derived(chunks, query_columns, derived)
+
+    # Keep only the requested columns, in the requested order
+    order = [query_columns.index(c) if c in EXPORT_COLUMNS else len(query_columns) + derived.index(c)
+             for c in columns]
+    projected = ([tuple(row[i] for i in order) for row in rows] for rows in chunks)
+
+    headers = [EXPORT_COLUMNS[c][1] if c in EXPORT_COLUMNS else DERIVED_COLUMNS[c] for c in columns]
+    path, filename, total = write_rows(projected, headers, fmt, filename_prefix, progress)
+    return path, filename, EXPORT_FORMATS[fmt]['mime'], total
+
+
+def export_technician_report(fmt='csv.gz', rows=None, filename_prefix='desempenho_tecnicos', progress=None):
+    """Technician performance report (rows: get_analytics_data()['technician_performance'] if omitted).
+
+    Returns (path, filename, mime, rows).
+    """
+    if rows is None:
+        rows = get_analytics_data()['technician_performance']
+    path, filename, total = write_rows(chunked(rows), TECHNICIAN_REPORT_HEADERS, fmt, filename_prefix, progress)
+    return path, filename, EXPORT_FORMATS[fmt]['mime'], total
@@ -1,9 +1,16 @@
 import streamlit as st
 from datetime import datetime, timedelta
-import sqlite3
+from itertools import chain
+from components.database import get_connection, get_quick_stats, get_storage_sizes
+from components.metrics import collect_counters
 import pandas as pd
 import pytz
 
+from components.sla_policy import get_sla_policy
+from utils.business_calendar import business_hours_between, compute_resolution_metrics, summarize_resolution_metrics
+from utils.audit import log_event
+from utils.export_engine import chunked, write_rows
+
 # Configuração do timezone brasileiro - Porto Velho, Rondônia
 BRAZIL_TZ = pytz.timezone('America/Porto_Velho')
 
@@ -77,14 +84,16 @@ def get_sla_status(sla_deadline, current_status):
     except:
         return {"status": "SLA Indefinido", "color": "gray", "icon": "⚪"}
 
-def get_priority_info(priority):
-    """Get priority information with colors and icons"""
+def get_priority_info(priority, setor=None):
+    """Get priority information with colors, icons and the SLA target from the compiled policies"""
     priority_map = {
-        'Alta': {"color": "red", "icon": "🔴", "sla_hours": 4},
-        'Média': {"color": "orange", "icon": "🟡", "sla_hours": 24},
-        'Baixa': {"color": "green", "icon": "🟢", "sla_hours": 72}
+        'Alta': {"color": "red", "icon": "🔴"},
+        'Média': {"color": "orange", "icon": "🟡"},
+        'Baixa': {"color": "green", "icon": "🟢"}
     }
-    return priority_map.get(priority, {"color": "gray", "icon": "⚪", "sla_hours": 24})
+    info = dict(priority_map.get(priority, {"color": "gray", "icon": "⚪"}))
+    info["sla_hours"] = get_sla_policy(priority, setor).horas_resolucao
+    return info
 
 def get_status_info(status):
     """Get status information with colors and icons"""
@@ -129,16 +138,22 @@ def generate_ticket_summary(ticket_data):
     
     return summary
 
-def export_to_csv(data, filename_prefix="export"):
-    """Export data to CSV format"""
-    if not data:
+def export_to_csv(data, filename_prefix="export", headers=None):
+    """Stream rows (tuples or dicts, any iterable) into a gzip CSV file; returns (path, filename)"""
+    rows = iter(data or [])
+    first = next(rows, None)
+    if first is None:
         return None
-    
-    df = pd.DataFrame(data)
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f"{filename_prefix}_{timestamp}.csv"
-    
-    return df.to_csv(index=False), filename
+
+    if isinstance(first, dict):
+        headers = headers or list(first.keys())
+        rows = (tuple(row.get(h) for h in headers) for row in chain([first], rows))
+    else:
+        headers = headers or [f"col_{i}" for i in range(len(first))]
+        rows = chain([first], rows)
+
+    path, filename, _ = write_rows(chunked(rows), headers, 'csv.gz', filename_prefix)
+    return path, filename
 
 def sanitize_input(input_text):
     """Sanitize user input to prevent basic security issues"""
@@ -168,18 +183,9 @@ def create_notification(message, notification_type="info"):
     notification_func(message)
 
 def get_business_hours_duration(start_time, end_time):
-    """Calculate duration considering only business hours (8 AM to 6 PM, Mon-Fri)"""
+    """Calculate duration considering only business hours (working hours per weekday, minus holidays)"""
     try:
-        start = datetime.strptime(start_time, '%Y-%m-%d %H:%M:%S')
-        end = datetime.strptime(end_time, '%Y-%m-%d %H:%M:%S')
-        
-        # Simplified calculation - in production, you'd implement proper business hours logic
-        total_hours = (end - start).total_seconds() / 3600
-        
-        # Rough estimation: assume 50% of time is during business hours
-        business_hours = total_hours * 0.5
-        
-        return round(business_hours, 1)
+        return round(max(business_hours_between(start_time, end_time), 0), 1)
     except:
         return 0
 
@@ -192,6 +198,7 @@ def generate_dashboard_metrics(tickets_data):
             'in_progress': 0,
             'resolved': 0,
             'avg_resolution_time': 0,
+            'avg_business_hours': 0,
             'sla_compliance': 0
         }
     
@@ -200,40 +207,17 @@ def generate_dashboard_metrics(tickets_data):
     in_progress = len([t for t in tickets_data if t[5] == 'Em Andamento'])
     resolved = len([t for t in tickets_data if t[5] == 'Resolvido'])
     
-    # Calculate average resolution time
-    resolution_times = []
-    sla_compliant = 0
-    total_with_sla = 0
-    
-    for ticket in tickets_data:
-        if ticket[5] == 'Resolvido' and ticket[8] and ticket[9]:  # Has open and resolution dates
-            try:
-                open_date = datetime.strptime(ticket[8], '%Y-%m-%d %H:%M:%S')
-                open_date = pytz.UTC.localize(open_date).astimezone(BRAZIL_TZ)
-                resolve_date = datetime.strptime(ticket[9], '%Y-%m-%d %H:%M:%S')
-                resolve_date = pytz.UTC.localize(resolve_date).astimezone(BRAZIL_TZ)
-                resolution_time = (resolve_date - open_date).total_seconds() / 3600  # hours
-                resolution_times.append(resolution_time)
-                
-                # Check SLA compliance
-                if ticket[10]:  # Has SLA deadline
-                    sla_deadline = datetime.strptime(ticket[10], '%Y-%m-%d %H:%M:%S')
-                    if resolve_date <= sla_deadline:
-                        sla_compliant += 1
-                    total_with_sla += 1
-            except:
-                continue
-    
-    avg_resolution_time = round(sum(resolution_times) / len(resolution_times), 1) if resolution_times else 0
-    sla_compliance = round((sla_compliant / total_with_sla) * 100, 1) if total_with_sla > 0 else 0
+    # Resolution times and SLA compliance computed in one vectorized pass
+    summary = summarize_resolution_metrics(compute_resolution_metrics(tickets_data))
     
     return {
         'total': total,
         'pending': pending,
         'in_progress': in_progress,
         'resolved': resolved,
-        'avg_resolution_time': avg_resolution_time,
-        'sla_compliance': sla_compliance
+        'avg_resolution_time': summary['avg_resolution_hours'],
+        'avg_business_hours': summary['avg_business_hours'],
+        'sla_compliance': summary['sla_compliance']
     }
 
 def create_ticket_card(ticket_data, current_user, show_actions=False):
@@ -280,49 +264,36 @@ def create_ticket_card(ticket_data, current_user, show_actions=False):
                 pass
 
 def log_user_action(user_id, action, details=None):
-    """Log user actions for audit purposes"""
-    conn = sqlite3.connect('data/chamados.db')
-    cursor = conn.cursor()
-    
-    # Create audit log table if it doesn't exist
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS audit_log (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            action TEXT NOT NULL,
-            details TEXT,
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES usuarios (id)
-        )
-    """)
-    
-    cursor.execute("""
-        INSERT INTO audit_log (user_id, action, details)
-        VALUES (?, ?, ?)
-    """, (user_id, action, details))
-    
-    conn.commit()
-    conn.close()
+    """Log user actions for audit purposes (buffered, see utils/audit.py)"""
+    log_event(user_id, action, details)
 
 def check_system_health():
     """Check system health and return status"""
     try:
-        conn = sqlite3.connect('data/chamados.db')
+        conn = get_connection()
         cursor = conn.cursor()
         
         # Check if main tables exist and have data
         cursor.execute("SELECT COUNT(*) FROM usuarios")
         users_count = cursor.fetchone()[0]
         
-        cursor.execute("SELECT COUNT(*) FROM chamados")
-        tickets_count = cursor.fetchone()[0]
-        
         conn.close()
-        
+
+        # Tickets may be spread over one file per unit
+        tickets_count = get_quick_stats()['total']
+
+        # Storage and connection figures from the metrics registry (connections: opened since start)
+        sizes = get_storage_sizes()
+        connections = sum(value for name, _, value in collect_counters()
+                          if name == 'chamados_db_connections_total')
+
         return {
             'status': 'healthy',
             'users': users_count,
             'tickets': tickets_count,
+            'db_bytes': sizes['db'],
+            'wal_bytes': sizes['wal'],
+            'connections': connections,
             'timestamp': get_current_time()
         }
     except Exception as e: